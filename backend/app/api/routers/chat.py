@@ -1,14 +1,23 @@
+import json
+from contextlib import aclosing
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.session import get_db
 from app.db.models import Company, ESGScore
 from app.core.auth import get_current_user, TokenPayload
 from app.schemas.common import ChatRequest, ChatResponse
-from app.services.rag import query_similar, generate_chat_answer
+from app.services.answer_cache import answer_cache, evidence_fingerprint
+from app.services.llm_scheduler import INTERACTIVE
+from app.services.rag import (
+    create_embedding, generate_chat_answer, is_mock_embedding, prepare_chat, query_similar, stream_chat_answer,
+)
 
 router = APIRouter(prefix="/v1", tags=["chat"])
 
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
 
 @router.post("/chat", response_model=ChatResponse)
 async def chat(
@@ -16,6 +25,110 @@ async def chat(
     current_user: TokenPayload = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
+    company_id = await _resolve_company_id(body, current_user, db)
+    cached, cache_entry = await _cached_answer(body.message, current_user.tenant_id, company_id, db)
+    if cached is not None:
+        return ChatResponse(**cached, cached=True)
+
+    evidence = await query_similar(
+        query=body.message,
+        tenant_id=current_user.tenant_id,
+        company_id=company_id,
+        top_k=5,
+        db=db,
+    )
+
+    answer_data = await generate_chat_answer(
+        query=body.message,
+        evidence_docs=evidence,
+        db=db,
+        company_id=company_id,
+        tenant_id=current_user.tenant_id,
+    )
+    if cache_entry is not None and not answer_data.pop("failed", False):
+        _cache_answer(current_user.tenant_id, company_id, cache_entry, answer_data)
+
+    return ChatResponse(**answer_data)
+
+
+@router.post("/chat/stream")
+async def chat_stream(
+    body: ChatRequest,
+    current_user: TokenPayload = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Server-Sent Events: ``citations`` first, then ``token`` events as the
+    model writes, then ``done`` (or ``error``). A client disconnect stops the
+    upstream completion. A cached answer arrives as a single ``token``."""
+    company_id = await _resolve_company_id(body, current_user, db)
+    cached, cache_entry = await _cached_answer(body.message, current_user.tenant_id, company_id, db)
+    if cached is not None:
+        events = _replay(cached)
+        return StreamingResponse(_sse(events), media_type="text/event-stream", headers=SSE_HEADERS)
+
+    evidence = await query_similar(
+        query=body.message,
+        tenant_id=current_user.tenant_id,
+        company_id=company_id,
+        top_k=5,
+        db=db,
+    )
+    # Everything that needs the DB session happens before streaming starts.
+    prepared = await prepare_chat(body.message, evidence, db, company_id, current_user.tenant_id)
+    events = stream_chat_answer(prepared)
+    if cache_entry is not None:
+        events = _caching(events, current_user.tenant_id, company_id, cache_entry)
+    return StreamingResponse(_sse(events), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+async def _cached_answer(message: str, tenant_id: str, company_id: str, db: AsyncSession):
+    """(cached answer or None, (fingerprint, embedding, question) to cache a
+    new answer under). ``question`` is only set for a mock embedding, which
+    can only match the same question."""
+    if answer_cache.max_entries <= 0:
+        return None, None
+    # The same text as retrieval embeds, so the embedding cache serves both.
+    embedding = await create_embedding(message, lane=INTERACTIVE)
+    question = message if is_mock_embedding(embedding) else None
+    fingerprint = await evidence_fingerprint(db, tenant_id, company_id)
+    cache_entry = (fingerprint, embedding, question)
+    return answer_cache.get(tenant_id, company_id, fingerprint, embedding, question), cache_entry
+
+
+def _cache_answer(tenant_id: str, company_id: str, cache_entry, answer: dict):
+    fingerprint, embedding, question = cache_entry
+    answer_cache.put(tenant_id, company_id, fingerprint, embedding, answer, question)
+
+
+async def _replay(cached: dict):
+    yield "citations", {"citations": cached["citations"], "used_company_id": cached["used_company_id"]}
+    yield "token", {"text": cached["answer"]}
+    yield "done", {"used_company_id": cached["used_company_id"], "cached": True}
+
+
+async def _caching(events, tenant_id: str, company_id: str, cache_entry):
+    """Pass events through; cache the answer once the stream completes."""
+    citations, parts = [], []
+    async with aclosing(events):
+        async for event, data in events:
+            if event == "citations":
+                citations = data["citations"]
+            elif event == "token":
+                parts.append(data["text"])
+            elif event == "done":
+                _cache_answer(tenant_id, company_id, cache_entry, {
+                    "answer": "".join(parts).strip(), "citations": citations, "used_company_id": company_id,
+                })
+            yield event, data
+
+
+async def _sse(events):
+    async with aclosing(events):
+        async for event, data in events:
+            yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def _resolve_company_id(body: ChatRequest, current_user: TokenPayload, db: AsyncSession) -> str:
     company_id = body.company_id
     if not company_id:
         result = await db.execute(
@@ -37,21 +150,4 @@ async def chat(
     )
     if not result.scalar_one_or_none():
         raise HTTPException(status_code=404, detail="Company not found")
-
-    evidence = await query_similar(
-        query=body.message,
-        tenant_id=current_user.tenant_id,
-        company_id=company_id,
-        top_k=5,
-        db=db,
-    )
-
-    answer_data = await generate_chat_answer(
-        query=body.message,
-        evidence_docs=evidence,
-        db=db,
-        company_id=company_id,
-        tenant_id=current_user.tenant_id,
-    )
-
-    return ChatResponse(**answer_data)
+    return company_id
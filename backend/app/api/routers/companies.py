@@ -6,7 +6,9 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.session import get_db
 from app.db.models import Company, ESGScore, ESGEvent
 from app.core.auth import get_current_user, TokenPayload
-from app.schemas.common import CompanyOut, ESGScoreOut, ESGEventOut
+from app.schemas.common import CompanyOut, CompanyWithScoreOut, ESGScoreOut, ESGEventOut
+from app.services.rollups import SCORE_RESOLUTIONS, score_series
+from app.services.latest_scores import COMPANY_INCLUDES, list_companies_with_scores
 
 router = APIRouter(prefix="/v1/companies", tags=["companies"])
 
@@ -19,16 +21,27 @@ def parse_range(range_str: str) -> timedelta:
     return timedelta(days=30)
 
 
-@router.get("", response_model=list[CompanyOut])
+@router.get("", response_model=list[CompanyWithScoreOut], response_model_exclude_unset=True)
 async def list_companies(
     query: Optional[str] = Query(None),
+    include: Optional[str] = Query(None, description="Comma-separated: latest_score,delta_24h"),
+    limit: int = Query(100, ge=1, le=10000),
     current_user: TokenPayload = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
+    includes = [i.strip() for i in include.split(",") if i.strip()] if include else []
+    unknown = set(includes) - set(COMPANY_INCLUDES)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown include: {', '.join(sorted(unknown))}")
+    if includes:
+        return await list_companies_with_scores(
+            db, current_user.tenant_id, includes, query=query, limit=limit
+        )
+
     stmt = select(Company).where(Company.tenant_id == current_user.tenant_id)
     if query:
         stmt = stmt.where(Company.name.ilike(f"%{query}%"))
-    stmt = stmt.order_by(Company.name).limit(100)
+    stmt = stmt.order_by(Company.name).limit(limit)
     result = await db.execute(stmt)
     return result.scalars().all()
 
@@ -55,20 +68,15 @@ async def get_company(
 async def get_scores(
     company_id: str,
     range: str = Query("30d"),
+    resolution: str = Query("auto", pattern="^(" + "|".join(SCORE_RESOLUTIONS) + ")$"),
+    points: int = Query(1000, ge=3, le=20000),
     current_user: TokenPayload = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
     since = datetime.now(timezone.utc) - parse_range(range)
-    result = await db.execute(
-        select(ESGScore)
-        .where(
-            ESGScore.company_id == company_id,
-            ESGScore.tenant_id == current_user.tenant_id,
-            ESGScore.recorded_at >= since,
-        )
-        .order_by(ESGScore.recorded_at.asc())
+    return await score_series(
+        db, current_user.tenant_id, company_id, since, resolution=resolution, points=points
     )
-    return result.scalars().all()
 
 
 @router.get("/{company_id}/events", response_model=list[ESGEventOut])
@@ -84,6 +92,7 @@ async def get_events(
         ESGEvent.company_id == company_id,
         ESGEvent.tenant_id == current_user.tenant_id,
         ESGEvent.event_date >= since,
+        ESGEvent.is_processed == True,  # async ingest: not classified yet
     )
     if severity_gte is not None:
         stmt = stmt.where(ESGEvent.severity >= severity_gte)
@@ -1,10 +1,13 @@
-from datetime import datetime, timezone
-from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import get_settings
 from app.db.session import get_db
-from app.db.models import ESGEvent
+from app.db.models import ESGEvent, LatestScore
 from app.core.auth import get_current_user, TokenPayload, require_internal_key
 from app.schemas.common import IngestEventRequest
+from app.services.bulk_ingest import BulkIngest, event_values, iter_json_array, iter_ndjson
+from app.workers.ingest_pool import get_ingest_queue
 from app.workers.pipeline import process_event
 
 router = APIRouter(prefix="/v1/ingest", tags=["ingest"])
@@ -13,29 +16,103 @@ router = APIRouter(prefix="/v1/ingest", tags=["ingest"])
 @router.post("/events")
 async def ingest_event(
     body: IngestEventRequest,
+    response: Response,
+    mode: str = Query("sync", pattern="^(sync|async)$"),
     current_user: TokenPayload = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
-    event = ESGEvent(
-        tenant_id=current_user.tenant_id,
-        company_id=body.company_id,
-        title=body.title,
-        description=body.description,
-        source_url=body.source_url or "",
-        category=body.category or "governance",
-        raw_text=body.raw_text or body.description,
-        event_date=body.event_date or datetime.now(timezone.utc),
-    )
+    """``mode=sync`` processes the event before answering. ``mode=async``
+    stores it, answers 202 and leaves processing to the ingest queue; poll
+    ``GET /v1/ingest/events/{event_id}`` for the outcome. The status is
+    "deferred" when the queue filled up while the event was being stored:
+    it is stored and queued later, so it must not be sent again."""
+    queue = get_ingest_queue()
+    if mode == "async" and not queue.accepts([body.company_id]):
+        raise HTTPException(status_code=503, detail="Ingest queue is full", headers={"Retry-After": "5"})
+
+    event = ESGEvent(**event_values(body, current_user.tenant_id))
     db.add(event)
     await db.flush()
 
+    if mode == "async":
+        await db.commit()  # the pool reads the event in its own session
+        response.status_code = 202
+        if not queue.submit(event.id, event.company_id):
+            return {"status": "deferred", "event_id": event.id, "detail": "Ingest queue is full; the event is queued later"}
+        return {"status": "queued", "event_id": event.id}
+
     new_score = await process_event(db, event)
 
     return {
-        "status": "processed",
+        "status": "duplicate" if event.duplicate_of else "processed",
         "event_id": event.id,
+        "duplicate_of": event.duplicate_of,
         "score": {
             "overall": new_score.overall,
             "risk_level": new_score.risk_level,
-        },
+        } if new_score else None,
+    }
+
+
+@router.post("/events/bulk")
+async def ingest_events_bulk(
+    request: Request,
+    current_user: TokenPayload = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """A JSON array of events, or one event per line with
+    ``Content-Type: application/x-ndjson``. Events are stored and queued for
+    the ingest queue as the body arrives; the response has a result per item,
+    in order."""
+    queue = get_ingest_queue()
+    if not queue.running or queue.pending >= get_settings().INGEST_MAX_PENDING:
+        raise HTTPException(status_code=503, detail="Ingest queue is full", headers={"Retry-After": "5"})
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    if content_type in ("application/x-ndjson", "application/jsonl", "application/ndjson"):
+        items = iter_ndjson(request.stream())
+    elif content_type in ("application/json", ""):
+        items = iter_json_array(request.stream())
+    else:
+        raise HTTPException(status_code=415, detail="Send application/json or application/x-ndjson")
+    return await BulkIngest(db, current_user.tenant_id, queue).run(items)
+
+
+@router.get("/events/{event_id}")
+async def get_ingest_status(
+    event_id: str,
+    current_user: TokenPayload = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    result = await db.execute(
+        select(ESGEvent).where(ESGEvent.id == event_id, ESGEvent.tenant_id == current_user.tenant_id)
+    )
+    event = result.scalar_one_or_none()
+    if not event:
+        raise HTTPException(status_code=404, detail="Event not found")
+
+    if event.is_processed:
+        status = "duplicate" if event.duplicate_of else "processed"
+    elif event.processing_error:
+        status = "failed"
+    else:
+        # Events held by another process, or awaiting recovery, are queued too.
+        status = get_ingest_queue().status(event.id) or "queued"
+
+    score = None
+    if event.is_processed:
+        result = await db.execute(
+            select(LatestScore).where(
+                LatestScore.company_id == event.company_id, LatestScore.tenant_id == event.tenant_id
+            )
+        )
+        latest = result.scalar_one_or_none()
+        if latest:
+            score = {"overall": latest.overall, "risk_level": latest.risk_level}
+
+    return {
+        "status": status,
+        "event_id": event.id,
+        "duplicate_of": event.duplicate_of,
+        "error": event.processing_error,
+        "score": score,
     }
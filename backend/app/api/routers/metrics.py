@@ -0,0 +1,40 @@
+from fastapi import APIRouter, Header
+from app.core.auth import require_internal_key
+from app.services.alerts import alert_dispatcher
+from app.services.answer_cache import answer_cache
+from app.services.classifier import classification_cache, classification_batcher
+from app.services.dedup import near_duplicates
+from app.services.embedding_cache import embedding_cache
+from app.services.keyword_index import keyword_index
+from app.services.llm_scheduler import llm_scheduler
+from app.services.local_classifier import local_classifier
+from app.services.rag import embedding_batcher
+from app.services.vector_store import get_vector_store
+from app.workers.coalescer import score_coalescer
+from app.workers.ingest_pool import ingest_pool
+from app.workers.pipeline import stage_timings
+from app.workers.stages import staged_pipeline
+
+router = APIRouter(prefix="/v1/metrics", tags=["metrics"])
+
+
+@router.get("")
+async def get_metrics(x_internal_key: str = Header("")):
+    require_internal_key(x_internal_key)
+    return {
+        "alert_dispatcher": alert_dispatcher.stats(),
+        "answer_cache": answer_cache.stats(),
+        "classification_cache": classification_cache.stats(),
+        "classifier_batching": classification_batcher.stats(),
+        "embedding_cache": embedding_cache.stats(),
+        "embedding_batching": embedding_batcher.stats(),
+        "ingest_pool": ingest_pool.stats(),
+        "keyword_index": keyword_index.stats(),
+        "local_classifier": local_classifier.stats(),
+        "near_duplicates": near_duplicates.stats(),
+        "llm_scheduler": llm_scheduler.stats(),
+        "pipeline_stages": stage_timings.stats(),
+        "score_coalescer": score_coalescer.stats(),
+        "staged_pipeline": staged_pipeline.stats(),
+        "vector_store": get_vector_store().stats(),
+    }
@@ -16,6 +16,53 @@ class Settings(BaseSettings):
     AZURE_OPENAI_CHAT_DEPLOYMENT: str = "gpt-5-mini"
     AZURE_OPENAI_EMBEDDING_DEPLOYMENT: str = "text-embedding-ada-002"
     AZURE_OPENAI_API_VERSION: str = "2024-12-01-preview"
+    LLM_MAX_CONNECTIONS: int = 100
+    LLM_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    LLM_KEEPALIVE_EXPIRY_S: float = 60
+    LLM_CONNECT_TIMEOUT_S: float = 5
+    LLM_CLASSIFY_TIMEOUT_S: float = 30
+    LLM_EMBED_TIMEOUT_S: float = 15
+    LLM_CHAT_TIMEOUT_S: float = 90
+    LLM_REQUESTS_PER_MINUTE: int = 0  # deployment quota, 0 = unlimited
+    LLM_TOKENS_PER_MINUTE: int = 0
+    LLM_MAX_CONCURRENCY: int = 32
+    LLM_INTERACTIVE_RESERVED: int = 4  # slots background calls cannot take
+    LLM_INTERACTIVE_QUOTA_SHARE: float = 0.1  # share of the rate buckets kept for chat
+    LLM_MAX_RETRIES: int = 3
+    LLM_BACKOFF_BASE_S: float = 1
+    LLM_BACKOFF_MAX_S: float = 60
+    CLASSIFIER_BATCH_WINDOW_MS: int = 25  # micro-batch concurrent classifications, 0 disables
+    CLASSIFIER_BATCH_MAX: int = 16
+    CLASSIFICATION_CACHE_SIZE: int = 10000  # in-process LRU entries, 0 disables the cache
+    CLASSIFICATION_CACHE_TTL_S: int = 7 * 86400  # Redis tier
+    CLASSIFIER_LEXICON_PATH: str = ""  # JSON {group: [keywords]} overriding the built-in rule lexicon
+    CLASSIFIER_WORD_BOUNDARY: bool = False  # rule keywords match whole words only
+    EMBEDDING_CACHE_SIZE: int = 5000  # in-process LRU entries (~6 KB each at 1536 dims), 0 disables the cache
+    EMBEDDING_CACHE_TTL_S: int = 30 * 86400  # Redis tier
+    EMBEDDING_BATCH_MAX: int = 256  # inputs per embeddings request (the API accepts up to 2048)
+    EMBEDDING_BATCH_MAX_TOKENS: int = 200000  # estimated tokens per embeddings request
+    EMBEDDING_BATCH_WINDOW_MS: int = 10  # micro-batch concurrent background embeddings, 0 disables
+    EMBEDDING_DIM: int = 1536  # dimensions of the embedding deployment; mock and fallback embeddings match it
+    LOCAL_CLASSIFIER_ENABLED: bool = True  # used once a model has been trained
+    LOCAL_CLASSIFIER_PATH: str = "models/local_classifier.npz"
+    LOCAL_CLASSIFIER_THRESHOLD: float = 0.9  # min confidence of every head to skip the LLM
+    LOCAL_CLASSIFIER_RELOAD_INTERVAL_S: float = 60.0  # how often to look for a retrained model file
+
+    VECTOR_STORE_PATH: str = "data/vectors"  # local RAG vectors on disk, "" keeps them in memory
+    VECTOR_STORE_COMPACT_INTERVAL_S: float = 300  # 0 disables periodic compaction
+    VECTOR_STORE_COMPACT_MIN_RECORDS: int = 1000  # write-log records needed to compact
+    ANSWER_CACHE_SIZE: int = 5000  # cached chat answers per process, 0 disables the cache
+    ANSWER_CACHE_MAX_PER_COMPANY: int = 50
+    ANSWER_CACHE_MIN_SIMILARITY: float = 0.95  # question embedding cosine needed to reuse an answer
+    ANSWER_CACHE_TTL_S: int = 3600
+    RETRIEVAL_CANDIDATES: int = 50  # hits taken from each ranking before fusion
+    RETRIEVAL_RRF_K: int = 60  # reciprocal rank fusion constant
+    KEYWORD_INDEX_SYNC_INTERVAL_S: float = 5  # re-read other workers' new RAG documents at most this often
+    VECTOR_ANN_MIN_ROWS: int = 50000  # partitions this large get an IVF-PQ index, 0 = always exact
+    VECTOR_ANN_NLIST: int = 0  # inverted lists, 0 = about 2 * sqrt(rows)
+    VECTOR_ANN_PQ_M: int = 32  # PQ sub-quantizers (bytes per code)
+    VECTOR_ANN_NPROBE: int = 16  # lists visited per query: higher = better recall, slower
+    VECTOR_ANN_REFINE: int = 10  # candidates re-scored exactly per result
 
     PINECONE_API_KEY: str = ""
     PINECONE_INDEX: str = "esg-rag"
@@ -28,6 +75,30 @@ class Settings(BaseSettings):
     SMTP_PASS: str = ""
     ALERT_EMAIL_FROM: str = "alerts@greenbharat.ai"
 
+    # Ingest
+    INGEST_WORKERS: int = 4  # async ingest lanes; a company's events always share a lane and run in order
+    INGEST_MAX_PENDING: int = 10000  # queued events, split evenly over the lanes; a full lane answers 503
+    INGEST_BULK_CHUNK: int = 500  # events per INSERT in bulk ingest
+    INGEST_BACKFILL_INTERVAL_S: float = 10.0  # re-scan for stored events a full lane refused; 0 = only at startup
+    # Staged pipeline for async ingest (workers/stages.py): "memory" or "file"; "" uses the worker pool
+    PIPELINE_BROKER: str = ""
+    PIPELINE_LOG_PATH: str = "data/pipeline"  # FileLogBroker topic logs and consumer offsets
+    PIPELINE_LOG_FSYNC: bool = False  # fsync every record and offset commit
+    PIPELINE_NORMALIZE_CONSUMERS: int = 1  # consumer tasks per stage, at most the topic's partitions
+    PIPELINE_CLASSIFY_CONSUMERS: int = 3
+    PIPELINE_CLASSIFY_BATCH: int = 16  # events classified per poll (one LLM request per CLASSIFIER_BATCH_MAX)
+    PIPELINE_SCORE_CONSUMERS: int = 2
+    PIPELINE_PUBLISH_CONSUMERS: int = 1
+    DEDUP_ENABLED: bool = True  # link near-duplicate events instead of processing them again
+    DEDUP_WINDOW_HOURS: float = 72
+    DEDUP_MIN_SIMILARITY: float = 0.7  # estimated Jaccard similarity of the word sets
+    DEDUP_MAX_PER_COMPANY: int = 5000  # indexed canonical events per company
+
+    # Scoring
+    INCREMENTAL_SCORING: bool = True
+    RESCORE_INTERVAL_HOURS: float = 24  # 0 disables the periodic bulk rescore
+    SCORE_COALESCE_WINDOW_MS: int = 500  # min gap between recomputes per company, 0 disables
+
     APP_ENV: str = "development"
     CORS_ORIGINS: str = "http://localhost:3000"
     INTERNAL_API_KEY: str = "change-me-internal-key"
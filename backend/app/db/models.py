@@ -96,6 +96,47 @@ class ESGScore(Base):
     )
 
 
+class LatestScore(Base):
+    """Materialized most recent ESGScore per company, maintained on every score write."""
+    __tablename__ = "latest_scores"
+    company_id = Column(StringUUID, ForeignKey("companies.id"), primary_key=True)
+    tenant_id = Column(StringUUID, ForeignKey("tenants.id"), nullable=False)
+    score_id = Column(StringUUID, nullable=False)
+    overall = Column(Float, nullable=False)
+    environmental = Column(Float, nullable=False)
+    social = Column(Float, nullable=False)
+    governance = Column(Float, nullable=False)
+    risk_level = Column(String(20), default="medium")
+    recorded_at = Column(DateTime(timezone=True), nullable=False)
+
+    __table_args__ = (Index("ix_latest_scores_tenant", "tenant_id"),)
+
+
+class ESGScoreRollup(Base):
+    """Hourly ("1h") and daily ("1d") OHLC buckets of overall score, with pillar averages."""
+    __tablename__ = "esg_score_rollups"
+    id = Column(StringUUID, primary_key=True, default=new_uuid)
+    tenant_id = Column(StringUUID, ForeignKey("tenants.id"), nullable=False)
+    company_id = Column(StringUUID, ForeignKey("companies.id"), nullable=False)
+    resolution = Column(String(8), nullable=False)  # 1h, 1d
+    bucket_start = Column(DateTime(timezone=True), nullable=False)
+    open = Column(Float, nullable=False)
+    high = Column(Float, nullable=False)
+    low = Column(Float, nullable=False)
+    close = Column(Float, nullable=False)
+    environmental_avg = Column(Float, nullable=False)
+    social_avg = Column(Float, nullable=False)
+    governance_avg = Column(Float, nullable=False)
+    sample_count = Column(Integer, default=0)
+    first_at = Column(DateTime(timezone=True), nullable=False)
+    last_at = Column(DateTime(timezone=True), nullable=False)
+
+    __table_args__ = (
+        Index("ux_score_rollups_bucket", "company_id", "resolution", "bucket_start", unique=True),
+        Index("ix_score_rollups_tenant", "tenant_id"),
+    )
+
+
 class ESGEvent(Base):
     __tablename__ = "esg_events"
     id = Column(StringUUID, primary_key=True, default=new_uuid)
@@ -113,6 +154,12 @@ class ESGEvent(Base):
     raw_text = Column(Text, default="")
     classification_json = Column(JSON, default=dict)
     is_processed = Column(Boolean, default=False)
+    # Set when asynchronous ingest gave up on the event (see workers/ingest_pool).
+    processing_error = Column(Text, nullable=True)
+    # Canonical event this one near-duplicates (see services/dedup); duplicates
+    # are not scored. No foreign key: the canonical row may still be
+    # uncommitted in another session when its duplicates arrive.
+    duplicate_of = Column(StringUUID, nullable=True)
     created_at = Column(DateTime(timezone=True), default=utcnow)
 
     company = relationship("Company", back_populates="events")
@@ -121,6 +168,7 @@ class ESGEvent(Base):
         Index("ix_esg_events_company_date", "company_id", "event_date"),
         Index("ix_esg_events_tenant", "tenant_id"),
         Index("ix_esg_events_severity", "severity"),
+        Index("ix_esg_events_duplicate_of", "duplicate_of"),
     )
 
 
@@ -133,11 +181,11 @@ class RAGDocument(Base):
     title = Column(String(500), nullable=False)
     content = Column(Text, nullable=False)
     source_url = Column(String(1000), default="")
-    embedding_id = Column(String(255), default="")
+    embedding_id = Column(String(255), default="")  # vector id once embedded; empty: needs (re-)embedding
     metadata_json = Column(JSON, default=dict)
     created_at = Column(DateTime(timezone=True), default=utcnow)
 
-    __table_args__ = (Index("ix_rag_docs_tenant_company", "tenant_id", "company_id"),)
+    __table_args__ = (Index("ix_rag_docs_tenant_company_created", "tenant_id", "company_id", "created_at"),)
 
 
 class Watchlist(Base):
@@ -0,0 +1,16 @@
+"""
+Dialect INSERT for ON CONFLICT upserts.
+
+Materialized rows (score rollups, latest scores) are written by concurrent
+transactions; an upsert resolves the unique-key race in the database instead
+of a select followed by an insert. Both supported databases (SQLite and
+PostgreSQL) share the ``on_conflict_do_update`` API.
+"""
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+def dialect_insert(db: AsyncSession, table):
+    if db.get_bind().dialect.name == "postgresql":
+        return postgresql.insert(table)
+    return sqlite.insert(table)
@@ -1,9 +1,18 @@
+import asyncio
 import logging
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import get_settings
-from app.api.routers import auth, companies, watchlists, alerts, chat, ingest, websocket
+from app.db.session import async_session
+from app.services.alerts import alert_dispatcher
+from app.services.score_state import score_engine
+from app.services.dedup import near_duplicates
+from app.services.llm_client import llm_clients
+from app.services.vector_store import get_vector_store
+from app.workers.ingest_pool import get_ingest_queue
+from app.workers.scheduler import run_periodically, rescore_all_tenants
+from app.api.routers import auth, companies, watchlists, alerts, chat, ingest, websocket, metrics
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
 
@@ -11,8 +20,48 @@ logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logging.info("ESG Risk Intelligence Platform starting...")
+    settings = get_settings()
+    if settings.INCREMENTAL_SCORING:
+        try:
+            async with async_session() as db:
+                await score_engine.resync(db)
+        except Exception as e:
+            logging.warning(f"Score state resync failed, hydrating lazily: {e}")
+    if settings.DEDUP_ENABLED:
+        try:
+            async with async_session() as db:
+                await near_duplicates.warm(db)
+        except Exception as e:
+            logging.warning(f"Near-duplicate index warm-up failed, starting empty: {e}")
+
+    if settings.AZURE_OPENAI_API_KEY:
+        await llm_clients.start()
+
+    ingest_queue = get_ingest_queue()
+    ingest_queue.start()
+    try:
+        await ingest_queue.recover()
+    except Exception as e:
+        logging.warning(f"Async ingest recovery failed: {e}")
+
+    background = []
+    if settings.VECTOR_STORE_PATH and not settings.PINECONE_API_KEY and settings.VECTOR_STORE_COMPACT_INTERVAL_S > 0:
+        vector_store = get_vector_store()
+        background.append(asyncio.create_task(run_periodically(
+            "vector-compaction", settings.VECTOR_STORE_COMPACT_INTERVAL_S,
+            lambda: asyncio.to_thread(vector_store.compact, settings.VECTOR_STORE_COMPACT_MIN_RECORDS),
+        )))
+    if settings.RESCORE_INTERVAL_HOURS > 0:
+        background.append(asyncio.create_task(
+            run_periodically("rescore", settings.RESCORE_INTERVAL_HOURS * 3600, rescore_all_tenants)
+        ))
     yield
     logging.info("Shutting down...")
+    for task in background:
+        task.cancel()
+    await ingest_queue.stop()
+    await alert_dispatcher.drain(timeout=10)
+    await llm_clients.close()
 
 
 app = FastAPI(
@@ -39,6 +88,7 @@ app.include_router(alerts.router)
 app.include_router(chat.router)
 app.include_router(ingest.router)
 app.include_router(websocket.router)
+app.include_router(metrics.router)
 
 
 @app.get("/health")
@@ -24,10 +24,20 @@ class ESGScoreOut(BaseModel):
     governance: float
     risk_level: str
     recorded_at: datetime
+    # Set when the point is a rollup bucket (overall is the bucket close).
+    open: Optional[float] = None
+    high: Optional[float] = None
+    low: Optional[float] = None
+    samples: Optional[int] = None
 
     model_config = {"from_attributes": True}
 
 
+class CompanyWithScoreOut(CompanyOut):
+    latest_score: Optional[ESGScoreOut] = None
+    delta_24h: Optional[float] = None
+
+
 class ESGEventOut(BaseModel):
     id: str
     company_id: str
@@ -40,6 +50,7 @@ class ESGEventOut(BaseModel):
     confidence: float
     sentiment: str
     event_date: datetime
+    duplicate_of: Optional[str] = None
     created_at: datetime
 
     model_config = {"from_attributes": True}
@@ -121,6 +132,7 @@ class ChatResponse(BaseModel):
     answer: str
     citations: List[Citation] = []
     used_company_id: Optional[str] = None
+    cached: bool = False
 
 
 class IngestEventRequest(BaseModel):
@@ -4,23 +4,40 @@ Alert Rules Engine
 Evaluates scored events against user-defined rules and sends notifications.
 Supports: score_drop, severity_gte, category_match
 Channels: slack (webhook), email (mock)
+
+Rules are evaluated inside the event's transaction, which records a
+``pending`` AlertDelivery per channel. Sending is off the pipeline's
+critical path: once that transaction commits, ``alert_dispatcher`` sends
+the notifications in the background and marks each delivery ``sent`` or
+``failed``. A rolled-back transaction sends nothing. Deliveries still
+pending when the process stops are not retried.
 """
+import asyncio
 import json
 import logging
-from typing import List, Optional
+import time
+from typing import List, Optional, Tuple
 from datetime import datetime, timezone
 import httpx
-from sqlalchemy import select
+from sqlalchemy import event as sa_event, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.db.models import AlertRule, AlertDelivery, ESGEvent, ESGScore
+from sqlalchemy.orm import Session
+from app.db.models import AlertRule, AlertDelivery, ESGEvent, ESGScore, new_uuid
+from app.db.session import async_session
 from app.core.config import get_settings
 
 logger = logging.getLogger(__name__)
 
+PENDING_KEY = "pending_alert_deliveries"  # Session.info key: deliveries to send after commit
+
+Delivery = Tuple[str, str, dict]  # (AlertDelivery id, channel, payload)
+
 
 async def evaluate_alerts_for_event(
     db: AsyncSession, event: ESGEvent, new_score: Optional[ESGScore], tenant_id: str
-):
+) -> int:
+    """Record a pending delivery per channel of every triggered rule; they are
+    sent after ``db`` commits. Returns the number of deliveries."""
     result = await db.execute(
         select(AlertRule).where(
             AlertRule.tenant_id == tenant_id,
@@ -29,6 +46,7 @@ async def evaluate_alerts_for_event(
     )
     rules = result.scalars().all()
 
+    queued = 0
     for rule in rules:
         if rule.company_id and rule.company_id != event.company_id:
             continue
@@ -56,10 +74,12 @@ async def evaluate_alerts_for_event(
 
         if triggered:
             for channel in (rule.channels or ["email"]):
-                await _deliver_alert(db, rule, event, channel, tenant_id)
+                _queue_delivery(db, rule, event, channel, tenant_id)
+                queued += 1
+    return queued
 
 
-async def _deliver_alert(
+def _queue_delivery(
     db: AsyncSession, rule: AlertRule, event: ESGEvent, channel: str, tenant_id: str
 ):
     payload = {
@@ -70,39 +90,116 @@ async def _deliver_alert(
         "company_id": event.company_id,
         "message": f"Alert: {rule.name} triggered by event '{event.title}' (severity: {event.severity})",
     }
-
-    if channel == "slack":
-        await _send_slack(payload)
-    elif channel == "email":
-        await _send_email(payload)
-
     delivery = AlertDelivery(
+        id=new_uuid(),
         tenant_id=tenant_id,
         rule_id=rule.id,
         event_id=event.id,
         channel=channel,
-        status="sent",
+        status="pending",
         payload=payload,
     )
     db.add(delivery)
-    await db.flush()
+    db.info.setdefault(PENDING_KEY, []).append((delivery.id, channel, payload))
+
+
+class AlertDispatcher:
+    """Sends committed deliveries in background tasks and records the outcome."""
+
+    def __init__(self, session_factory=None):
+        self._session_factory = session_factory
+        self._tasks: set = set()
+        self.sent = 0
+        self.failed = 0
+        self.seconds = 0.0
+
+    def dispatch(self, deliveries: List[Delivery]):
+        try:
+            task = asyncio.get_running_loop().create_task(self._deliver(deliveries))
+        except RuntimeError:
+            logger.warning(f"No event loop to send {len(deliveries)} alert deliveries; left pending")
+            return
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def drain(self, timeout: Optional[float] = None):
+        """Wait for deliveries in flight (at shutdown, and in tests)."""
+        if self._tasks:
+            await asyncio.wait(set(self._tasks), timeout=timeout)
+
+    def stats(self) -> dict:
+        done = self.sent + self.failed
+        return {
+            "in_flight": len(self._tasks),
+            "sent": self.sent,
+            "failed": self.failed,
+            "avg_ms": round(self.seconds / done * 1000, 2) if done else 0.0,
+        }
+
+    async def _deliver(self, deliveries: List[Delivery]):
+        started = time.perf_counter()
+        outcomes = await asyncio.gather(*(_send(channel, payload) for _, channel, payload in deliveries))
+        self.seconds += time.perf_counter() - started
+        sent = [d[0] for d, ok in zip(deliveries, outcomes) if ok]
+        failed = [d[0] for d, ok in zip(deliveries, outcomes) if not ok]
+        self.sent += len(sent)
+        self.failed += len(failed)
+        try:
+            async with (self._session_factory or async_session)() as db:
+                now = datetime.now(timezone.utc)
+                for status, ids in (("sent", sent), ("failed", failed)):
+                    if ids:
+                        await db.execute(
+                            update(AlertDelivery).where(AlertDelivery.id.in_(ids)).values(status=status, delivered_at=now)
+                        )
+                await db.commit()
+        except Exception as e:
+            logger.error(f"Could not record {len(deliveries)} alert deliveries: {e}")
+
+
+alert_dispatcher = AlertDispatcher()
+
+
+@sa_event.listens_for(Session, "after_commit")
+def _send_after_commit(session: Session):
+    deliveries = session.info.pop(PENDING_KEY, None)
+    if deliveries:
+        alert_dispatcher.dispatch(deliveries)
+
+
+@sa_event.listens_for(Session, "after_rollback")
+def _drop_after_rollback(session: Session):
+    session.info.pop(PENDING_KEY, None)
+
+
+async def _send(channel: str, payload: dict) -> bool:
+    if channel == "slack":
+        return await _send_slack(payload)
+    if channel == "email":
+        return await _send_email(payload)
+    logger.warning(f"Unknown alert channel {channel!r}")
+    return False
 
 
-async def _send_slack(payload: dict):
+async def _send_slack(payload: dict) -> bool:
     settings = get_settings()
     if not settings.SLACK_WEBHOOK_URL:
         logger.info(f"[MOCK SLACK] {payload['message']}")
-        return
+        return True
     try:
         async with httpx.AsyncClient() as client:
-            await client.post(
+            response = await client.post(
                 settings.SLACK_WEBHOOK_URL,
                 json={"text": payload["message"]},
                 timeout=10,
             )
+            response.raise_for_status()
+        return True
     except Exception as e:
         logger.error(f"Slack delivery failed: {e}")
+        return False
 
 
-async def _send_email(payload: dict):
+async def _send_email(payload: dict) -> bool:
     logger.info(f"[MOCK EMAIL] To: alert-recipient | Subject: {payload['rule_name']} | Body: {payload['message']}")
+    return True
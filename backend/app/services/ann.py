@@ -0,0 +1,254 @@
+"""
+IVF-PQ approximate nearest-neighbour search for large vector-store partitions.
+
+An inverted file (IVF) clusters a partition's normalized vectors around
+``nlist`` k-means centroids; a query only visits the ``nprobe`` lists whose
+centroids score highest. Within the visited lists, product quantization (PQ)
+scores each row from uint8 codes: the residual ``x - centroid`` is split into
+``m`` sub-vectors, each replaced by the nearest of 256 sub-centroids, so
+``q . x ~= q . c + sum_j table[j, code_j]`` costs ``m`` lookups per row. The best
+``top_k * refine`` candidates are then re-scored exactly against the stored
+float32 vectors, which keeps the returned scores exact.
+
+Recall/latency knobs: VECTOR_ANN_NPROBE (lists visited) and VECTOR_ANN_REFINE
+(candidates re-scored per result). Quantizers are trained once a partition
+reaches VECTOR_ANN_MIN_ROWS and retrained when it has doubled since.
+"""
+import math
+from typing import Optional
+import numpy as np
+
+KSUB = 256  # sub-centroids per PQ subspace, so codes fit in uint8
+
+
+def _kmeans(x: np.ndarray, k: int, iterations: int, rng: np.random.Generator) -> np.ndarray:
+    centroids = x[rng.choice(len(x), k, replace=False)].copy()
+    for _ in range(iterations):
+        assign = _nearest(x, centroids)
+        order = np.argsort(assign, kind="stable")
+        counts = np.bincount(assign, minlength=k)
+        empty = counts == 0
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        sums = np.add.reduceat(x[order], starts[~empty], axis=0)
+        centroids[~empty] = sums / counts[~empty, None]
+        # Re-seed empty clusters from random points.
+        centroids[empty] = x[rng.choice(len(x), int(empty.sum()))]
+    return centroids
+
+
+def _nearest(x: np.ndarray, centroids: np.ndarray, chunk: int = 16384) -> np.ndarray:
+    """Index of the nearest centroid (L2) of every row, in chunks to bound memory."""
+    half_norms = 0.5 * np.einsum("ij,ij->i", centroids, centroids)
+    out = np.empty(len(x), dtype=np.int32)
+    for i in range(0, len(x), chunk):
+        out[i:i + chunk] = np.argmax(x[i:i + chunk] @ centroids.T - half_norms, axis=1)
+    return out
+
+
+def default_nlist(n: int) -> int:
+    return int(min(4096, max(16, 2 * math.sqrt(n))))
+
+
+def pq_subspaces(dim: int, wanted: int) -> int:
+    """Largest divisor of ``dim`` not above ``wanted``."""
+    return max(d for d in range(1, min(dim, max(wanted, 1)) + 1) if dim % d == 0)
+
+
+class Quantizer:
+    """Trained coarse centroids and PQ codebooks."""
+
+    def __init__(self, centroids: np.ndarray, codebooks: np.ndarray, trained_on: int):
+        self.centroids = centroids.astype(np.float32)  # (nlist, dim)
+        self.codebooks = codebooks.astype(np.float32)  # (m, KSUB, dim // m)
+        self.trained_on = trained_on
+
+    @property
+    def nlist(self) -> int:
+        return len(self.centroids)
+
+    @property
+    def m(self) -> int:
+        return len(self.codebooks)
+
+    @classmethod
+    def train(cls, vectors: np.ndarray, nlist: int = 0, m: int = 16, iterations: int = 10,
+              seed: int = 0) -> "Quantizer":
+        rng = np.random.default_rng(seed)
+        n, dim = vectors.shape
+        nlist = min(nlist or default_nlist(n), n)
+        m = pq_subspaces(dim, m)
+        sample = vectors[rng.choice(n, min(n, 64 * nlist), replace=False)]
+        centroids = _kmeans(np.asarray(sample, dtype=np.float32), nlist, iterations, rng)
+
+        pq_sample = np.asarray(sample[:min(len(sample), 64 * KSUB)], dtype=np.float32)
+        residuals = pq_sample - centroids[_nearest(pq_sample, centroids)]
+        sub = residuals.reshape(len(residuals), m, dim // m)
+        ksub = min(KSUB, len(residuals))
+        codebooks = np.zeros((m, KSUB, dim // m), dtype=np.float32)
+        for j in range(m):
+            codebooks[j, :ksub] = _kmeans(sub[:, j], ksub, iterations, rng)
+        return cls(centroids, codebooks, n)
+
+    def assign(self, vectors: np.ndarray) -> np.ndarray:
+        return _nearest(vectors, self.centroids)
+
+    def encode(self, vectors: np.ndarray, lists: np.ndarray, chunk: int = 65536) -> np.ndarray:
+        m, ksub, ds = self.codebooks.shape
+        codes = np.empty((len(vectors), m), dtype=np.uint8)
+        for i in range(0, len(vectors), chunk):
+            residuals = vectors[i:i + chunk] - self.centroids[lists[i:i + chunk]]
+            for j in range(m):
+                codes[i:i + chunk, j] = _nearest(residuals[:, j * ds:(j + 1) * ds], self.codebooks[j])
+        return codes
+
+    def tables(self, query: np.ndarray):
+        """Coarse scores (nlist,) and PQ lookup table (m, KSUB) for ``query``."""
+        m, _, ds = self.codebooks.shape
+        return self.centroids @ query, np.einsum("mkd,md->mk", self.codebooks, query.reshape(m, ds))
+
+    def to_arrays(self, prefix: str = "") -> dict:
+        return {f"{prefix}centroids": self.centroids, f"{prefix}codebooks": self.codebooks,
+                f"{prefix}trained_on": np.array(self.trained_on)}
+
+    @classmethod
+    def from_arrays(cls, arrays, prefix: str = "") -> "Quantizer":
+        return cls(arrays[f"{prefix}centroids"], arrays[f"{prefix}codebooks"], int(arrays[f"{prefix}trained_on"]))
+
+
+def rank_candidates(quantizer: Quantizer, query: np.ndarray, lists: np.ndarray, codes: np.ndarray,
+                    keep: int) -> np.ndarray:
+    """Positions of the ``keep`` best candidates by approximate score."""
+    coarse, table = quantizer.tables(query)
+    approx = coarse[lists] + table[np.arange(quantizer.m), codes].sum(axis=1)
+    if keep < len(approx):
+        return np.argpartition(approx, len(approx) - keep)[len(approx) - keep:]
+    return np.arange(len(approx))
+
+
+def probe(quantizer: Quantizer, query: np.ndarray, nprobe: int) -> np.ndarray:
+    coarse = quantizer.centroids @ query
+    nprobe = min(nprobe, len(coarse))
+    return np.argpartition(coarse, len(coarse) - nprobe)[len(coarse) - nprobe:]
+
+
+class _Members:
+    __slots__ = ("rows", "size")
+
+    def __init__(self):
+        self.rows = np.empty(8, dtype=np.int64)
+        self.size = 0
+
+    def append(self, row: int) -> int:
+        if self.size == len(self.rows):
+            self.rows = np.concatenate([self.rows, np.empty(max(8, len(self.rows)), dtype=np.int64)])
+        self.rows[self.size] = row
+        self.size += 1
+        return self.size - 1
+
+
+class IVFPQIndex:
+    """Inverted lists over the rows of one in-memory partition.
+
+    Row numbers are the partition's; the partition reports appends and its
+    swap-removes so the index follows without rebuilding.
+    """
+
+    def __init__(self, quantizer: Quantizer):
+        self.quantizer = quantizer
+        self.lists = np.empty(0, dtype=np.int32)  # list of each row
+        self.codes = np.empty((0, quantizer.m), dtype=np.uint8)
+        self.positions = np.empty(0, dtype=np.int64)  # position of each row in its list
+        self.members = [_Members() for _ in range(quantizer.nlist)]
+        self.size = 0
+
+    @classmethod
+    def build(cls, vectors: np.ndarray, nlist: int = 0, m: int = 16) -> "IVFPQIndex":
+        quantizer = Quantizer.train(vectors, nlist=nlist, m=m)
+        lists = quantizer.assign(vectors)
+        return cls.from_assignments(quantizer, lists, quantizer.encode(vectors, lists))
+
+    @classmethod
+    def from_assignments(cls, quantizer: Quantizer, lists: np.ndarray, codes: np.ndarray) -> "IVFPQIndex":
+        """Index rows ``0 .. len(lists) - 1`` already assigned and encoded."""
+        index = cls(quantizer)
+        n = len(lists)
+        order = np.argsort(lists, kind="stable")
+        counts = np.bincount(lists, minlength=quantizer.nlist)
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        index.lists = lists.astype(np.int32)
+        index.codes = codes
+        index.positions = np.empty(n, dtype=np.int64)
+        index.positions[order] = np.arange(n) - starts[lists[order]]
+        for lst, members in enumerate(index.members):
+            if counts[lst]:
+                members.rows = order[starts[lst]:starts[lst] + counts[lst]].copy()
+                members.size = int(counts[lst])
+        index.size = n
+        return index
+
+    def extend(self, vectors: np.ndarray):
+        """Index new rows ``size .. size + len(vectors) - 1``."""
+        lists = self.quantizer.assign(vectors)
+        codes = self.quantizer.encode(vectors, lists)
+        n = self.size + len(vectors)
+        if n > len(self.lists):
+            capacity = max(n, 2 * len(self.lists))
+            self.lists = np.resize(self.lists, capacity)
+            self.codes = np.resize(self.codes, (capacity, self.quantizer.m))
+            self.positions = np.resize(self.positions, capacity)
+        self.lists[self.size:n] = lists
+        self.codes[self.size:n] = codes
+        for row, lst in enumerate(lists, start=self.size):
+            self.positions[row] = self.members[lst].append(row)
+        self.size = n
+
+    def set(self, row: int, vector: np.ndarray):
+        """Re-index an existing row whose vector changed."""
+        self._unlink(row)
+        lst = self.quantizer.assign(vector[None])
+        self.lists[row] = lst[0]
+        self.codes[row] = self.quantizer.encode(vector[None], lst)[0]
+        self.positions[row] = self.members[lst[0]].append(row)
+
+    def remove(self, row: int):
+        """Mirror the partition's swap-remove: the last row moves into ``row``."""
+        last = self.size - 1
+        self._unlink(row)
+        if row != last:
+            members = self.members[self.lists[last]]
+            members.rows[self.positions[last]] = row
+            self.lists[row] = self.lists[last]
+            self.codes[row] = self.codes[last]
+            self.positions[row] = self.positions[last]
+        self.size = last
+
+    def candidates(self, query: np.ndarray, keep: int, nprobe: int) -> np.ndarray:
+        rows = np.concatenate(
+            [self.members[lst].rows[:self.members[lst].size] for lst in probe(self.quantizer, query, nprobe)]
+        )
+        if not len(rows):
+            return rows
+        best = rank_candidates(self.quantizer, query, self.lists[rows], self.codes[rows], keep)
+        return rows[best]
+
+    def _unlink(self, row: int):
+        members = self.members[self.lists[row]]
+        pos = self.positions[row]
+        tail = members.size - 1
+        if pos != tail:
+            moved = members.rows[tail]
+            members.rows[pos] = moved
+            self.positions[moved] = pos
+        members.size = tail
+
+
+def exact_top_k(vectors: np.ndarray, rows: Optional[np.ndarray], query: np.ndarray, top_k: int):
+    """(rows, scores) of the best ``top_k`` among ``rows`` (all rows if None), best first."""
+    scores = vectors @ query if rows is None else vectors[rows] @ query
+    n = len(scores)
+    if top_k < n:
+        best = np.argpartition(scores, n - top_k)[n - top_k:]
+    else:
+        best = np.arange(n)
+    best = best[np.argsort(scores[best])[::-1]]
+    return (best if rows is None else rows[best]), scores[best]
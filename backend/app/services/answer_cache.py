@@ -0,0 +1,201 @@
+"""
+Semantic cache of chat answers.
+
+Analysts ask the same few questions about a company all day. A generated
+answer is cached per (tenant, company) with the embedding of its question;
+a later question whose embedding has cosine similarity of at least
+ANSWER_CACHE_MIN_SIMILARITY gets the cached answer and its citations without
+retrieval or generation. Mock embeddings (no Azure OpenAI key, or the API
+failed) carry no meaning, so a question embedded that way only matches an
+entry for the same normalized question text, and its entry never matches a
+question by similarity.
+
+Entries are only valid for the evidence they were generated from. Each
+company's entries carry a fingerprint of its newest score and newest RAG
+document; a lookup with a different fingerprint drops them, which also
+covers evidence added by other workers. process_event additionally
+invalidates the company here as soon as it adds evidence. Failed generations
+are never cached. The cache is per process: fingerprints make a shared tier
+unnecessary for correctness, and a per-company scan of a few dozen vectors
+is cheaper than a Redis round trip.
+"""
+import logging
+import re
+import time
+from collections import OrderedDict
+from typing import List, Optional, Sequence, Tuple
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import get_settings
+from app.db.models import ESGScore, RAGDocument
+from app.services.vector_store import normalize
+
+logger = logging.getLogger(__name__)
+
+Key = Tuple[str, str]
+
+
+def normalize_question(text: str) -> str:
+    """Case, punctuation and spacing do not make a different question."""
+    return " ".join(re.findall(r"\w+", text.lower()))
+
+
+async def evidence_fingerprint(db: AsyncSession, tenant_id: str, company_id: str) -> str:
+    """Changes whenever the company gets a new score or RAG document."""
+    score_id = (await db.execute(
+        select(ESGScore.id)
+        .where(ESGScore.tenant_id == tenant_id, ESGScore.company_id == company_id)
+        .order_by(ESGScore.recorded_at.desc())
+        .limit(1)
+    )).scalar_one_or_none()
+    doc_id = (await db.execute(
+        select(RAGDocument.id)
+        .where(RAGDocument.tenant_id == tenant_id, RAGDocument.company_id == company_id)
+        .order_by(RAGDocument.created_at.desc())
+        .limit(1)
+    )).scalar_one_or_none()
+    return f"{score_id}:{doc_id}"
+
+
+class _CompanyAnswers:
+    __slots__ = ("fingerprint", "vectors", "questions", "answers", "created")
+
+    def __init__(self, fingerprint: str):
+        self.fingerprint = fingerprint
+        self.vectors: List[np.ndarray] = []
+        self.questions: List[Optional[str]] = []  # normalized question of a mock-embedded entry
+        self.answers: List[dict] = []
+        self.created: List[float] = []
+
+
+class AnswerCache:
+    def __init__(self, max_entries: Optional[int] = None, min_similarity: Optional[float] = None):
+        self._max_entries = max_entries
+        self._min_similarity = min_similarity
+        self._companies: "OrderedDict[Key, _CompanyAnswers]" = OrderedDict()
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0  # lookups that found entries for older evidence
+        self.invalidations = 0
+        self.evictions = 0
+
+    @property
+    def max_entries(self) -> int:
+        if self._max_entries is not None:
+            return self._max_entries
+        return get_settings().ANSWER_CACHE_SIZE
+
+    @property
+    def min_similarity(self) -> float:
+        if self._min_similarity is not None:
+            return self._min_similarity
+        return get_settings().ANSWER_CACHE_MIN_SIMILARITY
+
+    def get(self, tenant_id: str, company_id: str, fingerprint: str,
+            query_embedding: Sequence[float], question: Optional[str] = None) -> Optional[dict]:
+        """``question`` is given when ``query_embedding`` is a mock: then
+        only an entry for the same normalized question matches."""
+        if self.max_entries <= 0:
+            return None
+        key = (tenant_id, company_id)
+        company = self._companies.get(key)
+        if company is not None and company.fingerprint != fingerprint:
+            self.stale += 1
+            self._drop(key)
+            company = None
+        if company is not None:
+            self._expire(key, company)
+        query = normalize(query_embedding)
+        # Entries embedded with other dimensions (a fallback embedding, or
+        # the deployment changed) cannot match.
+        if company is None or not company.vectors or len(company.vectors[0]) != len(query):
+            self.misses += 1
+            return None
+        if question is not None:
+            question = normalize_question(question)
+            best = next((i for i, q in enumerate(company.questions) if q == question), None)
+        else:
+            scores = np.stack(company.vectors) @ query
+            scores[[q is not None for q in company.questions]] = -np.inf
+            best = int(np.argmax(scores))
+            if scores[best] < self.min_similarity:
+                best = None
+        if best is None:
+            self.misses += 1
+            return None
+        self._companies.move_to_end(key)
+        self.hits += 1
+        answer = company.answers[best]
+        return {**answer, "citations": [dict(c) for c in answer["citations"]]}
+
+    def put(self, tenant_id: str, company_id: str, fingerprint: str,
+            query_embedding: Sequence[float], answer: dict, question: Optional[str] = None):
+        """``question`` as for get."""
+        if self.max_entries <= 0:
+            return
+        settings = get_settings()
+        key = (tenant_id, company_id)
+        vector = normalize(query_embedding)
+        company = self._companies.get(key)
+        if (company is None or company.fingerprint != fingerprint
+                or (company.vectors and len(company.vectors[0]) != len(vector))):
+            self._drop(key)
+            company = self._companies[key] = _CompanyAnswers(fingerprint)
+        self._companies.move_to_end(key)
+        company.vectors.append(vector)
+        company.questions.append(normalize_question(question) if question is not None else None)
+        company.answers.append({**answer, "citations": [dict(c) for c in answer["citations"]]})
+        company.created.append(time.monotonic())
+        self._size += 1
+        if len(company.vectors) > max(1, settings.ANSWER_CACHE_MAX_PER_COMPANY):
+            self._pop_oldest(company)
+        while self._size > self.max_entries and self._companies:
+            oldest = next(iter(self._companies))
+            self.evictions += len(self._companies[oldest].vectors)
+            self._drop(oldest)
+
+    def invalidate(self, tenant_id: str, company_id: str):
+        if (tenant_id, company_id) in self._companies:
+            self.invalidations += 1
+            self._drop((tenant_id, company_id))
+
+    def clear(self):
+        self._companies.clear()
+        self._size = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": self._size,
+            "companies": len(self._companies),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "stale": self.stale,
+            "invalidations": self.invalidations,
+            "evictions": self.evictions,
+        }
+
+    def _expire(self, key: Key, company: _CompanyAnswers):
+        cutoff = time.monotonic() - get_settings().ANSWER_CACHE_TTL_S
+        while company.created and company.created[0] < cutoff:
+            self._pop_oldest(company)
+        if not company.vectors:
+            self._drop(key)
+
+    def _pop_oldest(self, company: _CompanyAnswers):
+        company.vectors.pop(0)
+        company.questions.pop(0)
+        company.answers.pop(0)
+        company.created.pop(0)
+        self._size -= 1
+
+    def _drop(self, key: Key):
+        company = self._companies.pop(key, None)
+        if company is not None:
+            self._size -= len(company.vectors)
+
+
+answer_cache = AnswerCache()
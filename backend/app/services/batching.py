@@ -0,0 +1,81 @@
+"""
+Micro-batching for concurrent callers.
+
+Collects items submitted by concurrent coroutines for up to ``max_wait_ms``
+(or until ``max_batch`` items are queued) and hands them to one batch handler
+call. Each caller gets back its own result, or the handler's exception.
+"""
+import asyncio
+import logging
+from typing import Awaitable, Callable, Generic, List, Optional, Tuple, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class MicroBatcher(Generic[T, R]):
+    def __init__(
+        self,
+        handler: Callable[[List[T]], Awaitable[List[R]]],
+        max_batch: Callable[[], int],
+        max_wait_ms: Callable[[], float],
+        name: str = "batcher",
+    ):
+        # Limits are callables so they follow settings changes at runtime.
+        self._handler = handler
+        self._max_batch = max_batch
+        self._max_wait_ms = max_wait_ms
+        self._name = name
+        self._pending: List[Tuple[T, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: set = set()
+        self.batches = 0
+        self.items = 0
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "queued": len(self._pending),
+        }
+
+    async def submit(self, item: T) -> R:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future))
+        if len(self._pending) >= max(1, self._max_batch()):
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(max(self._max_wait_ms(), 0) / 1000, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        task = asyncio.get_running_loop().create_task(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[T, asyncio.Future]]):
+        self.batches += 1
+        self.items += len(batch)
+        try:
+            results = await self._handler([item for item, _ in batch])
+            if len(results) != len(batch):
+                raise RuntimeError(f"{self._name} handler returned {len(results)} results for {len(batch)} items")
+        except Exception as e:
+            logger.warning(f"{self._name} batch of {len(batch)} failed: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
@@ -0,0 +1,210 @@
+"""
+Bulk event ingest: a JSON array or NDJSON body, parsed as it arrives.
+
+Items are validated one at a time while the body streams in, so a
+100k-event upload never sits in memory as one document. Valid events are
+inserted INGEST_BULK_CHUNK at a time with a single executemany INSERT,
+committed, and their ids handed to the async ingest queue (the worker pool
+or the staged pipeline, see workers/ingest_pool.get_ingest_queue). Every
+item gets a result in the response: queued with its event id, invalid with
+the reason, or rejected when the queue's backlog is full (a rejected chunk
+is not stored, so it can be sent again). A lane can still fill up while a
+chunk is being inserted (another request queued events meanwhile); those
+events are stored but deferred, and the pool's backfill queues them later
+(see workers/ingest_pool). Do not send deferred items again.
+
+In NDJSON a bad line only fails that item. A syntax error in a JSON array
+cannot be skipped reliably, so parsing stops there and the rest of the body
+is reported as a single error.
+"""
+import codecs
+import json
+import logging
+from datetime import datetime, timezone
+from typing import AsyncIterator, Dict, List, Optional, Tuple, Union
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import get_settings
+from app.db.models import Company, ESGEvent, new_uuid
+from app.schemas.common import IngestEventRequest
+
+logger = logging.getLogger(__name__)
+
+MAX_ITEM_BYTES = 1 << 20  # a JSON array item that is still incomplete at this size is malformed
+
+Item = Tuple[int, Union[IngestEventRequest, str]]  # (index, event or error)
+
+
+def event_values(body: IngestEventRequest, tenant_id: str) -> dict:
+    """Column values of a new ESGEvent, with the ingest defaults applied."""
+    return {
+        "tenant_id": tenant_id,
+        "company_id": body.company_id,
+        "title": body.title,
+        "description": body.description,
+        "source_url": body.source_url or "",
+        "category": body.category or "governance",
+        "raw_text": body.raw_text or body.description,
+        "event_date": body.event_date or datetime.now(timezone.utc),
+    }
+
+
+def _validation_error(e: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in err['loc']) or 'item'}: {err['msg']}" for err in e.errors()
+    )
+
+
+def _validate(index: int, raw: Union[str, dict]) -> Item:
+    try:
+        if isinstance(raw, str):
+            return index, IngestEventRequest.model_validate_json(raw)
+        return index, IngestEventRequest.model_validate(raw)
+    except ValidationError as e:
+        return index, _validation_error(e)
+
+
+async def _text(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    async for chunk in chunks:
+        if chunk:
+            yield decoder.decode(chunk)
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+async def iter_ndjson(chunks: AsyncIterator[bytes]) -> AsyncIterator[Item]:
+    """One item per non-blank line."""
+    index = 0
+    buffer = ""
+    async for text in _text(chunks):
+        buffer += text
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            if line.strip():
+                yield _validate(index, line)
+                index += 1
+    if buffer.strip():
+        yield _validate(index, buffer)
+
+
+async def iter_json_array(chunks: AsyncIterator[bytes]) -> AsyncIterator[Item]:
+    """Items of a top-level JSON array, decoded one value at a time. A
+    syntax error ends the stream with an item of index -1 carrying the error."""
+    decoder = json.JSONDecoder()
+    index = 0
+    buffer = ""
+    pos = 0
+    started = done = False
+    expect_value = True
+
+    def skip_space(p: int) -> int:
+        while p < len(buffer) and buffer[p] in " \t\r\n":
+            p += 1
+        return p
+
+    text_chunks = _text(chunks)
+    eof = False
+    while not done:
+        if not eof:
+            try:
+                buffer = buffer[pos:] + await text_chunks.__anext__()
+                pos = 0
+            except StopAsyncIteration:
+                eof = True
+        while True:
+            pos = skip_space(pos)
+            if pos >= len(buffer):
+                break
+            char = buffer[pos]
+            if not started:
+                if char != "[":
+                    yield -1, "body must be a JSON array"
+                    return
+                started = True
+                pos += 1
+            elif char == "]" and (expect_value is False or index == 0):
+                done = True
+                break
+            elif char == "," and not expect_value:
+                expect_value = True
+                pos += 1
+            elif expect_value:
+                try:
+                    value, end = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError as e:
+                    if eof or len(buffer) - pos > MAX_ITEM_BYTES:
+                        yield -1, f"malformed JSON after item {index - 1}: {e.msg}"
+                        return
+                    break  # wait for the rest of the value
+                if end == len(buffer) and not eof and not isinstance(value, (dict, list)):
+                    break  # a number or literal may continue in the next chunk
+                pos = end
+                expect_value = False
+                yield _validate(index, value) if isinstance(value, dict) else (index, "item: must be an object")
+                index += 1
+            else:
+                yield -1, f"malformed JSON after item {index - 1}: expected ',' or ']'"
+                return
+        if eof and not done:
+            yield -1, "body must be a JSON array" if not started else f"unterminated JSON array after item {index - 1}"
+            return
+
+
+class BulkIngest:
+    """Inserts validated events in chunks and queues them on ``pool``."""
+
+    def __init__(self, db: AsyncSession, tenant_id: str, pool, chunk_size: Optional[int] = None):
+        settings = get_settings()
+        self.db = db
+        self.tenant_id = tenant_id
+        self.pool = pool
+        self.chunk_size = max(1, chunk_size or settings.INGEST_BULK_CHUNK)
+        self.results: List[dict] = []
+        self._chunk: List[Tuple[int, dict]] = []
+        self._companies: Optional[set] = None
+
+    async def run(self, items: AsyncIterator[Item]) -> dict:
+        result = await self.db.execute(select(Company.id).where(Company.tenant_id == self.tenant_id))
+        self._companies = set(result.scalars().all())
+        error = None
+        async for index, item in items:
+            if index < 0:
+                error = item
+                break
+            if isinstance(item, str):
+                self.results.append({"index": index, "status": "invalid", "error": item})
+            elif item.company_id not in self._companies:
+                self.results.append({"index": index, "status": "invalid", "error": "company_id: unknown company"})
+            else:
+                self._chunk.append((index, event_values(item, self.tenant_id)))
+                if len(self._chunk) >= self.chunk_size:
+                    await self._flush()
+        await self._flush()
+
+        self.results.sort(key=lambda r: r["index"])
+        counts: Dict[str, int] = {"queued": 0, "deferred": 0, "invalid": 0, "rejected": 0}
+        for r in self.results:
+            counts[r["status"]] += 1
+        return {**counts, "error": error, "results": self.results}
+
+    async def _flush(self):
+        chunk, self._chunk = self._chunk, []
+        if not chunk:
+            return
+        if not self.pool.accepts(values["company_id"] for _, values in chunk):
+            self.results.extend({"index": i, "status": "rejected", "error": "ingest queue is full"} for i, _ in chunk)
+            return
+        rows = [{**values, "id": new_uuid()} for _, values in chunk]
+        await self.db.execute(insert(ESGEvent), rows)
+        await self.db.commit()  # the pool reads the events in its own sessions
+        for (index, _), row in zip(chunk, rows):
+            if self.pool.submit(row["id"], row["company_id"]):
+                self.results.append({"index": index, "status": "queued", "event_id": row["id"]})
+            else:
+                self.results.append({
+                    "index": index, "status": "deferred", "event_id": row["id"],
+                    "error": "ingest queue is full; the stored event is queued later",
+                })
@@ -0,0 +1,150 @@
+"""
+Vectorized bulk rescoring.
+
+Recomputes the current ESG score of every company in a tenant (or in all
+tenants) in one pass, so companies without fresh news still pick up recency
+decay. Event columns are loaded as NumPy arrays and decay, repetition factor
+and category impacts are computed per company with ``bincount`` instead of one
+query and Python loop per company. Results are written with a single bulk
+insert into ``esg_scores``.
+"""
+import logging
+from datetime import datetime, timezone, timedelta
+from typing import Optional
+import numpy as np
+from sqlalchemy import select, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.models import Company, ESGEvent, ESGScore, new_uuid
+from app.services.scoring import (
+    BASE_SCORE, CATEGORY_WEIGHTS, HALF_LIFE_DAYS, LOOKBACK_DAYS,
+)
+from app.services.rollups import apply_scores_to_rollups
+from app.services.latest_scores import upsert_latest_scores
+
+logger = logging.getLogger(__name__)
+
+CATEGORIES = ("environmental", "social", "governance")
+MAX_IMPACT = 50.0
+
+
+def _epoch(dt: datetime) -> float:
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+def compute_scores(
+    company_idx: np.ndarray,
+    category_idx: np.ndarray,
+    severity: np.ndarray,
+    confidence: np.ndarray,
+    event_ts: np.ndarray,
+    n_companies: int,
+    now_ts: float,
+) -> dict:
+    """Score ``n_companies`` at once from per-event column arrays.
+
+    ``company_idx`` and ``category_idx`` are integer codes (category code -1
+    marks categories that do not count). Returns arrays of length
+    ``n_companies`` keyed by score component.
+    """
+    keep = category_idx >= 0
+    company_idx = company_idx[keep]
+    category_idx = category_idx[keep]
+    days_ago = np.maximum((now_ts - event_ts[keep]) / 86400, 0.0)
+    decay = np.exp(-0.693 * days_ago / HALF_LIFE_DAYS)
+    weight = severity[keep] * confidence[keep] * decay
+
+    n_cat = len(CATEGORIES)
+    flat = company_idx * n_cat + category_idx
+    size = n_companies * n_cat
+    counts = np.bincount(flat, minlength=size).reshape(n_companies, n_cat)
+    sums = np.bincount(flat, weights=weight, minlength=size).reshape(n_companies, n_cat)
+
+    rep_factor = 1.0 + 0.1 * (counts - 1)
+    impacts = np.where(counts > 0, sums * rep_factor, 0.0)
+    pillar = np.maximum(0.0, BASE_SCORE - np.minimum(impacts, MAX_IMPACT))
+    weights = np.array([CATEGORY_WEIGHTS[c] for c in CATEGORIES])
+    overall = pillar @ weights
+
+    risk = np.select(
+        [overall >= 80, overall >= 60, overall >= 40],
+        ["low", "medium", "high"],
+        default="critical",
+    )
+    return {
+        "overall": np.round(overall, 2),
+        "environmental": np.round(pillar[:, 0], 2),
+        "social": np.round(pillar[:, 1], 2),
+        "governance": np.round(pillar[:, 2], 2),
+        "risk_level": risk,
+    }
+
+
+async def rescore_universe(
+    db: AsyncSession, tenant_id: Optional[str] = None, now: Optional[datetime] = None
+) -> int:
+    """Write a fresh ESGScore row for every company. Returns the row count."""
+    now = now or datetime.now(timezone.utc)
+
+    company_stmt = select(Company.id, Company.tenant_id)
+    if tenant_id:
+        company_stmt = company_stmt.where(Company.tenant_id == tenant_id)
+    companies = (await db.execute(company_stmt)).all()
+    if not companies:
+        return 0
+    index = {(c.tenant_id, c.id): i for i, c in enumerate(companies)}
+
+    event_stmt = select(
+        ESGEvent.tenant_id, ESGEvent.company_id, ESGEvent.category,
+        ESGEvent.severity, ESGEvent.confidence, ESGEvent.event_date,
+    ).where(
+        ESGEvent.event_date >= now - timedelta(days=LOOKBACK_DAYS),
+        ESGEvent.is_processed == True,
+        ESGEvent.duplicate_of.is_(None),
+    )
+    if tenant_id:
+        event_stmt = event_stmt.where(ESGEvent.tenant_id == tenant_id)
+    events = (await db.execute(event_stmt)).all()
+
+    cat_codes = {c: i for i, c in enumerate(CATEGORIES)}
+    company_idx = np.fromiter(
+        (index.get((e.tenant_id, e.company_id), -1) for e in events), dtype=np.int64, count=len(events)
+    )
+    category_idx = np.fromiter(
+        (cat_codes.get(e.category.lower() if e.category else "governance", -1) for e in events),
+        dtype=np.int64, count=len(events),
+    )
+    # Events whose (tenant, company) pair is not in the universe are dropped.
+    category_idx[company_idx < 0] = -1
+    company_idx[company_idx < 0] = 0
+
+    scores = compute_scores(
+        company_idx,
+        category_idx,
+        np.fromiter((e.severity for e in events), dtype=np.float64, count=len(events)),
+        np.fromiter((e.confidence for e in events), dtype=np.float64, count=len(events)),
+        np.fromiter((_epoch(e.event_date) for e in events), dtype=np.float64, count=len(events)),
+        len(companies),
+        _epoch(now),
+    )
+
+    rows = [
+        {
+            "id": new_uuid(),
+            "tenant_id": c.tenant_id,
+            "company_id": c.id,
+            "overall": float(scores["overall"][i]),
+            "environmental": float(scores["environmental"][i]),
+            "social": float(scores["social"][i]),
+            "governance": float(scores["governance"][i]),
+            "risk_level": str(scores["risk_level"][i]),
+            "recorded_at": now,
+        }
+        for i, c in enumerate(companies)
+    ]
+    await db.execute(insert(ESGScore), rows)
+    await apply_scores_to_rollups(db, rows)
+    await upsert_latest_scores(db, rows)
+    logger.info(f"Bulk rescored {len(rows)} companies from {len(events)} events")
+    return len(rows)
@@ -0,0 +1,125 @@
+"""
+Content-hash cache for LLM event classifications.
+
+Syndicated news repeats the same title and description across companies and
+tenants, so LLM results are cached by a hash of the normalized text. Entries
+live in an in-process LRU and, when Redis is configured, in Redis with a TTL
+so workers share them.
+
+The key includes a hash of the classification prompts and the chat
+deployment: editing a prompt or switching models changes every key, which
+invalidates the old entries without an explicit flush (stale Redis entries
+expire with their TTL). Only LLM results are stored; rule-based fallbacks are
+cheap and would otherwise pin a degraded answer.
+"""
+import hashlib
+import json
+import logging
+import re
+import unicodedata
+from collections import OrderedDict
+from typing import Optional
+from app.core.config import get_settings
+from app.db.redis import redis_client
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    text = unicodedata.normalize("NFKC", text or "")
+    return _WHITESPACE.sub(" ", text).strip().lower()
+
+
+def prompt_version(*prompts: str) -> str:
+    settings = get_settings()
+    digest = hashlib.sha256(settings.AZURE_OPENAI_CHAT_DEPLOYMENT.encode())
+    for prompt in prompts:
+        digest.update(b"\0" + prompt.encode())
+    return digest.hexdigest()[:12]
+
+
+class ClassificationCache:
+    def __init__(self, version: str, max_entries: Optional[int] = None, ttl_s: Optional[int] = None):
+        self.version = version
+        self._max_entries = max_entries
+        self._ttl_s = ttl_s
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+        self.hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def max_entries(self) -> int:
+        if self._max_entries is not None:
+            return self._max_entries
+        return get_settings().CLASSIFICATION_CACHE_SIZE
+
+    @property
+    def ttl_s(self) -> int:
+        if self._ttl_s is not None:
+            return self._ttl_s
+        return get_settings().CLASSIFICATION_CACHE_TTL_S
+
+    def key(self, title: str, description: str) -> str:
+        text = normalize_text(title) + "\0" + normalize_text(description)
+        return f"esg:cls:{self.version}:{hashlib.sha256(text.encode()).hexdigest()}"
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.redis_hits + self.misses
+        return {
+            "version": self.version,
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.redis_hits) / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+    async def get(self, title: str, description: str) -> Optional[dict]:
+        if self.max_entries <= 0:
+            return None
+        key = self.key(title, description)
+        result = self._entries.get(key)
+        if result is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(result)
+
+        try:
+            raw = await redis_client.get(key)
+        except Exception as e:
+            logger.debug(f"Classification cache Redis get failed: {e}")
+            raw = None
+        if raw:
+            result = json.loads(raw)
+            result.setdefault("source", "llm")
+            self._remember(key, result)
+            self.redis_hits += 1
+            return dict(result)
+
+        self.misses += 1
+        return None
+
+    async def set(self, title: str, description: str, result: dict):
+        if self.max_entries <= 0:
+            return
+        key = self.key(title, description)
+        self._remember(key, dict(result))
+        try:
+            await redis_client.set(key, json.dumps(result), ex=self.ttl_s)
+        except Exception as e:
+            logger.debug(f"Classification cache Redis set failed: {e}")
+
+    def clear(self):
+        self._entries.clear()
+
+    def _remember(self, key: str, result: dict):
+        self._entries[key] = result
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
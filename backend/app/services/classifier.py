@@ -7,11 +7,25 @@ Classifies raw event text into:
 - severity: 1-10
 - confidence: 0.0-1.0
 - sentiment: positive | negative | neutral
+
+Concurrent calls are micro-batched into multi-event prompts
+(CLASSIFIER_BATCH_WINDOW_MS / CLASSIFIER_BATCH_MAX), and LLM results are
+cached by content hash (see classification_cache).
+
+Cascade: cache -> local model (when confident, see local_classifier) -> LLM
+-> rules. Every result carries a "source" tag: "llm", "local" or "rules".
 """
+import asyncio
 import json
 import logging
-from openai import AsyncAzureOpenAI
+from typing import List, Tuple
 from app.core.config import get_settings
+from app.services.batching import MicroBatcher
+from app.services.classification_cache import ClassificationCache, prompt_version
+from app.services.keyword_matcher import KeywordMatcher, load_lexicon
+from app.services.llm_client import llm_clients
+from app.services.llm_scheduler import BACKGROUND, estimate_tokens, llm_scheduler
+from app.services.local_classifier import local_classifier
 
 logger = logging.getLogger(__name__)
 
@@ -29,49 +43,188 @@ Event Description: {description}
 Return ONLY valid JSON, no markdown or explanation."""
 
 
+BATCH_CLASSIFICATION_PROMPT = """You are an ESG (Environmental, Social, Governance) event classifier.
+Analyze each of the events below and return one JSON object per event with these fields:
+- id: the id of the event, copied from the input
+- category: one of "environmental", "social", "governance"
+- subcategory: a specific sub-type (e.g., "carbon_emissions", "labor_rights", "board_diversity")
+- severity: integer 1-10 (10 = most severe risk)
+- confidence: float 0.0-1.0 (your confidence in the classification)
+- sentiment: one of "positive", "negative", "neutral"
+
+Events (JSON):
+{events}
+
+Return ONLY a valid JSON array with one object per event, no markdown or explanation."""
+
+CATEGORIES = ("environmental", "social", "governance")
+
+classification_cache = ClassificationCache(prompt_version(CLASSIFICATION_PROMPT, BATCH_CLASSIFICATION_PROMPT))
+
+
 async def classify_event(title: str, description: str) -> dict:
     settings = get_settings()
     if not settings.AZURE_OPENAI_API_KEY:
-        return _rule_based_classify(title, description)
+        return local_classifier.predict(title, description) or _rule_based_classify(title, description)
+    cached = await classification_cache.get(title, description)
+    if cached is not None:
+        return cached
+    local = local_classifier.predict(title, description)
+    if local is not None:
+        return local
+    if settings.CLASSIFIER_BATCH_WINDOW_MS > 0:
+        return await classification_batcher.submit((title, description))
+    return await _llm_classify(title, description)
+
+
+async def classify_events(items: List[Tuple[str, str]]) -> List[dict]:
+    """Classify many (title, description) pairs with one completion per chunk.
+
+    Items the model omits or returns malformed fall back to the rule-based
+    classifier individually; a failed request falls back for its whole chunk.
+    """
+    settings = get_settings()
+    if not settings.AZURE_OPENAI_API_KEY:
+        return [local_classifier.predict(t, d) or _rule_based_classify(t, d) for t, d in items]
+
+    results: List[dict] = [await classification_cache.get(t, d) for t, d in items]
+    results = [r or local_classifier.predict(t, d) for r, (t, d) in zip(results, items)]
+    misses = [i for i, r in enumerate(results) if r is None]
+    chunk_size = max(1, settings.CLASSIFIER_BATCH_MAX)
+    chunks = [misses[i:i + chunk_size] for i in range(0, len(misses), chunk_size)]
+    classified = await asyncio.gather(*(_llm_classify_batch([items[i] for i in chunk]) for chunk in chunks))
+    for chunk, chunk_results in zip(chunks, classified):
+        for i, result in zip(chunk, chunk_results):
+            results[i] = result
+    return results
 
+
+async def _llm_classify(title: str, description: str) -> dict:
+    settings = get_settings()
     try:
-        client = AsyncAzureOpenAI(
-            api_key=settings.AZURE_OPENAI_API_KEY,
-            azure_endpoint=settings.AZURE_OPENAI_ENDPOINT,
-            api_version=settings.AZURE_OPENAI_API_VERSION,
+        client = llm_clients.client()
+        messages = [
+            {"role": "system", "content": "You are an ESG classification expert. Return only valid JSON."},
+            {"role": "user", "content": CLASSIFICATION_PROMPT.format(title=title, description=description)},
+        ]
+        response = await llm_scheduler.run(
+            BACKGROUND,
+            estimate_tokens(messages, 1000),
+            lambda: client.chat.completions.create(
+                model=settings.AZURE_OPENAI_CHAT_DEPLOYMENT,
+                messages=messages,
+                max_completion_tokens=1000,
+                timeout=llm_clients.timeout("classify"),
+            ),
         )
-        response = await client.chat.completions.create(
-            model=settings.AZURE_OPENAI_CHAT_DEPLOYMENT,
-            messages=[
-                {"role": "system", "content": "You are an ESG classification expert. Return only valid JSON."},
-                {"role": "user", "content": CLASSIFICATION_PROMPT.format(title=title, description=description)},
-            ],
-            max_completion_tokens=1000,
-        )
-        raw = response.choices[0].message.content.strip()
-        if raw.startswith("```"):
-            raw = raw.split("```")[1]
-            if raw.startswith("json"):
-                raw = raw[4:]
-        result = json.loads(raw)
-        result["severity"] = max(1, min(10, int(result.get("severity", 5))))
-        result["confidence"] = max(0.0, min(1.0, float(result.get("confidence", 0.5))))
+        result = _clamp(json.loads(_strip_fences(response.choices[0].message.content)))
+        result["source"] = "llm"
+        await classification_cache.set(title, description, result)
         return result
     except Exception as e:
         logger.warning(f"LLM classification failed, using rule-based: {e}")
         return _rule_based_classify(title, description)
 
 
-def _rule_based_classify(title: str, description: str) -> dict:
-    text = (title + " " + description).lower()
+async def _llm_classify_batch(items: List[Tuple[str, str]]) -> List[dict]:
+    if len(items) == 1:
+        return [await _llm_classify(*items[0])]
+
+    settings = get_settings()
+    events = json.dumps(
+        [{"id": i, "title": t, "description": d} for i, (t, d) in enumerate(items)],
+        ensure_ascii=False,
+    )
+    try:
+        client = llm_clients.client()
+        messages = [
+            {"role": "system", "content": "You are an ESG classification expert. Return only a valid JSON array."},
+            {"role": "user", "content": BATCH_CLASSIFICATION_PROMPT.format(events=events)},
+        ]
+        max_tokens = min(16000, 1000 + 250 * len(items))
+        response = await llm_scheduler.run(
+            BACKGROUND,
+            estimate_tokens(messages, max_tokens),
+            lambda: client.chat.completions.create(
+                model=settings.AZURE_OPENAI_CHAT_DEPLOYMENT,
+                messages=messages,
+                max_completion_tokens=max_tokens,
+                timeout=llm_clients.timeout("classify"),
+            ),
+        )
+        parsed = json.loads(_strip_fences(response.choices[0].message.content))
+    except Exception as e:
+        logger.warning(f"LLM batch classification of {len(items)} events failed, using rule-based: {e}")
+        return [_rule_based_classify(t, d) for t, d in items]
+
+    if isinstance(parsed, dict):
+        parsed = parsed.get("results", parsed.get("events", []))
+    by_id = {}
+    for entry in parsed if isinstance(parsed, list) else []:
+        try:
+            idx = int(entry["id"])
+            if entry.get("category") not in CATEGORIES:
+                raise ValueError(f"invalid category {entry.get('category')!r}")
+            result = _clamp({k: v for k, v in entry.items() if k != "id"})
+            result["source"] = "llm"
+        except Exception:
+            continue
+        if 0 <= idx < len(items):
+            by_id[idx] = result
+            await classification_cache.set(*items[idx], result)
+
+    if len(by_id) < len(items):
+        logger.warning(f"LLM batch returned {len(by_id)}/{len(items)} valid results, rule-based for the rest")
+    return [by_id.get(i) or _rule_based_classify(t, d) for i, (t, d) in enumerate(items)]
+
+
+def _strip_fences(raw: str) -> str:
+    raw = raw.strip()
+    if raw.startswith("```"):
+        raw = raw.split("```")[1]
+        if raw.startswith("json"):
+            raw = raw[4:]
+    return raw
+
+
+def _clamp(result: dict) -> dict:
+    result["severity"] = max(1, min(10, int(result.get("severity", 5))))
+    result["confidence"] = max(0.0, min(1.0, float(result.get("confidence", 0.5))))
+    return result
+
+
+classification_batcher = MicroBatcher(
+    _llm_classify_batch,
+    max_batch=lambda: get_settings().CLASSIFIER_BATCH_MAX,
+    max_wait_ms=lambda: get_settings().CLASSIFIER_BATCH_WINDOW_MS,
+    name="classifier",
+)
+
+
+RULE_LEXICON = {
+    "environmental": ["emission", "carbon", "pollution", "climate", "waste", "deforest", "water", "biodiversity", "renewable", "energy"],
+    "social": ["labor", "worker", "safety", "health", "diversity", "human rights", "community", "discrimination", "wage"],
+    "governance": ["board", "corruption", "fraud", "compliance", "audit", "executive", "shareholder", "transparency", "bribery"],
+    "high_severity": ["critical", "severe", "major", "disaster", "scandal", "violation", "breach"],
+    "low_severity": ["minor", "improvement", "positive", "progress", "award"],
+    "positive": ["positive", "improvement", "award", "progress", "commitment"],
+}
+
+
+def build_rule_matcher() -> KeywordMatcher:
+    settings = get_settings()
+    lexicon = RULE_LEXICON
+    if settings.CLASSIFIER_LEXICON_PATH:
+        lexicon = load_lexicon(settings.CLASSIFIER_LEXICON_PATH, RULE_LEXICON)
+    return KeywordMatcher(lexicon, word_boundary=settings.CLASSIFIER_WORD_BOUNDARY)
 
-    env_keywords = ["emission", "carbon", "pollution", "climate", "waste", "deforest", "water", "biodiversity", "renewable", "energy"]
-    social_keywords = ["labor", "worker", "safety", "health", "diversity", "human rights", "community", "discrimination", "wage"]
-    gov_keywords = ["board", "corruption", "fraud", "compliance", "audit", "executive", "shareholder", "transparency", "bribery"]
 
-    env_score = sum(1 for k in env_keywords if k in text)
-    soc_score = sum(1 for k in social_keywords if k in text)
-    gov_score = sum(1 for k in gov_keywords if k in text)
+_rule_matcher = build_rule_matcher()
+
+
+def _rule_based_classify(title: str, description: str) -> dict:
+    hits = _rule_matcher.count((title + " " + description).lower())
+    env_score, soc_score, gov_score = hits["environmental"], hits["social"], hits["governance"]
 
     if env_score >= soc_score and env_score >= gov_score:
         category = "environmental"
@@ -81,15 +234,13 @@ def _rule_based_classify(title: str, description: str) -> dict:
         category = "governance"
 
     severity = 5
-    high_severity = ["critical", "severe", "major", "disaster", "scandal", "violation", "breach"]
-    low_severity = ["minor", "improvement", "positive", "progress", "award"]
-    if any(w in text for w in high_severity):
+    if hits["high_severity"]:
         severity = 8
-    elif any(w in text for w in low_severity):
+    elif hits["low_severity"]:
         severity = 3
 
     sentiment = "negative"
-    if any(w in text for w in ["positive", "improvement", "award", "progress", "commitment"]):
+    if hits["positive"]:
         sentiment = "positive"
 
     return {
@@ -98,4 +249,5 @@ def _rule_based_classify(title: str, description: str) -> dict:
         "severity": severity,
         "confidence": 0.7,
         "sentiment": sentiment,
+        "source": "rules",
     }
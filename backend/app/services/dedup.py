@@ -0,0 +1,254 @@
+"""
+Streaming near-duplicate detection for ingested events.
+
+The same incident is syndicated by many outlets with slightly different
+wording. Each event gets a MinHash signature of the words in its title and
+description, and events of the same (tenant, company) whose estimated Jaccard
+similarity is at least DEDUP_MIN_SIMILARITY within DEDUP_WINDOW_HOURS of each
+other are near-duplicates. The pipeline links them to the first (canonical)
+event and skips classification, embedding, scoring and alerts.
+
+Candidates are found with banded LSH: only events sharing all rows of at
+least one band with the new signature are compared. (SimHash was tried first;
+on short news items rewordings and unrelated events of the same company were
+too close in Hamming distance to separate.) The index lives in process
+memory; it is warmed from the DB on startup and bounded per company by the
+window and DEDUP_MAX_PER_COMPANY.
+"""
+import logging
+import re
+import time
+import zlib
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import get_settings
+from app.db.models import ESGEvent
+from app.services.classification_cache import normalize_text
+
+logger = logging.getLogger(__name__)
+
+NUM_PERM = 64
+BANDS = 16  # of NUM_PERM // BANDS rows: ~99% recall at similarity 0.7, ~12% at 0.3
+_ROWS = NUM_PERM // BANDS
+_TOKEN = re.compile(r"\w+")
+_rng = np.random.default_rng(0x5EED)
+# Multiply-shift hash family: the high 32 bits of (a * x + b) mod 2**64, a odd.
+_A = _rng.integers(1, 2 ** 63, NUM_PERM, dtype=np.uint64) | np.uint64(1)
+_B = _rng.integers(0, 2 ** 63, NUM_PERM, dtype=np.uint64)
+_EMPTY = np.full(NUM_PERM, 0xFFFFFFFF, dtype=np.uint32)
+
+
+def minhash(text: str) -> np.ndarray:
+    """MinHash signature of the set of words in ``text``."""
+    words = set(_TOKEN.findall(normalize_text(text)))
+    if not words:
+        return _EMPTY
+    x = np.fromiter((zlib.crc32(w.encode()) for w in words), dtype=np.uint64, count=len(words))
+    with np.errstate(over="ignore"):
+        hashed = (x[:, None] * _A + _B) >> np.uint64(32)
+    return hashed.min(axis=0).astype(np.uint32)
+
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Estimated Jaccard similarity of two signatures."""
+    return float(np.count_nonzero(a == b)) / NUM_PERM
+
+
+def _band_keys(signature: np.ndarray) -> List[Tuple[int, bytes]]:
+    raw = signature.tobytes()
+    width = _ROWS * 4
+    return [(i, raw[i * width:(i + 1) * width]) for i in range(BANDS)]
+
+
+def _timestamp(dt: Optional[datetime]) -> float:
+    if dt is None:
+        return time.time()
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+class CanonicalEvent:
+    __slots__ = ("event_id", "signature", "ts", "classification")
+
+    def __init__(self, event_id: str, signature: np.ndarray, ts: float, classification: Optional[dict] = None):
+        self.event_id = event_id
+        self.signature = signature
+        self.ts = ts
+        # Set once the canonical event is classified; duplicates reuse it.
+        self.classification = classification
+
+
+class _CompanyIndex:
+    __slots__ = ("entries", "buckets", "newest")
+
+    def __init__(self):
+        self.entries: deque = deque()  # insertion order
+        self.buckets: Dict[Tuple[int, bytes], List[CanonicalEvent]] = {}
+        self.newest = 0.0
+
+    def find(self, signature: np.ndarray, ts: float, min_similarity: float,
+             window_s: float) -> Optional[CanonicalEvent]:
+        best, best_similarity, seen = None, min_similarity, set()
+        for key in _band_keys(signature):
+            for entry in self.buckets.get(key, ()):
+                if id(entry) in seen or abs(entry.ts - ts) > window_s:
+                    continue
+                seen.add(id(entry))
+                score = similarity(entry.signature, signature)
+                if score >= best_similarity:
+                    best, best_similarity = entry, score
+        return best
+
+    def add(self, entry: CanonicalEvent):
+        self.entries.append(entry)
+        for key in _band_keys(entry.signature):
+            self.buckets.setdefault(key, []).append(entry)
+        self.newest = max(self.newest, entry.ts)
+
+    def remove(self, entry: CanonicalEvent):
+        for key in _band_keys(entry.signature):
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                continue
+            try:
+                bucket.remove(entry)
+            except ValueError:
+                continue
+            if not bucket:
+                del self.buckets[key]
+
+    def evict(self, window_s: float, max_entries: int) -> List[CanonicalEvent]:
+        evicted = []
+        while self.entries and (
+            len(self.entries) > max_entries or self.entries[0].ts < self.newest - window_s
+        ):
+            entry = self.entries.popleft()
+            self.remove(entry)
+            evicted.append(entry)
+        return evicted
+
+
+class NearDuplicateIndex:
+    def __init__(self, window_hours: Optional[float] = None, min_similarity: Optional[float] = None,
+                 max_per_company: Optional[int] = None):
+        self._window_hours = window_hours
+        self._min_similarity = min_similarity
+        self._max_per_company = max_per_company
+        self._companies: Dict[Tuple[str, str], _CompanyIndex] = {}
+        self._by_id: Dict[str, Tuple[Tuple[str, str], CanonicalEvent]] = {}
+        self.checked = 0
+        self.duplicates = 0
+        self.check_seconds = 0.0
+
+    @property
+    def window_s(self) -> float:
+        hours = self._window_hours if self._window_hours is not None else get_settings().DEDUP_WINDOW_HOURS
+        return hours * 3600
+
+    @property
+    def min_similarity(self) -> float:
+        if self._min_similarity is not None:
+            return self._min_similarity
+        return get_settings().DEDUP_MIN_SIMILARITY
+
+    @property
+    def max_per_company(self) -> int:
+        if self._max_per_company is not None:
+            return self._max_per_company
+        return get_settings().DEDUP_MAX_PER_COMPANY
+
+    def check(self, tenant_id: str, company_id: str, event_id: str, title: str, description: str,
+              event_date: Optional[datetime] = None) -> Optional[CanonicalEvent]:
+        """Canonical event this one duplicates, or None after indexing it as canonical."""
+        started = time.perf_counter()
+        signature = minhash(f"{title} {description or ''}")
+        ts = _timestamp(event_date)
+        key = (tenant_id, company_id)
+        index = self._companies.get(key)
+        if index is None:
+            index = self._companies[key] = _CompanyIndex()
+
+        canonical = index.find(signature, ts, self.min_similarity, self.window_s)
+        self.checked += 1
+        if canonical is not None:
+            self.duplicates += 1
+        else:
+            self._add(key, index, CanonicalEvent(event_id, signature, ts))
+        self.check_seconds += time.perf_counter() - started
+        return canonical
+
+    def resolve(self, event_id: str, classification: dict):
+        """Attach the canonical event's classification for its duplicates."""
+        found = self._by_id.get(event_id)
+        if found is not None:
+            found[1].classification = classification
+
+    def discard(self, event_id: str):
+        """Forget an event that failed processing, so it is not linked to."""
+        found = self._by_id.pop(event_id, None)
+        if found is None:
+            return
+        key, entry = found
+        index = self._companies.get(key)
+        if index is not None:
+            index.remove(entry)
+            try:
+                index.entries.remove(entry)
+            except ValueError:
+                pass
+
+    def clear(self):
+        self._companies.clear()
+        self._by_id.clear()
+
+    async def warm(self, db: AsyncSession, now: Optional[datetime] = None) -> int:
+        """Index the canonical events of the current window from the DB."""
+        now = now or datetime.now(timezone.utc)
+        result = await db.execute(
+            select(
+                ESGEvent.id, ESGEvent.tenant_id, ESGEvent.company_id, ESGEvent.title,
+                ESGEvent.description, ESGEvent.event_date, ESGEvent.classification_json,
+            ).where(
+                ESGEvent.event_date >= now - timedelta(seconds=self.window_s),
+                ESGEvent.is_processed == True,
+                ESGEvent.duplicate_of.is_(None),
+            ).order_by(ESGEvent.event_date)
+        )
+        self.clear()
+        count = 0
+        for row in result:
+            key = (row.tenant_id, row.company_id)
+            index = self._companies.get(key)
+            if index is None:
+                index = self._companies[key] = _CompanyIndex()
+            self._add(key, index, CanonicalEvent(
+                row.id, minhash(f"{row.title} {row.description or ''}"),
+                _timestamp(row.event_date), row.classification_json or None,
+            ))
+            count += 1
+        logger.info(f"Near-duplicate index warmed with {count} events")
+        return count
+
+    def stats(self) -> dict:
+        return {
+            "checked": self.checked,
+            "duplicates": self.duplicates,
+            "duplicate_rate": round(self.duplicates / self.checked, 4) if self.checked else 0.0,
+            "companies": len(self._companies),
+            "indexed": len(self._by_id),
+            "avg_check_us": round(self.check_seconds / self.checked * 1e6, 1) if self.checked else 0.0,
+        }
+
+    def _add(self, key: Tuple[str, str], index: _CompanyIndex, entry: CanonicalEvent):
+        index.add(entry)
+        self._by_id[entry.event_id] = (key, entry)
+        for old in index.evict(self.window_s, self.max_per_company):
+            self._by_id.pop(old.event_id, None)
+
+
+near_duplicates = NearDuplicateIndex()
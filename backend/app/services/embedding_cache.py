@@ -0,0 +1,111 @@
+"""
+Content-hash cache for embeddings.
+
+Reindexing, re-seeding and repeated chat questions embed the same texts over
+and over. Embeddings are cached by a hash of the exact text sent to the API
+(embeddings are sensitive to case and punctuation, so unlike the
+classification cache nothing is normalized away). Entries live in an
+in-process LRU as float32 arrays and, when Redis is configured, in Redis with
+a TTL so workers and restarts share them.
+
+The key includes the embedding deployment, so switching models never mixes
+vectors from different embedding spaces. Only API results are stored; mock
+fallbacks are never cached.
+"""
+import base64
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import List, Optional, Sequence
+import numpy as np
+from app.core.config import get_settings
+from app.db.redis import redis_client
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingCache:
+    def __init__(self, max_entries: Optional[int] = None, ttl_s: Optional[int] = None):
+        self._max_entries = max_entries
+        self._ttl_s = ttl_s
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self.hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def max_entries(self) -> int:
+        if self._max_entries is not None:
+            return self._max_entries
+        return get_settings().EMBEDDING_CACHE_SIZE
+
+    @property
+    def ttl_s(self) -> int:
+        if self._ttl_s is not None:
+            return self._ttl_s
+        return get_settings().EMBEDDING_CACHE_TTL_S
+
+    def key(self, text: str) -> str:
+        deployment = get_settings().AZURE_OPENAI_EMBEDDING_DEPLOYMENT
+        return f"esg:emb:{deployment}:{hashlib.sha256(text.encode()).hexdigest()}"
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.redis_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": sum(v.nbytes for v in self._entries.values()),
+            "hits": self.hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.redis_hits) / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+    async def get(self, text: str) -> Optional[List[float]]:
+        if self.max_entries <= 0:
+            return None
+        key = self.key(text)
+        vector = self._entries.get(key)
+        if vector is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return vector.tolist()
+
+        try:
+            raw = await redis_client.get(key)
+        except Exception as e:
+            logger.debug(f"Embedding cache Redis get failed: {e}")
+            raw = None
+        if raw:
+            vector = np.frombuffer(base64.b64decode(raw), dtype=np.float32)
+            self._remember(key, vector)
+            self.redis_hits += 1
+            return vector.tolist()
+
+        self.misses += 1
+        return None
+
+    async def set(self, text: str, embedding: Sequence[float]):
+        if self.max_entries <= 0:
+            return
+        key = self.key(text)
+        vector = np.asarray(embedding, dtype=np.float32)
+        self._remember(key, vector)
+        try:
+            await redis_client.set(key, base64.b64encode(vector.tobytes()).decode(), ex=self.ttl_s)
+        except Exception as e:
+            logger.debug(f"Embedding cache Redis set failed: {e}")
+
+    def clear(self):
+        self._entries.clear()
+
+    def _remember(self, key: str, vector: np.ndarray):
+        self._entries[key] = vector
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+
+embedding_cache = EmbeddingCache()
@@ -0,0 +1,259 @@
+"""
+BM25 keyword index over RAGDocument.content for chat retrieval.
+
+One in-memory inverted index per (tenant, company). Postings are compact
+``array`` buffers of (row, term frequency), appended in row order as
+documents arrive, so inserts are O(terms in the document). A query scores its
+terms rarest first with NumPy; once the best ``top_k`` documents so far
+cannot be overtaken by a document matching only the remaining common terms
+(MaxScore), those terms are looked up for the candidates alone instead of
+scanning their long postings.
+
+A partition is loaded from the DB on its first query. Documents embedded in
+this process are added as they are indexed (see rag.index_document); other
+workers' documents are picked up by re-reading rows created since the
+partition's watermark, at most every KEYWORD_INDEX_SYNC_INTERVAL_S.
+Replaced and removed rows are tombstoned and the postings compacted once a
+quarter of the rows are dead.
+"""
+import logging
+import math
+import re
+import time
+from array import array
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import get_settings
+from app.db.models import RAGDocument
+from app.services.classification_cache import normalize_text
+
+logger = logging.getLogger(__name__)
+
+K1 = 1.2
+B = 0.75
+# Rows created this long before the watermark are re-read on sync, for
+# transactions that committed after a later row was seen; duplicates are
+# skipped by id.
+SYNC_SLACK = timedelta(seconds=60)
+
+_TOKEN = re.compile(r"\w+")
+STOPWORDS = frozenset(
+    "a an and are as at be been but by did do does for from had has have how i in is it its "
+    "me my of on or our so than that the their them there these they this to was we were what "
+    "when where which who why will with you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN.findall(normalize_text(text)) if t not in STOPWORDS]
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """Fuse ranked id lists: score(d) = sum of 1 / (k + rank of d), rank from 1."""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+class _Partition:
+    __slots__ = ("ids", "rows", "lengths", "dead", "postings", "alive", "total_length", "watermark", "synced_at")
+
+    def __init__(self):
+        self.ids: List[str] = []
+        self.rows: Dict[str, int] = {}
+        self.lengths = array("f")
+        self.dead = bytearray()
+        self.postings: Dict[str, Tuple[array, array]] = {}
+        self.alive = 0
+        self.total_length = 0
+        self.watermark: Optional[datetime] = None
+        self.synced_at = 0.0
+
+    def add(self, doc_id: str, text: str):
+        if doc_id in self.rows:
+            self.remove(doc_id)
+        tokens = tokenize(text)
+        row = len(self.ids)
+        self.ids.append(doc_id)
+        self.rows[doc_id] = row
+        self.lengths.append(len(tokens))
+        self.dead.append(0)
+        self.alive += 1
+        self.total_length += len(tokens)
+        counts: Dict[str, int] = {}
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+        for token, tf in counts.items():
+            posting = self.postings.get(token)
+            if posting is None:
+                posting = self.postings[token] = (array("i"), array("H"))
+            posting[0].append(row)
+            posting[1].append(min(tf, 0xFFFF))
+
+    def remove(self, doc_id: str) -> bool:
+        row = self.rows.pop(doc_id, None)
+        if row is None:
+            return False
+        self.dead[row] = 1
+        self.alive -= 1
+        self.total_length -= self.lengths[row]
+        if len(self.ids) - self.alive > len(self.ids) // 4:
+            self._compact()
+        return True
+
+    def search(self, terms: Sequence[str], top_k: int) -> List[Tuple[str, float]]:
+        n = len(self.ids)
+        if not self.alive or top_k <= 0:
+            return []
+        avgdl = max(self.total_length / self.alive, 1.0)
+        lengths = np.frombuffer(self.lengths, dtype=np.float32)
+        dead = np.frombuffer(self.dead, dtype=np.uint8) if self.alive < n else None
+        postings = sorted(
+            (p for p in (self.postings.get(t) for t in dict.fromkeys(terms)) if p is not None),
+            key=lambda p: len(p[0]),
+        )
+        idfs = [math.log(1 + (self.alive - len(p[0]) + 0.5) / (len(p[0]) + 0.5)) for p in postings]
+        # A term adds at most idf * (K1 + 1) to any document's score.
+        remaining = [idf * (K1 + 1) for idf in idfs]
+        remaining = np.cumsum(remaining[::-1])[::-1]
+
+        # float32 throughout: these arrays can be as long as the partition.
+        c0, c1 = np.float32(K1 * (1 - B)), np.float32(K1 * B / avgdl)
+
+        def contributions(rows, tfs, idf):
+            tf = tfs.astype(np.float32)
+            return np.float32(idf * (K1 + 1)) * tf / (tf + (c0 + c1 * lengths[rows]))
+
+        rows = np.empty(0, dtype=np.int64)
+        scores = np.empty(0, dtype=np.float64)
+        dense = None  # per-row scores once the matches cover a good part of the partition
+        for j, ((term_rows, term_tfs), idf) in enumerate(zip(postings, idfs)):
+            term_rows = np.frombuffer(term_rows, dtype=np.int32)
+            term_tfs = np.frombuffer(term_tfs, dtype=np.uint16)
+            if dense is None and len(rows) >= top_k and \
+                    np.partition(scores, len(scores) - top_k)[len(scores) - top_k] > remaining[j]:
+                # MaxScore pruning: rarer terms have already found top_k
+                # documents that no document outside them can overtake, so
+                # the remaining (common) terms only score those candidates.
+                pos = np.minimum(np.searchsorted(term_rows, rows), len(term_rows) - 1)
+                match = term_rows[pos] == rows
+                scores[match] += contributions(rows[match], term_tfs[pos[match]], idf)
+                continue
+            if dead is not None:
+                alive = dead[term_rows] == 0
+                term_rows, term_tfs = term_rows[alive], term_tfs[alive]
+            weights = contributions(term_rows, term_tfs, idf)
+            if dense is None and 8 * (len(rows) + len(term_rows)) > n:
+                dense = np.zeros(n, dtype=np.float32)
+                dense[rows] = scores
+            if dense is not None:
+                dense[term_rows] += weights  # rows of one posting are distinct
+            elif not len(rows):
+                rows, scores = term_rows.astype(np.int64), weights
+            else:
+                rows, inverse = np.unique(np.concatenate([rows, term_rows]), return_inverse=True)
+                scores = np.bincount(inverse, weights=np.concatenate([scores, weights]))
+        if dense is not None:
+            rows = np.argpartition(dense, n - top_k)[n - top_k:] if top_k < n else np.arange(n)
+            rows = rows[dense[rows] > 0]
+            scores = dense[rows]
+        if top_k < len(scores):
+            best = np.argpartition(scores, len(scores) - top_k)[len(scores) - top_k:]
+        else:
+            best = np.arange(len(scores))
+        best = best[np.argsort(scores[best])[::-1]]
+        return [(self.ids[rows[i]], float(scores[i])) for i in best]
+
+    def _compact(self):
+        dead = np.frombuffer(self.dead, dtype=np.uint8).astype(bool)
+        renumber = np.cumsum(~dead) - 1
+        postings = {}
+        for term, (rows, tfs) in self.postings.items():
+            rows = np.array(rows, dtype=np.int64)
+            keep = ~dead[rows]
+            if keep.any():
+                postings[term] = (array("i", renumber[rows[keep]].astype(np.int32).tobytes()),
+                                  array("H", np.array(tfs, dtype=np.uint16)[keep].tobytes()))
+        alive = np.flatnonzero(~dead)
+        self.postings = postings
+        self.ids = [self.ids[i] for i in alive]
+        self.rows = {doc_id: i for i, doc_id in enumerate(self.ids)}
+        self.lengths = array("f", np.array(self.lengths, dtype=np.float32)[alive].tobytes())
+        self.dead = bytearray(len(self.ids))
+
+
+class KeywordIndex:
+    def __init__(self):
+        self._partitions: Dict[Tuple[str, str], _Partition] = {}
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.loaded_rows = 0
+
+    def add(self, doc_id: str, tenant_id: str, company_id: str, text: str):
+        """Index a new document. Partitions not loaded yet are skipped: their
+        first query reads every document from the DB anyway."""
+        partition = self._partitions.get((tenant_id, company_id))
+        if partition is not None:
+            partition.add(doc_id, text)
+
+    def remove(self, doc_id: str, tenant_id: str, company_id: str) -> bool:
+        partition = self._partitions.get((tenant_id, company_id))
+        return partition is not None and partition.remove(doc_id)
+
+    async def search(
+        self, db: AsyncSession, query: str, tenant_id: str, company_id: str, top_k: int,
+    ) -> List[Tuple[str, float]]:
+        """(doc_id, BM25 score) of the best ``top_k`` documents, best first."""
+        partition = await self._sync(db, tenant_id, company_id)
+        started = time.perf_counter()
+        hits = partition.search(tokenize(query), top_k)
+        self.queries += 1
+        self.query_seconds += time.perf_counter() - started
+        return hits
+
+    def clear(self):
+        self._partitions.clear()
+
+    def stats(self) -> dict:
+        return {
+            "partitions": len(self._partitions),
+            "documents": sum(p.alive for p in self._partitions.values()),
+            "terms": sum(len(p.postings) for p in self._partitions.values()),
+            "loaded_rows": self.loaded_rows,
+            "queries": self.queries,
+            "avg_query_ms": round(self.query_seconds / self.queries * 1000, 3) if self.queries else 0.0,
+        }
+
+    async def _sync(self, db: AsyncSession, tenant_id: str, company_id: str) -> _Partition:
+        key = (tenant_id, company_id)
+        partition = self._partitions.get(key)
+        if partition is None:
+            partition = _Partition()
+        elif time.monotonic() - partition.synced_at < get_settings().KEYWORD_INDEX_SYNC_INTERVAL_S:
+            return partition
+
+        stmt = (
+            select(RAGDocument.id, RAGDocument.content, RAGDocument.created_at)
+            .where(RAGDocument.tenant_id == tenant_id, RAGDocument.company_id == company_id)
+            .order_by(RAGDocument.created_at)
+        )
+        if partition.watermark is not None:
+            stmt = stmt.where(RAGDocument.created_at >= partition.watermark - SYNC_SLACK)
+        result = await db.execute(stmt)
+        for row in result:
+            if row.id not in partition.rows:
+                partition.add(row.id, row.content)
+                self.loaded_rows += 1
+            if row.created_at is not None and (partition.watermark is None or row.created_at > partition.watermark):
+                partition.watermark = row.created_at
+        partition.synced_at = time.monotonic()
+        self._partitions[key] = partition
+        return partition
+
+
+keyword_index = KeywordIndex()
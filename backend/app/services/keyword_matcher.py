@@ -0,0 +1,103 @@
+"""
+Compiled multi-keyword matcher for the rule-based classifier.
+
+Built once from a lexicon ({group: [keywords]}) and answers which keywords of
+every group occur in a text with one split of the text instead of one
+substring scan per keyword:
+
+- A keyword without whitespace can only occur inside a single
+  whitespace-separated chunk, so each distinct chunk is resolved once
+  through a memo (chunk -> keywords it contains) and every later text is a
+  sequence of dict lookups. Cost is linear in the text and independent of
+  lexicon size once the vocabulary is warm.
+- Multi-word keywords ("human rights") are checked against the whole text
+  (in word-boundary mode with one combined regex).
+
+By default matching has plain substring semantics ("emission" matches
+"emissions"). With ``word_boundary=True`` keywords only match whole words.
+"""
+import json
+import re
+from collections import defaultdict
+from itertools import chain
+from typing import Dict, Iterable, List, Set, Tuple
+
+_WORD = re.compile(r"\w+")
+_MEMO_MAX = 200_000
+
+
+def load_lexicon(path: str, base: Dict[str, List[str]], allowed_groups: Iterable[str] = ()) -> Dict[str, List[str]]:
+    """Overlay the groups of a JSON lexicon file ({group: [keywords]}) on ``base``."""
+    with open(path, encoding="utf-8") as f:
+        overrides = json.load(f)
+    if not isinstance(overrides, dict):
+        raise ValueError(f"Lexicon {path} must be a JSON object of keyword lists")
+    allowed = set(allowed_groups) or set(base)
+    unknown = set(overrides) - allowed
+    if unknown:
+        raise ValueError(f"Unknown lexicon groups in {path}: {sorted(unknown)}")
+    lexicon = {group: list(words) for group, words in base.items()}
+    for group, words in overrides.items():
+        if not isinstance(words, list) or not all(isinstance(w, str) for w in words):
+            raise ValueError(f"Lexicon group {group!r} in {path} must be a list of strings")
+        lexicon[group] = words
+    return lexicon
+
+
+class _ChunkMemo(dict):
+    def __init__(self, resolve):
+        super().__init__()
+        self._resolve = resolve
+
+    def __missing__(self, chunk: str) -> Tuple[str, ...]:
+        if len(self) >= _MEMO_MAX:
+            self.clear()
+        found = self[chunk] = self._resolve(chunk)
+        return found
+
+
+class KeywordMatcher:
+    def __init__(self, lexicon: Dict[str, List[str]], word_boundary: bool = False):
+        self.word_boundary = word_boundary
+        self.groups = tuple(lexicon)
+        self._groups_of: Dict[str, Set[str]] = defaultdict(set)
+        for group, words in lexicon.items():
+            for word in words:
+                word = " ".join(word.lower().split())
+                if word:
+                    self._groups_of[word].add(group)
+
+        if word_boundary:
+            self._words = frozenset(k for k in self._groups_of if _WORD.fullmatch(k))
+        else:
+            self._words = frozenset(k for k in self._groups_of if " " not in k)
+        self._phrases = tuple(k for k in self._groups_of if k not in self._words)
+        self._phrase_re = None
+        if word_boundary and self._phrases:
+            alternation = "|".join(re.escape(p) for p in sorted(self._phrases, key=len, reverse=True))
+            # Lookahead so overlapping phrases are all reported.
+            self._phrase_re = re.compile(rf"(?=\b({alternation})\b)")
+        self._memo = _ChunkMemo(self._whole_words if word_boundary else self._substrings)
+
+    def _substrings(self, chunk: str) -> Tuple[str, ...]:
+        return tuple(k for k in self._words if k in chunk)
+
+    def _whole_words(self, chunk: str) -> Tuple[str, ...]:
+        return tuple(self._words.intersection(_WORD.findall(chunk)))
+
+    def find(self, text: str) -> Set[str]:
+        """Distinct keywords occurring in ``text`` (already lowercased)."""
+        hits = set(chain.from_iterable(map(self._memo.__getitem__, text.split())))
+        if self._phrase_re is not None:
+            hits.update(self._phrase_re.findall(" ".join(text.split())))
+        elif self._phrases:
+            hits.update(p for p in self._phrases if p in text)
+        return hits
+
+    def count(self, text: str) -> Dict[str, int]:
+        """Number of distinct keywords of each group occurring in ``text``."""
+        counts = dict.fromkeys(self.groups, 0)
+        for keyword in self.find(text):
+            for group in self._groups_of[keyword]:
+                counts[group] += 1
+        return counts
@@ -0,0 +1,151 @@
+"""
+Latest-score materialization.
+
+``latest_scores`` holds one row per company with its most recent ESGScore, so
+the company list can return every company's current score in a single indexed
+query instead of one score lookup per company. Writers call
+``upsert_latest_scores`` in the same transaction as the score insert.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Sequence
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.models import Company, ESGScore, ESGScoreRollup, LatestScore
+from app.db.upsert import dialect_insert
+
+COMPANY_INCLUDES = ("latest_score", "delta_24h")
+
+_SCORE_FIELDS = ("overall", "environmental", "social", "governance", "risk_level", "recorded_at")
+
+
+def _aware(dt: datetime) -> datetime:
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=timezone.utc)
+    return dt
+
+
+def _get(score, key):
+    return score[key] if isinstance(score, dict) else getattr(score, key)
+
+
+async def upsert_latest_scores(db: AsyncSession, scores: Sequence, chunk_size: int = 500):
+    """Point each company's latest row at the newest of ``scores`` if it is newer.
+
+    One upsert per chunk, guarded by recorded_at, so concurrent recomputes of
+    a company neither fail on the primary key nor let an older score
+    overwrite a newer one.
+    """
+    newest: Dict[str, object] = {}
+    for score in scores:
+        company_id = _get(score, "company_id")
+        current = newest.get(company_id)
+        if current is None or _aware(_get(score, "recorded_at")) >= _aware(_get(current, "recorded_at")):
+            newest[company_id] = score
+    rows = [_latest_row(score) for score in newest.values()]
+    for i in range(0, len(rows), chunk_size):
+        await db.execute(_upsert(db, rows[i:i + chunk_size], newer_only=True))
+    await db.flush()
+
+
+async def refresh_latest_score(db: AsyncSession, tenant_id: str, company_id: str):
+    """Recompute a company's latest row from raw scores (after deletes/backfills)."""
+    result = await db.execute(
+        select(ESGScore)
+        .where(ESGScore.company_id == company_id, ESGScore.tenant_id == tenant_id)
+        .order_by(ESGScore.recorded_at.desc())
+        .limit(1)
+    )
+    score = result.scalar_one_or_none()
+    if score is None:
+        await db.execute(delete(LatestScore).where(LatestScore.company_id == company_id))
+        return
+    # Unconditional: after deletes the newest remaining score may be older.
+    await db.execute(_upsert(db, [_latest_row(score)], newer_only=False))
+    await db.flush()
+
+
+def _latest_row(score) -> dict:
+    row = {"company_id": _get(score, "company_id"), "tenant_id": _get(score, "tenant_id"), "score_id": _get(score, "id")}
+    for field in _SCORE_FIELDS:
+        row[field] = _get(score, field)
+    return row
+
+
+def _upsert(db: AsyncSession, rows: List[dict], newer_only: bool):
+    stmt = dialect_insert(db, LatestScore).values(rows)
+    return stmt.on_conflict_do_update(
+        index_elements=["company_id"],
+        set_={field: stmt.excluded[field] for field in ("score_id", *_SCORE_FIELDS)},
+        where=stmt.excluded.recorded_at >= LatestScore.recorded_at if newer_only else None,
+    )
+
+
+def _score_out(row: LatestScore) -> dict:
+    return {
+        "id": row.score_id,
+        "company_id": row.company_id,
+        "overall": row.overall,
+        "environmental": row.environmental,
+        "social": row.social,
+        "governance": row.governance,
+        "risk_level": row.risk_level,
+        "recorded_at": row.recorded_at,
+    }
+
+
+async def list_companies_with_scores(
+    db: AsyncSession,
+    tenant_id: str,
+    include: List[str],
+    query: Optional[str] = None,
+    limit: int = 100,
+) -> List[dict]:
+    """Companies joined with their latest score and/or 24h overall delta.
+
+    The 24h baseline is the close of the last hourly rollup bucket starting at
+    or before now - 24h, read through a correlated subquery on the rollup
+    index, so the whole list is one statement.
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=24)
+    baseline = (
+        select(ESGScoreRollup.close)
+        .where(
+            ESGScoreRollup.company_id == Company.id,
+            ESGScoreRollup.resolution == "1h",
+            ESGScoreRollup.bucket_start <= cutoff.replace(minute=0, second=0, microsecond=0),
+        )
+        .order_by(ESGScoreRollup.bucket_start.desc())
+        .limit(1)
+        .correlate(Company)
+        .scalar_subquery()
+    )
+
+    stmt = (
+        select(Company, LatestScore, baseline.label("baseline"))
+        .outerjoin(LatestScore, LatestScore.company_id == Company.id)
+        .where(Company.tenant_id == tenant_id)
+    )
+    if query:
+        stmt = stmt.where(Company.name.ilike(f"%{query}%"))
+    stmt = stmt.order_by(Company.name).limit(limit)
+
+    companies = []
+    for company, latest, baseline_overall in (await db.execute(stmt)).all():
+        item = {
+            "id": company.id,
+            "name": company.name,
+            "ticker": company.ticker,
+            "sector": company.sector,
+            "country": company.country,
+            "description": company.description,
+            "logo_url": company.logo_url,
+        }
+        if "latest_score" in include:
+            item["latest_score"] = _score_out(latest) if latest else None
+        if "delta_24h" in include:
+            item["delta_24h"] = (
+                round(latest.overall - baseline_overall, 2)
+                if latest is not None and baseline_overall is not None else None
+            )
+        companies.append(item)
+    return companies
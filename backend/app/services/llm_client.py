@@ -0,0 +1,106 @@
+"""
+Shared Azure OpenAI client.
+
+Classification, embeddings and chat all go through one AsyncAzureOpenAI
+client backed by one pooled httpx client, so connections (and their TLS
+sessions) are kept alive and reused instead of being set up per call. The
+manager is started and closed in the FastAPI lifespan; scripts and tests that
+never run the lifespan get a client built lazily on first use.
+
+Each operation has its own timeout (LLM_*_TIMEOUT_S), passed per request.
+
+A pool is closed on the loop that opened it: when the manager replaces or
+closes it, or when that loop shuts down (asyncio.run cancels the pool's
+closer task), so a loop change does not leak the old connections.
+"""
+import asyncio
+import logging
+from typing import Optional
+import httpx
+from openai import AsyncAzureOpenAI
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+OPERATIONS = ("classify", "embed", "chat")
+
+
+class LLMClientManager:
+    def __init__(self):
+        self._client: Optional[AsyncAzureOpenAI] = None
+        self._http: Optional[httpx.AsyncClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._closer: Optional[asyncio.Task] = None
+        self.clients_built = 0
+
+    async def start(self):
+        self.client()
+        logger.info("LLM client pool started")
+
+    def client(self) -> AsyncAzureOpenAI:
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            # Pooled connections belong to the loop that opened them; a new
+            # loop (asyncio.run in scripts and tests) needs a new pool.
+            self._release()
+            self._client = self._build()
+            self._loop = loop
+            self._closer = loop.create_task(_close_when_cancelled(self._client))
+        return self._client
+
+    def timeout(self, operation: str) -> httpx.Timeout:
+        if operation not in OPERATIONS:
+            raise ValueError(f"Unknown LLM operation: {operation}")
+        settings = get_settings()
+        total = {
+            "classify": settings.LLM_CLASSIFY_TIMEOUT_S,
+            "embed": settings.LLM_EMBED_TIMEOUT_S,
+            "chat": settings.LLM_CHAT_TIMEOUT_S,
+        }[operation]
+        return httpx.Timeout(total, connect=settings.LLM_CONNECT_TIMEOUT_S)
+
+    async def close(self):
+        closer = self._closer
+        self._release()
+        if closer is not None and closer.get_loop() is asyncio.get_running_loop():
+            await asyncio.gather(closer, return_exceptions=True)
+        logger.info("LLM client pool closed")
+
+    def _release(self):
+        """Have the current pool closed on its own loop and forget it."""
+        if self._closer is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._closer.cancel)
+        self._client = self._http = self._loop = self._closer = None
+
+    def _build(self) -> AsyncAzureOpenAI:
+        settings = get_settings()
+        self._http = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.LLM_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.LLM_KEEPALIVE_EXPIRY_S,
+            ),
+            timeout=httpx.Timeout(settings.LLM_CHAT_TIMEOUT_S, connect=settings.LLM_CONNECT_TIMEOUT_S),
+        )
+        self.clients_built += 1
+        return AsyncAzureOpenAI(
+            api_key=settings.AZURE_OPENAI_API_KEY,
+            azure_endpoint=settings.AZURE_OPENAI_ENDPOINT,
+            api_version=settings.AZURE_OPENAI_API_VERSION,
+            http_client=self._http,
+            # Retries go through llm_scheduler so they respect rate limits.
+            max_retries=0,
+        )
+
+    def stats(self) -> dict:
+        return {"clients_built": self.clients_built, "active": self._client is not None}
+
+
+async def _close_when_cancelled(client: AsyncAzureOpenAI):
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await client.close()
+
+
+llm_clients = LLMClientManager()
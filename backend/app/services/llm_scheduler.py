@@ -0,0 +1,376 @@
+"""
+Rate-limit-aware scheduler for Azure OpenAI calls.
+
+Every chat, classification and embedding request passes through one
+scheduler before it reaches the API:
+
+- Token buckets for requests/min and tokens/min (LLM_REQUESTS_PER_MINUTE,
+  LLM_TOKENS_PER_MINUTE; 0 = unlimited). Buckets hold 10 seconds of quota,
+  matching the window Azure enforces quotas over. Token cost is estimated
+  like Azure does (prompt size + max completion tokens) and corrected with
+  the reported usage afterwards.
+- Priority lanes: queued "interactive" calls (chat) are always dispatched
+  before "background" calls (ingest classification, document embeddings),
+  LLM_INTERACTIVE_RESERVED of the LLM_MAX_CONCURRENCY slots and
+  LLM_INTERACTIVE_QUOTA_SHARE of each bucket are kept free for interactive
+  calls.
+- Adaptive backoff: a 429 pauses dispatching for the Retry-After interval
+  (or exponential backoff without one), halves the effective rate and
+  concurrency, and retries the call; successes recover the rate gradually.
+  Connection errors and 5xx responses retry with backoff for that call only.
+  The scheduler owns all retries, so the SDK's own retries are disabled.
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+import time
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, TypeVar
+from openai import APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+LANES = (INTERACTIVE, BACKGROUND)
+
+BUCKET_WINDOW_S = 10.0
+MIN_RATE_FACTOR = 0.1
+RATE_RECOVERY_STEP = 0.05
+
+
+def estimate_tokens(messages: List[dict], max_completion_tokens: int = 0) -> int:
+    """Rough token cost of a request: ~4 characters per prompt token plus
+    the completion budget, which Azure reserves against the quota up front."""
+    chars = sum(len(m.get("content") or "") for m in messages)
+    return chars // 4 + max_completion_tokens
+
+
+def estimate_text_tokens(text: str) -> int:
+    return len(text) // 4 + 1
+
+
+class _Waiter:
+    __slots__ = ("lane", "priority", "seq", "tokens", "future")
+
+    def __init__(self, lane: str, seq: int, tokens: int, future: asyncio.Future):
+        self.lane = lane
+        self.priority = LANES.index(lane)
+        self.seq = seq
+        self.tokens = tokens
+        self.future = future
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class _LaneStats:
+    __slots__ = ("submitted", "granted", "completed", "failed", "wait_total", "wait_max")
+
+    def __init__(self):
+        self.submitted = self.granted = self.completed = self.failed = 0
+        self.wait_total = self.wait_max = 0.0
+
+
+class LLMScheduler:
+    def __init__(
+        self,
+        requests_per_minute: Optional[int] = None,
+        tokens_per_minute: Optional[int] = None,
+        max_concurrency: Optional[int] = None,
+        interactive_reserved: Optional[int] = None,
+        bucket_window_s: float = BUCKET_WINDOW_S,
+    ):
+        # Explicit limits are for tests and benchmarks; None reads settings.
+        self._bucket_window_s = bucket_window_s
+        self._rpm = requests_per_minute
+        self._tpm = tokens_per_minute
+        self._max_concurrency = max_concurrency
+        self._interactive_reserved = interactive_reserved
+        self._lane_stats: Dict[str, _LaneStats] = {lane: _LaneStats() for lane in LANES}
+        self.throttled = 0
+        self.retries = 0
+        self._reset(None)
+
+    def _reset(self, loop: Optional[asyncio.AbstractEventLoop]):
+        self._loop = loop
+        self._queue: List[_Waiter] = []
+        self._seq = itertools.count()
+        self._in_flight: Dict[str, int] = dict.fromkeys(LANES, 0)
+        self._wakeup = asyncio.Event() if loop else None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._requests = self._tokens = None
+        self._refilled_at = time.monotonic()
+        self._rate_factor = 1.0
+        self._paused_until = 0.0
+        self._consecutive_failures = 0
+
+    # -- limits -----------------------------------------------------------
+
+    def _limit(self, explicit: Optional[int], setting: str) -> int:
+        return explicit if explicit is not None else getattr(get_settings(), setting)
+
+    @property
+    def requests_per_minute(self) -> int:
+        return self._limit(self._rpm, "LLM_REQUESTS_PER_MINUTE")
+
+    @property
+    def tokens_per_minute(self) -> int:
+        return self._limit(self._tpm, "LLM_TOKENS_PER_MINUTE")
+
+    @property
+    def max_concurrency(self) -> int:
+        configured = max(1, self._limit(self._max_concurrency, "LLM_MAX_CONCURRENCY"))
+        return max(1, int(configured * self._rate_factor))
+
+    def _lane_capacity(self, lane: str) -> int:
+        if lane == INTERACTIVE:
+            return self.max_concurrency
+        reserved = self._limit(self._interactive_reserved, "LLM_INTERACTIVE_RESERVED")
+        return max(1, self.max_concurrency - max(reserved, 0))
+
+    # -- public API -------------------------------------------------------
+
+    async def run(self, lane: str, tokens: int, call: Callable[[], Awaitable[T]]) -> T:
+        """Run ``call`` (a fresh API request per invocation) once the rate
+        limits allow it, retrying on 429s and transient errors."""
+        result = await self._call(lane, tokens, call)
+        self._release(lane)
+        self._lane_stats[lane].completed += 1
+        self._on_success(tokens, result)
+        return result
+
+    async def stream(self, lane: str, tokens: int, call: Callable[[], Awaitable[AsyncIterator[T]]]) -> AsyncIterator[T]:
+        """Like ``run`` for a streamed request: ``call`` opens the stream and
+        the concurrency slot is held until it is exhausted or closed. Retries
+        only happen while opening. Closing this generator early (e.g. the
+        client disconnected) closes the upstream response, which stops the
+        completion."""
+        upstream = await self._call(lane, tokens, call)
+        stats = self._lane_stats[lane]
+        last = None
+        try:
+            async for chunk in upstream:
+                last = chunk
+                yield chunk
+        except (GeneratorExit, asyncio.CancelledError):
+            raise  # the caller stopped reading; not an API failure
+        except BaseException:
+            stats.failed += 1
+            raise
+        else:
+            stats.completed += 1
+            self._on_success(tokens, last)  # usage, when requested, is on the last chunk
+        finally:
+            self._release(lane)
+            close = getattr(upstream, "close", None)
+            if close is not None:
+                await close()
+
+    async def _call(self, lane: str, tokens: int, call: Callable[[], Awaitable[T]]) -> T:
+        """Await ``call`` in a granted slot, which stays held on success."""
+        if lane not in LANES:
+            raise ValueError(f"Unknown LLM lane: {lane}")
+        settings = get_settings()
+        stats = self._lane_stats[lane]
+        stats.submitted += 1
+        seq = None
+        attempt = 0
+        while True:
+            seq = await self._acquire(lane, tokens, seq)
+            try:
+                return await call()
+            except (RateLimitError, APIConnectionError, InternalServerError) as e:
+                self._release(lane)
+                delay = self._on_failure(e)
+                if isinstance(e, APITimeoutError) or attempt >= settings.LLM_MAX_RETRIES:
+                    stats.failed += 1
+                    raise
+                attempt += 1
+                self.retries += 1
+                if not isinstance(e, RateLimitError):
+                    # Transient errors only back off this call; 429s pause
+                    # every lane in the dispatcher.
+                    await asyncio.sleep(delay)
+            except BaseException:
+                self._release(lane)
+                stats.failed += 1
+                raise
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        lanes = {}
+        for lane, s in self._lane_stats.items():
+            lanes[lane] = {
+                "queued": sum(1 for w in self._queue if w.lane == lane and not w.future.done()),
+                "in_flight": self._in_flight[lane],
+                "submitted": s.submitted,
+                "completed": s.completed,
+                "failed": s.failed,
+                "wait_avg_ms": round(s.wait_total / s.granted * 1000, 1) if s.granted else 0.0,
+                "wait_max_ms": round(s.wait_max * 1000, 1),
+            }
+        return {
+            "lanes": lanes,
+            "throttled": self.throttled,
+            "retries": self.retries,
+            "rate_factor": round(self._rate_factor, 2),
+            "max_concurrency": self.max_concurrency,
+            "paused_for_s": round(max(0.0, self._paused_until - now), 2),
+        }
+
+    # -- dispatching ------------------------------------------------------
+
+    def _ensure_loop(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Futures and the dispatcher task belong to one event loop.
+            self._reset(loop)
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = loop.create_task(self._dispatch_forever())
+
+    async def _acquire(self, lane: str, tokens: int, seq: Optional[int]) -> int:
+        self._ensure_loop()
+        if seq is None:
+            seq = next(self._seq)
+        now = time.monotonic()
+        waiter = _Waiter(lane, seq, tokens, self._loop.create_future())
+        heapq.heappush(self._queue, waiter)
+        self._wakeup.set()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Granted just as the caller was cancelled: give the slot back.
+                self._release(lane)
+            raise
+        wait = time.monotonic() - now
+        stats = self._lane_stats[lane]
+        stats.granted += 1
+        stats.wait_total += wait
+        stats.wait_max = max(stats.wait_max, wait)
+        return seq
+
+    def _release(self, lane: str):
+        self._in_flight[lane] -= 1
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _dispatch_forever(self):
+        while True:
+            self._wakeup.clear()
+            delay = self._dispatch()
+            if delay is None:
+                await self._wakeup.wait()
+            else:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+
+    def _dispatch(self) -> Optional[float]:
+        """Grant queued calls in priority order. Returns how long to sleep
+        before limits allow the next one (None: wait for a release)."""
+        while self._queue:
+            head = self._queue[0]
+            if head.future.done():
+                heapq.heappop(self._queue)
+                continue
+            now = time.monotonic()
+            if now < self._paused_until:
+                return self._paused_until - now
+            if sum(self._in_flight.values()) >= self.max_concurrency:
+                return None
+            if self._in_flight[head.lane] >= self._lane_capacity(head.lane):
+                return None
+            delay = self._take_quota(head.lane, head.tokens, now)
+            if delay > 0:
+                return delay
+            heapq.heappop(self._queue)
+            self._in_flight[head.lane] += 1
+            head.future.set_result(None)
+        return None
+
+    def _take_quota(self, lane: str, tokens: int, now: float) -> float:
+        rpm, tpm = self.requests_per_minute, self.tokens_per_minute
+        req_rate = rpm * self._rate_factor / 60
+        tok_rate = tpm * self._rate_factor / 60
+        req_cap = max(1.0, rpm * self._bucket_window_s / 60)
+        tok_cap = max(1.0, tpm * self._bucket_window_s / 60)
+        if self._requests is None:
+            self._requests, self._tokens = req_cap, tok_cap
+        elapsed = now - self._refilled_at
+        self._refilled_at = now
+        self._requests = min(req_cap, self._requests + elapsed * req_rate)
+        self._tokens = min(tok_cap, self._tokens + elapsed * tok_rate)
+
+        # Background calls leave a share of each bucket to interactive ones.
+        share = get_settings().LLM_INTERACTIVE_QUOTA_SHARE if lane == BACKGROUND else 0.0
+        need_requests = min(req_cap, 1 + share * req_cap)
+        need_tokens = min(tok_cap, min(tokens, tok_cap) + share * tok_cap)
+        delay = 0.0
+        if rpm > 0 and self._requests < need_requests:
+            delay = max(delay, (need_requests - self._requests) / req_rate)
+        if tpm > 0 and self._tokens < need_tokens:
+            delay = max(delay, (need_tokens - self._tokens) / tok_rate)
+        if delay > 0:
+            return delay
+        if rpm > 0:
+            self._requests -= 1
+        if tpm > 0:
+            self._tokens -= min(tokens, tok_cap)
+        return 0.0
+
+    # -- feedback ---------------------------------------------------------
+
+    def _on_success(self, estimated_tokens: int, result):
+        self._consecutive_failures = 0
+        self._rate_factor = min(1.0, self._rate_factor + RATE_RECOVERY_STEP)
+        usage = getattr(result, "usage", None)
+        actual = getattr(usage, "total_tokens", None)
+        if actual is not None and self._tokens is not None and self.tokens_per_minute > 0:
+            self._tokens += estimated_tokens - actual
+
+    def _on_failure(self, error: Exception) -> float:
+        settings = get_settings()
+        self._consecutive_failures += 1
+        delay = _retry_after(error)
+        if delay is None:
+            backoff = settings.LLM_BACKOFF_BASE_S * 2 ** (self._consecutive_failures - 1)
+            delay = min(settings.LLM_BACKOFF_MAX_S, backoff) * random.uniform(0.5, 1.0)
+        if isinstance(error, RateLimitError):
+            self.throttled += 1
+            now = time.monotonic()
+            if now >= self._paused_until:
+                # Calls already in flight when the quota ran out come back as
+                # a burst of 429s; slow down once per pause, not per 429.
+                self._rate_factor = max(MIN_RATE_FACTOR, self._rate_factor / 2)
+            self._paused_until = max(self._paused_until, now + delay)
+            if self._wakeup is not None:
+                self._wakeup.set()
+            logger.warning(
+                f"LLM rate limited, pausing {delay:.1f}s (rate factor {self._rate_factor:.2f})"
+            )
+        return delay
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if "retry-after-ms" in headers:
+            return float(headers["retry-after-ms"]) / 1000
+        if "retry-after" in headers:
+            return float(headers["retry-after"])
+    except ValueError:
+        return None
+    return None
+
+
+llm_scheduler = LLMScheduler()
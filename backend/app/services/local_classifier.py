@@ -0,0 +1,276 @@
+"""
+Local CPU classifier in front of the LLM.
+
+A multinomial logistic regression over hashed word unigrams and bigrams,
+trained from the LLM classifications stored in ``ESGEvent.classification_json``.
+It predicts three heads (category, severity band, sentiment) from one sparse
+feature vector in a few microseconds. ``classify_event`` uses it when every
+head is at least LOCAL_CLASSIFIER_THRESHOLD confident and escalates the
+rest to Azure OpenAI.
+
+Features are hashed with CRC32 (stable across processes) into 2**18 buckets,
+so the model is a single weight matrix saved as ``.npz``. The model file is
+looked at on first use and then at most every
+LOCAL_CLASSIFIER_RELOAD_INTERVAL_S, so a model retrained by the script is
+picked up without a filesystem call per classification.
+"""
+import logging
+import os
+import re
+import time
+import zlib
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+N_FEATURES = 2 ** 18
+HEADS = {
+    "category": ("environmental", "social", "governance"),
+    "severity_band": ("low", "medium", "high"),
+    "sentiment": ("positive", "neutral", "negative"),
+}
+# Letters only: numbers in news text ("emissions up 23%") would just be memorized.
+_TOKEN = re.compile(r"[^\W\d_]+")
+
+
+def severity_band(severity: int) -> str:
+    if severity <= 3:
+        return "low"
+    if severity <= 6:
+        return "medium"
+    return "high"
+
+
+def featurize(text: str) -> np.ndarray:
+    tokens = _TOKEN.findall(text.lower())
+    grams = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    return np.unique(np.fromiter(
+        (zlib.crc32(g.encode()) % N_FEATURES for g in grams), dtype=np.int64, count=len(grams),
+    ))
+
+
+def event_text(title: str, description: str) -> str:
+    return f"{title} {description or ''}"
+
+
+def labels_from_classification(c: dict) -> Optional[Dict[str, int]]:
+    """Per-head class indices for a stored classification (-1 = unusable)."""
+    if not isinstance(c, dict) or c.get("category") not in HEADS["category"]:
+        return None
+    labels = {"category": HEADS["category"].index(c["category"])}
+    try:
+        labels["severity_band"] = HEADS["severity_band"].index(severity_band(int(c["severity"])))
+    except (KeyError, TypeError, ValueError):
+        labels["severity_band"] = -1
+    sentiment = c.get("sentiment")
+    labels["sentiment"] = HEADS["sentiment"].index(sentiment) if sentiment in HEADS["sentiment"] else -1
+    return labels
+
+
+@dataclass
+class LocalModel:
+    weights: np.ndarray  # (N_FEATURES, total classes), float32
+    bias: np.ndarray
+    band_severity: Dict[str, int]  # representative severity per band
+    subcategory: Dict[str, str]  # most common subcategory per category
+    trained_on: int = 0
+
+    def _slices(self):
+        start = 0
+        for head, classes in HEADS.items():
+            yield head, classes, slice(start, start + len(classes))
+            start += len(classes)
+
+    def predict(self, title: str, description: str) -> dict:
+        idx = featurize(event_text(title, description))
+        logits = self.weights[idx].sum(axis=0) + self.bias
+        out = {}
+        confidences = []
+        for head, classes, sl in self._slices():
+            z = logits[sl] - logits[sl].max()
+            p = np.exp(z)
+            p /= p.sum()
+            best = int(p.argmax())
+            out[head] = classes[best]
+            confidences.append(float(p[best]))
+        return {
+            "category": out["category"],
+            "subcategory": self.subcategory.get(out["category"], "general"),
+            "severity": self.band_severity.get(out["severity_band"], 5),
+            "confidence": round(min(confidences), 4),
+            "sentiment": out["sentiment"],
+            "source": "local",
+        }
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp = f"{path}.tmp.npz"
+        np.savez_compressed(
+            tmp,
+            weights=self.weights,
+            bias=self.bias,
+            band_severity=np.array([self.band_severity.get(b, 5) for b in HEADS["severity_band"]]),
+            subcategory=np.array([self.subcategory.get(c, "general") for c in HEADS["category"]]),
+            trained_on=np.array(self.trained_on),
+        )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "LocalModel":
+        with np.load(path) as data:
+            return cls(
+                weights=data["weights"],
+                bias=data["bias"],
+                band_severity=dict(zip(HEADS["severity_band"], map(int, data["band_severity"]))),
+                subcategory=dict(zip(HEADS["category"], map(str, data["subcategory"]))),
+                trained_on=int(data["trained_on"]),
+            )
+
+
+def train(
+    examples: Sequence[Tuple[str, str, dict]],
+    epochs: int = 40,
+    learning_rate: float = 0.5,
+    l2: float = 1e-4,
+) -> LocalModel:
+    """Fit the model on (title, description, classification) examples with
+    full-batch Adagrad on the softmax cross-entropy of every head."""
+    docs, labels, raw = [], [], []
+    for title, description, classification in examples:
+        y = labels_from_classification(classification)
+        features = featurize(event_text(title, description))
+        if y is not None and len(features):
+            docs.append(features)
+            labels.append([y[h] for h in HEADS])
+            raw.append(classification)
+    if len(docs) < 20:
+        raise ValueError(f"Need at least 20 labelled events to train, got {len(docs)}")
+
+    y = np.array(labels, dtype=np.int64)
+    lengths = np.array([len(d) for d in docs])
+    doc_starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    indices = np.concatenate(docs)
+    doc_of = np.repeat(np.arange(len(docs)), lengths)
+    # Feature-major order, to sum gradients per feature with reduceat.
+    order = np.argsort(indices, kind="stable")
+    used, feature_starts = np.unique(indices[order], return_index=True)
+
+    n_classes = sum(len(c) for c in HEADS.values())
+    weights = np.zeros((N_FEATURES, n_classes), dtype=np.float32)
+    bias = np.zeros(n_classes, dtype=np.float32)
+    g2_w = np.full((len(used), n_classes), 1e-8, dtype=np.float32)
+    g2_b = np.full_like(bias, 1e-8)
+
+    targets = np.zeros((len(docs), n_classes), dtype=np.float32)
+    mask = np.zeros_like(targets)
+    start = 0
+    for h, classes in enumerate(HEADS.values()):
+        known = y[:, h] >= 0
+        targets[np.flatnonzero(known), start + y[known, h]] = 1.0
+        mask[known, start:start + len(classes)] = 1.0
+        start += len(classes)
+
+    for _ in range(epochs):
+        logits = np.add.reduceat(weights[indices], doc_starts, axis=0) + bias
+        probs = np.empty_like(logits)
+        start = 0
+        for classes in HEADS.values():
+            sl = slice(start, start + len(classes))
+            z = logits[:, sl] - logits[:, sl].max(axis=1, keepdims=True)
+            e = np.exp(z)
+            probs[:, sl] = e / e.sum(axis=1, keepdims=True)
+            start += len(classes)
+        err = (probs - targets) * mask / len(docs)
+
+        grad_w = np.add.reduceat(err[doc_of[order]], feature_starts, axis=0) + l2 * weights[used]
+        grad_b = err.sum(axis=0)
+        g2_w += grad_w ** 2
+        g2_b += grad_b ** 2
+        weights[used] -= learning_rate * grad_w / np.sqrt(g2_w)
+        bias -= learning_rate * grad_b / np.sqrt(g2_b)
+
+    by_band: Dict[str, List[int]] = {}
+    subcats: Dict[str, Counter] = {}
+    for c in raw:
+        try:
+            severity = int(c["severity"])
+            by_band.setdefault(severity_band(severity), []).append(severity)
+        except (KeyError, TypeError, ValueError):
+            pass
+        subcats.setdefault(c["category"], Counter())[c.get("subcategory") or "general"] += 1
+    return LocalModel(
+        weights=weights,
+        bias=bias,
+        band_severity={band: int(np.median(v)) for band, v in by_band.items()},
+        subcategory={cat: counts.most_common(1)[0][0] for cat, counts in subcats.items()},
+        trained_on=len(docs),
+    )
+
+
+class LocalClassifier:
+    """Lazily loads the trained model from LOCAL_CLASSIFIER_PATH."""
+
+    def __init__(self):
+        self._model: Optional[LocalModel] = None
+        self._loaded_from: Optional[Tuple[str, float]] = None
+        self._checked: Optional[Tuple[str, float]] = None  # (path, monotonic time of the last look)
+        self.predictions = 0
+        self.accepted = 0
+
+    def model(self) -> Optional[LocalModel]:
+        settings = get_settings()
+        path = settings.LOCAL_CLASSIFIER_PATH
+        if not settings.LOCAL_CLASSIFIER_ENABLED or not path:
+            return None
+        now = time.monotonic()
+        if (self._checked is None or self._checked[0] != path
+                or now - self._checked[1] >= settings.LOCAL_CLASSIFIER_RELOAD_INTERVAL_S):
+            self._checked = (path, now)
+            self._refresh(path)
+        return self._model
+
+    def reload(self):
+        """Look at the model file again on next use (after retraining in this process)."""
+        self._checked = None
+
+    def _refresh(self, path: str):
+        try:
+            key = (path, os.stat(path).st_mtime)
+        except OSError:
+            self._model = self._loaded_from = None
+            return
+        if key != self._loaded_from:
+            try:
+                self._model = LocalModel.load(path)
+                logger.info(f"Loaded local classifier trained on {self._model.trained_on} events")
+            except Exception as e:
+                logger.warning(f"Could not load local classifier from {path}: {e}")
+                self._model = None
+            self._loaded_from = key
+
+    def predict(self, title: str, description: str) -> Optional[dict]:
+        """Prediction when the model is confident enough, else None."""
+        model = self.model()
+        if model is None:
+            return None
+        self.predictions += 1
+        result = model.predict(title, description)
+        if result["confidence"] < get_settings().LOCAL_CLASSIFIER_THRESHOLD:
+            return None
+        self.accepted += 1
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "loaded": self._model is not None,
+            "predictions": self.predictions,
+            "accepted": self.accepted,
+            "escalated": self.predictions - self.accepted,
+        }
+
+
+local_classifier = LocalClassifier()
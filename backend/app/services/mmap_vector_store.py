@@ -0,0 +1,423 @@
+"""
+Persistent vector store shared by every worker on a host.
+
+Layout of VECTOR_STORE_PATH, where ``g`` is the generation named in CURRENT:
+
+- ``vectors-g.f32``: L2-normalized float32 rows, grouped by (tenant, company);
+  memory-mapped read-only, so all workers share the OS page cache instead of
+  each holding a copy.
+- ``meta-g.jsonl``: one ``{"id", "metadata", "text"}`` line per row; a
+  partition's lines are parsed on its first query.
+- ``manifest-g.json``: dimension plus each partition's row range and byte
+  range in the metadata file.
+- ``ann-g-i.npz`` / ``ann-g-i.npy``: for partition ``i`` of at least
+  VECTOR_ANN_MIN_ROWS rows, the IVF-PQ quantizer plus list offsets, and the
+  memory-mapped PQ codes. Such partitions are written sorted by list, so a
+  probed list is a contiguous row range.
+- ``wal-g.log``: append-only JSON lines of upserts and deletes since the
+  generation was written, replayed into an in-memory overlay. Appends are
+  serialized across processes with ``flock`` on LOCK; workers pick up each
+  other's writes by tailing the log before every query.
+
+Startup maps the matrix and replays only the log, so it does not depend on
+the index size. ``compact`` folds the log into a new generation and flips
+CURRENT; it reads only files, so it can run in a thread. Old generation files
+are unlinked right away: workers still using them keep their open handles
+and mappings until they notice the new generation. The log is not fsynced,
+a crash can lose the last writes (the RAG documents themselves are in the DB).
+"""
+import base64
+import glob
+import json
+import logging
+import os
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from app.core.config import get_settings
+from app.services.ann import Quantizer, exact_top_k, probe, rank_candidates
+from app.services.vector_store import LocalVectorStore, normalize
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process use only
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+Key = Tuple[str, str]
+
+
+class _BaseMeta:
+    __slots__ = ("ids", "metadata", "texts", "dead", "rows")
+
+    def __init__(self, ids: List[str], metadata: List[dict], texts: List[str], dead: np.ndarray):
+        self.ids = ids
+        self.metadata = metadata
+        self.texts = texts
+        self.dead = dead
+        self.rows = {doc_id: i for i, doc_id in enumerate(ids)}
+
+
+class _BaseIndex:
+    __slots__ = ("quantizer", "offsets", "codes")
+
+    def __init__(self, quantizer: Quantizer, offsets: np.ndarray, codes: np.ndarray):
+        self.quantizer = quantizer
+        self.offsets = offsets  # rows of list l are offsets[l] .. offsets[l + 1] - 1
+        self.codes = codes
+
+    def candidates(self, query: np.ndarray, keep: int, nprobe: int, dead: np.ndarray) -> np.ndarray:
+        lists = probe(self.quantizer, query, nprobe)
+        lengths = self.offsets[lists + 1] - self.offsets[lists]
+        rows = np.concatenate([np.arange(self.offsets[l], self.offsets[l + 1]) for l in lists])
+        row_lists = np.repeat(lists, lengths)
+        alive = ~dead[rows]
+        rows, row_lists = rows[alive], row_lists[alive]
+        if not len(rows):
+            return rows
+        return rows[rank_candidates(self.quantizer, query, row_lists, np.asarray(self.codes[rows]), keep)]
+
+
+class _Generation:
+    """Read state of one generation: mapped base rows plus the replayed log."""
+
+    def __init__(self, path: str, generation: int):
+        self.path = path
+        self.generation = generation
+        self.dim: Optional[int] = None
+        self.parts: Dict[Key, Tuple[int, int, int, int]] = {}
+        self.indexed: Dict[Key, int] = {}  # partitions with a persisted ANN index
+        self.vectors: Optional[np.ndarray] = None
+        self.overlay = LocalVectorStore()
+        self.shadowed: set = set()  # ids the log touched; their base rows are dead
+        self.wal_offset = 0
+        self.wal_records = 0
+        self._meta: Dict[Key, _BaseMeta] = {}
+        self._ann: Dict[Key, _BaseIndex] = {}
+        self._base_key: Dict[str, Key] = {}  # ids of loaded partitions
+        self._meta_file = None
+        self._wal_file = None
+
+        manifest = _file(path, "manifest", generation)
+        if os.path.exists(manifest):
+            with open(manifest) as f:
+                data = json.load(f)
+            self.dim = data["dim"]
+            self.parts = {(t, c): (start, count, m0, m1) for t, c, start, count, m0, m1 in data["partitions"]}
+            self.indexed = {tuple(data["partitions"][i][:2]): i for i in data.get("indexed", [])}
+            if data["rows"]:
+                self.vectors = np.memmap(
+                    _file(path, "vectors", generation), dtype=np.float32, mode="r", shape=(data["rows"], self.dim),
+                )
+            self._meta_file = open(_file(path, "meta", generation), "rb")
+
+    def close(self):
+        for f in (self._meta_file, self._wal_file):
+            if f is not None:
+                f.close()
+        self.vectors = None
+        self._ann.clear()
+
+    def tail(self, limit: Optional[int] = None):
+        """Apply log records appended since the last call (up to byte ``limit``)."""
+        if self._wal_file is None:
+            try:
+                self._wal_file = open(_file(self.path, "wal", self.generation), "rb")
+            except FileNotFoundError:
+                return
+        end = os.fstat(self._wal_file.fileno()).st_size if limit is None else limit
+        if end <= self.wal_offset:
+            return
+        self._wal_file.seek(self.wal_offset)
+        chunk = self._wal_file.read(end - self.wal_offset)
+        complete = chunk.rfind(b"\n") + 1  # a partial last line is still being written
+        for line in chunk[:complete].splitlines():
+            if line:
+                self.apply(json.loads(line))
+        self.wal_offset += complete
+
+    def apply(self, record: dict):
+        doc_id = record["id"]
+        if record["op"] == "put":
+            vector = np.frombuffer(base64.b64decode(record["vector"]), dtype=np.float32)
+            if self.dim is None:
+                self.dim = len(vector)
+            self.overlay.upsert(doc_id, vector, record["metadata"], record.get("text", ""))
+        else:
+            self.overlay.delete(doc_id)
+        self.shadowed.add(doc_id)
+        key = self._base_key.get(doc_id)
+        if key is not None:
+            meta = self._meta[key]
+            meta.dead[meta.rows[doc_id]] = True
+        self.wal_records += 1
+
+    def base_meta(self, key: Key) -> _BaseMeta:
+        meta = self._meta.get(key)
+        if meta is None:
+            _, count, m0, m1 = self.parts[key]
+            self._meta_file.seek(m0)
+            rows = [json.loads(line) for line in self._meta_file.read(m1 - m0).splitlines()]
+            ids = [r["id"] for r in rows]
+            meta = self._meta[key] = _BaseMeta(
+                ids, [r["metadata"] for r in rows], [r.get("text", "") for r in rows],
+                np.fromiter((i in self.shadowed for i in ids), dtype=bool, count=count),
+            )
+            self._base_key.update((i, key) for i in ids)
+        return meta
+
+    def base_index(self, key: Key) -> Optional[_BaseIndex]:
+        if key not in self.indexed:
+            return None
+        index = self._ann.get(key)
+        if index is None:
+            prefix = _ann_prefix(self.path, self.generation, self.indexed[key])
+            with np.load(prefix + ".npz") as arrays:
+                quantizer, offsets = Quantizer.from_arrays(arrays), arrays["offsets"]
+            index = self._ann[key] = _BaseIndex(quantizer, offsets, np.load(prefix + ".npy", mmap_mode="r"))
+        return index
+
+    def search(self, query: np.ndarray, key: Key, top_k: int) -> List[dict]:
+        hits = self.overlay.query(query, *key, top_k=top_k)
+        part = self.parts.get(key)
+        if part is None:
+            return hits
+        start, count = part[0], part[1]
+        meta = self.base_meta(key)
+        vectors = self.vectors[start:start + count]
+        index = self.base_index(key)
+        if index is not None:
+            settings = get_settings()
+            rows = index.candidates(query, top_k * max(1, settings.VECTOR_ANN_REFINE),
+                                    settings.VECTOR_ANN_NPROBE, meta.dead)
+            best, scores = exact_top_k(vectors, rows, query, top_k)
+        else:
+            rows = np.flatnonzero(~meta.dead) if meta.dead.any() else None
+            best, scores = exact_top_k(vectors, rows, query, top_k)
+        for i, score in zip(best, scores):
+            hits.append({"id": meta.ids[i], "score": float(score),
+                         "metadata": meta.metadata[i], "text": meta.texts[i]})
+        hits.sort(key=lambda h: h["score"], reverse=True)
+        return hits[:top_k]
+
+    def live_partitions(self):
+        """(key, vectors, ids, metadata, texts) of every non-empty partition."""
+        overlay = {key: rows for key, *rows in self.overlay.export()}
+        for key in sorted(set(self.parts) | set(overlay)):
+            vectors, ids, metadata, texts = [], [], [], []
+            if key in self.parts:
+                start, count = self.parts[key][:2]
+                meta = self.base_meta(key)
+                alive = np.flatnonzero(~meta.dead)
+                vectors.append(np.asarray(self.vectors[start:start + count])[alive])
+                ids += [meta.ids[i] for i in alive]
+                metadata += [meta.metadata[i] for i in alive]
+                texts += [meta.texts[i] for i in alive]
+            if key in overlay:
+                overlay_vectors, overlay_ids, overlay_metadata, overlay_texts = overlay[key]
+                vectors.append(overlay_vectors)
+                ids += overlay_ids
+                metadata += overlay_metadata
+                texts += overlay_texts
+            if ids:
+                yield key, np.concatenate(vectors), ids, metadata, texts
+
+
+def _ann_prefix(path: str, generation: int, partition: int) -> str:
+    return os.path.join(path, f"ann-{generation}-{partition}")
+
+
+def _file(path: str, kind: str, generation: int) -> str:
+    suffix = {"vectors": "f32", "meta": "jsonl", "manifest": "json", "wal": "log"}[kind]
+    return os.path.join(path, f"{kind}-{generation}.{suffix}")
+
+
+class MappedVectorStore:
+    """Drop-in for LocalVectorStore backed by files under ``path``."""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._gen: Optional[_Generation] = None
+        self.compactions = 0
+        self._refresh()
+
+    @property
+    def dim(self) -> Optional[int]:
+        return self._gen.dim
+
+    def upsert(self, doc_id: str, embedding: Sequence[float], metadata: dict, text: str = ""):
+        vector = normalize(embedding)
+        if self.dim is not None and len(vector) != self.dim:
+            raise ValueError(f"Embedding has {len(vector)} dimensions, store has {self.dim}")
+        self._append({
+            "op": "put", "id": doc_id, "metadata": metadata, "text": text,
+            "vector": base64.b64encode(vector.tobytes()).decode(),
+        })
+
+    def delete(self, doc_id: str) -> bool:
+        """Log a delete. False only if the log already shows the id gone;
+        base rows are not looked up, that would load every partition."""
+        self._refresh()
+        gen = self._gen
+        if doc_id in gen.shadowed and doc_id not in gen.overlay:
+            return False
+        self._append({"op": "del", "id": doc_id})
+        return True
+
+    def query(self, embedding: Sequence[float], tenant_id: str, company_id: str, top_k: int = 5) -> List[dict]:
+        self._refresh()
+        if self.dim is None:
+            return []
+        query = normalize(embedding)
+        if len(query) != self.dim:
+            raise ValueError(f"Query has {len(query)} dimensions, store has {self.dim}")
+        return self._gen.search(query, (tenant_id, company_id), top_k)
+
+    def compact(self, min_records: int = 0) -> bool:
+        """Write base rows plus the log as a new generation. Reads only files,
+        so it is safe to run in a worker thread while this store serves.
+        Returns False if there was too little to fold or another worker is
+        already compacting."""
+        with self._locked("COMPACT", blocking=False) as acquired:
+            if not acquired:
+                return False
+            return self._compact(min_records)
+
+    def _compact(self, min_records: int) -> bool:
+        generation = self._current()
+        wal = _file(self.path, "wal", generation)
+        end = os.path.getsize(wal) if os.path.exists(wal) else 0
+        snapshot = _Generation(self.path, generation)
+        try:
+            snapshot.tail(limit=end)
+            if snapshot.wal_records < max(min_records, 1):
+                return False
+            new = generation + 1
+            self._write_generation(snapshot, new)
+        finally:
+            snapshot.close()
+
+        # Only the log tail the snapshot has not applied moves over under the
+        # lock. It starts at the snapshot's offset, not at ``end``: a record
+        # half-written when ``end`` was read was left for the tail.
+        with self._locked():
+            with open(_file(self.path, "wal", new), "wb") as out:
+                if os.path.exists(wal):
+                    with open(wal, "rb") as f:
+                        f.seek(snapshot.wal_offset)
+                        out.write(f.read())
+            tmp = os.path.join(self.path, "CURRENT.tmp")
+            with open(tmp, "w") as f:
+                f.write(str(new))
+            os.replace(tmp, os.path.join(self.path, "CURRENT"))
+        for kind in ("vectors", "meta", "manifest", "wal"):
+            _remove(_file(self.path, kind, generation))
+        for name in glob.glob(os.path.join(self.path, f"ann-{generation}-*")):
+            _remove(name)
+        self.compactions += 1
+        logger.info(f"Vector store compacted {snapshot.wal_records} log records into generation {new}")
+        return True
+
+    def stats(self) -> dict:
+        self._refresh()
+        gen = self._gen
+        return {
+            "path": self.path,
+            "generation": gen.generation,
+            "dim": gen.dim,
+            "base_rows": 0 if gen.vectors is None else len(gen.vectors),
+            "base_partitions": len(gen.parts),
+            "indexed_partitions": len(gen.indexed),
+            "log_records": gen.wal_records,
+            "compactions": self.compactions,
+        }
+
+    def _current(self) -> int:
+        try:
+            with open(os.path.join(self.path, "CURRENT")) as f:
+                return int(f.read().strip() or 0)
+        except FileNotFoundError:
+            return 0
+
+    def _refresh(self):
+        generation = self._current()
+        if self._gen is None or self._gen.generation != generation:
+            if self._gen is not None:
+                self._gen.close()
+            self._gen = _Generation(self.path, generation)
+        self._gen.tail()
+
+    def _append(self, record: dict):
+        line = (json.dumps(record, separators=(",", ":")) + "\n").encode()
+        with self._locked():
+            self._refresh()
+            with open(_file(self.path, "wal", self._gen.generation), "ab") as f:
+                f.write(line)
+        self._gen.tail()
+
+    @contextmanager
+    def _locked(self, name: str = "LOCK", blocking: bool = True):
+        if fcntl is None:
+            yield True
+            return
+        with open(os.path.join(self.path, name), "a") as f:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _write_generation(self, snapshot: _Generation, generation: int):
+        settings = get_settings()
+        partitions, indexed = [], []
+        rows = 0
+        with open(_file(self.path, "vectors", generation), "wb") as vf, \
+                open(_file(self.path, "meta", generation), "wb") as mf:
+            for key, vectors, ids, metadata, texts in snapshot.live_partitions():
+                tenant_id, company_id = key
+                if 0 < settings.VECTOR_ANN_MIN_ROWS <= len(ids):
+                    order = self._write_index(snapshot, key, vectors, generation, len(partitions))
+                    vectors = vectors[order]
+                    ids, metadata, texts = ([values[i] for i in order] for values in (ids, metadata, texts))
+                    indexed.append(len(partitions))
+                m0 = mf.tell()
+                for doc_id, meta, text in zip(ids, metadata, texts):
+                    mf.write((json.dumps({"id": doc_id, "metadata": meta, "text": text}) + "\n").encode())
+                vf.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+                partitions.append([tenant_id, company_id, rows, len(ids), m0, mf.tell()])
+                rows += len(ids)
+        tmp = _file(self.path, "manifest", generation) + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"dim": snapshot.dim, "rows": rows, "partitions": partitions, "indexed": indexed}, f)
+        os.replace(tmp, _file(self.path, "manifest", generation))
+
+    @staticmethod
+    def _write_index(snapshot: _Generation, key: Key, vectors: np.ndarray, generation: int,
+                     partition: int) -> np.ndarray:
+        """Write the partition's IVF-PQ files; returns the row order (by list)."""
+        settings = get_settings()
+        previous = snapshot.base_index(key)
+        if previous is not None and len(vectors) < 2 * previous.quantizer.trained_on:
+            quantizer = previous.quantizer
+        else:
+            quantizer = Quantizer.train(vectors, nlist=settings.VECTOR_ANN_NLIST, m=settings.VECTOR_ANN_PQ_M)
+        lists = quantizer.assign(vectors)
+        order = np.argsort(lists, kind="stable")
+        offsets = np.concatenate(([0], np.cumsum(np.bincount(lists, minlength=quantizer.nlist))))
+        prefix = _ann_prefix(snapshot.path, generation, partition)
+        np.save(prefix + ".npy", quantizer.encode(vectors[order], lists[order]))
+        np.savez(prefix + ".npz", offsets=offsets, **quantizer.to_arrays())
+        return order
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
@@ -1,74 +1,247 @@
 """
 RAG (Retrieval-Augmented Generation) service for ESG chat.
 
-- Stores document embeddings locally (or Pinecone when configured)
-- Retrieves top-K evidence docs filtered by tenant_id + company_id
+- Stores document embeddings locally (see vector_store) or in Pinecone when configured;
+  pipeline documents are indexed once their RAGDocument row commits
+- Retrieves top-K evidence docs filtered by tenant_id + company_id, fusing
+  BM25 keyword search (see keyword_index) with vector search
 - Generates answers with citations using Azure OpenAI
+
+Embeddings are cached by content hash (see embedding_cache). Texts are sent
+to the API in batches of up to EMBEDDING_BATCH_MAX inputs, and concurrent
+background create_embedding calls (pipeline upserts) are micro-batched over
+EMBEDDING_BATCH_WINDOW_MS into one request.
 """
+import asyncio
 import logging
 import hashlib
-from typing import List
-from openai import AsyncAzureOpenAI
-from sqlalchemy import select
+import re
+from contextlib import aclosing
+from typing import AsyncIterator, List, Optional, Sequence, Tuple
+from sqlalchemy import event as sa_event, select
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
 from app.core.config import get_settings
-from app.db.models import ESGScore
+from app.db.models import ESGScore, RAGDocument
+from app.services.batching import MicroBatcher
+from app.services.embedding_cache import embedding_cache
+from app.services.keyword_index import keyword_index, reciprocal_rank_fusion
+from app.services.llm_client import llm_clients
+from app.services.llm_scheduler import (
+    BACKGROUND, INTERACTIVE, estimate_text_tokens, estimate_tokens, llm_scheduler,
+)
+from app.services.vector_store import get_vector_store
 
 logger = logging.getLogger(__name__)
 
-_local_vectors: dict = {}
+
+MAX_EMBEDDING_CHARS = 8000
+PENDING_INDEX_KEY = "pending_rag_index"  # Session.info key: documents to index after commit
 
 
-async def create_embedding(text: str) -> List[float]:
+async def create_embedding(text: str, lane: str = BACKGROUND) -> List[float]:
     settings = get_settings()
     if not settings.AZURE_OPENAI_API_KEY:
         return _mock_embedding(text)
+    text = text[:MAX_EMBEDDING_CHARS]
+    cached = await embedding_cache.get(text)
+    if cached is not None:
+        return cached
+    # Chat queries skip the batching window; it would only add latency.
+    if lane == BACKGROUND and settings.EMBEDDING_BATCH_WINDOW_MS > 0:
+        return await embedding_batcher.submit(text)
+    return (await _embed_uncached([text], lane))[0]
+
+
+async def create_embeddings(texts: List[str], lane: str = BACKGROUND) -> List[List[float]]:
+    """Embed many texts, one API request per chunk of EMBEDDING_BATCH_MAX
+    inputs (or EMBEDDING_BATCH_MAX_TOKENS estimated tokens)."""
+    settings = get_settings()
+    if not settings.AZURE_OPENAI_API_KEY:
+        return [_mock_embedding(t) for t in texts]
+    texts = [t[:MAX_EMBEDDING_CHARS] for t in texts]
+    results = [await embedding_cache.get(t) for t in texts]
+    misses = [t for t, r in zip(texts, results) if r is None]
+    if misses:
+        embedded = iter(await _embed_uncached(misses, lane))
+        results = [r if r is not None else next(embedded) for r in results]
+    return results
+
+
+async def _embed_uncached(texts: List[str], lane: str = BACKGROUND) -> List[List[float]]:
+    """Embed texts already missing from the cache; duplicates are sent once."""
+    distinct = list(dict.fromkeys(texts))
+    chunks = _embedding_chunks(distinct)
+    embedded = await asyncio.gather(*(_embed_chunk(chunk, lane) for chunk in chunks))
+    by_text = dict(zip(distinct, (e for chunk in embedded for e in chunk)))
+    return [by_text[t] for t in texts]
+
+
+def _embedding_chunks(texts: List[str]) -> List[List[str]]:
+    settings = get_settings()
+    max_inputs = max(1, settings.EMBEDDING_BATCH_MAX)
+    chunks, chunk, tokens = [], [], 0
+    for text in texts:
+        cost = estimate_text_tokens(text)
+        if chunk and (len(chunk) >= max_inputs or tokens + cost > settings.EMBEDDING_BATCH_MAX_TOKENS):
+            chunks.append(chunk)
+            chunk, tokens = [], 0
+        chunk.append(text)
+        tokens += cost
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+async def _embed_chunk(texts: List[str], lane: str) -> List[List[float]]:
+    settings = get_settings()
     try:
-        client = AsyncAzureOpenAI(
-            api_key=settings.AZURE_OPENAI_API_KEY,
-            azure_endpoint=settings.AZURE_OPENAI_ENDPOINT,
-            api_version=settings.AZURE_OPENAI_API_VERSION,
-        )
-        response = await client.embeddings.create(
-            model=settings.AZURE_OPENAI_EMBEDDING_DEPLOYMENT,
-            input=text[:8000],
+        client = llm_clients.client()
+        response = await llm_scheduler.run(
+            lane,
+            sum(estimate_text_tokens(t) for t in texts),
+            lambda: client.embeddings.create(
+                model=settings.AZURE_OPENAI_EMBEDDING_DEPLOYMENT,
+                input=texts,
+                timeout=llm_clients.timeout("embed"),
+            ),
         )
-        return response.data[0].embedding
+        embeddings = [d.embedding for d in sorted(response.data, key=lambda d: d.index)]
+        if len(embeddings) != len(texts):
+            raise ValueError(f"{len(embeddings)} embeddings returned for {len(texts)} inputs")
     except Exception as e:
-        logger.warning(f"Embedding creation failed, using mock: {e}")
-        return _mock_embedding(text)
+        logger.warning(f"Embedding creation failed for {len(texts)} texts, using mock: {e}")
+        return [_mock_embedding(t) for t in texts]
+    for text, embedding in zip(texts, embeddings):
+        await embedding_cache.set(text, embedding)
+    return embeddings
+
 
+embedding_batcher = MicroBatcher(
+    _embed_uncached,
+    max_batch=lambda: get_settings().EMBEDDING_BATCH_MAX,
+    max_wait_ms=lambda: get_settings().EMBEDDING_BATCH_WINDOW_MS,
+    name="embeddings",
+)
 
-def _mock_embedding(text: str) -> List[float]:
+
+class MockEmbedding(list):
+    """An embedding made up from a hash of the text: the right length, but
+    no meaning. Similar texts do not get similar vectors."""
+
+
+def is_mock_embedding(embedding: Sequence[float]) -> bool:
+    return isinstance(embedding, MockEmbedding)
+
+
+def _mock_embedding(text: str) -> MockEmbedding:
+    """Stand-in without a key or when the API fails; EMBEDDING_DIM long so it
+    fits a store of real embeddings."""
     h = hashlib.md5(text.encode()).hexdigest()
-    return [int(c, 16) / 15.0 for c in h] * 96
+    dim = get_settings().EMBEDDING_DIM
+    return MockEmbedding(([int(c, 16) / 15.0 for c in h] * (dim // len(h) + 1))[:dim])
+
+
+def _fits(store, embedding: List[float], what: str) -> bool:
+    """False (and a warning) if ``embedding`` cannot go into ``store``, e.g.
+    after EMBEDDING_DIM or the deployment changed; the caller skips the
+    vector instead of failing the event or chat request."""
+    if store.dim is None or len(embedding) == store.dim:
+        return True
+    logger.warning(f"Skipping vector {what}: {len(embedding)} dimensions, store has {store.dim}")
+    return False
 
 
 async def upsert_document(doc_id: str, text: str, metadata: dict):
-    settings = get_settings()
     embedding = await create_embedding(text)
+    index_document(doc_id, text, metadata, embedding)
+
 
+def index_document(doc_id: str, text: str, metadata: dict, embedding: Optional[List[float]]):
+    """Without ``embedding`` the document only goes into the keyword index."""
+    settings = get_settings()
+    if embedding is None:
+        keyword_index.add(doc_id, metadata["tenant_id"], metadata["company_id"], text)
+        return
     if settings.PINECONE_API_KEY:
         try:
             from pinecone import Pinecone
             pc = Pinecone(api_key=settings.PINECONE_API_KEY)
             index = pc.Index(settings.PINECONE_INDEX)
             index.upsert(vectors=[{"id": doc_id, "values": embedding, "metadata": metadata}])
+            keyword_index.add(doc_id, metadata["tenant_id"], metadata["company_id"], text)
             return
         except Exception as e:
             logger.warning(f"Pinecone upsert failed, using local: {e}")
 
-    _local_vectors[doc_id] = {"values": embedding, "metadata": metadata, "text": text}
+    store = get_vector_store()
+    if _fits(store, embedding, f"upsert of {doc_id}"):
+        store.upsert(doc_id, embedding, metadata, text)
+    keyword_index.add(doc_id, metadata["tenant_id"], metadata["company_id"], text)
+
+
+def index_after_commit(
+    db: AsyncSession, doc_id: str, text: str, metadata: dict, embedding: Optional[List[float]]
+):
+    """Index a RAGDocument added in ``db`` once ``db`` commits; a document
+    that is rolled back never reaches the vector store or keyword index."""
+    db.info.setdefault(PENDING_INDEX_KEY, []).append((doc_id, text, metadata, embedding))
+
+
+@sa_event.listens_for(Session, "after_commit")
+def _index_committed(session: Session):
+    for doc_id, text, metadata, embedding in session.info.pop(PENDING_INDEX_KEY, ()):
+        try:
+            index_document(doc_id, text, metadata, embedding)
+        except Exception as e:
+            # The row is committed; keyword search still finds it via its DB sync.
+            logger.warning(f"Indexing RAG document {doc_id} failed: {e}")
+
+
+@sa_event.listens_for(Session, "after_transaction_end")
+def _drop_uncommitted(session: Session, transaction):
+    # Runs after _index_committed, so anything left here was not committed.
+    if transaction.parent is None:
+        session.info.pop(PENDING_INDEX_KEY, None)
 
 
 async def query_similar(
     query: str, tenant_id: str, company_id: str, top_k: int = 5,
     db: "AsyncSession | None" = None,
 ) -> List[dict]:
+    """Hybrid retrieval: BM25 over the company's RAG documents (needs ``db``)
+    fused with vector search by reciprocal rank fusion.
+
+    Mock embeddings (no Azure OpenAI key) carry no meaning, so without a key
+    only the keyword ranking is used. When neither ranking finds anything
+    the newest documents are returned, as before.
+    """
     settings = get_settings()
+    candidates = max(top_k, settings.RETRIEVAL_CANDIDATES)
+    semantic = bool(settings.AZURE_OPENAI_API_KEY or settings.PINECONE_API_KEY)
+    vector_hits = await _vector_query(query, tenant_id, company_id, candidates) if semantic or db is None else []
+    if db is None:
+        return vector_hits[:top_k]
+
+    keyword_hits = await keyword_index.search(db, query, tenant_id, company_id, candidates)
+    fused = reciprocal_rank_fusion(
+        [[h["id"] for h in vector_hits], [doc_id for doc_id, _ in keyword_hits]], k=settings.RETRIEVAL_RRF_K,
+    )[:top_k]
+    if not fused:
+        return await _db_query(db, tenant_id, company_id, top_k)
+
+    by_id = {h["id"]: h for h in vector_hits}
+    missing = [doc_id for doc_id, _ in fused if doc_id not in by_id]
+    if missing:
+        result = await db.execute(select(RAGDocument).where(RAGDocument.id.in_(missing)))
+        by_id.update((doc.id, _document_hit(doc)) for doc in result.scalars())
+    return [{**by_id[doc_id], "score": score} for doc_id, score in fused if doc_id in by_id]
 
+
+async def _vector_query(query: str, tenant_id: str, company_id: str, top_k: int) -> List[dict]:
+    settings = get_settings()
+    query_embedding = await create_embedding(query, lane=INTERACTIVE)
     if settings.PINECONE_API_KEY:
-        query_embedding = await create_embedding(query)
         try:
             from pinecone import Pinecone
             pc = Pinecone(api_key=settings.PINECONE_API_KEY)
@@ -84,18 +257,15 @@ async def query_similar(
                 for m in results.matches
             ]
         except Exception as e:
-            logger.warning(f"Pinecone query failed, using DB fallback: {e}")
-
-    if db is not None:
-        return await _db_query(db, tenant_id, company_id, top_k)
-
-    query_embedding = await create_embedding(query)
-    return _local_query(query_embedding, tenant_id, company_id, top_k)
+            logger.warning(f"Pinecone query failed, using local vector store: {e}")
+    store = get_vector_store()
+    if not _fits(store, query_embedding, "query"):
+        return []
+    return store.query(query_embedding, tenant_id, company_id, top_k)
 
 
 async def _db_query(db, tenant_id: str, company_id: str, top_k: int) -> List[dict]:
-    """Retrieve RAG documents directly from DB when vector store is unavailable."""
-    from app.db.models import RAGDocument, ESGEvent
+    """Newest RAG documents, when retrieval finds nothing for the query."""
     result = await db.execute(
         select(RAGDocument)
         .where(
@@ -105,52 +275,39 @@ async def _db_query(db, tenant_id: str, company_id: str, top_k: int) -> List[dic
         .order_by(RAGDocument.created_at.desc())
         .limit(top_k)
     )
-    docs = result.scalars().all()
-    return [
-        {
-            "id": str(doc.id),
-            "score": 1.0,
-            "metadata": {
-                "title": doc.title,
-                "source_url": doc.source_url or "",
-                "ts": doc.created_at.isoformat() if doc.created_at else "",
-                "text": doc.content[:500],
-            },
-            "text": doc.content,
-        }
-        for doc in docs
-    ]
+    return [_document_hit(doc) for doc in result.scalars().all()]
 
 
-def _cosine_sim(a: List[float], b: List[float]) -> float:
-    dot = sum(x * y for x, y in zip(a, b))
-    norm_a = sum(x * x for x in a) ** 0.5
-    norm_b = sum(x * x for x in b) ** 0.5
-    if norm_a == 0 or norm_b == 0:
-        return 0
-    return dot / (norm_a * norm_b)
+def _document_hit(doc: RAGDocument) -> dict:
+    return {
+        "id": str(doc.id),
+        "score": 1.0,
+        "metadata": {
+            "title": doc.title,
+            "source_url": doc.source_url or "",
+            "ts": doc.created_at.isoformat() if doc.created_at else "",
+            "text": doc.content[:500],
+        },
+        "text": doc.content,
+    }
 
 
-def _local_query(query_emb: List[float], tenant_id: str, company_id: str, top_k: int) -> List[dict]:
-    scored = []
-    for doc_id, doc in _local_vectors.items():
-        meta = doc["metadata"]
-        if meta.get("tenant_id") == tenant_id and meta.get("company_id") == company_id:
-            sim = _cosine_sim(query_emb, doc["values"])
-            scored.append({"id": doc_id, "score": sim, "metadata": meta, "text": doc.get("text", "")})
-    scored.sort(key=lambda x: x["score"], reverse=True)
-    return scored[:top_k]
+CHAT_SYSTEM_PROMPT = (
+    "You are an ESG risk intelligence assistant. Answer questions about company ESG performance "
+    "using the provided evidence documents. Always cite sources using [1], [2], etc. "
+    "Be concise and factual."
+)
 
 
-async def generate_chat_answer(
+async def prepare_chat(
     query: str,
     evidence_docs: List[dict],
     db: AsyncSession,
     company_id: str,
     tenant_id: str,
 ) -> dict:
-    settings = get_settings()
-
+    """Citations, prompt messages and score context for a chat answer. All
+    DB reads happen here, so streaming can outlive the request's session."""
     citations = []
     context_parts = []
     for i, doc in enumerate(evidence_docs):
@@ -178,28 +335,7 @@ async def generate_chat_answer(
     elif recent_scores:
         score_context = f"\nLatest score: {recent_scores[0].overall}. Risk level: {recent_scores[0].risk_level}."
 
-    if not settings.AZURE_OPENAI_API_KEY:
-        answer = f"Based on the available evidence, here is what I found regarding your query about this company.{score_context}\n\n"
-        if citations:
-            answer += "Key findings from recent events:\n"
-            for c in citations[:3]:
-                answer += f"- [{c['idx']}] {c['title']}\n"
-        else:
-            answer += "No specific evidence documents were found for this query."
-        return {"answer": answer, "citations": citations, "used_company_id": company_id}
-
-    try:
-        client = AsyncAzureOpenAI(
-            api_key=settings.AZURE_OPENAI_API_KEY,
-            azure_endpoint=settings.AZURE_OPENAI_ENDPOINT,
-            api_version=settings.AZURE_OPENAI_API_VERSION,
-        )
-        system_prompt = (
-            "You are an ESG risk intelligence assistant. Answer questions about company ESG performance "
-            "using the provided evidence documents. Always cite sources using [1], [2], etc. "
-            "Be concise and factual."
-        )
-        user_prompt = f"""Question: {query}
+    user_prompt = f"""Question: {query}
 {score_context}
 
 Evidence:
@@ -207,13 +343,55 @@ Evidence:
 
 Answer the question using the evidence above. Cite sources with [1], [2], etc."""
 
-        response = await client.chat.completions.create(
-            model=settings.AZURE_OPENAI_CHAT_DEPLOYMENT,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt},
-            ],
-            max_completion_tokens=4000,
+    return {
+        "citations": citations,
+        "score_context": score_context,
+        "messages": [
+            {"role": "system", "content": CHAT_SYSTEM_PROMPT},
+            {"role": "user", "content": user_prompt},
+        ],
+        "used_company_id": company_id,
+    }
+
+
+def _mock_answer(chat: dict) -> str:
+    citations = chat["citations"]
+    answer = f"Based on the available evidence, here is what I found regarding your query about this company.{chat['score_context']}\n\n"
+    if citations:
+        answer += "Key findings from recent events:\n"
+        for c in citations[:3]:
+            answer += f"- [{c['idx']}] {c['title']}\n"
+    else:
+        answer += "No specific evidence documents were found for this query."
+    return answer
+
+
+async def generate_chat_answer(
+    query: str,
+    evidence_docs: List[dict],
+    db: AsyncSession,
+    company_id: str,
+    tenant_id: str,
+) -> dict:
+    settings = get_settings()
+    chat = await prepare_chat(query, evidence_docs, db, company_id, tenant_id)
+    citations = chat["citations"]
+
+    if not settings.AZURE_OPENAI_API_KEY:
+        return {"answer": _mock_answer(chat), "citations": citations, "used_company_id": company_id}
+
+    try:
+        client = llm_clients.client()
+        messages = chat["messages"]
+        response = await llm_scheduler.run(
+            INTERACTIVE,
+            estimate_tokens(messages, 4000),
+            lambda: client.chat.completions.create(
+                model=settings.AZURE_OPENAI_CHAT_DEPLOYMENT,
+                messages=messages,
+                max_completion_tokens=4000,
+                timeout=llm_clients.timeout("chat"),
+            ),
         )
         answer = response.choices[0].message.content.strip()
         return {"answer": answer, "citations": citations, "used_company_id": company_id}
@@ -222,7 +400,48 @@ Answer the question using the evidence above. Cite sources with [1], [2], etc.""
         logger.error(f"Chat generation failed: {type(e).__name__}: {e}")
         logger.error(traceback.format_exc())
         return {
-            "answer": f"I encountered an error generating a response. {score_context}",
+            "answer": f"I encountered an error generating a response. {chat['score_context']}",
             "citations": citations,
             "used_company_id": company_id,
+            "failed": True,
         }
+
+
+async def stream_chat_answer(chat: dict) -> AsyncIterator[Tuple[str, dict]]:
+    """(event, data) pairs for a prepared chat: "citations" first, then a
+    "token" per content delta as the model produces it, then "done" (or
+    "error"). Closing the generator closes the upstream completion."""
+    settings = get_settings()
+    yield "citations", {"citations": chat["citations"], "used_company_id": chat["used_company_id"]}
+
+    if not settings.AZURE_OPENAI_API_KEY:
+        for piece in re.findall(r"\S+\s*|\s+", _mock_answer(chat)):
+            yield "token", {"text": piece}
+        yield "done", {"used_company_id": chat["used_company_id"]}
+        return
+
+    client = llm_clients.client()
+    messages = chat["messages"]
+    chunks = llm_scheduler.stream(
+        INTERACTIVE,
+        estimate_tokens(messages, 4000),
+        lambda: client.chat.completions.create(
+            model=settings.AZURE_OPENAI_CHAT_DEPLOYMENT,
+            messages=messages,
+            max_completion_tokens=4000,
+            stream=True,
+            stream_options={"include_usage": True},
+            timeout=llm_clients.timeout("chat"),
+        ),
+    )
+    try:
+        async with aclosing(chunks):
+            async for chunk in chunks:
+                for choice in chunk.choices:
+                    if choice.delta is not None and choice.delta.content:
+                        yield "token", {"text": choice.delta.content}
+    except Exception as e:
+        logger.error(f"Chat streaming failed: {type(e).__name__}: {e}")
+        yield "error", {"message": f"I encountered an error generating a response. {chat['score_context']}"}
+        return
+    yield "done", {"used_company_id": chat["used_company_id"]}
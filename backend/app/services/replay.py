@@ -0,0 +1,258 @@
+"""
+Point-in-time score replay and backfill.
+
+Walks each company's processed event log in time order and emits ESGScore
+snapshots at a fixed cadence ("15m", "1h", "1d", ...) or after every event
+("event") over a date range. A snapshot at time T only sees events dated at
+or before T, so history can be regenerated after changing CATEGORY_WEIGHTS or
+HALF_LIFE_DAYS, or after backfilling old events, without replaying ingest.
+
+Companies are replayed concurrently, each in its own session. Rows are written
+in batches and, when a checkpoint file is given, progress is recorded after
+every committed batch so an interrupted run resumes where it stopped. Score
+rollups covering the range and the latest-score row are rebuilt once a
+company has been replayed.
+"""
+import asyncio
+import json
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Iterator, List, Optional
+from sqlalchemy import select, insert, delete
+from app.db.models import Company, ESGEvent, ESGScore, new_uuid
+from app.db.session import async_session
+from app.services.scoring import LOOKBACK_DAYS, build_score
+from app.services.score_state import CompanyScoreState
+from app.services.rollups import rebuild_rollups
+from app.services.latest_scores import refresh_latest_score
+
+logger = logging.getLogger(__name__)
+
+
+def parse_cadence(cadence: str) -> Optional[timedelta]:
+    """Return the snapshot interval, or None for per-event snapshots."""
+    if cadence == "event":
+        return None
+    units = {"m": "minutes", "h": "hours", "d": "days"}
+    if cadence[-1:] in units and cadence[:-1].isdigit() and int(cadence[:-1]) > 0:
+        return timedelta(**{units[cadence[-1]]: int(cadence[:-1])})
+    raise ValueError(f"Invalid cadence: {cadence!r} (use 'event' or e.g. '15m', '1h', '1d')")
+
+
+def _aware(dt: datetime) -> datetime:
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=timezone.utc)
+    return dt
+
+
+def _ticks(start: datetime, end: datetime, interval: timedelta) -> Iterator[datetime]:
+    t = start
+    while t <= end:
+        yield t
+        t += interval
+
+
+class ReplayCheckpoint:
+    """JSON file mapping company_id -> last committed snapshot time or "done"."""
+
+    def __init__(self, path: Optional[str], params: dict):
+        self.path = path
+        self.params = params
+        self.companies: dict = {}
+        self._lock = asyncio.Lock()
+        if path and os.path.exists(path):
+            with open(path) as f:
+                data = json.load(f)
+            if data.get("params") != params:
+                raise ValueError(
+                    f"Checkpoint {path} was written for different replay parameters: {data.get('params')}"
+                )
+            self.companies = data.get("companies", {})
+
+    def is_done(self, company_id: str) -> bool:
+        return self.companies.get(company_id) == "done"
+
+    def resume_after(self, company_id: str) -> Optional[datetime]:
+        value = self.companies.get(company_id)
+        if value and value != "done":
+            return datetime.fromisoformat(value)
+        return None
+
+    async def mark(self, company_id: str, value: str):
+        async with self._lock:
+            self.companies[company_id] = value
+            if not self.path:
+                return
+            tmp = f"{self.path}.tmp"
+            with open(tmp, "w") as f:
+                json.dump({"params": self.params, "companies": self.companies}, f)
+            os.replace(tmp, self.path)
+
+
+async def replay_company(
+    tenant_id: str,
+    company_id: str,
+    start: datetime,
+    end: datetime,
+    cadence: str = "1h",
+    batch_size: int = 1000,
+    replace: bool = False,
+    checkpoint: Optional[ReplayCheckpoint] = None,
+) -> int:
+    """Replay one company and write its snapshots. Returns rows written."""
+    start, end = _aware(start), _aware(end)
+    interval = parse_cadence(cadence)
+    resume_after = checkpoint.resume_after(company_id) if checkpoint else None
+    written = 0
+
+    async with async_session() as db:
+        if replace:
+            # On resume only rows after the checkpoint are ours to replace.
+            lower = ESGScore.recorded_at > resume_after if resume_after else ESGScore.recorded_at >= start
+            await db.execute(
+                delete(ESGScore).where(
+                    ESGScore.tenant_id == tenant_id,
+                    ESGScore.company_id == company_id,
+                    lower,
+                    ESGScore.recorded_at <= end,
+                )
+            )
+
+        state = CompanyScoreState(start - timedelta(days=LOOKBACK_DAYS))
+        ticks = _ticks(start, end, interval) if interval else iter(())
+        next_tick = next(ticks, None)
+        batch: List[dict] = []
+
+        def snapshot(at: datetime):
+            if resume_after and at <= resume_after:
+                return
+            state.advance(at)
+            score = build_score(tenant_id, company_id, state.category_impacts(), at)
+            batch.append({
+                "id": new_uuid(),
+                "tenant_id": tenant_id,
+                "company_id": company_id,
+                "overall": score.overall,
+                "environmental": score.environmental,
+                "social": score.social,
+                "governance": score.governance,
+                "risk_level": score.risk_level,
+                "recorded_at": at,
+            })
+
+        async def flush():
+            nonlocal written, batch
+            if not batch:
+                return
+            await db.execute(insert(ESGScore), batch)
+            await db.commit()
+            written += len(batch)
+            if checkpoint:
+                await checkpoint.mark(company_id, batch[-1]["recorded_at"].isoformat())
+            batch = []
+
+        result = await db.execute(
+            select(
+                ESGEvent.id, ESGEvent.category, ESGEvent.severity,
+                ESGEvent.confidence, ESGEvent.event_date,
+            )
+            .where(
+                ESGEvent.tenant_id == tenant_id,
+                ESGEvent.company_id == company_id,
+                ESGEvent.event_date >= start - timedelta(days=LOOKBACK_DAYS),
+                ESGEvent.event_date <= end,
+                ESGEvent.is_processed == True,
+                ESGEvent.duplicate_of.is_(None),
+            )
+            .order_by(ESGEvent.event_date, ESGEvent.id)
+        )
+        # Fetch everything before writing: SQLite cannot insert while a
+        # cursor on the same connection is still open.
+        rows = result.all()
+        pending_event_snapshot: Optional[datetime] = None
+
+        for row in rows:
+            event_date = _aware(row.event_date)
+            if pending_event_snapshot is not None and event_date > pending_event_snapshot:
+                snapshot(pending_event_snapshot)
+                pending_event_snapshot = None
+            while next_tick is not None and next_tick < event_date:
+                snapshot(next_tick)
+                next_tick = next(ticks, None)
+            if len(batch) >= batch_size:
+                await flush()
+
+            state.advance(event_date)
+            state.add(row.id, event_date, row.category, row.severity, row.confidence)
+            if interval is None and event_date >= start:
+                pending_event_snapshot = event_date
+
+        if pending_event_snapshot is not None:
+            snapshot(pending_event_snapshot)
+        while next_tick is not None:
+            snapshot(next_tick)
+            next_tick = next(ticks, None)
+            if len(batch) >= batch_size:
+                await flush()
+        await flush()
+
+        await rebuild_rollups(db, tenant_id, company_id, start, end)
+        await refresh_latest_score(db, tenant_id, company_id)
+        await db.commit()
+
+    if checkpoint:
+        await checkpoint.mark(company_id, "done")
+    return written
+
+
+async def replay_scores(
+    start: datetime,
+    end: datetime,
+    cadence: str = "1h",
+    tenant_id: Optional[str] = None,
+    company_ids: Optional[List[str]] = None,
+    concurrency: int = 4,
+    batch_size: int = 1000,
+    replace: bool = False,
+    checkpoint_path: Optional[str] = None,
+) -> dict:
+    """Replay every selected company concurrently. Returns run statistics."""
+    parse_cadence(cadence)
+    start, end = _aware(start), _aware(end)
+    if end < start:
+        raise ValueError("end must not be before start")
+
+    params = {
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "cadence": cadence,
+        "tenant_id": tenant_id,
+        "company_ids": sorted(company_ids) if company_ids else None,
+        "replace": replace,
+    }
+    checkpoint = ReplayCheckpoint(checkpoint_path, params)
+
+    async with async_session() as db:
+        stmt = select(Company.id, Company.tenant_id)
+        if tenant_id:
+            stmt = stmt.where(Company.tenant_id == tenant_id)
+        if company_ids:
+            stmt = stmt.where(Company.id.in_(company_ids))
+        companies = (await db.execute(stmt.order_by(Company.id))).all()
+
+    todo = [c for c in companies if not checkpoint.is_done(c.id)]
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    totals = {"companies": len(companies), "skipped": len(companies) - len(todo), "rows": 0}
+
+    async def run(company):
+        async with semaphore:
+            rows = await replay_company(
+                company.tenant_id, company.id, start, end, cadence,
+                batch_size=batch_size, replace=replace, checkpoint=checkpoint,
+            )
+            totals["rows"] += rows
+            logger.info(f"Replayed {rows} snapshots for company {company.id}")
+
+    await asyncio.gather(*(run(c) for c in todo))
+    return totals
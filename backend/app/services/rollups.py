@@ -0,0 +1,301 @@
+"""
+Score rollups and downsampling for score time series.
+
+Every ESGScore written is folded into hourly ("1h") and daily ("1d") rollup
+buckets holding open/high/low/close of the overall score and the average of
+each pillar. Chart queries read rollups instead of raw rows for long ranges,
+and LTTB (Largest-Triangle-Three-Buckets) keeps any series within a point
+budget while preserving its visual shape.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Sequence, Tuple
+from sqlalchemy import case, select, insert, delete, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.models import ESGScore, ESGScoreRollup, new_uuid
+from app.db.upsert import dialect_insert
+from app.services.scoring import risk_level_from_score
+
+ROLLUP_RESOLUTIONS = {"1h": timedelta(hours=1), "1d": timedelta(days=1)}
+SCORE_RESOLUTIONS = ("raw", "auto", "1h", "1d", "lttb")
+
+
+def _aware(dt: datetime) -> datetime:
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc)
+
+
+def bucket_floor(ts: datetime, resolution: str) -> datetime:
+    ts = _aware(ts)
+    if resolution == "1h":
+        return ts.replace(minute=0, second=0, microsecond=0)
+    if resolution == "1d":
+        return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+    raise ValueError(f"Unknown rollup resolution: {resolution}")
+
+
+def _get(score, key):
+    return score[key] if isinstance(score, dict) else getattr(score, key)
+
+
+class _Bucket:
+    __slots__ = ("open", "high", "low", "close", "first_at", "last_at",
+                 "e_sum", "s_sum", "g_sum", "count")
+
+    def __init__(self, at: datetime, overall: float):
+        self.open = self.high = self.low = self.close = overall
+        self.first_at = self.last_at = at
+        self.e_sum = self.s_sum = self.g_sum = 0.0
+        self.count = 0
+
+    def add(self, at: datetime, overall: float, e: float, s: float, g: float):
+        if at < self.first_at:
+            self.first_at, self.open = at, overall
+        if at >= self.last_at:
+            self.last_at, self.close = at, overall
+        self.high = max(self.high, overall)
+        self.low = min(self.low, overall)
+        self.e_sum += e
+        self.s_sum += s
+        self.g_sum += g
+        self.count += 1
+
+
+def _aggregate(scores: Iterable) -> Dict[Tuple[str, str, str, datetime], _Bucket]:
+    buckets: Dict[Tuple[str, str, str, datetime], _Bucket] = {}
+    for score in scores:
+        at = _aware(_get(score, "recorded_at"))
+        overall = _get(score, "overall")
+        for resolution in ROLLUP_RESOLUTIONS:
+            key = (_get(score, "tenant_id"), _get(score, "company_id"), resolution, bucket_floor(at, resolution))
+            bucket = buckets.get(key)
+            if bucket is None:
+                bucket = buckets[key] = _Bucket(at, overall)
+            bucket.add(at, overall, _get(score, "environmental"), _get(score, "social"), _get(score, "governance"))
+    return buckets
+
+
+def _new_row(key, bucket: _Bucket) -> dict:
+    tenant_id, company_id, resolution, start = key
+    return {
+        "id": new_uuid(),
+        "tenant_id": tenant_id,
+        "company_id": company_id,
+        "resolution": resolution,
+        "bucket_start": start,
+        "open": bucket.open,
+        "high": bucket.high,
+        "low": bucket.low,
+        "close": bucket.close,
+        "environmental_avg": bucket.e_sum / bucket.count,
+        "social_avg": bucket.s_sum / bucket.count,
+        "governance_avg": bucket.g_sum / bucket.count,
+        "sample_count": bucket.count,
+        "first_at": bucket.first_at,
+        "last_at": bucket.last_at,
+    }
+
+
+async def apply_scores_to_rollups(db: AsyncSession, scores: Sequence, chunk_size: int = 500):
+    """Fold freshly written scores (ESGScore objects or row dicts) into rollups.
+
+    One upsert per chunk: a bucket another transaction created or updated
+    meanwhile is merged in SQL (open/close by time, high/low, weighted pillar
+    averages) instead of failing on ``ux_score_rollups_bucket`` or losing
+    that transaction's samples.
+    """
+    rows = [_new_row(key, bucket) for key, bucket in _aggregate(scores).items()]
+    for i in range(0, len(rows), chunk_size):
+        stmt = dialect_insert(db, ESGScoreRollup).values(rows[i:i + chunk_size])
+        await db.execute(stmt.on_conflict_do_update(
+            index_elements=["company_id", "resolution", "bucket_start"],
+            set_=_merge(ESGScoreRollup.__table__.c, stmt.excluded),
+        ))
+    await db.flush()
+
+
+def _merge(row, new) -> dict:
+    """SET clause merging bucket ``new`` into stored ``row`` (columns)."""
+    row_count = func.coalesce(row.sample_count, 0)
+    n = row_count + new.sample_count
+
+    def weighted(col: str):
+        return (row[col] * row_count + new[col] * new.sample_count) / n
+
+    earlier = new.first_at < row.first_at
+    later = new.last_at >= row.last_at
+    return {
+        "open": case((earlier, new.open), else_=row.open),
+        "first_at": case((earlier, new.first_at), else_=row.first_at),
+        "close": case((later, new.close), else_=row.close),
+        "last_at": case((later, new.last_at), else_=row.last_at),
+        "high": case((new.high > row.high, new.high), else_=row.high),
+        "low": case((new.low < row.low, new.low), else_=row.low),
+        "environmental_avg": weighted("environmental_avg"),
+        "social_avg": weighted("social_avg"),
+        "governance_avg": weighted("governance_avg"),
+        "sample_count": n,
+    }
+
+
+async def rebuild_rollups(
+    db: AsyncSession, tenant_id: str, company_id: str, start: datetime, end: datetime
+) -> int:
+    """Recompute every rollup bucket touching [start, end] from raw scores."""
+    lo = bucket_floor(start, "1d")
+    hi = bucket_floor(end, "1d") + ROLLUP_RESOLUTIONS["1d"]
+    await db.execute(
+        delete(ESGScoreRollup).where(
+            ESGScoreRollup.tenant_id == tenant_id,
+            ESGScoreRollup.company_id == company_id,
+            ESGScoreRollup.bucket_start >= lo,
+            ESGScoreRollup.bucket_start < hi,
+        )
+    )
+    result = await db.execute(
+        select(
+            ESGScore.tenant_id, ESGScore.company_id, ESGScore.overall, ESGScore.environmental,
+            ESGScore.social, ESGScore.governance, ESGScore.recorded_at,
+        ).where(
+            ESGScore.tenant_id == tenant_id,
+            ESGScore.company_id == company_id,
+            ESGScore.recorded_at >= lo,
+            ESGScore.recorded_at < hi,
+        )
+    )
+    buckets = _aggregate(result.all())
+    if buckets:
+        await db.execute(insert(ESGScoreRollup), [_new_row(k, b) for k, b in buckets.items()])
+    return len(buckets)
+
+
+def lttb_indices(xs: Sequence[float], ys: Sequence[float], threshold: int) -> List[int]:
+    """Indices of the points kept by Largest-Triangle-Three-Buckets downsampling."""
+    n = len(xs)
+    if threshold >= n:
+        return list(range(n))
+    if threshold < 3:
+        return [0, n - 1][:max(threshold, 0)]
+
+    every = (n - 2) / (threshold - 2)
+    kept = [0]
+    a = 0
+    for i in range(threshold - 2):
+        avg_start = int((i + 1) * every) + 1
+        avg_end = min(int((i + 2) * every) + 1, n)
+        span = avg_end - avg_start
+        avg_x = sum(xs[avg_start:avg_end]) / span
+        avg_y = sum(ys[avg_start:avg_end]) / span
+
+        range_start = int(i * every) + 1
+        range_end = int((i + 1) * every) + 1
+        ax, ay = xs[a], ys[a]
+        best, best_area = range_start, -1.0
+        for j in range(range_start, range_end):
+            area = abs((ax - avg_x) * (ys[j] - ay) - (ax - xs[j]) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = j, area
+        kept.append(best)
+        a = best
+    kept.append(n - 1)
+    return kept
+
+
+def lttb(points: List[dict], threshold: int) -> List[dict]:
+    if len(points) <= threshold:
+        return points
+    xs = [_aware(p["recorded_at"]).timestamp() for p in points]
+    ys = [p["overall"] for p in points]
+    return [points[i] for i in lttb_indices(xs, ys, threshold)]
+
+
+def _rollup_point(row: ESGScoreRollup) -> dict:
+    return {
+        "id": row.id,
+        "company_id": row.company_id,
+        "overall": row.close,
+        "environmental": round(row.environmental_avg, 2),
+        "social": round(row.social_avg, 2),
+        "governance": round(row.governance_avg, 2),
+        "risk_level": risk_level_from_score(row.close),
+        "recorded_at": row.bucket_start,
+        "open": row.open,
+        "high": row.high,
+        "low": row.low,
+        "samples": row.sample_count,
+    }
+
+
+def _raw_point(score: ESGScore) -> dict:
+    return {
+        "id": score.id,
+        "company_id": score.company_id,
+        "overall": score.overall,
+        "environmental": score.environmental,
+        "social": score.social,
+        "governance": score.governance,
+        "risk_level": score.risk_level,
+        "recorded_at": score.recorded_at,
+    }
+
+
+async def score_series(
+    db: AsyncSession,
+    tenant_id: str,
+    company_id: str,
+    since: datetime,
+    resolution: str = "auto",
+    points: int = 1000,
+) -> List[dict]:
+    """Score time series for charts.
+
+    ``raw`` returns every row; ``1h``/``1d`` read rollups; ``lttb`` downsamples
+    raw rows; ``auto`` uses raw rows when they fit in ``points`` and otherwise
+    the finest rollup that does. Every mode except ``raw`` is capped at
+    ``points`` with LTTB.
+    """
+    if resolution not in SCORE_RESOLUTIONS:
+        raise ValueError(f"Unknown resolution: {resolution}")
+
+    raw_filter = (
+        ESGScore.company_id == company_id,
+        ESGScore.tenant_id == tenant_id,
+        ESGScore.recorded_at >= since,
+    )
+
+    if resolution == "auto":
+        raw_count = (await db.execute(select(func.count()).select_from(ESGScore).where(*raw_filter))).scalar()
+        resolution = "lttb" if raw_count <= points else None
+        if resolution is None:
+            for candidate in ROLLUP_RESOLUTIONS:
+                resolution = candidate
+                count = (await db.execute(
+                    select(func.count()).select_from(ESGScoreRollup).where(
+                        *_rollup_filter(tenant_id, company_id, candidate, since)
+                    )
+                )).scalar()
+                if count <= points:
+                    break
+
+    if resolution in ROLLUP_RESOLUTIONS:
+        result = await db.execute(
+            select(ESGScoreRollup)
+            .where(*_rollup_filter(tenant_id, company_id, resolution, since))
+            .order_by(ESGScoreRollup.bucket_start.asc())
+        )
+        series = [_rollup_point(r) for r in result.scalars()]
+    else:
+        result = await db.execute(select(ESGScore).where(*raw_filter).order_by(ESGScore.recorded_at.asc()))
+        series = [_raw_point(s) for s in result.scalars()]
+        if resolution == "raw":
+            return series
+    return lttb(series, points)
+
+
+def _rollup_filter(tenant_id: str, company_id: str, resolution: str, since: datetime):
+    return (
+        ESGScoreRollup.company_id == company_id,
+        ESGScoreRollup.tenant_id == tenant_id,
+        ESGScoreRollup.resolution == resolution,
+        ESGScoreRollup.bucket_start >= bucket_floor(since, resolution),
+    )
@@ -0,0 +1,288 @@
+"""
+Incremental ESG score state.
+
+Keeps, per (tenant_id, company_id), the decayed impact sum and event count of
+every category inside the scoring lookback window, so a new event costs O(1)
+instead of a full 90-day rescan.
+
+Because recency decay is exponential, the decayed sum at time ``t2`` is the
+sum at ``t1`` multiplied by ``decay(t2 - t1)``; advancing the clock is a single
+rescale per category. Events leaving the lookback window are subtracted at
+their current decayed weight. The repetition factor only depends on the
+category count, so it is applied when impacts are read.
+
+The state lives in process memory. It is resynced from the DB on startup and
+lazily hydrated for companies it has not seen yet; with several API workers
+ingesting concurrently, run ingest on a single worker or set
+INCREMENTAL_SCORING=false.
+
+Events are folded in before their transaction commits (the recompute in the
+same transaction needs them). ``add_event`` given the session records them
+in it, and events whose transaction ends without a commit (rollback, or the
+session closed after a pipeline failure) are taken out again.
+"""
+import asyncio
+import bisect
+import heapq
+import logging
+import math
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Tuple
+from sqlalchemy import event as sa_event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.db.models import ESGEvent
+from app.services.scoring import HALF_LIFE_DAYS, LOOKBACK_DAYS
+
+logger = logging.getLogger(__name__)
+
+CATEGORIES = ("environmental", "social", "governance")
+DECAY_PER_DAY = 0.693 / HALF_LIFE_DAYS
+
+UNCOMMITTED_KEY = "uncommitted_score_events"  # Session.info key: events folded in before commit
+
+
+def _aware(dt: datetime) -> datetime:
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=timezone.utc)
+    return dt
+
+
+def _decay(days: float) -> float:
+    return math.exp(-DECAY_PER_DAY * max(days, 0.0))
+
+
+def _days_between(later: datetime, earlier: datetime) -> float:
+    return (later - earlier).total_seconds() / 86400
+
+
+class CompanyScoreState:
+    """Decayed per-category sums for a single company at time ``as_of``.
+
+    ``past`` holds events dated at or before ``as_of`` (decayed to ``as_of``),
+    ``future`` holds events dated after it, which are not decayed yet, matching
+    ``recency_decay`` clamping negative ages to zero.
+    """
+
+    __slots__ = ("as_of", "past", "future", "counts", "window", "pending", "ids", "_ops")
+
+    def __init__(self, as_of: datetime):
+        self.as_of = _aware(as_of)
+        self.past = {c: 0.0 for c in CATEGORIES}
+        self.future = {c: 0.0 for c in CATEGORIES}
+        self.counts = {c: 0 for c in CATEGORIES}
+        # (event_date, event_id, category, weight) sorted by event_date
+        self.window: deque = deque()
+        # heap of window entries dated after as_of
+        self.pending: list = []
+        self.ids: set = set()
+        self._ops = 0
+
+    def __len__(self) -> int:
+        return len(self.window)
+
+    def add(self, event_id: str, event_date: datetime, category: Optional[str],
+            severity: int, confidence: float) -> bool:
+        """Add one processed event. Returns False if it was ignored."""
+        cat = category.lower() if category else "governance"
+        if cat not in self.counts or event_id in self.ids:
+            return False
+        event_date = _aware(event_date)
+        if event_date < self.as_of - timedelta(days=LOOKBACK_DAYS):
+            return False
+
+        entry = (event_date, event_id, cat, severity * confidence)
+        if not self.window or event_date >= self.window[-1][0]:
+            self.window.append(entry)
+        else:
+            self.window.insert(bisect.bisect_right(self.window, entry), entry)
+        self.ids.add(event_id)
+        self.counts[cat] += 1
+
+        if event_date <= self.as_of:
+            self.past[cat] += entry[3] * _decay(_days_between(self.as_of, event_date))
+        else:
+            heapq.heappush(self.pending, entry)
+            self.future[cat] += entry[3]
+        self._tick()
+        return True
+
+    def remove(self, event_id: str) -> bool:
+        """Take an event out again. O(n); only used when its transaction fails."""
+        if event_id not in self.ids:
+            return False
+        self.window = deque(entry for entry in self.window if entry[1] != event_id)
+        self._rebuild(self.as_of)
+        return True
+
+    def advance(self, now: datetime):
+        """Move the state clock to ``now``: rescale, promote and expire events."""
+        now = _aware(now)
+        if now < self.as_of:
+            self._rebuild(now)
+            return
+        if now == self.as_of:
+            return
+
+        factor = _decay(_days_between(now, self.as_of))
+        for c in CATEGORIES:
+            self.past[c] *= factor
+        self.as_of = now
+
+        while self.pending and self.pending[0][0] <= now:
+            event_date, _, cat, weight = heapq.heappop(self.pending)
+            self.future[cat] -= weight
+            self.past[cat] += weight * _decay(_days_between(now, event_date))
+
+        cutoff = now - timedelta(days=LOOKBACK_DAYS)
+        while self.window and self.window[0][0] < cutoff:
+            event_date, event_id, cat, weight = self.window.popleft()
+            self.ids.discard(event_id)
+            self.counts[cat] -= 1
+            self.past[cat] -= weight * _decay(_days_between(now, event_date))
+            if self.counts[cat] == 0:
+                self.past[cat] = 0.0
+                self.future[cat] = 0.0
+            self._tick()
+
+    def category_impacts(self) -> dict:
+        impacts = {}
+        for c in CATEGORIES:
+            if self.counts[c] == 0:
+                impacts[c] = 0.0
+                continue
+            rep_factor = 1.0 + 0.1 * (self.counts[c] - 1)
+            impacts[c] = max(self.past[c] + self.future[c], 0.0) * rep_factor
+        return impacts
+
+    def _tick(self):
+        # Periodically recompute the sums exactly so add/subtract rounding
+        # cannot accumulate; amortised O(1) since the interval scales with n.
+        self._ops += 1
+        if self._ops >= max(1024, len(self.window)):
+            self._rebuild(self.as_of)
+
+    def _rebuild(self, now: datetime):
+        entries = list(self.window)
+        self.__init__(now)
+        for event_date, event_id, cat, weight in entries:
+            if event_date < now - timedelta(days=LOOKBACK_DAYS):
+                continue
+            self.window.append((event_date, event_id, cat, weight))
+            self.ids.add(event_id)
+            self.counts[cat] += 1
+            if event_date <= now:
+                self.past[cat] += weight * _decay(_days_between(now, event_date))
+            else:
+                heapq.heappush(self.pending, (event_date, event_id, cat, weight))
+                self.future[cat] += weight
+
+
+class IncrementalScoreEngine:
+    """Registry of CompanyScoreState keyed by (tenant_id, company_id)."""
+
+    def __init__(self):
+        self._states: Dict[Tuple[str, str], CompanyScoreState] = {}
+        self._load_lock = asyncio.Lock()
+
+    def __contains__(self, key: Tuple[str, str]) -> bool:
+        return key in self._states
+
+    def add_event(self, event: ESGEvent, db: Optional[AsyncSession] = None) -> bool:
+        """Fold a freshly processed event into its company's state, if loaded.
+
+        Companies that are not loaded yet pick the event up from the DB when
+        they are first hydrated, so nothing is lost by skipping them here.
+        With ``db`` the event is removed again unless ``db`` commits.
+        """
+        key = (event.tenant_id, event.company_id)
+        state = self._states.get(key)
+        if state is None:
+            return False
+        added = state.add(event.id, event.event_date, event.category, event.severity, event.confidence)
+        if added and db is not None:
+            db.info.setdefault(UNCOMMITTED_KEY, []).append((key, event.id))
+        return added
+
+    def remove_event(self, tenant_id: str, company_id: str, event_id: str) -> bool:
+        state = self._states.get((tenant_id, company_id))
+        return state is not None and state.remove(event_id)
+
+    def discard(self, tenant_id: str, company_id: str):
+        self._states.pop((tenant_id, company_id), None)
+
+    async def category_impacts(
+        self, db: AsyncSession, tenant_id: str, company_id: str, now: datetime
+    ) -> dict:
+        state = await self._ensure_loaded(db, tenant_id, company_id, now)
+        state.advance(now)
+        return state.category_impacts()
+
+    async def resync(self, db: AsyncSession, now: Optional[datetime] = None) -> int:
+        """Rebuild every company's state from the processed events in the DB."""
+        now = _aware(now or datetime.now(timezone.utc))
+        states: Dict[Tuple[str, str], CompanyScoreState] = {}
+        result = await db.execute(
+            self._events_stmt(now).order_by(ESGEvent.event_date)
+        )
+        for row in result:
+            key = (row.tenant_id, row.company_id)
+            state = states.get(key)
+            if state is None:
+                state = states[key] = CompanyScoreState(now)
+            state.add(row.id, row.event_date, row.category, row.severity, row.confidence)
+        async with self._load_lock:
+            self._states = states
+        logger.info(f"Score state resynced for {len(states)} companies")
+        return len(states)
+
+    async def _ensure_loaded(
+        self, db: AsyncSession, tenant_id: str, company_id: str, now: datetime
+    ) -> CompanyScoreState:
+        key = (tenant_id, company_id)
+        state = self._states.get(key)
+        if state is not None:
+            return state
+        async with self._load_lock:
+            state = self._states.get(key)
+            if state is not None:
+                return state
+            state = CompanyScoreState(now)
+            result = await db.execute(
+                self._events_stmt(now)
+                .where(ESGEvent.tenant_id == tenant_id, ESGEvent.company_id == company_id)
+                .order_by(ESGEvent.event_date)
+            )
+            for row in result:
+                state.add(row.id, row.event_date, row.category, row.severity, row.confidence)
+            self._states[key] = state
+            return state
+
+    @staticmethod
+    def _events_stmt(now: datetime):
+        return select(
+            ESGEvent.id, ESGEvent.tenant_id, ESGEvent.company_id, ESGEvent.category,
+            ESGEvent.severity, ESGEvent.confidence, ESGEvent.event_date,
+        ).where(
+            ESGEvent.event_date >= now - timedelta(days=LOOKBACK_DAYS),
+            ESGEvent.is_processed == True,
+            ESGEvent.duplicate_of.is_(None),
+        )
+
+
+score_engine = IncrementalScoreEngine()
+
+
+@sa_event.listens_for(Session, "after_commit")
+def _keep_after_commit(session: Session):
+    session.info.pop(UNCOMMITTED_KEY, None)
+
+
+@sa_event.listens_for(Session, "after_transaction_end")
+def _remove_uncommitted(session: Session, transaction):
+    # Runs after _keep_after_commit, so anything left here was not committed.
+    if transaction.parent is not None:
+        return
+    for (tenant_id, company_id), event_id in session.info.pop(UNCOMMITTED_KEY, ()):
+        score_engine.remove_event(tenant_id, company_id, event_id)
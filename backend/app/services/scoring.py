@@ -13,10 +13,12 @@ from datetime import datetime, timezone, timedelta
 from typing import List, Optional
 from sqlalchemy import select, func
 from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import get_settings
 from app.db.models import ESGScore, ESGEvent, Company
 
 CATEGORY_WEIGHTS = {"environmental": 0.35, "social": 0.30, "governance": 0.35}
 HALF_LIFE_DAYS = 14
+LOOKBACK_DAYS = 90
 BASE_SCORE = 75.0
 
 
@@ -44,47 +46,40 @@ def risk_level_from_score(score: float) -> str:
     return "critical"
 
 
-async def recalculate_company_score(
-    db: AsyncSession, company_id: str, tenant_id: str
-) -> ESGScore:
-    now = datetime.now(timezone.utc)
-    lookback = now - timedelta(days=90)
+def _event_category(category: Optional[str]) -> str:
+    return category.lower() if category else "governance"
 
-    result = await db.execute(
-        select(ESGEvent).where(
-            ESGEvent.company_id == company_id,
-            ESGEvent.tenant_id == tenant_id,
-            ESGEvent.event_date >= lookback,
-            ESGEvent.is_processed == True,
-        )
-    )
-    events = result.scalars().all()
 
-    category_impacts = {"environmental": [], "social": [], "governance": []}
+def compute_category_impacts(events, now: datetime) -> dict:
+    """Sum decayed, repetition-weighted impact per category over ``events``.
 
+    ``events`` only needs ``category``, ``severity``, ``confidence`` and
+    ``event_date`` attributes, so ORM rows and lightweight tuples both work.
+    """
     cat_counts = {"environmental": 0, "social": 0, "governance": 0}
     for e in events:
-        cat = e.category.lower() if e.category else "governance"
+        cat = _event_category(e.category)
         if cat in cat_counts:
             cat_counts[cat] += 1
 
+    category_impacts = {"environmental": 0.0, "social": 0.0, "governance": 0.0}
     for event in events:
-        cat = event.category.lower() if event.category else "governance"
+        cat = _event_category(event.category)
         if cat not in category_impacts:
             continue
         decay = recency_decay(event.event_date, now)
         rep_factor = 1.0 + 0.1 * (cat_counts.get(cat, 1) - 1)
-        impact = compute_event_impact(event.severity, event.confidence, decay, rep_factor)
-        category_impacts[cat].append(impact)
+        category_impacts[cat] += compute_event_impact(event.severity, event.confidence, decay, rep_factor)
+    return category_impacts
 
-    e_impact = sum(category_impacts["environmental"])
-    s_impact = sum(category_impacts["social"])
-    g_impact = sum(category_impacts["governance"])
 
+def build_score(
+    tenant_id: str, company_id: str, category_impacts: dict, now: datetime
+) -> ESGScore:
     max_impact = 50.0
-    e_score = max(0, BASE_SCORE - min(e_impact, max_impact))
-    s_score = max(0, BASE_SCORE - min(s_impact, max_impact))
-    g_score = max(0, BASE_SCORE - min(g_impact, max_impact))
+    e_score = max(0, BASE_SCORE - min(category_impacts["environmental"], max_impact))
+    s_score = max(0, BASE_SCORE - min(category_impacts["social"], max_impact))
+    g_score = max(0, BASE_SCORE - min(category_impacts["governance"], max_impact))
 
     overall = (
         e_score * CATEGORY_WEIGHTS["environmental"]
@@ -92,7 +87,7 @@ async def recalculate_company_score(
         + g_score * CATEGORY_WEIGHTS["governance"]
     )
 
-    score = ESGScore(
+    return ESGScore(
         tenant_id=tenant_id,
         company_id=company_id,
         overall=round(overall, 2),
@@ -102,6 +97,42 @@ async def recalculate_company_score(
         risk_level=risk_level_from_score(overall),
         recorded_at=now,
     )
+
+
+async def rescan_category_impacts(
+    db: AsyncSession, company_id: str, tenant_id: str, now: datetime
+) -> dict:
+    """Reference implementation: reload the whole lookback window from the DB."""
+    lookback = now - timedelta(days=LOOKBACK_DAYS)
+    result = await db.execute(
+        select(ESGEvent).where(
+            ESGEvent.company_id == company_id,
+            ESGEvent.tenant_id == tenant_id,
+            ESGEvent.event_date >= lookback,
+            ESGEvent.is_processed == True,
+            ESGEvent.duplicate_of.is_(None),
+        )
+    )
+    return compute_category_impacts(result.scalars().all(), now)
+
+
+async def recalculate_company_score(
+    db: AsyncSession, company_id: str, tenant_id: str
+) -> ESGScore:
+    now = datetime.now(timezone.utc)
+
+    if get_settings().INCREMENTAL_SCORING:
+        from app.services.score_state import score_engine
+        category_impacts = await score_engine.category_impacts(db, tenant_id, company_id, now)
+    else:
+        category_impacts = await rescan_category_impacts(db, company_id, tenant_id, now)
+
+    score = build_score(tenant_id, company_id, category_impacts, now)
     db.add(score)
     await db.flush()
+
+    from app.services.rollups import apply_scores_to_rollups
+    from app.services.latest_scores import upsert_latest_scores
+    await apply_scores_to_rollups(db, [score])
+    await upsert_latest_scores(db, [score])
     return score
@@ -0,0 +1,250 @@
+"""
+In-process vector store used for RAG when Pinecone is not configured.
+
+Documents are partitioned by (tenant_id, company_id), which is exactly the
+filter every query applies, so a query only touches one company's vectors.
+Each partition keeps its embeddings L2-normalized in one contiguous float32
+matrix: cosine similarity for the whole partition is a single matrix-vector
+product and top-k comes from ``argpartition``. Appends grow the matrix
+geometrically (amortized O(1)); deletes move the last row into the freed slot.
+
+Partitions reaching VECTOR_ANN_MIN_ROWS also get an IVF-PQ index (see ann),
+trained in a background thread and then maintained on every append and
+delete; until it is ready, queries scan exactly.
+
+With VECTOR_STORE_PATH set, ``get_vector_store`` returns the file-backed
+MappedVectorStore (see mmap_vector_store) with the same interface instead.
+"""
+import logging
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from app.core.config import get_settings
+from app.services.ann import IVFPQIndex, Quantizer, exact_top_k
+
+logger = logging.getLogger(__name__)
+
+_INITIAL_CAPACITY = 16
+
+
+def normalize(vector: Sequence[float]) -> np.ndarray:
+    v = np.asarray(vector, dtype=np.float32).ravel()
+    norm = float(np.linalg.norm(v))
+    return v / norm if norm > 0 else v
+
+
+class _Partition:
+    __slots__ = ("vectors", "ids", "metadata", "texts", "rows", "ann", "background", "_build", "_dirty")
+
+    def __init__(self, dim: int, background: bool = True):
+        self.vectors = np.empty((_INITIAL_CAPACITY, dim), dtype=np.float32)
+        self.ids: List[str] = []
+        self.metadata: List[dict] = []
+        self.texts: List[str] = []
+        self.rows: Dict[str, int] = {}
+        self.ann: Optional[IVFPQIndex] = None
+        self.background = background
+        self._build: Optional[dict] = None  # in-flight ANN build
+        self._dirty: Optional[set] = None  # rows changed since the build's snapshot
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def put(self, doc_id: str, vector: np.ndarray, metadata: dict, text: str):
+        self._install_index()
+        row = self.rows.get(doc_id)
+        if row is None:
+            row = len(self.ids)
+            if row == len(self.vectors):
+                grown = np.empty((2 * len(self.vectors), self.vectors.shape[1]), dtype=np.float32)
+                grown[:row] = self.vectors[:row]
+                self.vectors = grown
+            self.ids.append(doc_id)
+            self.metadata.append(metadata)
+            self.texts.append(text)
+            self.rows[doc_id] = row
+            self.vectors[row] = vector
+            if self.ann is not None:
+                self.ann.extend(vector[None])
+        else:
+            self.metadata[row] = metadata
+            self.texts[row] = text
+            self.vectors[row] = vector
+            if self.ann is not None:
+                self.ann.set(row, vector)
+        if self._dirty is not None:
+            self._dirty.add(row)
+        self._maybe_build_index()
+
+    def remove(self, doc_id: str) -> bool:
+        self._install_index()
+        row = self.rows.pop(doc_id, None)
+        if row is None:
+            return False
+        last = len(self.ids) - 1
+        if self.ann is not None:
+            self.ann.remove(row)
+        if self._dirty is not None:
+            self._dirty.add(row)
+        if row != last:
+            self.vectors[row] = self.vectors[last]
+            self.ids[row] = self.ids[last]
+            self.metadata[row] = self.metadata[last]
+            self.texts[row] = self.texts[last]
+            self.rows[self.ids[row]] = row
+        self.ids.pop()
+        self.metadata.pop()
+        self.texts.pop()
+        if last < len(self.vectors) // 4 and len(self.vectors) > _INITIAL_CAPACITY and self._build is None:
+            self.vectors = self.vectors[:max(_INITIAL_CAPACITY, len(self.vectors) // 2)].copy()
+        if self.ann is not None and last < get_settings().VECTOR_ANN_MIN_ROWS // 2:
+            self.ann = None
+        return True
+
+    def search(self, query: np.ndarray, top_k: int) -> List[Tuple[int, float]]:
+        self._install_index()
+        n = len(self.ids)
+        if n == 0 or top_k <= 0:
+            return []
+        rows = None
+        if self.ann is not None:
+            settings = get_settings()
+            rows = self.ann.candidates(query, top_k * max(1, settings.VECTOR_ANN_REFINE), settings.VECTOR_ANN_NPROBE)
+        best, scores = exact_top_k(self.vectors[:n], rows, query, top_k)
+        return [(int(i), float(score)) for i, score in zip(best, scores)]
+
+    def _maybe_build_index(self):
+        settings = get_settings()
+        n = len(self.ids)
+        if settings.VECTOR_ANN_MIN_ROWS <= 0 or n < settings.VECTOR_ANN_MIN_ROWS or self._build is not None:
+            return
+        if self.ann is not None and n < 2 * self.ann.quantizer.trained_on:
+            return
+        # Train on a view of the current rows; rows written meanwhile are
+        # tracked in _dirty and re-encoded when the index is installed.
+        build = self._build = {"rows": n, "nlist": settings.VECTOR_ANN_NLIST, "m": settings.VECTOR_ANN_PQ_M}
+        self._dirty = set()
+        if self.background:
+            threading.Thread(target=self._train, args=(build, self.vectors[:n]), daemon=True).start()
+        else:
+            self._train(build, self.vectors[:n])
+            self._install_index()
+
+    @staticmethod
+    def _train(build: dict, vectors: np.ndarray):
+        try:
+            quantizer = Quantizer.train(vectors, nlist=build["nlist"], m=build["m"])
+            lists = quantizer.assign(vectors)
+            build["result"] = (quantizer, lists, quantizer.encode(vectors, lists))
+        except Exception as e:
+            logger.warning(f"Vector index build failed: {e}")
+            build["result"] = None
+
+    def _install_index(self):
+        build = self._build
+        if build is None or "result" not in build:
+            return
+        self._build, dirty, self._dirty = None, self._dirty, None
+        if build["result"] is None:
+            return
+        quantizer, lists, codes = build["result"]
+        n = len(self.ids)
+        snapshot = min(build["rows"], n)
+        index = IVFPQIndex.from_assignments(quantizer, lists[:snapshot], codes[:snapshot])
+        for row in sorted(r for r in dirty if r < snapshot):
+            index.set(row, self.vectors[row])
+        if n > snapshot:
+            index.extend(self.vectors[snapshot:n])
+        self.ann = index
+
+
+class LocalVectorStore:
+    def __init__(self, background_index: bool = True):
+        self.dim: Optional[int] = None
+        self.background_index = background_index
+        self._partitions: Dict[Tuple[str, str], _Partition] = {}
+        self._where: Dict[str, Tuple[str, str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._where)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._where
+
+    def upsert(self, doc_id: str, embedding: Sequence[float], metadata: dict, text: str = ""):
+        vector = normalize(embedding)
+        key = (metadata.get("tenant_id", ""), metadata.get("company_id", ""))
+        if self.dim is None:
+            self.dim = len(vector)
+        elif len(vector) != self.dim:
+            raise ValueError(f"Embedding has {len(vector)} dimensions, store has {self.dim}")
+        previous = self._where.get(doc_id)
+        if previous is not None and previous != key:
+            self._remove(previous, doc_id)
+        partition = self._partitions.get(key)
+        if partition is None:
+            partition = self._partitions[key] = _Partition(self.dim, self.background_index)
+        partition.put(doc_id, vector, metadata, text)
+        self._where[doc_id] = key
+
+    def delete(self, doc_id: str) -> bool:
+        key = self._where.pop(doc_id, None)
+        if key is None:
+            return False
+        self._remove(key, doc_id)
+        return True
+
+    def query(self, embedding: Sequence[float], tenant_id: str, company_id: str, top_k: int = 5) -> List[dict]:
+        partition = self._partitions.get((tenant_id, company_id))
+        if partition is None:
+            return []
+        query = normalize(embedding)
+        if len(query) != self.dim:
+            raise ValueError(f"Query has {len(query)} dimensions, store has {self.dim}")
+        return [
+            {"id": partition.ids[i], "score": score, "metadata": partition.metadata[i], "text": partition.texts[i]}
+            for i, score in partition.search(query, top_k)
+        ]
+
+    def export(self):
+        """(key, vectors, ids, metadata, texts) of every partition."""
+        for key, partition in self._partitions.items():
+            n = len(partition)
+            yield key, partition.vectors[:n], partition.ids, partition.metadata, partition.texts
+
+    def clear(self):
+        self.dim = None
+        self._partitions.clear()
+        self._where.clear()
+
+    def _remove(self, key: Tuple[str, str], doc_id: str):
+        partition = self._partitions[key]
+        partition.remove(doc_id)
+        if not len(partition):
+            del self._partitions[key]
+
+    def stats(self) -> dict:
+        return {
+            "documents": len(self._where),
+            "partitions": len(self._partitions),
+            "dim": self.dim,
+            "bytes": sum(p.vectors.nbytes for p in self._partitions.values()),
+            "indexed_partitions": sum(p.ann is not None for p in self._partitions.values()),
+        }
+
+
+_stores: dict = {}
+
+
+def get_vector_store():
+    """The vector store for the configured VECTOR_STORE_PATH ("" = in memory)."""
+    path = get_settings().VECTOR_STORE_PATH
+    store = _stores.get(path)
+    if store is None:
+        if path:
+            from app.services.mmap_vector_store import MappedVectorStore
+            store = MappedVectorStore(path)
+        else:
+            store = LocalVectorStore()
+        _stores[path] = store
+    return store
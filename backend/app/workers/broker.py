@@ -0,0 +1,247 @@
+"""
+Message brokers for the staged pipeline (see workers/stages).
+
+``Broker`` is the Kafka-shaped interface the stages are written against:
+topics split into partitions, records appended with a key that picks the
+partition, consumers reading from an offset and committing the next offset
+to read per consumer group. Two local implementations:
+
+- ``MemoryBroker``: lists in this process. Fast, but records and offsets
+  are lost when the process exits; the pipeline re-queues unprocessed
+  events from the DB on startup.
+- ``FileLogBroker``: one append-only JSON-lines file per partition plus an
+  offsets file per consumer group, so a restarted process resumes every
+  stage from its last commit. A torn last line (crash mid-write) is
+  truncated on open. One process owns a log directory; the files are
+  never trimmed.
+
+A Kafka deployment would implement the same interface with a client library
+(``produce`` maps to a buffered producer, ``fetch`` to a poll on assigned
+partitions) and keep the topic layout of ``TOPICS``.
+"""
+import asyncio
+import json
+import logging
+import os
+import zlib
+from abc import ABC, abstractmethod
+from array import array
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+from app.core.config import get_settings
+from app.workers.kafka_scaffold import TOPICS
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Record:
+    topic: str
+    partition: int
+    offset: int
+    key: str
+    value: Any
+
+
+def partition_for(key: str, partitions: int) -> int:
+    """Stable across processes, unlike ``hash()``."""
+    return zlib.crc32(key.encode()) % partitions
+
+
+class Broker(ABC):
+    def __init__(self, topics: Optional[Dict[str, dict]] = None):
+        self.topics = {name: spec["partitions"] for name, spec in (topics or TOPICS).items()}
+        self._signals: Dict[str, asyncio.Event] = {}
+
+    def produce(self, topic: str, key: str, value: Any) -> Record:
+        """Append a record; the key's hash picks the partition."""
+        partition = partition_for(key, self.topics[topic])
+        offset = self._append(topic, partition, key, value)
+        self._signal(topic).set()
+        return Record(topic, partition, offset, key, value)
+
+    async def fetch(self, topic: str, positions: Dict[int, int], max_records: int,
+                    timeout_s: float) -> List[Record]:
+        """Records at or after ``positions`` (partition -> offset), at most
+        ``max_records``, waiting up to ``timeout_s`` for the first one."""
+        signal = self._signal(topic)
+        while True:
+            signal.clear()
+            records: List[Record] = []
+            for partition, offset in positions.items():
+                records.extend(self.read(topic, partition, offset, max_records - len(records)))
+                if len(records) >= max_records:
+                    break
+            if records or timeout_s <= 0:
+                return records
+            try:
+                await asyncio.wait_for(signal.wait(), timeout_s)
+            except asyncio.TimeoutError:
+                return []
+            timeout_s = 0  # one more read after the wake-up
+
+    @abstractmethod
+    def read(self, topic: str, partition: int, offset: int, max_records: int) -> List[Record]:
+        """Records from ``offset`` on that are already there, without waiting."""
+
+    @abstractmethod
+    def end_offset(self, topic: str, partition: int) -> int:
+        """Offset the partition's next record gets."""
+
+    @abstractmethod
+    def committed(self, group: str, topic: str, partition: int) -> int:
+        """The group's committed offset (0 before its first commit)."""
+
+    @abstractmethod
+    def commit(self, group: str, topic: str, partition: int, offset: int):
+        """Store the offset the group resumes from."""
+
+    def close(self):
+        pass
+
+    def _signal(self, topic: str) -> asyncio.Event:
+        signal = self._signals.get(topic)
+        if signal is None:
+            signal = self._signals[topic] = asyncio.Event()
+        return signal
+
+    @abstractmethod
+    def _append(self, topic: str, partition: int, key: str, value: Any) -> int:
+        """Store a record at the end of the partition; returns its offset."""
+
+
+class MemoryBroker(Broker):
+    def __init__(self, topics: Optional[Dict[str, dict]] = None):
+        super().__init__(topics)
+        self._logs = {topic: [[] for _ in range(n)] for topic, n in self.topics.items()}
+        self._offsets: Dict[str, Dict[tuple, int]] = {}
+
+    def end_offset(self, topic: str, partition: int) -> int:
+        return len(self._logs[topic][partition])
+
+    def committed(self, group: str, topic: str, partition: int) -> int:
+        return self._offsets.get(group, {}).get((topic, partition), 0)
+
+    def commit(self, group: str, topic: str, partition: int, offset: int):
+        self._offsets.setdefault(group, {})[(topic, partition)] = offset
+
+    def _append(self, topic: str, partition: int, key: str, value: Any) -> int:
+        log = self._logs[topic][partition]
+        log.append((key, value))
+        return len(log) - 1
+
+    def read(self, topic: str, partition: int, offset: int, max_records: int) -> List[Record]:
+        log = self._logs[topic][partition]
+        return [Record(topic, partition, i, *log[i]) for i in range(offset, min(len(log), offset + max_records))]
+
+
+class _PartitionLog:
+    __slots__ = ("path", "writer", "reader", "positions", "size")
+
+    def __init__(self, path: str):
+        self.path = path
+        self.positions = array("q")  # byte offset of every record
+        size = 0
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break  # torn write: the record was never acknowledged
+                    self.positions.append(size)
+                    size += len(line)
+            if size != os.path.getsize(path):
+                logger.warning(f"Truncating torn record at the end of {path}")
+                os.truncate(path, size)
+        self.size = size
+        self.writer = open(path, "ab")
+        self.reader = open(path, "rb")
+
+    def append(self, line: bytes, fsync: bool) -> int:
+        self.writer.write(line)
+        self.writer.flush()
+        if fsync:
+            os.fsync(self.writer.fileno())
+        self.positions.append(self.size)
+        self.size += len(line)
+        return len(self.positions) - 1
+
+    def read(self, offset: int, max_records: int) -> List[bytes]:
+        end = min(len(self.positions), offset + max_records)
+        if offset >= end:
+            return []
+        self.reader.seek(self.positions[offset])
+        return [self.reader.readline() for _ in range(end - offset)]
+
+    def close(self):
+        self.writer.close()
+        self.reader.close()
+
+
+class FileLogBroker(Broker):
+    def __init__(self, path: str, topics: Optional[Dict[str, dict]] = None, fsync: Optional[bool] = None):
+        super().__init__(topics)
+        self.path = path
+        self.fsync = get_settings().PIPELINE_LOG_FSYNC if fsync is None else fsync
+        os.makedirs(os.path.join(path, "offsets"), exist_ok=True)
+        self._logs: Dict[str, List[_PartitionLog]] = {}
+        for topic, n in self.topics.items():
+            os.makedirs(os.path.join(path, topic), exist_ok=True)
+            self._logs[topic] = [_PartitionLog(os.path.join(path, topic, f"{p:03d}.log")) for p in range(n)]
+        self._offsets: Dict[str, Dict[str, int]] = {}
+
+    def end_offset(self, topic: str, partition: int) -> int:
+        return len(self._logs[topic][partition].positions)
+
+    def committed(self, group: str, topic: str, partition: int) -> int:
+        return self._group_offsets(group).get(f"{topic}/{partition}", 0)
+
+    def commit(self, group: str, topic: str, partition: int, offset: int):
+        offsets = self._group_offsets(group)
+        offsets[f"{topic}/{partition}"] = offset
+        path = self._offsets_path(group)
+        with open(path + ".tmp", "w") as f:
+            json.dump(offsets, f)
+            if self.fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(path + ".tmp", path)
+
+    def close(self):
+        for logs in self._logs.values():
+            for log in logs:
+                log.close()
+
+    def _append(self, topic: str, partition: int, key: str, value: Any) -> int:
+        line = json.dumps({"key": key, "value": value}, separators=(",", ":")).encode() + b"\n"
+        return self._logs[topic][partition].append(line, self.fsync)
+
+    def read(self, topic: str, partition: int, offset: int, max_records: int) -> List[Record]:
+        records = []
+        for i, line in enumerate(self._logs[topic][partition].read(offset, max_records)):
+            entry = json.loads(line)
+            records.append(Record(topic, partition, offset + i, entry["key"], entry["value"]))
+        return records
+
+    def _offsets_path(self, group: str) -> str:
+        return os.path.join(self.path, "offsets", f"{group}.json")
+
+    def _group_offsets(self, group: str) -> Dict[str, int]:
+        offsets = self._offsets.get(group)
+        if offsets is None:
+            try:
+                with open(self._offsets_path(group)) as f:
+                    offsets = json.load(f)
+            except FileNotFoundError:
+                offsets = {}
+            self._offsets[group] = offsets
+        return offsets
+
+
+def create_broker(kind: Optional[str] = None) -> Broker:
+    settings = get_settings()
+    kind = kind if kind is not None else settings.PIPELINE_BROKER
+    if kind == "memory":
+        return MemoryBroker()
+    if kind == "file":
+        return FileLogBroker(settings.PIPELINE_LOG_PATH)
+    raise ValueError(f"Unknown PIPELINE_BROKER {kind!r}, expected 'memory' or 'file'")
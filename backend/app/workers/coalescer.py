@@ -0,0 +1,192 @@
+"""
+Coalesced score recomputation.
+
+During news bursts many events for the same company arrive within seconds.
+Instead of one full rescoring and live update per event, a company with a
+pending recompute is marked dirty and every event arriving before it runs is
+folded into it:
+
+- the first event after a quiet period recomputes immediately (no added
+  latency for isolated events);
+- later events within SCORE_COALESCE_WINDOW_MS of the last recompute join a
+  single trailing recompute scheduled at the end of the window.
+
+So each company is rescored at most once per window. Callers still get the
+resulting score (for alert evaluation); only the caller that ran the
+recompute receives the folded events and publishes the live update.
+
+Events are folded through the incremental score state, so the recompute sees
+events whose transactions are still open in other sessions. Coalescing is
+therefore only active with INCREMENTAL_SCORING enabled. The stored score
+then counts events of every session in the batch, so when one of those
+sessions does not commit (its events are taken out of the score state, see
+score_state) the company is rescored in a fresh session, which replaces its
+latest score. Followers get a detached copy of the leader's score: the
+original belongs to the leader's session.
+"""
+import asyncio
+import logging
+from typing import Dict, List, Optional, Set, Tuple
+from sqlalchemy import event as sa_event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.core.config import get_settings
+from app.db.models import ESGEvent, ESGScore
+from app.db.session import async_session
+from app.services.scoring import recalculate_company_score
+
+logger = logging.getLogger(__name__)
+
+BATCH_KEY = "coalesced_score_batches"  # Session.info key: companies rescored with other sessions' events
+
+
+class _Batch:
+    __slots__ = ("future", "events")
+
+    def __init__(self, future: asyncio.Future, event: ESGEvent):
+        self.future = future
+        self.events = [event]
+
+
+class ScoreCoalescer:
+    def __init__(self, window_ms: Optional[int] = None, session_factory=None):
+        self._window_ms = window_ms
+        self._session_factory = session_factory
+        self._pending: Dict[Tuple[str, str], _Batch] = {}
+        self._last_run: Dict[Tuple[str, str], float] = {}
+        self._rescores: Set[asyncio.Task] = set()
+        self.requests = 0
+        self.recomputes = 0
+        self.rescores = 0
+
+    @property
+    def window_s(self) -> float:
+        settings = get_settings()
+        if not settings.INCREMENTAL_SCORING:
+            return 0.0
+        window_ms = self._window_ms if self._window_ms is not None else settings.SCORE_COALESCE_WINDOW_MS
+        return max(window_ms, 0) / 1000
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "recomputes": self.recomputes,
+            "coalesced": self.requests - self.recomputes,
+            "dirty_companies": len(self._pending),
+            "rescores": self.rescores,
+        }
+
+    async def recompute(
+        self, db: AsyncSession, event: ESGEvent, coalesce: bool = True
+    ) -> Tuple[ESGScore, List[ESGEvent]]:
+        """Rescore ``event``'s company, coalescing with concurrent requests.
+
+        Returns the score and the events folded into this recompute; the list
+        is empty when another caller ran the recompute. ``coalesce=False``
+        recomputes at once, for callers that never have two events of one
+        company in flight and would only wait out the window.
+        """
+        self.requests += 1
+        window = self.window_s if coalesce else 0.0
+        if window <= 0:
+            self.recomputes += 1
+            score = await recalculate_company_score(db, event.company_id, event.tenant_id)
+            return score, [event]
+
+        key = (event.tenant_id, event.company_id)
+        batch = self._pending.get(key)
+        if batch is not None:
+            batch.events.append(event)
+            # asyncio.wait only raises if this caller itself is cancelled.
+            await asyncio.wait([batch.future])
+            if not batch.future.cancelled() and batch.future.exception() is None:
+                _joined(db, key)
+                return _detached(batch.future.result()), []
+            logger.warning(f"Coalesced recompute failed for {event.company_id}, recomputing alone")
+            self.recomputes += 1
+            score = await recalculate_company_score(db, event.company_id, event.tenant_id)
+            return score, [event]
+
+        loop = asyncio.get_running_loop()
+        batch = self._pending[key] = _Batch(loop.create_future(), event)
+        try:
+            delay = self._last_run.get(key, float("-inf")) + window - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            # From here on new events start the next batch.
+            del self._pending[key]
+            self._last_run[key] = loop.time()
+            self.recomputes += 1
+            score = await recalculate_company_score(db, event.company_id, event.tenant_id)
+        except asyncio.CancelledError:
+            if self._pending.get(key) is batch:
+                del self._pending[key]
+            batch.future.cancel()
+            raise
+        except Exception as e:
+            if self._pending.get(key) is batch:
+                del self._pending[key]
+            batch.future.set_exception(e)
+            # Followers recompute on their own; mark the exception retrieved.
+            batch.future.exception()
+            raise
+        batch.future.set_result(score)
+        if len(batch.events) > 1:
+            _joined(db, key)
+        self._prune(loop.time() - window)
+        return score, batch.events
+
+    def rescore_later(self, tenant_id: str, company_id: str):
+        """Rescore the company in a session of its own, after a session whose
+        events went into a coalesced score did not commit."""
+        try:
+            task = asyncio.get_running_loop().create_task(self._rescore(tenant_id, company_id))
+        except RuntimeError:
+            logger.warning(f"No event loop to rescore {company_id} after a rolled-back batch")
+            return
+        self._rescores.add(task)
+        task.add_done_callback(self._rescores.discard)
+
+    async def drain(self):
+        """Wait for rescores in flight (in tests)."""
+        if self._rescores:
+            await asyncio.wait(set(self._rescores))
+
+    async def _rescore(self, tenant_id: str, company_id: str):
+        try:
+            async with (self._session_factory or async_session)() as db:
+                await recalculate_company_score(db, company_id, tenant_id)
+                await db.commit()
+            self.rescores += 1
+        except Exception as e:
+            logger.error(f"Rescore of {company_id} after a rolled-back batch failed: {e}")
+
+    def _prune(self, older_than: float):
+        if len(self._last_run) > 10_000:
+            self._last_run = {k: t for k, t in self._last_run.items() if t >= older_than}
+
+
+def _joined(db: AsyncSession, key: Tuple[str, str]):
+    db.info.setdefault(BATCH_KEY, set()).add(key)
+
+
+def _detached(score: ESGScore) -> ESGScore:
+    """A copy of ``score`` outside any session (the same id and values)."""
+    return ESGScore(**{column.key: getattr(score, column.key) for column in ESGScore.__table__.columns})
+
+
+@sa_event.listens_for(Session, "after_commit")
+def _batch_committed(session: Session):
+    session.info.pop(BATCH_KEY, None)
+
+
+@sa_event.listens_for(Session, "after_transaction_end")
+def _batch_not_committed(session: Session, transaction):
+    # Runs after _batch_committed, so anything left here was not committed.
+    if transaction.parent is not None:
+        return
+    for tenant_id, company_id in session.info.pop(BATCH_KEY, ()):
+        score_coalescer.rescore_later(tenant_id, company_id)
+
+
+score_coalescer = ScoreCoalescer()
@@ -0,0 +1,243 @@
+"""
+Background worker pool for asynchronous ingest.
+
+``POST /v1/ingest/events?mode=async`` commits the raw event with
+``is_processed=False`` and hands its id to this pool, which runs
+``process_event`` in a session of its own and commits. The pool is a keyed
+executor (workers/keyed_executor) with INGEST_WORKERS lanes keyed by
+company_id: a company's events are processed one at a time in the order
+they arrived, so its score rows are written in order, while other
+companies' events run in parallel. The lanes share INGEST_MAX_PENDING
+between them; a full lane refuses new events. A failure rolls the pipeline
+back and stores the error on the event (``processing_error``), which takes
+it out of recovery.
+
+An event can be stored and then refused (its lane filled up between the
+ingest request's check and its commit, or recovery found more events than
+the lanes hold). After a refusal the pool re-runs recovery every
+INGEST_BACKFILL_INTERVAL_S, which queues what fits as the lanes drain,
+until a pass queues everything it finds.
+
+The lanes only hold ids and live in this process. On startup every event
+that is neither processed nor failed is queued again, so events accepted by
+a process that stopped before finishing them are not lost. With several API
+processes each one recovers the whole backlog; a worker skips events that
+are already processed when it gets to them, but two processes starting at
+once can still process the same event twice.
+"""
+import asyncio
+import logging
+import math
+import time
+from typing import Iterable, Optional, Set
+from sqlalchemy import select
+from app.core.config import get_settings
+from app.db.models import ESGEvent
+from app.db.session import async_session
+from app.workers.keyed_executor import KeyedExecutor
+from app.workers.pipeline import process_event
+from app.workers.scheduler import run_periodically
+
+logger = logging.getLogger(__name__)
+
+MAX_ERROR_CHARS = 1000
+
+
+class IngestPool:
+    def __init__(
+        self, workers: Optional[int] = None, session_factory=None, max_pending: Optional[int] = None,
+        backfill_interval_s: Optional[float] = None,
+    ):
+        self._workers = workers
+        self._max_pending = max_pending
+        self._backfill_interval_s = backfill_interval_s
+        self._session_factory = session_factory
+        self._executor: Optional[KeyedExecutor] = None
+        self._backfill: Optional[asyncio.Task] = None
+        self._refused = False  # an event was refused since the last recovery pass
+        self._queued: Set[str] = set()
+        self._processing: Set[str] = set()
+        self.submitted = 0
+        self.recovered = 0
+        self.rejected = 0
+        self.processed = 0
+        self.failed = 0
+        self.processing_seconds = 0.0
+
+    @property
+    def workers(self) -> int:
+        if self._workers is not None:
+            return self._workers
+        return get_settings().INGEST_WORKERS
+
+    @property
+    def running(self) -> bool:
+        return self._executor is not None and self._executor.running
+
+    @property
+    def pending(self) -> int:
+        return len(self._queued) + len(self._processing)
+
+    def start(self):
+        if self.running:
+            return
+        lanes = max(1, self.workers)
+        max_pending = self._max_pending or get_settings().INGEST_MAX_PENDING
+        self._executor = KeyedExecutor(self._run_one, lanes, math.ceil(max_pending / lanes), name="ingest")
+        self._executor.start()
+        self._refused = False
+        interval = self._backfill_interval_s
+        if interval is None:
+            interval = get_settings().INGEST_BACKFILL_INTERVAL_S
+        if interval > 0:
+            self._backfill = asyncio.create_task(run_periodically("ingest-backfill", interval, self.backfill))
+
+    async def stop(self, timeout: float = 10.0):
+        """Let in-flight events finish (up to ``timeout``); queued ones are
+        left for recovery on the next start."""
+        if self._executor is None:
+            return
+        if self._backfill is not None:
+            self._backfill.cancel()
+            await asyncio.gather(self._backfill, return_exceptions=True)
+            self._backfill = None
+        await self._executor.stop(timeout)
+        self._queued.clear()
+
+    def submit(self, event_id: str, company_id: str = "") -> bool:
+        """Queue a committed event on its company's lane. False when the
+        pool is stopped or the lane is full; the event stays unprocessed in
+        the DB and is queued by a later backfill pass (or, when stopped, by
+        the recovery at the next start)."""
+        if not self.running:
+            return False
+        if event_id in self._queued or event_id in self._processing:
+            return True
+        if not self._executor.submit(company_id, event_id):
+            self.rejected += 1
+            self._refused = True
+            return False
+        self._queued.add(event_id)
+        self.submitted += 1
+        return True
+
+    def accepts(self, company_ids: Iterable[str]) -> bool:
+        """Whether events of these companies would all be queued right now."""
+        return self.running and self._executor.has_room(company_ids)
+
+    def status(self, event_id: str) -> Optional[str]:
+        """Where this process is with the event: queued, processing or None."""
+        if event_id in self._processing:
+            return "processing"
+        if event_id in self._queued:
+            return "queued"
+        return None
+
+    async def recover(self) -> int:
+        """Queue every event that is neither processed nor failed, oldest first."""
+        async with self._session() as db:
+            result = await db.execute(
+                select(ESGEvent.id, ESGEvent.company_id)
+                .where(ESGEvent.is_processed == False, ESGEvent.processing_error.is_(None))  # noqa: E712
+                .order_by(ESGEvent.created_at)
+            )
+            rows = list(result)
+        submitted = self.submitted
+        for row in rows:
+            self.submit(row.id, row.company_id)
+        queued = self.submitted - submitted  # not counting events already queued here
+        self.recovered += queued
+        if rows:
+            logger.info(f"Recovered {queued} of {len(rows)} unprocessed events for async ingest")
+        return queued
+
+    async def backfill(self) -> int:
+        """Recover again if an event was refused since the last pass. Only
+        then: another process's backlog is that process's to recover."""
+        if not self._refused or not self.running:
+            return 0
+        self._refused = False
+        return await self.recover()
+
+    async def drain(self):
+        """Wait until every queued event has been processed."""
+        if self._executor is not None:
+            await self._executor.drain()
+
+    def stats(self) -> dict:
+        done = self.processed + self.failed
+        executor = self._executor.stats() if self._executor else {}
+        return {
+            "workers": executor.get("lanes", 0) if self.running else 0,
+            "queued": len(self._queued),
+            "processing": len(self._processing),
+            "submitted": self.submitted,
+            "recovered": self.recovered,
+            "rejected": self.rejected,
+            "processed": self.processed,
+            "failed": self.failed,
+            "avg_ms": round(self.processing_seconds / done * 1000, 2) if done else 0.0,
+            "lane_capacity": executor.get("capacity", 0),
+            "lanes": executor.get("lane_stats", []),
+        }
+
+    def _session(self):
+        return (self._session_factory or async_session)()
+
+    async def _run_one(self, event_id: str) -> bool:
+        self._queued.discard(event_id)
+        self._processing.add(event_id)
+        try:
+            return await self._process(event_id)
+        finally:
+            self._processing.discard(event_id)
+
+    async def _process(self, event_id: str) -> bool:
+        started = time.perf_counter()
+        error = None
+        async with self._session() as db:
+            event = await db.get(ESGEvent, event_id)
+            if event is None or event.is_processed or event.processing_error:
+                return True
+            try:
+                # A lane never holds two events of one company at once, so
+                # there is nothing to coalesce with; waiting would stall the lane.
+                await process_event(db, event, coalesce=False)
+                await db.commit()
+            except asyncio.CancelledError:
+                await db.rollback()
+                raise
+            except Exception as e:
+                await db.rollback()
+                error = f"{type(e).__name__}: {e}"[:MAX_ERROR_CHARS]
+        self.processing_seconds += time.perf_counter() - started
+        if error is None:
+            self.processed += 1
+            return True
+        self.failed += 1
+        await record_failure(self._session, event_id, error)
+        return False
+
+
+async def record_failure(session_factory, event_id: str, error: str):
+    """Store why processing gave up on an event, which takes it out of recovery."""
+    try:
+        async with session_factory() as db:
+            event = await db.get(ESGEvent, event_id)
+            if event is not None:
+                event.processing_error = error[:MAX_ERROR_CHARS]
+                await db.commit()
+    except Exception as e:
+        logger.error(f"Could not record ingest failure for event {event_id}: {e}")
+
+
+def get_ingest_queue():
+    """Where async ingest sends events: the staged pipeline when
+    PIPELINE_BROKER is set, otherwise the worker pool."""
+    if get_settings().PIPELINE_BROKER:
+        from app.workers.stages import staged_pipeline
+        return staged_pipeline
+    return ingest_pool
+
+
+ingest_pool = IngestPool()
@@ -7,7 +7,9 @@ Topics:
 - classified: Events after ESG classification
 - scored_updates: Final scored updates for live distribution
 
-This is scaffolding only. MVP uses the sequential pipeline worker.
+Every topic is keyed by company_id. The stages consuming them run on the
+local brokers in workers/broker.py (see workers/stages.py); a Kafka broker
+would implement the same interface on top of the stubs below.
 """
 
 TOPICS = {
@@ -46,23 +48,3 @@ class KafkaConsumerStub:
 
     async def consume(self, topic: str, group_id: str):
         raise NotImplementedError("Kafka mode not implemented. Use MVP worker mode.")
-
-
-class RawEventsConsumer(KafkaConsumerStub):
-    """Consumes from raw_events, normalizes, produces to normalized."""
-    pass
-
-
-class NormalizedConsumer(KafkaConsumerStub):
-    """Consumes from normalized, classifies, produces to classified."""
-    pass
-
-
-class ClassifiedConsumer(KafkaConsumerStub):
-    """Consumes from classified, scores, produces to scored_updates."""
-    pass
-
-
-class ScoredUpdatesConsumer(KafkaConsumerStub):
-    """Consumes from scored_updates, publishes to WebSocket via Redis."""
-    pass
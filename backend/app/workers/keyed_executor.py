@@ -0,0 +1,173 @@
+"""
+Keyed executor: per-key ordering, cross-key parallelism.
+
+Each item is submitted with a key (a company_id) that is hashed to one of N
+lanes. A lane is a bounded queue drained by a single task, so items with the
+same key run one at a time in submission order, and items of keys on
+different lanes run in parallel. A full lane refuses new items (``submit``
+returns False) instead of growing, which callers turn into backpressure.
+
+Ordering is what matters for the score pipeline: two events of one company
+processed concurrently can finish their recomputes out of order and write
+ESGScore rows in the wrong order. Throughput scales with the lane count as
+long as the keys spread over the lanes; a single hot key is limited to one
+lane.
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+from app.workers.broker import partition_for
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[Any], Awaitable[Optional[bool]]]
+
+
+class _Lane:
+    __slots__ = ("index", "queue", "task", "current", "processed", "failed", "dropped", "seconds", "max_depth")
+
+    def __init__(self, index: int, capacity: int):
+        self.index = index
+        self.queue: asyncio.Queue = asyncio.Queue(capacity)
+        self.task: Optional[asyncio.Task] = None
+        self.current: Any = None
+        self.processed = 0
+        self.failed = 0
+        self.dropped = 0
+        self.seconds = 0.0
+        self.max_depth = 0
+
+    def stats(self) -> dict:
+        done = self.processed + self.failed
+        return {
+            "lane": self.index,
+            "depth": self.queue.qsize(),
+            "max_depth": self.max_depth,
+            "busy": self.current is not None,
+            "processed": self.processed,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "avg_ms": round(self.seconds / done * 1000, 2) if done else 0.0,
+        }
+
+
+class KeyedExecutor:
+    """Runs ``handler(item)`` on ``lanes`` lanes of at most ``capacity``
+    queued items each. A handler that returns False or raises (logged) counts
+    as failed; the lane moves on to its next item."""
+
+    def __init__(self, handler: Handler, lanes: int, capacity: int, name: str = "keyed"):
+        self.handler = handler
+        self.name = name
+        self.capacity = max(1, capacity)
+        self._lanes = [_Lane(i, self.capacity) for i in range(max(1, lanes))]
+        self._stopping = False
+
+    @property
+    def lanes(self) -> int:
+        return len(self._lanes)
+
+    @property
+    def running(self) -> bool:
+        return self._lanes[0].task is not None and not self._stopping
+
+    @property
+    def pending(self) -> int:
+        """Items queued or being handled."""
+        return sum(lane.queue.qsize() + (lane.current is not None) for lane in self._lanes)
+
+    def lane_for(self, key: str) -> int:
+        return partition_for(key or "", len(self._lanes))
+
+    def start(self):
+        if self.running:
+            return
+        self._stopping = False
+        for lane in self._lanes:
+            # A fresh queue: a lane cancelled by stop() left its wake-up
+            # sentinel behind, which would end the new task at once.
+            lane.queue = asyncio.Queue(self.capacity)
+            lane.task = asyncio.create_task(self._run(lane))
+
+    async def stop(self, timeout: float = 10.0) -> List[Any]:
+        """Let the item in hand on each lane finish (up to ``timeout``) and
+        return the queued items that were never started."""
+        if self._lanes[0].task is None:
+            return []
+        self._stopping = True
+        dropped = []
+        for lane in self._lanes:
+            while not lane.queue.empty():
+                dropped.append(lane.queue.get_nowait())
+                lane.queue.task_done()
+            lane.queue.put_nowait(None)  # wakes an idle lane
+        tasks = [lane.task for lane in self._lanes]
+        _, unfinished = await asyncio.wait(tasks, timeout=timeout)
+        for task in unfinished:
+            task.cancel()
+        await asyncio.gather(*unfinished, return_exceptions=True)
+        for lane in self._lanes:
+            lane.task = None
+            lane.current = None
+        return [item for item in dropped if item is not None]
+
+    def submit(self, key: str, item: Any) -> bool:
+        """Queue ``item`` on its key's lane; False when stopped or the lane is full."""
+        if not self.running:
+            return False
+        lane = self._lanes[self.lane_for(key)]
+        try:
+            lane.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            lane.dropped += 1
+            return False
+        lane.max_depth = max(lane.max_depth, lane.queue.qsize())
+        return True
+
+    def has_room(self, keys: Iterable[str]) -> bool:
+        """Whether every one of ``keys`` would be accepted right now."""
+        if not self.running:
+            return False
+        needed: Dict[int, int] = {}
+        for key in keys:
+            index = self.lane_for(key)
+            needed[index] = needed.get(index, 0) + 1
+        return all(self._lanes[i].queue.qsize() + n <= self.capacity for i, n in needed.items())
+
+    async def drain(self):
+        """Wait until every queued item has been handled."""
+        for lane in self._lanes:
+            await lane.queue.join()
+
+    def stats(self) -> dict:
+        return {
+            "lanes": len(self._lanes),
+            "capacity": self.capacity,
+            "pending": self.pending,
+            "lane_stats": [lane.stats() for lane in self._lanes],
+        }
+
+    async def _run(self, lane: _Lane):
+        while True:
+            item = await lane.queue.get()
+            try:
+                if item is None:
+                    return
+                lane.current = item
+                started = time.perf_counter()
+                try:
+                    if await self.handler(item) is False:
+                        lane.failed += 1
+                    else:
+                        lane.processed += 1
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    lane.failed += 1
+                    logger.error(f"{self.name} lane {lane.index} failed on {item!r}: {e}")
+                finally:
+                    lane.seconds += time.perf_counter() - started
+                    lane.current = None
+            finally:
+                lane.queue.task_done()
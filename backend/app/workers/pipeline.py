@@ -2,94 +2,285 @@
 Event Processing Pipeline (MVP Worker Mode)
 
 Steps:
-1. Ingest raw event
+1. Ingest raw event; near-duplicates of a recent event are linked to it and stop here
 2. Classify (LLM or rule-based)
-3. Store RAG document + create embedding
-4. Recalculate company score
-5. Evaluate alert rules
-6. Publish live update via Redis pubsub
+3. Store RAG document + create embedding (indexed after commit; without a real
+   embedding the document is only keyword-indexed and left for re-embedding)
+4. Recalculate company score (coalesced per company during bursts)
+5. Evaluate alert rules (delivery happens in the background after commit)
+6. Publish live update via Redis pubsub (once per recompute)
+
+Steps 2-6 run as a small dependency graph (run_stages): the embedding does
+not need the classification, so steps 2 and 3 overlap, and alerts and the
+live update both only wait for the score. Only the score and alert steps
+use the DB session, and never at the same time. Stage and end-to-end wall
+times are kept in ``stage_timings`` (/v1/metrics pipeline_stages).
+
+process_event runs every step for one event (sync ingest, ingest pool).
+The staged pipeline (workers/stages) runs the same helpers as separate
+stages: find_canonical/link_duplicate, classification, score_classified,
+then live_update/publish_live_update.
 """
+import asyncio
 import json
 import logging
+import time
 from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.db.models import ESGEvent, RAGDocument
+from app.core.config import get_settings
+from app.db.models import ESGEvent, ESGScore, RAGDocument, new_uuid
 from app.services.classifier import classify_event
-from app.services.scoring import recalculate_company_score
+from app.services.dedup import CanonicalEvent, near_duplicates
+from app.services.score_state import score_engine
+from app.workers.coalescer import score_coalescer
 from app.services.alerts import evaluate_alerts_for_event
-from app.services.rag import upsert_document
+from app.services.answer_cache import answer_cache
+from app.services.rag import create_embedding, index_after_commit, is_mock_embedding
 from app.db.redis import redis_client
 
 logger = logging.getLogger(__name__)
 
+# (names of the stages it waits for, coroutine function of their results)
+Stage = Tuple[Tuple[str, ...], Callable[[Dict[str, Any]], Awaitable[Any]]]
 
-async def process_event(db: AsyncSession, event: ESGEvent):
-    try:
-        classification = await classify_event(event.title, event.description or "")
-        event.category = classification.get("category", event.category or "governance")
-        event.subcategory = classification.get("subcategory", "")
-        event.severity = classification.get("severity", 5)
-        event.confidence = classification.get("confidence", 0.7)
-        event.sentiment = classification.get("sentiment", "negative")
-        event.classification_json = classification
-        event.is_processed = True
-        await db.flush()
-
-        rag_doc = RAGDocument(
-            tenant_id=event.tenant_id,
-            company_id=event.company_id,
-            event_id=event.id,
-            title=event.title,
-            content=f"{event.title}. {event.description or ''}",
-            source_url=event.source_url or "",
-        )
-        db.add(rag_doc)
-        await db.flush()
-
-        await upsert_document(
-            doc_id=rag_doc.id,
-            text=rag_doc.content,
-            metadata={
-                "tenant_id": event.tenant_id,
-                "company_id": event.company_id,
-                "title": event.title,
-                "source_url": event.source_url or "",
-                "ts": event.event_date.isoformat() if event.event_date else "",
-                "text": rag_doc.content[:500],
-            },
-        )
-
-        new_score = await recalculate_company_score(db, event.company_id, event.tenant_id)
-
-        await evaluate_alerts_for_event(db, event, new_score, event.tenant_id)
-
-        live_update = {
-            "type": "score_update",
-            "company_id": event.company_id,
-            "tenant_id": event.tenant_id,
-            "score": {
-                "overall": new_score.overall,
-                "environmental": new_score.environmental,
-                "social": new_score.social,
-                "governance": new_score.governance,
-                "risk_level": new_score.risk_level,
-            },
-            "event": {
-                "id": event.id,
-                "title": event.title,
-                "category": event.category,
-                "severity": event.severity,
-                "sentiment": event.sentiment,
-            },
+
+class StageTimings:
+    """Wall time per stage, and per graph run under the graph's name."""
+
+    def __init__(self):
+        self._totals: Dict[str, List[float]] = {}  # name -> [runs, seconds, max seconds]
+
+    def record(self, name: str, seconds: float):
+        totals = self._totals.setdefault(name, [0, 0.0, 0.0])
+        totals[0] += 1
+        totals[1] += seconds
+        totals[2] = max(totals[2], seconds)
+
+    def stats(self) -> dict:
+        return {
+            name: {"runs": int(runs), "avg_ms": round(seconds / runs * 1000, 2), "max_ms": round(peak * 1000, 2)}
+            for name, (runs, seconds, peak) in sorted(self._totals.items())
         }
-        try:
-            await redis_client.publish("esg:live", json.dumps(live_update))
-        except Exception as e:
-            logger.warning(f"Redis publish failed (non-critical): {e}")
+
+
+stage_timings = StageTimings()
+
+
+async def run_stages(stages: Dict[str, Stage], name: str) -> Dict[str, Any]:
+    """Run each stage as soon as the stages it names have finished, with the
+    results so far; independent stages overlap. The first failure cancels
+    the others and is raised. Returns every stage's result."""
+    started = time.perf_counter()
+    results: Dict[str, Any] = {}
+    tasks: Dict[str, asyncio.Task] = {}
+
+    async def run(stage: str, deps: Tuple[str, ...], fn) -> Any:
+        for dep in deps:
+            await tasks[dep]
+        stage_started = time.perf_counter()
+        results[stage] = await fn(results)
+        stage_timings.record(stage, time.perf_counter() - stage_started)
+
+    for stage, (deps, fn) in stages.items():
+        tasks[stage] = asyncio.ensure_future(run(stage, deps, fn))
+    try:
+        await asyncio.gather(*tasks.values())
+    except BaseException:
+        for task in tasks.values():
+            task.cancel()
+        await asyncio.gather(*tasks.values(), return_exceptions=True)
+        raise
+    stage_timings.record(name, time.perf_counter() - started)
+    return results
+
+
+async def process_event(db: AsyncSession, event: ESGEvent, coalesce: bool = True) -> Optional[ESGScore]:
+    try:
+        canonical = find_canonical(event)
+        if canonical is not None:
+            return await link_duplicate(db, event, canonical)
+
+        stages = _scoring_stages(db, event, None, coalesce)
+        stages["publish"] = (("score",), lambda r: _publish_folded(*r["score"]))
+        new_score, _ = (await run_stages(stages, "event"))["score"]
 
         logger.info(f"Processed event {event.id} for company {event.company_id}")
         return new_score
 
     except Exception as e:
+        near_duplicates.discard(event.id)
         logger.error(f"Pipeline failed for event {event.id}: {e}")
         raise
+
+
+def find_canonical(event: ESGEvent) -> Optional[CanonicalEvent]:
+    """Step 1: the recent event ``event`` near-duplicates, if any."""
+    if not get_settings().DEDUP_ENABLED:
+        return None
+    canonical = near_duplicates.check(
+        event.tenant_id, event.company_id, event.id,
+        event.title, event.description or "", event.event_date,
+    )
+    # A redelivered event (staged pipeline) matches its own earlier entry.
+    if canonical is not None and canonical.event_id == event.id:
+        return None
+    return canonical
+
+
+async def score_classified(
+    db: AsyncSession, event: ESGEvent, classification: dict, coalesce: bool = True
+) -> Tuple[ESGScore, List[ESGEvent]]:
+    """Steps 3-5 for a classified event. Returns the company's new score and
+    the events folded into its recompute (empty when another caller ran it
+    and publishes the live update)."""
+    return (await run_stages(_scoring_stages(db, event, classification, coalesce), "scoring"))["score"]
+
+
+def _scoring_stages(
+    db: AsyncSession, event: ESGEvent, classification: Optional[dict], coalesce: bool
+) -> Dict[str, Stage]:
+    """Steps 2-5; step 2 only when ``classification`` is not known yet."""
+    # Added up front, not inside a stage, so no stage touches the session
+    # while the score stage is using it.
+    rag_doc = RAGDocument(
+        id=new_uuid(),
+        tenant_id=event.tenant_id,
+        company_id=event.company_id,
+        event_id=event.id,
+        title=event.title,
+        content=f"{event.title}. {event.description or ''}",
+        source_url=event.source_url or "",
+    )
+    db.add(rag_doc)
+
+    stages: Dict[str, Stage] = {}
+    if classification is None:
+        stages["classify"] = ((), lambda r: classify_event(event.title, event.description or ""))
+    stages["embed"] = ((), lambda r: _embed_document(db, event, rag_doc))
+    stages["score"] = (
+        ("classify",) if classification is None else (),
+        lambda r: _score(db, event, r.get("classify", classification), coalesce),
+    )
+    stages["alerts"] = (("score",), lambda r: evaluate_alerts_for_event(db, event, r["score"][0], event.tenant_id))
+    return stages
+
+
+async def _embed_document(db: AsyncSession, event: ESGEvent, rag_doc: RAGDocument):
+    """Step 3. The document is indexed only once ``db`` commits. A failed
+    embedding does not fail the event, and neither a failure nor the API's
+    mock fallback puts a vector in the store: the document only goes into
+    the keyword index and keeps an empty ``embedding_id``, which marks it for
+    re-embedding."""
+    embedding = None
+    try:
+        embedding = await create_embedding(rag_doc.content)
+    except Exception as e:
+        logger.warning(f"Embedding failed for RAG document {rag_doc.id} of event {event.id}: {e}")
+    if embedding is not None and is_mock_embedding(embedding) and get_settings().AZURE_OPENAI_API_KEY:
+        logger.warning(f"Embedding API unavailable, RAG document {rag_doc.id} is left for re-embedding")
+        embedding = None
+    if embedding is not None:
+        rag_doc.embedding_id = rag_doc.id  # the vector is stored under the document id
+    index_after_commit(
+        db,
+        doc_id=rag_doc.id,
+        text=rag_doc.content,
+        metadata={
+            "tenant_id": event.tenant_id,
+            "company_id": event.company_id,
+            "title": event.title,
+            "source_url": event.source_url or "",
+            "ts": event.event_date.isoformat() if event.event_date else "",
+            "text": rag_doc.content[:500],
+        },
+        embedding=embedding,
+    )
+
+
+async def _score(
+    db: AsyncSession, event: ESGEvent, classification: dict, coalesce: bool
+) -> Tuple[ESGScore, List[ESGEvent]]:
+    near_duplicates.resolve(event.id, classification)
+    _apply_classification(event, classification)
+    answer_cache.invalidate(event.tenant_id, event.company_id)
+    score_engine.add_event(event, db)  # taken out again if db does not commit
+    # No flush before the recompute: it may wait out the coalescing window,
+    # and a flushed session would hold SQLite's write lock meanwhile.
+    return await score_coalescer.recompute(db, event, coalesce)
+
+
+async def _publish_folded(score: ESGScore, folded_events: List[ESGEvent]):
+    if folded_events:
+        await publish_live_update(live_update(score, folded_events))
+
+
+def _apply_classification(event: ESGEvent, classification: dict):
+    event.category = classification.get("category", event.category or "governance")
+    event.subcategory = classification.get("subcategory", "")
+    event.severity = classification.get("severity", 5)
+    event.confidence = classification.get("confidence", 0.7)
+    event.sentiment = classification.get("sentiment", "negative")
+    event.classification_json = classification
+    event.is_processed = True
+
+
+async def link_duplicate(db: AsyncSession, event: ESGEvent, canonical: CanonicalEvent) -> Optional[ESGScore]:
+    """Store a near-duplicate with its canonical event's classification.
+
+    It gets no RAG document, is not scored (score queries skip duplicates, so
+    syndicated copies do not inflate the repetition factor) and raises no
+    alerts; the company's latest score is returned unchanged.
+    """
+    classification = canonical.classification
+    if classification is None:
+        # The canonical event is still being classified.
+        classification = await classify_event(event.title, event.description or "")
+    _apply_classification(event, dict(classification))
+    event.duplicate_of = canonical.event_id
+    await db.flush()
+    logger.info(f"Event {event.id} is a near-duplicate of {canonical.event_id}")
+
+    result = await db.execute(
+        select(ESGScore)
+        .where(ESGScore.tenant_id == event.tenant_id, ESGScore.company_id == event.company_id)
+        .order_by(ESGScore.recorded_at.desc())
+        .limit(1)
+    )
+    return result.scalar_one_or_none()
+
+
+def _event_summary(event: ESGEvent) -> dict:
+    return {
+        "id": event.id,
+        "title": event.title,
+        "category": event.category,
+        "severity": event.severity,
+        "sentiment": event.sentiment,
+    }
+
+
+def live_update(score: ESGScore, events: List[ESGEvent]) -> dict:
+    return {
+        "type": "score_update",
+        "company_id": score.company_id,
+        "tenant_id": score.tenant_id,
+        "score": {
+            "overall": score.overall,
+            "environmental": score.environmental,
+            "social": score.social,
+            "governance": score.governance,
+            "risk_level": score.risk_level,
+        },
+        "event": _event_summary(events[-1]),
+        "events": [_event_summary(e) for e in events],
+    }
+
+
+async def publish_live_update(update: dict):
+    """Step 6."""
+    try:
+        await redis_client.publish("esg:live", json.dumps(update))
+    except Exception as e:
+        logger.warning(f"Redis publish failed (non-critical): {e}")
@@ -0,0 +1,28 @@
+"""
+Periodic background jobs started from the FastAPI lifespan.
+"""
+import asyncio
+import logging
+from app.db.session import async_session
+from app.services.bulk_scoring import rescore_universe
+
+logger = logging.getLogger(__name__)
+
+
+async def run_periodically(name: str, interval_s: float, job):
+    """Run ``job()`` every ``interval_s`` seconds until cancelled."""
+    while True:
+        await asyncio.sleep(interval_s)
+        try:
+            await job()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Periodic job {name} failed: {e}")
+
+
+async def rescore_all_tenants():
+    async with async_session() as db:
+        count = await rescore_universe(db)
+        await db.commit()
+    logger.info(f"Scheduled rescore wrote {count} scores")
@@ -0,0 +1,381 @@
+"""
+Staged event pipeline on a message broker.
+
+The steps of ``process_event`` run as four independent stages connected by
+the topics of ``kafka_scaffold.TOPICS``, all keyed by company_id:
+
+  raw_events -> RawEventsConsumer (normalize, near-duplicate check)
+  normalized -> NormalizedConsumer (classify a batch per LLM request)
+  classified -> ClassifiedConsumer (RAG document, score, alerts; commits)
+  scored_updates -> ScoredUpdatesConsumer (live update via Redis)
+
+Each stage is a consumer group with its own number of consumer tasks
+(PIPELINE_*_CONSUMERS). A consumer owns a fixed share of the topic's
+partitions, so a company's records are handled by one consumer at a time
+and in order. A consumer handles a polled batch, produces its outputs and
+then commits the next offset, so delivery is at least once. A redelivered
+event is skipped by the stages that touch the DB once it is processed, and
+classification is cached. Slow classification therefore only delays the
+classify stage, and scoring keeps draining what is already classified.
+
+With PIPELINE_BROKER set, async ingest (POST /v1/ingest/events?mode=async
+and /bulk) produces to raw_events instead of using the ingest pool. A
+record whose processing raises is committed past and its error stored on
+the event, as in the ingest pool.
+"""
+import asyncio
+import logging
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from sqlalchemy import select
+from app.core.config import get_settings
+from app.db.models import ESGEvent
+from app.db.session import async_session
+from app.services.classifier import classify_events
+from app.services.dedup import near_duplicates
+from app.workers.broker import Broker, Record, create_broker
+from app.workers.ingest_pool import record_failure
+from app.workers.pipeline import (
+    find_canonical, link_duplicate, live_update, publish_live_update, score_classified,
+)
+
+logger = logging.getLogger(__name__)
+
+POLL_TIMEOUT_S = 0.5
+
+Output = Optional[Tuple[str, Any]]  # (key, value) for the next topic
+
+
+def _clean(text: str) -> str:
+    return " ".join((text or "").split())
+
+
+def _unprocessed(event: Optional[ESGEvent]) -> bool:
+    return event is not None and not event.is_processed and not event.processing_error
+
+
+class StageConsumer(ABC):
+    name = ""
+    source = ""
+    sink: Optional[str] = None
+    concurrent = False  # handle a polled batch concurrently instead of in order
+
+    def __init__(self, pipeline: "StagedPipeline", consumers: int, batch: int = 16):
+        self.pipeline = pipeline
+        self.consumers = max(1, consumers)
+        self.batch = max(1, batch)
+        self.group = f"esg-{self.name}"
+        self.in_flight: Set[str] = set()
+        self.processed = 0
+        self.skipped = 0
+        self.failed = 0
+        self.seconds = 0.0
+
+    def lag(self) -> int:
+        broker = self.pipeline.broker
+        return sum(
+            broker.end_offset(self.source, p) - broker.committed(self.group, self.source, p)
+            for p in range(broker.topics[self.source])
+        )
+
+    def stats(self) -> dict:
+        done = self.processed + self.failed
+        return {
+            "consumers": self.consumers,
+            "lag": self.lag() if self.pipeline.broker else 0,
+            "in_flight": len(self.in_flight),
+            "processed": self.processed,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "avg_ms": round(self.seconds / done * 1000, 2) if done else 0.0,
+        }
+
+    async def run(self, index: int):
+        """One consumer task: poll its partitions until the pipeline stops."""
+        broker = self.pipeline.broker
+        partitions = [p for p in range(broker.topics[self.source]) if p % self.consumers == index]
+        if not partitions:
+            return
+        positions = {p: broker.committed(self.group, self.source, p) for p in partitions}
+        turn = 0
+        while not self.pipeline.stopping:
+            # Start each poll at the next partition so a busy one cannot starve the rest.
+            turn = (turn + 1) % len(partitions)
+            order = partitions[turn:] + partitions[:turn]
+            records = await broker.fetch(self.source, {p: positions[p] for p in order}, self.batch, POLL_TIMEOUT_S)
+            by_partition: Dict[int, List[Record]] = {}
+            for record in records:
+                by_partition.setdefault(record.partition, []).append(record)
+            batches = list(by_partition.values())
+            if self.concurrent:
+                # Partitions hold different companies; their batches can overlap
+                # (and wait out a coalescing window together).
+                handled = await asyncio.gather(*(self._handle(batch) for batch in batches))
+            else:
+                handled = [await self._handle(batch) for batch in batches]
+            for batch, outputs in zip(batches, handled):
+                partition = batch[0].partition
+                for output in outputs:
+                    if output is not None and self.sink:
+                        broker.produce(self.sink, *output)
+                positions[partition] = batch[-1].offset + 1
+                broker.commit(self.group, self.source, partition, positions[partition])
+
+    async def _handle(self, records: List[Record]) -> List[Output]:
+        if not self.concurrent:
+            return [await self._handle_one(r) for r in records]
+        # An event submitted twice (recovery racing ingest) must not be
+        # handled twice at once; later copies in order see it processed.
+        first: Dict[Any, int] = {}
+        for i, r in enumerate(records):
+            first.setdefault(r.value.get("event_id", i) if isinstance(r.value, dict) else i, i)
+        unique = sorted(first.values())
+        outputs = await asyncio.gather(*(self._handle_one(records[i]) for i in unique))
+        by_index = dict(zip(unique, outputs))
+        return [by_index.get(i) for i in range(len(records))]
+
+    async def _handle_one(self, record: Record) -> Output:
+        event_id = record.value.get("event_id") if isinstance(record.value, dict) else None
+        if event_id:
+            self.in_flight.add(event_id)
+        started = time.perf_counter()
+        try:
+            output = await self.handle(record)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.failed += 1
+            logger.error(f"Stage {self.name} failed for record {record.topic}/{record.partition}@{record.offset}: {e}")
+            if event_id:
+                near_duplicates.discard(event_id)
+                await record_failure(self.pipeline.session_factory, event_id, f"{type(e).__name__}: {e}")
+            return None
+        finally:
+            self.seconds += time.perf_counter() - started
+            if event_id:
+                self.in_flight.discard(event_id)
+        self.processed += 1
+        return output
+
+    @abstractmethod
+    async def handle(self, record: Record) -> Output:
+        """The record's output for the sink topic, or None."""
+
+
+class RawEventsConsumer(StageConsumer):
+    """Normalizes the stored event into the pipeline's payload and links
+    near-duplicates, which stop here."""
+    name = "normalize"
+    source = "raw_events"
+    sink = "normalized"
+
+    async def handle(self, record: Record) -> Output:
+        async with self.pipeline.session_factory() as db:
+            event = await db.get(ESGEvent, record.value["event_id"])
+            if not _unprocessed(event):
+                self.skipped += 1
+                return None
+            canonical = find_canonical(event)
+            if canonical is not None:
+                await link_duplicate(db, event, canonical)
+                await db.commit()
+                return None
+            return event.company_id, {
+                "event_id": event.id,
+                "tenant_id": event.tenant_id,
+                "company_id": event.company_id,
+                "title": _clean(event.title),
+                "description": _clean(event.description),
+            }
+
+
+class NormalizedConsumer(StageConsumer):
+    """Classifies a polled batch with one LLM request per chunk."""
+    name = "classify"
+    source = "normalized"
+    sink = "classified"
+
+    async def _handle(self, records: List[Record]) -> List[Output]:
+        event_ids = [r.value["event_id"] for r in records]
+        self.in_flight.update(event_ids)
+        started = time.perf_counter()
+        try:
+            classifications = await classify_events([(r.value["title"], r.value["description"]) for r in records])
+        except Exception as e:
+            # classify_events falls back to rules itself; this is a bug, not an outage.
+            logger.error(f"Stage classify failed for a batch of {len(records)}: {e}")
+            classifications = [None] * len(records)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.in_flight.difference_update(event_ids)
+        outputs: List[Output] = []
+        for record, classification in zip(records, classifications):
+            if classification is None:
+                self.failed += 1
+                outputs.append(None)
+                await record_failure(self.pipeline.session_factory, record.value["event_id"], "classification failed")
+            else:
+                self.processed += 1
+                outputs.append((record.key, {**record.value, "classification": classification}))
+        return outputs
+
+    async def handle(self, record: Record) -> Output:
+        return (await self._handle([record]))[0]
+
+
+class ClassifiedConsumer(StageConsumer):
+    """Stores the classification, RAG document and new score and evaluates
+    alerts. A polled batch is handled concurrently so events of one company
+    share a coalesced recompute."""
+    name = "score"
+    source = "classified"
+    sink = "scored_updates"
+    concurrent = True
+
+    async def handle(self, record: Record) -> Output:
+        async with self.pipeline.session_factory() as db:
+            event = await db.get(ESGEvent, record.value["event_id"])
+            if not _unprocessed(event):
+                self.skipped += 1
+                return None
+            new_score, folded_events = await score_classified(db, event, record.value["classification"])
+            await db.commit()
+        logger.info(f"Processed event {event.id} for company {event.company_id}")
+        if not folded_events:
+            return None
+        return event.company_id, live_update(new_score, folded_events)
+
+
+class ScoredUpdatesConsumer(StageConsumer):
+    """Publishes live score updates to Redis."""
+    name = "publish"
+    source = "scored_updates"
+
+    async def handle(self, record: Record) -> Output:
+        await publish_live_update(record.value)
+        return None
+
+
+class StagedPipeline:
+    """Runs the stages and accepts events from async ingest (the same
+    interface as the ingest pool)."""
+
+    def __init__(self, broker: Optional[Broker] = None, session_factory=None):
+        self._broker = broker
+        self.broker: Optional[Broker] = broker
+        self.session_factory = session_factory or async_session
+        self.stages: List[StageConsumer] = []
+        self._tasks: List[asyncio.Task] = []
+        self.stopping = False
+        self.submitted = 0
+        self.recovered = 0
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks) and not self.stopping
+
+    @property
+    def pending(self) -> int:
+        """Events accepted but not scored yet."""
+        if self.broker is None:
+            return 0
+        return sum(stage.lag() for stage in self.stages if stage.source != "scored_updates")
+
+    def start(self):
+        if self._tasks:
+            return
+        settings = get_settings()
+        self.broker = self._broker or create_broker()
+        self.stopping = False
+        self.stages = [
+            RawEventsConsumer(self, settings.PIPELINE_NORMALIZE_CONSUMERS),
+            NormalizedConsumer(self, settings.PIPELINE_CLASSIFY_CONSUMERS, settings.PIPELINE_CLASSIFY_BATCH),
+            ClassifiedConsumer(self, settings.PIPELINE_SCORE_CONSUMERS),
+            ScoredUpdatesConsumer(self, settings.PIPELINE_PUBLISH_CONSUMERS),
+        ]
+        self._tasks = [
+            asyncio.create_task(stage.run(i)) for stage in self.stages for i in range(stage.consumers)
+        ]
+
+    async def stop(self, timeout: float = 10.0):
+        """Let consumers finish their current batch (up to ``timeout``);
+        anything uncommitted is delivered again after a restart."""
+        if not self._tasks:
+            return
+        self.stopping = True
+        _, unfinished = await asyncio.wait(self._tasks, timeout=timeout)
+        for task in unfinished:
+            task.cancel()
+        await asyncio.gather(*unfinished, return_exceptions=True)
+        self._tasks = []
+        if self._broker is None:
+            self.broker.close()
+            self.broker = None
+
+    def submit(self, event_id: str, company_id: str) -> bool:
+        if not self.running:
+            return False
+        self.broker.produce("raw_events", company_id, {"event_id": event_id})
+        self.submitted += 1
+        return True
+
+    def accepts(self, company_ids: Iterable[str]) -> bool:
+        """Whether these events fit under INGEST_MAX_PENDING."""
+        return self.running and self.pending + len(list(company_ids)) <= get_settings().INGEST_MAX_PENDING
+
+    def status(self, event_id: str) -> Optional[str]:
+        if any(event_id in stage.in_flight for stage in self.stages):
+            return "processing"
+        return None
+
+    async def recover(self) -> int:
+        """Produce every event that is neither processed nor failed and not
+        already waiting in a topic (after a restart with the memory broker,
+        or when the process stopped between committing an event and
+        producing it)."""
+        queued = self._queued_event_ids()
+        async with self.session_factory() as db:
+            result = await db.execute(
+                select(ESGEvent.id, ESGEvent.company_id)
+                .where(ESGEvent.is_processed == False, ESGEvent.processing_error.is_(None))  # noqa: E712
+                .order_by(ESGEvent.created_at)
+            )
+            rows = [row for row in result if row.id not in queued]
+        for row in rows:
+            self.submit(row.id, row.company_id)
+        self.recovered += len(rows)
+        if rows or queued:
+            logger.info(f"Staged pipeline resuming {len(queued)} queued events, recovered {len(rows)} more")
+        return len(rows)
+
+    async def drain(self, poll_s: float = 0.02):
+        """Wait until every submitted event has gone through every stage."""
+        while any(stage.lag() or stage.in_flight for stage in self.stages):
+            await asyncio.sleep(poll_s)
+
+    def stats(self) -> dict:
+        return {
+            "broker": type(self.broker).__name__ if self.broker else None,
+            "submitted": self.submitted,
+            "recovered": self.recovered,
+            "pending": self.pending,
+            "stages": {stage.name: stage.stats() for stage in self.stages},
+        }
+
+    def _queued_event_ids(self) -> Set[str]:
+        queued: Set[str] = set()
+        for stage in self.stages:
+            if stage.source == "scored_updates":
+                continue
+            for p in range(self.broker.topics[stage.source]):
+                offset = self.broker.committed(stage.group, stage.source, p)
+                end = self.broker.end_offset(stage.source, p)
+                while offset < end:
+                    records = self.broker.read(stage.source, p, offset, 1000)
+                    queued.update(r.value["event_id"] for r in records)
+                    offset += len(records)
+        return queued
+
+
+staged_pipeline = StagedPipeline()
@@ -0,0 +1,86 @@
+"""Upgrade tables of an existing database
+
+Adds what create_all does not add to tables that already exist:
+esg_events.processing_error (async ingest failures), esg_events.duplicate_of
+and its index (near-duplicate linking), and the rag_documents index that now
+includes created_at. Creates latest_scores and esg_score_rollups if missing
+(fill them with scripts.rebuild_score_tables).
+
+Every step checks the current schema first, so the upgrade can run on a
+database created by a newer create_all, and on an empty one (where seed
+creates everything) it does nothing.
+
+Revision ID: 3f2b9c1d7e40
+Revises:
+Create Date: 2026-10-17 10:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.db.models import ESGScoreRollup, LatestScore, StringUUID
+
+revision = '3f2b9c1d7e40'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def _columns(inspector, table: str) -> set:
+    return {c["name"] for c in inspector.get_columns(table)}
+
+
+def _indexes(inspector, table: str) -> set:
+    return {i["name"] for i in inspector.get_indexes(table)}
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if not inspector.has_table("esg_events"):
+        return
+
+    columns = _columns(inspector, "esg_events")
+    if "processing_error" not in columns:
+        op.add_column("esg_events", sa.Column("processing_error", sa.Text(), nullable=True))
+    if "duplicate_of" not in columns:
+        op.add_column("esg_events", sa.Column("duplicate_of", StringUUID(), nullable=True))
+    if "ix_esg_events_duplicate_of" not in _indexes(inspector, "esg_events"):
+        op.create_index("ix_esg_events_duplicate_of", "esg_events", ["duplicate_of"])
+
+    if inspector.has_table("rag_documents"):
+        indexes = _indexes(inspector, "rag_documents")
+        if "ix_rag_docs_tenant_company_created" not in indexes:
+            op.create_index(
+                "ix_rag_docs_tenant_company_created", "rag_documents", ["tenant_id", "company_id", "created_at"],
+            )
+        if "ix_rag_docs_tenant_company" in indexes:
+            op.drop_index("ix_rag_docs_tenant_company", table_name="rag_documents")
+
+    for model in (LatestScore, ESGScoreRollup):
+        model.__table__.create(bind, checkfirst=True)
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if not inspector.has_table("esg_events"):
+        return
+
+    for model in (ESGScoreRollup, LatestScore):
+        model.__table__.drop(bind, checkfirst=True)
+
+    if inspector.has_table("rag_documents"):
+        indexes = _indexes(inspector, "rag_documents")
+        if "ix_rag_docs_tenant_company" not in indexes:
+            op.create_index("ix_rag_docs_tenant_company", "rag_documents", ["tenant_id", "company_id"])
+        if "ix_rag_docs_tenant_company_created" in indexes:
+            op.drop_index("ix_rag_docs_tenant_company_created", table_name="rag_documents")
+
+    if "ix_esg_events_duplicate_of" in _indexes(inspector, "esg_events"):
+        op.drop_index("ix_esg_events_duplicate_of", table_name="esg_events")
+    columns = _columns(inspector, "esg_events")
+    with op.batch_alter_table("esg_events") as batch:
+        if "duplicate_of" in columns:
+            batch.drop_column("duplicate_of")
+        if "processing_error" in columns:
+            batch.drop_column("processing_error")
@@ -0,0 +1,75 @@
+"""
+Benchmark the IVF-PQ index against exact search on one large partition:
+recall@k and p50/p99 query latency for each nprobe/refine setting, so
+VECTOR_ANN_NPROBE and VECTOR_ANN_REFINE can be picked for a latency budget.
+Vectors are clustered (like embeddings of related documents); uniform random
+vectors have no neighbourhood structure and make every ANN index look bad.
+Run: python -m scripts.bench_ann [--rows 200000] [--dim 256] [--nprobe 4,8,16,32] [--refine 5,10]
+"""
+import argparse
+import time
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import numpy as np
+from app.services.ann import IVFPQIndex, exact_top_k
+
+
+def _percentiles(timings):
+    return np.percentile(timings, 50) * 1000, np.percentile(timings, 99) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ANN recall and latency against exact search")
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--clusters", type=int, default=2000)
+    parser.add_argument("--pq-m", type=int, default=32)
+    parser.add_argument("--nlist", type=int, default=0)
+    parser.add_argument("--nprobe", default="4,8,16,32")
+    parser.add_argument("--refine", default="5,10")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=300)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    centers = rng.standard_normal((args.clusters, args.dim), dtype=np.float32)
+    x = centers[rng.integers(0, args.clusters, args.rows)]
+    x += 0.3 * rng.standard_normal(x.shape, dtype=np.float32)
+    x /= np.linalg.norm(x, axis=1, keepdims=True)
+    queries = x[rng.integers(0, args.rows, args.queries)] + 0.1 * rng.standard_normal(
+        (args.queries, args.dim), dtype=np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    started = time.perf_counter()
+    index = IVFPQIndex.build(x, nlist=args.nlist, m=args.pq_m)
+    build_s = time.perf_counter() - started
+    print(f"{args.rows:,} x {args.dim}: built {index.quantizer.nlist} lists, m={index.quantizer.m} "
+          f"in {build_s:.1f}s, codes {index.codes[:index.size].nbytes / 2**20:.1f} MiB")
+
+    truth, timings = [], []
+    for q in queries:
+        t0 = time.perf_counter()
+        rows, _ = exact_top_k(x, None, q, args.top_k)
+        timings.append(time.perf_counter() - t0)
+        truth.append(set(rows.tolist()))
+    p50, p99 = _percentiles(timings)
+    print(f"exact: recall@{args.top_k} 1.000, p50 {p50:.2f}ms, p99 {p99:.2f}ms")
+
+    for nprobe in (int(n) for n in args.nprobe.split(",")):
+        for refine in (int(r) for r in args.refine.split(",")):
+            recall, timings = 0.0, []
+            for q, expected in zip(queries, truth):
+                t0 = time.perf_counter()
+                rows, _ = exact_top_k(x, index.candidates(q, args.top_k * refine, nprobe), q, args.top_k)
+                timings.append(time.perf_counter() - t0)
+                recall += len(expected & set(rows.tolist())) / args.top_k
+            p50, p99 = _percentiles(timings)
+            print(f"nprobe {nprobe:>3} refine {refine:>3}: recall@{args.top_k} {recall / len(queries):.3f}, "
+                  f"p50 {p50:.2f}ms, p99 {p99:.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
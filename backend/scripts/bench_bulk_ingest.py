@@ -0,0 +1,131 @@
+"""
+Benchmark ingest throughput in events/sec: one POST /v1/ingest/events per
+event (sync and async mode) vs POST /v1/ingest/events/bulk with a JSON array
+and a streamed NDJSON body. Accepting an event is measured, not processing
+it, but the ingest pool keeps processing in the background and competes for
+SQLite's write lock; --accept-only makes its workers skip the pipeline.
+Runs uvicorn against a freshly seeded SQLite database in a temporary
+directory.
+Run: python -m scripts.bench_bulk_ingest [--events 2000] [--sync-events 100] [--workers 1] [--accept-only]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import httpx
+
+API_PORT = 8770
+TITLES = [
+    "Oil spill contaminates river near {city} refinery",
+    "Workers strike over unpaid wages at {city} plant",
+    "Regulator fines company for emissions breach in {city}",
+    "Auditor resigns citing board interference",
+    "Community protests land acquisition near {city}",
+]
+CITIES = ["Mumbai", "Chennai", "Delhi", "Pune", "Kolkata", "Jaipur"]
+
+
+def _serve_api():
+    import uvicorn
+    from app.main import app
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=API_PORT, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def _events(n: int, company_ids):
+    rng = random.Random(7)
+    for i in range(n):
+        city = rng.choice(CITIES)
+        yield {
+            "company_id": rng.choice(company_ids),
+            "title": f"{rng.choice(TITLES).format(city=city)} ({i})",
+            "description": f"Report {i} from {city}.",
+        }
+
+
+def _report(name: str, n: int, seconds: float):
+    print(f"{name:<28} {n:>7} events  {seconds:8.2f}s  {n / seconds:10.0f} events/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark single vs bulk ingest")
+    parser.add_argument("--events", type=int, default=2000)
+    parser.add_argument("--sync-events", type=int, default=100, help="Events for the sync endpoint (runs the pipeline)")
+    parser.add_argument("--workers", type=int, default=1, help="Ingest pool workers processing in the background")
+    parser.add_argument("--accept-only", action="store_true", help="Pool workers skip the pipeline")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="bench-ingest-")
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{tmp}/esg.db"
+    os.environ["VECTOR_STORE_PATH"] = ""
+    os.environ["RESCORE_INTERVAL_HOURS"] = "0"
+    os.environ["INGEST_WORKERS"] = str(args.workers)
+    os.environ["INGEST_MAX_PENDING"] = str(10 * args.events + args.sync_events)
+    os.environ.pop("AZURE_OPENAI_API_KEY", None)
+
+    from scripts.seed import seed
+    asyncio.run(seed())
+    if args.accept_only:
+        import app.workers.ingest_pool as ingest_pool_module
+
+        async def skip_pipeline(db, event, coalesce=True):
+            event.is_processed = True
+
+        ingest_pool_module.process_event = skip_pipeline
+    server = _serve_api()
+    logging.getLogger("app").setLevel(logging.WARNING)  # one line per processed event otherwise
+
+    base = f"http://127.0.0.1:{API_PORT}"
+    with httpx.Client(base_url=base, timeout=600) as client:
+        token = client.post("/v1/auth/login", json={"email": "demo@greenbharat.ai", "password": "demo123"}).json()
+        client.headers["Authorization"] = f"Bearer {token['access_token']}"
+        company_ids = [c["id"] for c in client.get("/v1/companies").json()]
+
+        if args.sync_events:
+            started = time.perf_counter()
+            for event in _events(args.sync_events, company_ids):
+                client.post("/v1/ingest/events", json=event).raise_for_status()
+            _report("single, mode=sync", args.sync_events, time.perf_counter() - started)
+
+        started = time.perf_counter()
+        for event in _events(args.events, company_ids):
+            client.post("/v1/ingest/events", params={"mode": "async"}, json=event).raise_for_status()
+        _report("single, mode=async", args.events, time.perf_counter() - started)
+
+        events = list(_events(args.events, company_ids))
+        started = time.perf_counter()
+        response = client.post("/v1/ingest/events/bulk", json=events)
+        response.raise_for_status()
+        _report("bulk, JSON array", response.json()["queued"], time.perf_counter() - started)
+
+        def ndjson():
+            for event in _events(args.events, company_ids):
+                yield (json.dumps(event) + "\n").encode()
+
+        started = time.perf_counter()
+        response = client.post(
+            "/v1/ingest/events/bulk", content=ndjson(), headers={"Content-Type": "application/x-ndjson"},
+        )
+        response.raise_for_status()
+        _report("bulk, streamed NDJSON", response.json()["queued"], time.perf_counter() - started)
+
+    server.should_exit = True
+    mode = "skipping the pipeline" if args.accept_only else "processing in the background"
+    print(f"(ingest pool: {args.workers} worker(s) {mode}; database in {tmp})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Benchmark chat time-to-first-byte: POST /v1/chat (whole answer at once) vs
+POST /v1/chat/stream (SSE), with the API served by uvicorn against the local
+OpenAI stub. Needs a seeded database (python -m scripts.seed).
+Run: python -m scripts.bench_chat_stream [--requests 20] [--latency-ms 300] [--token-ms 20] [--answer-words 200]
+"""
+import argparse
+import statistics
+import threading
+import time
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import httpx
+
+STUB_PORT = 8768
+API_PORT = 8769
+
+
+def _serve_api():
+    import uvicorn
+    from app.main import app
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=API_PORT, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def _timed(client: httpx.Client, path: str, body: dict):
+    """Seconds to the first body byte, to the first answer text and to the end."""
+    started = time.perf_counter()
+    first = first_token = None
+    with client.stream("POST", path, json=body) as response:
+        response.raise_for_status()
+        for chunk in response.iter_raw():
+            now = time.perf_counter() - started
+            if first is None:
+                first = now
+            if first_token is None and (b"event: token" in chunk or b'"answer"' in chunk):
+                first_token = now
+    return first, first_token, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark chat time-to-first-byte")
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=300, help="Stub time to first token")
+    parser.add_argument("--token-ms", type=float, default=20, help="Stub generation time per word")
+    parser.add_argument("--answer-words", type=int, default=200)
+    args = parser.parse_args()
+
+    os.environ["AZURE_OPENAI_API_KEY"] = "stub"
+    os.environ["AZURE_OPENAI_ENDPOINT"] = f"http://127.0.0.1:{STUB_PORT}"
+    os.environ.setdefault("RESCORE_INTERVAL_HOURS", "0")
+
+    from scripts.openai_stub import serve_in_background
+
+    stub = serve_in_background(STUB_PORT, args.latency_ms, concurrency=8,
+                               token_ms=args.token_ms, answer_words=args.answer_words)
+    api = _serve_api()
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{API_PORT}", timeout=120) as client:
+            login = client.post("/v1/auth/login", json={"email": "demo@greenbharat.ai", "password": "demo123"})
+            login.raise_for_status()
+            client.headers["Authorization"] = f"Bearer {login.json()['access_token']}"
+            body = {"message": "How are carbon emissions trending?"}
+            for label, path in (("/v1/chat", "/v1/chat"), ("/v1/chat/stream", "/v1/chat/stream")):
+                timings = [_timed(client, path, body) for _ in range(args.requests)]
+                ttfb, first_token, total = (statistics.median(t[i] for t in timings) * 1000 for i in range(3))
+                print(f"{label:>16}: first byte p50 {ttfb:.0f}ms, first answer text p50 {first_token:.0f}ms, "
+                      f"complete p50 {total:.0f}ms")
+    finally:
+        api.should_exit = True
+        stub.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Benchmark LLM event classification throughput against the local OpenAI stub,
+one request per event vs. micro-batched multi-event prompts.
+Run: python -m scripts.bench_classifier [--events 200] [--latency-ms 300] [--concurrency 8]
+"""
+import argparse
+import asyncio
+import random
+import time
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+PORT = 8765
+
+
+async def _run(events, window_ms: int, batch_max: int) -> float:
+    from app.core.config import get_settings
+    from app.services import classifier
+
+    settings = get_settings()
+    settings.CLASSIFIER_BATCH_WINDOW_MS = window_ms
+    settings.CLASSIFIER_BATCH_MAX = batch_max
+    started = time.perf_counter()
+    await asyncio.gather(*(classifier.classify_event(t, d) for t, d in events))
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batched LLM classification")
+    parser.add_argument("--events", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--concurrency", type=int, default=8, help="Stub requests processed at once")
+    parser.add_argument("--window-ms", type=int, default=25)
+    parser.add_argument("--batch-max", type=int, default=16)
+    args = parser.parse_args()
+
+    # Point the client at the stub before settings are first read.
+    os.environ["AZURE_OPENAI_API_KEY"] = "stub"
+    os.environ["AZURE_OPENAI_ENDPOINT"] = f"http://127.0.0.1:{PORT}"
+
+    from scripts.openai_stub import serve_in_background
+    from scripts.seed import EVENT_TEMPLATES
+
+    server = serve_in_background(PORT, args.latency_ms, args.concurrency)
+    templates = [t[:2] for category in EVENT_TEMPLATES.values() for t in category]
+    events = [random.choice(templates) for _ in range(args.events)]
+    try:
+        for label, window_ms in (("unbatched", 0), ("batched", args.window_ms)):
+            before = server.app_state.stats["chat"]
+            elapsed = asyncio.run(_run(events, window_ms, args.batch_max))
+            calls = server.app_state.stats["chat"] - before
+            print(f"{label:>10}: {len(events)} events in {elapsed:.2f}s "
+                  f"({len(events) / elapsed:.1f} events/s, {calls} API calls)")
+    finally:
+        server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Benchmark near-duplicate detection on a synthetic syndicated stream:
+incidents mixed from seed template sentences (the templates alone are too few
+to tell incidents apart), each republished by several outlets with reworded,
+trimmed or suffixed copies, spread over many companies. Reports throughput
+and precision/recall of the duplicate links against the known incidents.
+Run: python -m scripts.bench_dedup [--incidents 20000] [--copies 4] [--companies 200]
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from app.services.dedup import NearDuplicateIndex
+from scripts.seed import EVENT_TEMPLATES, gen_event
+
+OUTLETS = ["Reuters", "PTI", "Economic Times", "Mint", "Business Standard", "Moneycontrol"]
+SYNONYMS = {"company": "firm", "annual": "yearly", "targets": "goals", "workers": "employees",
+            "announced": "said", "concerns": "questions", "failed": "did not manage"}
+
+
+def _reword(text: str, rng: random.Random) -> str:
+    words = text.split()
+    out = []
+    for w in words:
+        if rng.random() < 0.05:
+            continue  # dropped word
+        out.append(SYNONYMS.get(w, w) if rng.random() < 0.5 else w)
+    return " ".join(out)
+
+
+def _copy(title: str, description: str, rng: random.Random) -> tuple:
+    choice = rng.randrange(4)
+    if choice == 0:
+        return f"{title} - {rng.choice(OUTLETS)}", description
+    if choice == 1:
+        return title, description.rsplit(". ", 1)[0] + "."
+    if choice == 2:
+        return _reword(title, rng), _reword(description, rng)
+    return title, f"{description} ({rng.choice(OUTLETS)})"
+
+
+def build_stream(incidents: int, copies: int, companies: int, seed: int) -> list:
+    rng = random.Random(seed)
+    random.seed(seed)
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    stream = []
+    categories = list(EVENT_TEMPLATES)
+    sentences = [
+        s.rstrip(".") + "."
+        for _ in range(200)
+        for s in gen_event(rng.choice(categories), "")[1].split(". ")
+    ]
+    for i in range(incidents):
+        company = f"company-{rng.randrange(companies)}"
+        title, _ = gen_event(rng.choice(categories), "")
+        description = " ".join(rng.sample(sentences, 3))
+        at = start + timedelta(minutes=i)
+        stream.append((i, company, title, description, at))
+        for _ in range(rng.randrange(copies + 1)):
+            t, d = _copy(title, description, rng)
+            stream.append((i, company, t, d, at + timedelta(minutes=rng.randrange(1, 600))))
+    stream.sort(key=lambda e: e[4])
+    return stream
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark near-duplicate detection")
+    parser.add_argument("--incidents", type=int, default=20000)
+    parser.add_argument("--copies", type=int, default=4, help="Max syndicated copies per incident")
+    parser.add_argument("--companies", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    stream = build_stream(args.incidents, args.copies, args.companies, args.seed)
+    for min_similarity in (0.5, 0.6, 0.7, 0.8):
+        index = NearDuplicateIndex(window_hours=72, min_similarity=min_similarity, max_per_company=5000)
+        incident_of = {}
+        first_seen = set()
+        linked = correct = expected = 0
+        started = time.perf_counter()
+        for n, (incident, company, title, description, at) in enumerate(stream):
+            event_id = str(n)
+            incident_of[event_id] = incident
+            canonical = index.check("tenant", company, event_id, title, description, at)
+            if incident in first_seen:
+                expected += 1
+            first_seen.add(incident)
+            if canonical is not None:
+                linked += 1
+                correct += incident_of[canonical.event_id] == incident
+        elapsed = time.perf_counter() - started
+        print(
+            f"similarity >= {min_similarity}: {len(stream)} events in {elapsed:.2f}s "
+            f"({len(stream) / elapsed:,.0f}/s), precision {correct / max(linked, 1):.1%}, "
+            f"recall {correct / max(expected, 1):.1%} ({linked} linked, {expected} true copies)"
+        )
+
+
+if __name__ == "__main__":
+    main()
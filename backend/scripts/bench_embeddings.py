@@ -0,0 +1,76 @@
+"""
+Benchmark document embedding against the local OpenAI stub: concurrent
+upsert-style create_embedding calls (what the pipeline does per event),
+indexed twice to mimic a reindex, with batching and the cache switched on
+and off. Reports API requests and throughput for each mode.
+Run: python -m scripts.bench_embeddings [--docs 2000] [--parallel 64] [--latency-ms 50]
+"""
+import argparse
+import asyncio
+import time
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+PORT = 8767
+
+
+async def _index(docs: int, parallel: int) -> float:
+    from app.services import rag
+
+    slots = asyncio.Semaphore(parallel)
+
+    async def one(i: int):
+        async with slots:
+            await rag.create_embedding(f"Document {i}: emissions report for plant {i % 97}")
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(docs)))
+    return time.perf_counter() - started
+
+
+async def _run(docs: int, parallel: int) -> list:
+    from app.services.llm_client import llm_clients
+
+    await llm_clients.start()
+    try:
+        return [await _index(docs, parallel) for _ in range(2)]
+    finally:
+        await llm_clients.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark embedding batching and caching")
+    parser.add_argument("--docs", type=int, default=2000)
+    parser.add_argument("--parallel", type=int, default=64, help="Embeddings in flight at once")
+    parser.add_argument("--latency-ms", type=float, default=50)
+    args = parser.parse_args()
+
+    os.environ["AZURE_OPENAI_API_KEY"] = "stub"
+    os.environ["AZURE_OPENAI_ENDPOINT"] = f"http://127.0.0.1:{PORT}"
+
+    from app.core.config import get_settings
+    from app.services import rag
+    from scripts.openai_stub import serve_in_background
+
+    settings = get_settings()
+    server = serve_in_background(PORT, args.latency_ms, concurrency=args.parallel)
+    try:
+        for label, window_ms, cache_size in (
+            ("one per call", 0, 0), ("batched", 10, 0), ("batched + cache", 10, args.docs),
+        ):
+            settings.EMBEDDING_BATCH_WINDOW_MS = window_ms
+            settings.EMBEDDING_CACHE_SIZE = cache_size
+            rag.embedding_cache.clear()
+            before = server.app_state.stats["embeddings"]
+            first, second = asyncio.run(_run(args.docs, args.parallel))
+            requests = server.app_state.stats["embeddings"] - before
+            print(f"{label:>16}: {requests:>5} requests for {2 * args.docs} embeddings, "
+                  f"index {args.docs / first:.0f} docs/s, reindex {args.docs / second:.0f} docs/s")
+    finally:
+        server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Benchmark per-event latency of process_event's stage graph. Classification,
+the embedding request and Slack delivery are replaced by sleeps of --llm-ms,
+--embed-ms and --alert-ms (network latency), and every event triggers an
+alert rule. Events are processed one at a time against a freshly seeded
+SQLite database in a temporary directory. The report shows each stage's
+average wall time, the sum of the stages on the critical path if they ran
+one after another (classify + embed + score + alerts + publish; Slack
+delivery was inline before as well) and the measured end-to-end latency.
+Run: python -m scripts.bench_event_stages [--events 50] [--llm-ms 300] [--embed-ms 150] [--alert-ms 400]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+STAGES = ["classify", "embed", "score", "alerts", "publish"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark process_event stage overlap")
+    parser.add_argument("--events", type=int, default=50)
+    parser.add_argument("--llm-ms", type=float, default=300, help="Simulated classification request")
+    parser.add_argument("--embed-ms", type=float, default=150, help="Simulated embedding request")
+    parser.add_argument("--alert-ms", type=float, default=400, help="Simulated Slack webhook")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="bench-stages-")
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{tmp}/esg.db"
+    os.environ["VECTOR_STORE_PATH"] = ""
+    os.environ["RESCORE_INTERVAL_HOURS"] = "0"
+    os.environ["DEDUP_ENABLED"] = "false"
+    os.environ.pop("AZURE_OPENAI_API_KEY", None)
+
+    from scripts.seed import seed
+    asyncio.run(seed())
+    logging.getLogger("app").setLevel(logging.WARNING)
+
+    import app.services.alerts as alerts_module
+    import app.services.rag as rag_module
+    import app.workers.pipeline as pipeline_module
+    from sqlalchemy import select
+    from app.db.models import AlertRule, Company, ESGEvent, User
+    from app.db.session import async_session
+    from app.services.classifier import _rule_based_classify
+
+    mock_embedding = rag_module.create_embedding
+
+    async def slow_classify_event(title, description):
+        await asyncio.sleep(args.llm_ms / 1000)
+        return _rule_based_classify(title, description)
+
+    async def slow_create_embedding(text):
+        await asyncio.sleep(args.embed_ms / 1000)
+        return await mock_embedding(text)
+
+    async def slow_send_slack(payload):
+        await asyncio.sleep(args.alert_ms / 1000)
+        return True
+
+    pipeline_module.classify_event = slow_classify_event
+    rag_module.create_embedding = slow_create_embedding
+    alerts_module._send_slack = slow_send_slack
+
+    async def bench():
+        async with async_session() as db:
+            companies = (await db.execute(select(Company))).scalars().all()
+            user = (await db.execute(select(User))).scalars().first()
+            db.add(AlertRule(
+                tenant_id=user.tenant_id, user_id=user.id, name="Every event", condition_type="severity_gte",
+                threshold=0, channels=["slack"],
+            ))
+            await db.commit()
+        for i in range(args.events):
+            company = companies[i % len(companies)]
+            async with async_session() as db:
+                event = ESGEvent(
+                    tenant_id=company.tenant_id, company_id=company.id, source_url="", category="governance",
+                    title=f"Regulator fines company over emissions at site {i}", description=f"Report {i}.",
+                )
+                db.add(event)
+                await db.flush()
+                await pipeline_module.process_event(db, event)
+                await db.commit()
+        await alerts_module.alert_dispatcher.drain()
+
+    started = time.perf_counter()
+    asyncio.run(bench())
+    elapsed = time.perf_counter() - started
+
+    stats = pipeline_module.stage_timings.stats()
+    for stage in STAGES:
+        print(f"  {stage:<9} {stats[stage]['avg_ms']:8.1f} ms")
+    sequential = sum(stats[s]["avg_ms"] for s in STAGES) + args.alert_ms
+    print(f"stages one after another (with Slack inline) {sequential:8.1f} ms/event")
+    print(f"stage graph, end to end                      {stats['event']['avg_ms']:8.1f} ms/event")
+    dispatcher = alerts_module.alert_dispatcher.stats()
+    print(f"alert deliveries in the background: {dispatcher['sent']} sent, {dispatcher['avg_ms']:.1f} ms avg")
+    print(f"({args.events} events in {elapsed:.1f}s; database in {tmp})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Benchmark keyed-executor throughput against lane count. Events for
+--companies companies are processed on 1, 2, 4, ... lanes; the report shows
+events/sec, the speedup over one lane, how evenly the lanes were loaded and
+whether every company's events ran one at a time in submission order.
+
+By default each event is a sleep of --work-ms (I/O-bound work such as an LLM
+call). With --pipeline the async ingest pool runs the real pipeline on a
+freshly seeded SQLite database in a temporary directory, with classification
+replaced by a sleep of --work-ms.
+Run: python -m scripts.bench_keyed_executor [--events 2000] [--companies 200] [--lanes 1,2,4,8,16,32] [--work-ms 20] [--pipeline]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+
+def _report(lanes: int, n: int, seconds: float, base: float, stats: dict, ordered: bool):
+    rate = n / seconds
+    loads = [lane["processed"] + lane["failed"] for lane in stats["lane_stats"]]
+    print(f"lanes={lanes:<3} {n:>6} events  {seconds:7.2f}s  {rate:9.1f} events/s  "
+          f"speedup {rate / base if base else 1:5.2f}x  busiest lane {max(loads) / (n / lanes):4.2f}x avg  "
+          f"ordered={'yes' if ordered else 'NO'}")
+    return rate
+
+
+async def _synthetic(args, lane_counts):
+    from app.workers.keyed_executor import KeyedExecutor
+
+    rng = random.Random(7)
+    events = [(f"c{rng.randrange(args.companies)}", i) for i in range(args.events)]
+    base = 0.0
+    for lanes in lane_counts:
+        running = set()
+        seen = {}
+        violations = 0
+
+        async def handle(item):
+            nonlocal violations
+            company, seq = item
+            if company in running or seen.get(company, -1) > seq:
+                violations += 1
+            running.add(company)
+            await asyncio.sleep(args.work_ms / 1000)
+            running.discard(company)
+            seen[company] = seq
+
+        executor = KeyedExecutor(handle, lanes, args.events)
+        executor.start()
+        started = time.perf_counter()
+        for company, seq in events:
+            executor.submit(company, (company, seq))
+        await executor.drain()
+        seconds = time.perf_counter() - started
+        await executor.stop()
+        rate = _report(lanes, len(events), seconds, base, executor.stats(), violations == 0)
+        base = base or rate
+
+
+async def _pipeline(args, lane_counts):
+    from sqlalchemy import select
+    import app.workers.ingest_pool as ingest_pool_module
+    from app.db.models import Company, ESGEvent
+    from app.db.session import async_session
+    from app.workers.ingest_pool import IngestPool
+
+    process_event = ingest_pool_module.process_event
+    running = set()
+    seen = {}
+    violations = 0
+
+    async def checked_process_event(db, event, coalesce=True):
+        nonlocal violations
+        seq = order[event.id]
+        if event.company_id in running or seen.get(event.company_id, -1) > seq:
+            violations += 1
+        running.add(event.company_id)
+        try:
+            return await process_event(db, event, coalesce)
+        finally:
+            running.discard(event.company_id)
+            seen[event.company_id] = seq
+
+    ingest_pool_module.process_event = checked_process_event
+    rng = random.Random(7)
+    base = 0.0
+    async with async_session() as db:
+        companies = (await db.execute(select(Company))).scalars().all()
+    for lanes in lane_counts:
+        async with async_session() as db:
+            events = [
+                ESGEvent(
+                    tenant_id=c.tenant_id, company_id=c.id, source_url="", category="governance",
+                    title=f"Regulator fines company over emissions at site {lanes}-{i}",
+                    description=f"Report {lanes}-{i}.",
+                )
+                for i, c in enumerate(rng.choice(companies) for _ in range(args.events))
+            ]
+            db.add_all(events)
+            await db.commit()
+            ids = [(e.id, e.company_id) for e in events]
+        order = {event_id: i for i, (event_id, _) in enumerate(ids)}
+        seen.clear()
+        violations = 0
+
+        pool = IngestPool(workers=lanes, max_pending=len(ids) * lanes)  # room for any skew
+        pool.start()
+        started = time.perf_counter()
+        for event_id, company_id in ids:
+            pool.submit(event_id, company_id)
+        await pool.drain()
+        seconds = time.perf_counter() - started
+        stats = pool._executor.stats()
+        await pool.stop()
+        rate = _report(lanes, len(ids), seconds, base, stats, violations == 0)
+        base = base or rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark keyed executor scaling with lane count")
+    parser.add_argument("--events", type=int, default=2000)
+    parser.add_argument("--companies", type=int, default=200, help="Synthetic mode only; --pipeline uses the seeded companies")
+    parser.add_argument("--lanes", default="1,2,4,8,16,32")
+    parser.add_argument("--work-ms", type=float, default=20, help="Simulated I/O per event (classification with --pipeline)")
+    parser.add_argument("--pipeline", action="store_true", help="Run the real ingest pool and pipeline")
+    args = parser.parse_args()
+    lane_counts = [int(n) for n in args.lanes.split(",")]
+
+    if not args.pipeline:
+        asyncio.run(_synthetic(args, lane_counts))
+        print(f"({args.work_ms:.0f} ms of simulated I/O per event, {args.companies} companies)")
+        return
+
+    tmp = tempfile.mkdtemp(prefix="bench-keyed-")
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{tmp}/esg.db"
+    os.environ["VECTOR_STORE_PATH"] = ""
+    os.environ["RESCORE_INTERVAL_HOURS"] = "0"
+    os.environ["DEDUP_ENABLED"] = "false"
+    os.environ.pop("AZURE_OPENAI_API_KEY", None)
+
+    from scripts.seed import seed
+    asyncio.run(seed())
+    logging.getLogger("app").setLevel(logging.WARNING)
+
+    import app.workers.pipeline as pipeline_module
+    from app.services.classifier import _rule_based_classify
+
+    async def slow_classify_event(title, description):
+        await asyncio.sleep(args.work_ms / 1000)
+        return _rule_based_classify(title, description)
+
+    pipeline_module.classify_event = slow_classify_event
+    asyncio.run(_pipeline(args, lane_counts))
+    print(f"(classification {args.work_ms:.0f} ms per event; database in {tmp})")
+
+
+if __name__ == "__main__":
+    main()
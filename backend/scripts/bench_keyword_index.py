@@ -0,0 +1,57 @@
+"""
+Benchmark the BM25 keyword index: build time and query latency as the corpus
+grows. By default every document belongs to one company, the worst case for
+a partition; --companies spreads them like a real multi-company corpus.
+Documents and queries draw words from a Zipf-distributed vocabulary, so
+common words have long postings like in real text.
+Run: python -m scripts.bench_keyword_index [--sizes 10000,100000,1000000] [--companies 1] [--words 30]
+"""
+import argparse
+import time
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import numpy as np
+from app.services.keyword_index import _Partition, tokenize
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the BM25 keyword index")
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--companies", type=int, default=1)
+    parser.add_argument("--vocabulary", type=int, default=50000)
+    parser.add_argument("--words", type=int, default=30, help="Words per document")
+    parser.add_argument("--queries", type=int, default=500)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    vocabulary = [f"w{i}" for i in range(args.vocabulary)]
+    for size in (int(s) for s in args.sizes.split(",")):
+        words = np.minimum(rng.zipf(1.2, (size, args.words)), args.vocabulary) - 1
+        texts = [" ".join(vocabulary[w] for w in doc) for doc in words]
+        started = time.perf_counter()
+        partitions = [_Partition() for _ in range(args.companies)]
+        for i, text in enumerate(texts):
+            partitions[i % args.companies].add(str(i), text)
+        build_s = time.perf_counter() - started
+        memory = sum(rows.itemsize * len(rows) + tfs.itemsize * len(tfs)
+                     for partition in partitions for rows, tfs in partition.postings.values())
+
+        timings = []
+        for _ in range(args.queries):
+            # A query is a few words of some document: a mix of rare and common terms.
+            i = rng.integers(size)
+            query = " ".join(vocabulary[w] for w in rng.choice(words[i], rng.integers(2, 7)))
+            t0 = time.perf_counter()
+            partitions[i % args.companies].search(tokenize(query), 50)
+            timings.append(time.perf_counter() - t0)
+        p50, p99 = np.percentile(timings, 50) * 1000, np.percentile(timings, 99) * 1000
+        print(f"{size:>9,} docs / {args.companies} companies: build {build_s:.1f}s ({size / build_s:,.0f} docs/s), "
+              f"postings {memory / 2**20:.0f} MiB, query p50 {p50:.2f}ms p99 {p99:.2f}ms")
+        del texts, partitions
+
+
+if __name__ == "__main__":
+    main()
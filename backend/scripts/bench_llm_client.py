@@ -0,0 +1,94 @@
+"""
+Benchmark per-event LLM latency (classification + embedding) against the
+local OpenAI stub, with a new client per call vs. the shared pooled client.
+Run: python -m scripts.bench_llm_client [--events 500] [--parallel 32] [--latency-ms 50]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+PORT = 8766
+
+
+async def _run(events: int, parallel: int, per_call_client: bool) -> list:
+    from openai import AsyncAzureOpenAI
+    from app.core.config import get_settings
+    from app.services import classifier, rag
+    from app.services.llm_client import llm_clients
+
+    settings = get_settings()
+    per_call_clients = []
+    if per_call_client:
+        # What every call did before the shared client (kept here only to be
+        # closed before the loop ends).
+        def new_client():
+            client = AsyncAzureOpenAI(
+                api_key=settings.AZURE_OPENAI_API_KEY,
+                azure_endpoint=settings.AZURE_OPENAI_ENDPOINT,
+                api_version=settings.AZURE_OPENAI_API_VERSION,
+            )
+            per_call_clients.append(client)
+            return client
+
+        llm_clients.client = new_client
+    else:
+        llm_clients.__dict__.pop("client", None)
+        await llm_clients.start()
+
+    slots = asyncio.Semaphore(parallel)
+    latencies = []
+
+    async def one(i: int):
+        async with slots:
+            started = time.perf_counter()
+            title = f"Worker safety incident #{i} at plant"
+            await classifier.classify_event(title, "Workplace accident resulted in injuries")
+            await rag.create_embedding(title)
+            latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(one(i) for i in range(events)))
+    for client in per_call_clients:
+        await client.close()
+    if not per_call_client:
+        await llm_clients.close()
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the shared LLM client")
+    parser.add_argument("--events", type=int, default=500)
+    parser.add_argument("--parallel", type=int, default=32, help="Events in flight at once")
+    parser.add_argument("--latency-ms", type=float, default=50)
+    args = parser.parse_args()
+
+    os.environ["AZURE_OPENAI_API_KEY"] = "stub"
+    os.environ["AZURE_OPENAI_ENDPOINT"] = f"http://127.0.0.1:{PORT}"
+    # Measure the client alone: one request per operation, nothing cached.
+    os.environ["CLASSIFIER_BATCH_WINDOW_MS"] = "0"
+    os.environ["CLASSIFICATION_CACHE_SIZE"] = "0"
+    os.environ["EMBEDDING_BATCH_WINDOW_MS"] = "0"
+    os.environ["EMBEDDING_CACHE_SIZE"] = "0"
+
+    from scripts.openai_stub import serve_in_background
+
+    server = serve_in_background(PORT, args.latency_ms, concurrency=args.parallel * 2)
+    try:
+        for label, per_call in (("client per call", True), ("shared client", False)):
+            started = time.perf_counter()
+            latencies = asyncio.run(_run(args.events, args.parallel, per_call))
+            elapsed = time.perf_counter() - started
+            latencies.sort()
+            p95 = latencies[int(len(latencies) * 0.95) - 1]
+            print(f"{label:>16}: {len(latencies) / elapsed:.1f} events/s, "
+                  f"p50 {statistics.median(latencies) * 1000:.0f}ms, p95 {p95 * 1000:.0f}ms")
+    finally:
+        server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Benchmark the LLM scheduler against the local OpenAI stub enforcing a
+request quota: a burst of background classifications plus a trickle of
+interactive chat completions, with the scheduler unaware of the quota (429s
+and backoff only) vs. configured with it.
+Run: python -m scripts.bench_llm_scheduler [--events 300] [--chats 20] [--rpm 1200]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+PORT = 8767
+
+
+async def _run(port: int, events: int, chats: int, rpm: int) -> dict:
+    from app.core.config import get_settings
+    from app.services.classifier import classify_event
+    from app.services.llm_client import llm_clients
+    from app.services.llm_scheduler import INTERACTIVE, estimate_tokens, llm_scheduler
+
+    settings = get_settings()
+    settings.AZURE_OPENAI_ENDPOINT = f"http://127.0.0.1:{port}"
+    settings.LLM_REQUESTS_PER_MINUTE = rpm
+    llm_scheduler.__init__()  # fresh counters and state per configuration
+    chat_latencies = []
+
+    async def chat(i: int):
+        await asyncio.sleep(i * 0.2)
+        started = time.perf_counter()
+        client = llm_clients.client()
+        messages = [{"role": "user", "content": f"Question {i}: what happened at the plant?"}]
+        try:
+            await llm_scheduler.run(
+                INTERACTIVE, estimate_tokens(messages, 500),
+                lambda: client.chat.completions.create(
+                    model=settings.AZURE_OPENAI_CHAT_DEPLOYMENT, messages=messages, max_completion_tokens=500,
+                ),
+            )
+        except Exception:
+            pass
+        chat_latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(
+        *(classify_event(f"Worker strike #{i}", "Labor dispute over wages at the plant") for i in range(events)),
+        *(chat(i) for i in range(chats)),
+    )
+    elapsed = time.perf_counter() - started
+    await llm_clients.close()
+    return {"elapsed": elapsed, "chat_latencies": sorted(chat_latencies), "stats": llm_scheduler.stats()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the LLM scheduler under a quota")
+    parser.add_argument("--events", type=int, default=300)
+    parser.add_argument("--chats", type=int, default=20)
+    parser.add_argument("--rpm", type=int, default=1200, help="Quota enforced by the stub")
+    parser.add_argument("--latency-ms", type=float, default=100)
+    args = parser.parse_args()
+
+    os.environ["AZURE_OPENAI_API_KEY"] = "stub"
+    os.environ["CLASSIFIER_BATCH_WINDOW_MS"] = "0"
+    os.environ["CLASSIFICATION_CACHE_SIZE"] = "0"
+    os.environ["LLM_BACKOFF_BASE_S"] = "0.5"
+
+    from scripts.openai_stub import serve_in_background
+
+    for offset, (label, rpm) in enumerate((("quota unknown", 0), ("quota configured", args.rpm))):
+        # A fresh stub per run so both start with a full quota.
+        server = serve_in_background(PORT + offset, args.latency_ms, concurrency=64, rpm=args.rpm)
+        try:
+            result = asyncio.run(_run(PORT + offset, args.events, args.chats, rpm))
+        finally:
+            server.should_exit = True
+        lanes = result["stats"]["lanes"]
+        chats = result["chat_latencies"]
+        print(
+            f"{label:>16}: {args.events} classifications in {result['elapsed']:.1f}s, "
+            f"{lanes['background']['failed']} fell back to rules, "
+            f"{server.app_state.stats['throttled']} 429s; "
+            f"chat p50 {statistics.median(chats) * 1000:.0f}ms, max {chats[-1] * 1000:.0f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Benchmark the persistent vector store: time to open a compacted store (what
+each worker pays at startup) and query latency as the corpus grows, plus the
+cost of replaying an uncompacted write log.
+Run: python -m scripts.bench_mmap_vector_store [--sizes 10000,100000,1000000] [--dim 64]
+"""
+import argparse
+import shutil
+import statistics
+import tempfile
+import time
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import numpy as np
+from app.services.mmap_vector_store import MappedVectorStore
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the persistent vector store")
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--companies", type=int, default=2000)
+    parser.add_argument("--dim", type=int, default=64)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    for size in (int(s) for s in args.sizes.split(",")):
+        path = tempfile.mkdtemp(prefix="vectors-")
+        try:
+            store = MappedVectorStore(path)
+            vectors = rng.standard_normal((size, args.dim), dtype=np.float32)
+            companies = rng.integers(0, args.companies, size)
+            started = time.perf_counter()
+            for i in range(size):
+                store.upsert(f"d{i}", vectors[i], {"tenant_id": "t", "company_id": f"c{companies[i]}"}, f"doc {i}")
+            write_s = time.perf_counter() - started
+
+            started = time.perf_counter()
+            MappedVectorStore(path)
+            replay_s = time.perf_counter() - started
+
+            started = time.perf_counter()
+            store.compact()
+            compact_s = time.perf_counter() - started
+
+            started = time.perf_counter()
+            reopened = MappedVectorStore(path)
+            open_ms = (time.perf_counter() - started) * 1000
+
+            timings = []
+            for _ in range(args.queries):
+                q = rng.standard_normal(args.dim, dtype=np.float32)
+                company = f"c{rng.integers(args.companies)}"
+                t0 = time.perf_counter()
+                reopened.query(q, "t", company, 5)
+                timings.append(time.perf_counter() - t0)
+            first = statistics.median(timings) * 1000
+            timings = []
+            for _ in range(args.queries):
+                q = rng.standard_normal(args.dim, dtype=np.float32)
+                t0 = time.perf_counter()
+                reopened.query(q, "t", "c0", 5)
+                timings.append(time.perf_counter() - t0)
+            warm = statistics.median(timings) * 1000
+            print(
+                f"{size:>9,} docs: write {write_s:.1f}s, replay log {replay_s:.2f}s, compact {compact_s:.1f}s, "
+                f"open compacted {open_ms:.1f}ms, query p50 {first:.2f}ms cold partition / {warm:.3f}ms warm"
+            )
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Benchmark the rule-based classifier on synthetic events built from the seed
+templates, against the previous per-keyword substring scan, and check that
+both produce identical classifications.
+Run: python -m scripts.bench_rule_classifier [--events 1000000]
+"""
+import argparse
+import random
+import time
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from app.services.classifier import RULE_LEXICON, _rule_based_classify
+from scripts.seed import EVENT_TEMPLATES, gen_event
+
+
+def _scan_classify(title: str, description: str) -> dict:
+    """The original implementation: one substring scan per keyword."""
+    text = (title + " " + description).lower()
+    env_score = sum(1 for k in RULE_LEXICON["environmental"] if k in text)
+    soc_score = sum(1 for k in RULE_LEXICON["social"] if k in text)
+    gov_score = sum(1 for k in RULE_LEXICON["governance"] if k in text)
+
+    if env_score >= soc_score and env_score >= gov_score:
+        category = "environmental"
+    elif soc_score >= gov_score:
+        category = "social"
+    else:
+        category = "governance"
+
+    severity = 5
+    if any(w in text for w in RULE_LEXICON["high_severity"]):
+        severity = 8
+    elif any(w in text for w in RULE_LEXICON["low_severity"]):
+        severity = 3
+
+    sentiment = "negative"
+    if any(w in text for w in RULE_LEXICON["positive"]):
+        sentiment = "positive"
+
+    return {
+        "category": category,
+        "subcategory": "general",
+        "severity": severity,
+        "confidence": 0.7,
+        "sentiment": sentiment,
+        "source": "rules",
+    }
+
+
+def _time(fn, events) -> float:
+    started = time.perf_counter()
+    for title, description in events:
+        fn(title, description)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the rule-based classifier")
+    parser.add_argument("--events", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    categories = list(EVENT_TEMPLATES)
+    events = [gen_event(random.choice(categories), "") for _ in range(args.events)]
+
+    mismatches = sum(1 for t, d in events if _scan_classify(t, d) != _rule_based_classify(t, d))
+    print(f"Checked {len(events)} events: {mismatches} mismatches")
+
+    for label, fn in (("substring scan", _scan_classify), ("compiled matcher", _rule_based_classify)):
+        elapsed = _time(fn, events)
+        print(f"{label:>16}: {elapsed:.2f}s ({len(events) / elapsed:,.0f} events/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Benchmark event processing with a slow classifier: the ingest pool (every
+worker runs all steps of one event) vs the staged pipeline (classification
+batched in its own stage, scoring draining what is already classified).
+Classification is replaced by a sleep of --llm-ms per request, one request
+per event in the pool and per batch in the staged pipeline. Runs against a
+freshly seeded SQLite database in a temporary directory.
+Run: python -m scripts.bench_staged_pipeline [--events 300] [--llm-ms 400] [--workers 4] [--broker memory]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+TITLES = [
+    "Oil spill contaminates river near {city} refinery",
+    "Workers strike over unpaid wages at {city} plant",
+    "Regulator fines company for emissions breach in {city}",
+    "Auditor resigns citing board interference",
+    "Community protests land acquisition near {city}",
+]
+CITIES = ["Mumbai", "Chennai", "Delhi", "Pune", "Kolkata", "Jaipur"]
+
+
+async def _insert_events(n: int, rng: random.Random):
+    from sqlalchemy import select
+    from app.db.models import Company, ESGEvent
+    from app.db.session import async_session
+
+    async with async_session() as db:
+        companies = (await db.execute(select(Company))).scalars().all()
+        events = []
+        for i in range(n):
+            company = rng.choice(companies)
+            city = rng.choice(CITIES)
+            events.append(ESGEvent(
+                tenant_id=company.tenant_id, company_id=company.id,
+                title=f"{rng.choice(TITLES).format(city=city)} (case {i})",
+                description=f"Report {i} from {city}.", source_url="", category="governance",
+            ))
+        db.add_all(events)
+        await db.commit()
+        return [(e.id, e.company_id) for e in events]
+
+
+async def _run(queue, events) -> float:
+    queue.start()
+    started = time.perf_counter()
+    for event_id, company_id in events:
+        queue.submit(event_id, company_id)
+    await queue.drain()
+    elapsed = time.perf_counter() - started
+    await queue.stop()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the ingest pool vs the staged pipeline")
+    parser.add_argument("--events", type=int, default=300)
+    parser.add_argument("--llm-ms", type=float, default=400, help="Simulated latency of one classification request")
+    parser.add_argument("--workers", type=int, default=4, help="Ingest pool workers")
+    parser.add_argument("--broker", choices=["memory", "file"], default="memory")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="bench-staged-")
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{tmp}/esg.db"
+    os.environ["VECTOR_STORE_PATH"] = ""
+    os.environ["RESCORE_INTERVAL_HOURS"] = "0"
+    os.environ["DEDUP_ENABLED"] = "false"
+    os.environ["PIPELINE_LOG_PATH"] = os.path.join(tmp, "pipeline")
+    os.environ.pop("AZURE_OPENAI_API_KEY", None)
+
+    from scripts.seed import seed
+    asyncio.run(seed())
+    logging.getLogger("app").setLevel(logging.WARNING)
+
+    import app.workers.pipeline as pipeline_module
+    import app.workers.stages as stages_module
+    from app.services.classifier import _rule_based_classify
+    from app.workers.broker import create_broker
+    from app.workers.ingest_pool import IngestPool
+    from app.workers.stages import StagedPipeline
+
+    delay = args.llm_ms / 1000
+
+    async def slow_classify_event(title, description):
+        await asyncio.sleep(delay)
+        return _rule_based_classify(title, description)
+
+    async def slow_classify_events(items):
+        await asyncio.sleep(delay)
+        return [_rule_based_classify(t, d) for t, d in items]
+
+    pipeline_module.classify_event = slow_classify_event
+    stages_module.classify_events = slow_classify_events
+
+    async def bench():
+        rng = random.Random(7)
+        events = await _insert_events(args.events, rng)
+        seconds = await _run(IngestPool(workers=args.workers), events)
+        print(f"{'ingest pool, ' + str(args.workers) + ' workers':<34} {len(events):>6} events  "
+              f"{seconds:8.2f}s  {len(events) / seconds:8.1f} events/s")
+
+        events = await _insert_events(args.events, rng)
+        staged = StagedPipeline(create_broker(args.broker))
+        seconds = await _run(staged, events)
+        print(f"{'staged pipeline, ' + args.broker + ' broker':<34} {len(events):>6} events  "
+              f"{seconds:8.2f}s  {len(events) / seconds:8.1f} events/s")
+        for name, stats in staged.stats()["stages"].items():
+            print(f"  {name:<10} consumers={stats['consumers']} processed={stats['processed']} "
+                  f"avg_ms={stats['avg_ms']}")
+        staged.broker.close()
+
+    asyncio.run(bench())
+    print(f"(classification {args.llm_ms:.0f} ms per request; database in {tmp})")
+
+
+if __name__ == "__main__":
+    main()
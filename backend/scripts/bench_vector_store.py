@@ -0,0 +1,89 @@
+"""
+Benchmark local RAG retrieval as the corpus grows: the partitioned NumPy
+vector store against the previous flat dict scanned with a pure-Python cosine
+loop (only run on the smaller corpora).
+Run: python -m scripts.bench_vector_store [--sizes 10000,100000,1000000] [--companies 2000] [--dim 64]
+"""
+import argparse
+import random
+import statistics
+import time
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import numpy as np
+from app.services.vector_store import LocalVectorStore
+
+
+def _cosine_sim(a, b) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm_a = sum(x * x for x in a) ** 0.5
+    norm_b = sum(x * x for x in b) ** 0.5
+    if norm_a == 0 or norm_b == 0:
+        return 0
+    return dot / (norm_a * norm_b)
+
+
+def _flat_query(vectors: dict, query, tenant_id: str, company_id: str, top_k: int) -> list:
+    """The original implementation: scan every document of every tenant."""
+    scored = []
+    for doc_id, doc in vectors.items():
+        meta = doc["metadata"]
+        if meta.get("tenant_id") == tenant_id and meta.get("company_id") == company_id:
+            scored.append({"id": doc_id, "score": _cosine_sim(query, doc["values"]), "metadata": meta})
+    scored.sort(key=lambda x: x["score"], reverse=True)
+    return scored[:top_k]
+
+
+def _p50_ms(fn, queries) -> float:
+    timings = []
+    for args in queries:
+        started = time.perf_counter()
+        fn(*args)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark local vector retrieval")
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--companies", type=int, default=2000)
+    parser.add_argument("--dim", type=int, default=64)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--flat-max", type=int, default=100000, help="Largest corpus to run the flat scan on")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    for size in (int(s) for s in args.sizes.split(",")):
+        vectors = rng.standard_normal((size, args.dim), dtype=np.float32)
+        companies = rng.integers(0, args.companies, size)
+        store = LocalVectorStore()
+        started = time.perf_counter()
+        for i in range(size):
+            meta = {"tenant_id": "t", "company_id": f"c{companies[i]}"}
+            store.upsert(f"d{i}", vectors[i], meta)
+        load_s = time.perf_counter() - started
+
+        queries = [
+            (rng.standard_normal(args.dim, dtype=np.float32), "t", f"c{random.randrange(args.companies)}", 5)
+            for _ in range(args.queries)
+        ]
+        line = f"{size:>9,} docs: load {load_s:.1f}s, store p50 {_p50_ms(store.query, queries):.3f}ms"
+        if size <= args.flat_max:
+            flat = {
+                f"d{i}": {"values": vectors[i].tolist(), "metadata": {"tenant_id": "t", "company_id": f"c{companies[i]}"}}
+                for i in range(size)
+            }
+            flat_queries = [(q.tolist(), t, c, k) for q, t, c, k in queries[:20]]
+            for (q, t, c, k), fq in zip(queries[:5], flat_queries):
+                assert [d["id"] for d in store.query(q, t, c, k)] == [d["id"] for d in _flat_query(flat, *fq)]
+            line += f", flat scan p50 {_p50_ms(lambda *a: _flat_query(flat, *a), flat_queries):.1f}ms"
+            del flat
+        print(line)
+        del store, vectors
+
+
+if __name__ == "__main__":
+    main()
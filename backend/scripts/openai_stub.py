@@ -0,0 +1,196 @@
+"""
+Local stand-in for the Azure OpenAI REST API, for benchmarks and load tests.
+
+Serves chat completions and embeddings with a fixed latency and a cap on
+concurrently processed requests, so client-side batching, pooling and rate
+limiting can be measured without real API calls. With ``--rpm``, requests
+over an Azure-style quota get 429s with a Retry-After. Classification prompts
+are answered with the rule-based classifier (one object, or a JSON array for
+multi-event prompts); other chat prompts get a short canned answer, padded to
+``--answer-words`` words. Chat answers take ``--token-ms`` per word to
+generate; ``"stream": true`` requests get them as SSE chunks as they are
+"generated", and the stub counts streams the client abandoned.
+Run: python -m scripts.openai_stub [--port 8765] [--latency-ms 300] [--concurrency 8] [--rpm 0] [--token-ms 0]
+"""
+import argparse
+import asyncio
+import base64
+import json
+import re
+import threading
+import time
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import numpy as np
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from app.services.classifier import _rule_based_classify
+from app.services.rag import _mock_embedding
+
+BATCH_MARKER = "Events (JSON):"
+
+
+def create_app(latency_ms: float = 300, concurrency: int = 8, rpm: int = 0,
+               token_ms: float = 0, answer_words: int = 0) -> FastAPI:
+    app = FastAPI(title="OpenAI stub")
+    slots = asyncio.Semaphore(max(concurrency, 1))
+    app.state.stats = {"chat": 0, "embeddings": 0, "throttled": 0,
+                       "stream_tokens": 0, "streams_completed": 0, "streams_cancelled": 0}
+    # Azure-style quota: a bucket of rpm / 6 requests (10 seconds' worth)
+    # refilled continuously.
+    bucket = {"level": max(1.0, rpm / 6), "at": time.monotonic()}
+
+    def _throttle():
+        if rpm <= 0:
+            return None
+        now = time.monotonic()
+        bucket["level"] = min(max(1.0, rpm / 6), bucket["level"] + (now - bucket["at"]) * rpm / 60)
+        bucket["at"] = now
+        if bucket["level"] >= 1:
+            bucket["level"] -= 1
+            return None
+        app.state.stats["throttled"] += 1
+        retry_ms = int((1 - bucket["level"]) * 60_000 / rpm) + 1
+        return JSONResponse(
+            {"error": {"code": "429", "message": "Rate limit is exceeded."}},
+            status_code=429, headers={"retry-after-ms": str(retry_ms)},
+        )
+
+    async def _work():
+        async with slots:
+            await asyncio.sleep(latency_ms / 1000)
+
+    @app.post("/openai/deployments/{deployment}/chat/completions")
+    async def chat(deployment: str, request: Request):
+        body = await request.json()
+        throttled = _throttle()
+        if throttled is not None:
+            return throttled
+        await _work()
+        app.state.stats["chat"] += 1
+        prompt = body["messages"][-1]["content"]
+        content = _answer(prompt, answer_words)
+        if body.get("stream"):
+            return StreamingResponse(
+                _stream(deployment, prompt, content, body), media_type="text/event-stream",
+            )
+        if token_ms > 0:
+            await asyncio.sleep(len(content.split()) * token_ms / 1000)
+        return {
+            "id": f"chatcmpl-{time.time_ns()}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": deployment,
+            "choices": [{
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": content},
+            }],
+            "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(content) // 4,
+                      "total_tokens": (len(prompt) + len(content)) // 4},
+        }
+
+    async def _stream(deployment: str, prompt: str, content: str, body: dict):
+        stats = app.state.stats
+        created = int(time.time())
+
+        def chunk(delta: dict, finish_reason=None, **extra) -> str:
+            choices = [{"index": 0, "delta": delta, "finish_reason": finish_reason}] if delta is not None else []
+            return "data: " + json.dumps({
+                "id": f"chatcmpl-{created}", "object": "chat.completion.chunk", "created": created,
+                "model": deployment, "choices": choices, **extra,
+            }) + "\n\n"
+
+        try:
+            yield chunk({"role": "assistant", "content": ""})
+            for i, piece in enumerate(re.findall(r"\S+\s*", content)):
+                if i:
+                    await asyncio.sleep(token_ms / 1000)
+                yield chunk({"content": piece})
+                stats["stream_tokens"] += 1
+            yield chunk({}, "stop")
+            if (body.get("stream_options") or {}).get("include_usage"):
+                yield chunk(None, usage={"prompt_tokens": len(prompt) // 4, "completion_tokens": len(content) // 4,
+                                         "total_tokens": (len(prompt) + len(content)) // 4})
+            yield "data: [DONE]\n\n"
+            stats["streams_completed"] += 1
+        except asyncio.CancelledError:
+            # The client hung up: a real deployment stops generating here.
+            stats["streams_cancelled"] += 1
+            raise
+
+    @app.post("/openai/deployments/{deployment}/embeddings")
+    async def embeddings(deployment: str, request: Request):
+        body = await request.json()
+        throttled = _throttle()
+        if throttled is not None:
+            return throttled
+        await _work()
+        app.state.stats["embeddings"] += 1
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        # The SDK asks for base64 (as the real API supports) unless told otherwise.
+        encode = _base64_embedding if body.get("encoding_format") == "base64" else _mock_embedding
+        return {
+            "object": "list",
+            "model": deployment,
+            "data": [{"object": "embedding", "index": i, "embedding": encode(str(text))}
+                     for i, text in enumerate(inputs)],
+            "usage": {"prompt_tokens": 0, "total_tokens": 0},
+        }
+
+    return app
+
+
+def _base64_embedding(text: str) -> str:
+    return base64.b64encode(np.asarray(_mock_embedding(text), dtype=np.float32).tobytes()).decode()
+
+
+def _answer(prompt: str, answer_words: int = 0) -> str:
+    if BATCH_MARKER in prompt:
+        raw = prompt.split(BATCH_MARKER, 1)[1].split("\n\n", 1)[0]
+        events = json.loads(raw)
+        return json.dumps([
+            {"id": e["id"], **_rule_based_classify(e["title"], e["description"])} for e in events
+        ])
+    match = re.search(r"Event Title: (.*)\nEvent Description: (.*)", prompt)
+    if match:
+        return json.dumps(_rule_based_classify(match.group(1), match.group(2)))
+    answer = "Based on the evidence, the company shows mixed ESG performance [1]."
+    if answer_words > 0:
+        filler = "Further evidence points to the same conclusion [2]."
+        words = answer.split() + filler.split() * (answer_words // len(filler.split()) + 1)
+        answer = " ".join(words[:max(answer_words, len(answer.split()))])
+    return answer
+
+
+def serve_in_background(port: int = 8765, latency_ms: float = 300, concurrency: int = 8, rpm: int = 0,
+                        token_ms: float = 0, answer_words: int = 0):
+    """Start the stub on a daemon thread; returns the uvicorn server (set
+    ``should_exit`` to stop it)."""
+    import uvicorn
+
+    app = create_app(latency_ms, concurrency, rpm, token_ms, answer_words)
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", loop="asyncio"))
+    server.app_state = app.state
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Local Azure OpenAI stub")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--concurrency", type=int, default=8, help="Requests processed at once")
+    parser.add_argument("--rpm", type=int, default=0, help="Requests/min quota answered with 429s, 0 = none")
+    parser.add_argument("--token-ms", type=float, default=0, help="Generation time per word of a chat answer")
+    parser.add_argument("--answer-words", type=int, default=0, help="Pad canned chat answers to this many words")
+    args = parser.parse_args()
+    uvicorn.run(create_app(args.latency_ms, args.concurrency, args.rpm, args.token_ms, args.answer_words),
+                host="127.0.0.1", port=args.port)
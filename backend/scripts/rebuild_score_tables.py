@@ -0,0 +1,46 @@
+"""
+Rebuilds the derived score tables (hourly/daily rollups and latest_scores)
+from raw esg_scores, e.g. after upgrading an existing database. New scores
+keep both current automatically.
+Run: python -m scripts.rebuild_score_tables [--tenant TENANT_ID]
+"""
+import argparse
+import asyncio
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from sqlalchemy import select, func
+from app.db.session import async_session, engine, Base
+from app.db.models import ESGScore
+from app.services.rollups import rebuild_rollups
+from app.services.latest_scores import refresh_latest_score
+
+
+async def rebuild(tenant_id: str | None):
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    async with async_session() as db:
+        stmt = select(
+            ESGScore.tenant_id, ESGScore.company_id,
+            func.min(ESGScore.recorded_at), func.max(ESGScore.recorded_at),
+        ).group_by(ESGScore.tenant_id, ESGScore.company_id)
+        if tenant_id:
+            stmt = stmt.where(ESGScore.tenant_id == tenant_id)
+        ranges = (await db.execute(stmt)).all()
+
+        buckets = 0
+        for tid, cid, first, last in ranges:
+            buckets += await rebuild_rollups(db, tid, cid, first, last)
+            await refresh_latest_score(db, tid, cid)
+            await db.commit()
+    print(f"Rebuilt {buckets} rollup buckets and latest scores for {len(ranges)} companies")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild ESG score rollups and latest scores from raw scores")
+    parser.add_argument("--tenant", help="Only rebuild companies of this tenant")
+    args = parser.parse_args()
+    asyncio.run(rebuild(args.tenant))
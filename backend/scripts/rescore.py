@@ -0,0 +1,31 @@
+"""
+Bulk rescoring: writes a fresh ESG score for every company so recency decay
+is applied even to companies without new events.
+Run: python -m scripts.rescore [--tenant TENANT_ID]
+"""
+import argparse
+import asyncio
+import time
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from app.db.session import async_session
+from app.services.bulk_scoring import rescore_universe
+
+
+async def rescore(tenant_id: str | None):
+    started = time.perf_counter()
+    async with async_session() as db:
+        count = await rescore_universe(db, tenant_id=tenant_id)
+        await db.commit()
+    scope = f"tenant {tenant_id}" if tenant_id else "all tenants"
+    print(f"Rescored {count} companies ({scope}) in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recompute ESG scores for every company")
+    parser.add_argument("--tenant", help="Only rescore companies of this tenant")
+    args = parser.parse_args()
+    asyncio.run(rescore(args.tenant))
@@ -18,7 +18,10 @@ from app.db.models import (
     Watchlist, WatchlistItem, AlertRule,
 )
 from app.core.auth import hash_password
-from app.services.rag import _mock_embedding, _local_vectors
+from app.services.rag import _mock_embedding
+from app.services.vector_store import get_vector_store
+from app.services.rollups import apply_scores_to_rollups
+from app.services.latest_scores import upsert_latest_scores
 
 DEMO_TENANT_ID = "00000000-0000-0000-0000-000000000001"
 DEMO_USER_ID = "00000000-0000-0000-0000-000000000002"
@@ -131,6 +134,8 @@ async def seed():
 
         await db.flush()
         now = datetime.now(timezone.utc)
+        scores = []
+        vector_store = get_vector_store()
 
         for cid in company_ids:
             num_events = random.randint(8, 20)
@@ -185,11 +190,7 @@ async def seed():
                     "ts": event_date.isoformat(),
                     "text": rag_doc.content[:500],
                 }
-                _local_vectors[rag_doc.id] = {
-                    "values": _mock_embedding(rag_doc.content),
-                    "metadata": meta,
-                    "text": rag_doc.content,
-                }
+                vector_store.upsert(rag_doc.id, _mock_embedding(rag_doc.content), meta, rag_doc.content)
 
             for day_offset in range(30, -1, -1):
                 base = 75 - random.uniform(0, 25)
@@ -211,6 +212,11 @@ async def seed():
                     recorded_at=now - timedelta(days=day_offset),
                 )
                 db.add(score)
+                scores.append(score)
+
+        await db.flush()
+        await apply_scores_to_rollups(db, scores)
+        await upsert_latest_scores(db, scores)
 
         watchlist = Watchlist(
             tenant_id=DEMO_TENANT_ID,
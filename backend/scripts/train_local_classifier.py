@@ -0,0 +1,128 @@
+"""
+Train the local event classifier from stored LLM classifications.
+
+Only events classified by the LLM (classification_json.source == "llm") are
+used; rule-based and local-model results would teach the model its own
+mistakes. Events from before source tagging can be included with
+--include-untagged.
+
+With --eval, a deterministic 20% holdout is scored first: agreement with the
+LLM labels and the share of LLM calls (and tokens) saved at several
+confidence thresholds, to pick LOCAL_CLASSIFIER_THRESHOLD.
+Run: python -m scripts.train_local_classifier [--eval] [--include-untagged] [--tenant TENANT_ID]
+"""
+import argparse
+import asyncio
+import time
+import zlib
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from sqlalchemy import select
+from app.core.config import get_settings
+from app.db.session import async_session
+from app.db.models import ESGEvent
+from app.services.classifier import CLASSIFICATION_PROMPT
+from app.services.llm_scheduler import estimate_tokens
+from app.services.local_classifier import severity_band, train
+
+THRESHOLDS = (0.5, 0.6, 0.7, 0.8, 0.9, 0.95, 0.99)
+# Typical completion size of a single-event classification.
+COMPLETION_TOKENS = 80
+
+
+async def load_examples(tenant_id: str | None, include_untagged: bool) -> list:
+    stmt = select(ESGEvent.id, ESGEvent.title, ESGEvent.description, ESGEvent.classification_json).where(
+        ESGEvent.is_processed == True,
+    )
+    if tenant_id:
+        stmt = stmt.where(ESGEvent.tenant_id == tenant_id)
+    async with async_session() as db:
+        rows = (await db.execute(stmt)).all()
+
+    examples = []
+    for row in rows:
+        c = row.classification_json
+        if not isinstance(c, dict):
+            continue
+        source = c.get("source")
+        if source == "llm" or (source is None and include_untagged):
+            examples.append((row.id, row.title, row.description or "", c))
+    return examples
+
+
+def evaluate(examples: list, usd_per_million_tokens: float | None):
+    holdout = [e for e in examples if zlib.crc32(e[0].encode()) % 5 == 0]
+    training = [e for e in examples if zlib.crc32(e[0].encode()) % 5 != 0]
+    model = train([e[1:] for e in training])
+
+    scored = []
+    tokens = 0
+    started = time.perf_counter()
+    for _, title, description, label in holdout:
+        scored.append((model.predict(title, description), label))
+    per_event_us = (time.perf_counter() - started) / max(len(holdout), 1) * 1e6
+    for _, title, description, _ in holdout:
+        messages = [{"role": "user", "content": CLASSIFICATION_PROMPT.format(title=title, description=description)}]
+        tokens += estimate_tokens(messages) + COMPLETION_TOKENS
+    tokens_per_event = tokens / max(len(holdout), 1)
+
+    print(f"Holdout: {len(holdout)} events (trained on {len(training)}), {per_event_us:.0f}us per prediction")
+    header = f"{'threshold':>9} {'local':>7} {'category':>9} {'severity':>9} {'sentiment':>10} {'all':>6} {'tokens saved/1k':>16}"
+    if usd_per_million_tokens is not None:
+        header += f" {'USD saved/1k':>13}"
+    print(header)
+    for threshold in THRESHOLDS:
+        covered = [(p, l) for p, l in scored if p["confidence"] >= threshold]
+        n = len(covered)
+        if n:
+            cat = sum(p["category"] == l["category"] for p, l in covered) / n
+            sev = sum(_band(p) == _band(l) for p, l in covered) / n
+            sent = sum(p["sentiment"] == l.get("sentiment") for p, l in covered) / n
+            both = sum(
+                p["category"] == l["category"] and _band(p) == _band(l) and p["sentiment"] == l.get("sentiment")
+                for p, l in covered
+            ) / n
+        else:
+            cat = sev = sent = both = 0.0
+        share = n / max(len(scored), 1)
+        saved = share * tokens_per_event * 1000
+        line = (f"{threshold:>9.2f} {share:>7.1%} {cat:>9.1%} {sev:>9.1%} {sent:>10.1%} {both:>6.1%} "
+                f"{saved:>16,.0f}")
+        if usd_per_million_tokens is not None:
+            line += f" {saved / 1e6 * usd_per_million_tokens:>13.4f}"
+        print(line)
+    print("local = share of events answered without the LLM; agreement is measured on those events.")
+
+
+def _band(c: dict):
+    try:
+        return severity_band(int(c["severity"]))
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+async def main(args):
+    examples = await load_examples(args.tenant, args.include_untagged)
+    print(f"Loaded {len(examples)} LLM-labelled events")
+    if args.eval:
+        evaluate(examples, args.usd_per_million_tokens)
+
+    started = time.perf_counter()
+    model = train([e[1:] for e in examples])
+    path = args.output or get_settings().LOCAL_CLASSIFIER_PATH
+    model.save(path)
+    print(f"Trained on {model.trained_on} events in {time.perf_counter() - started:.1f}s, saved to {path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the local event classifier")
+    parser.add_argument("--eval", action="store_true", help="Report holdout agreement and savings first")
+    parser.add_argument("--include-untagged", action="store_true",
+                        help="Also train on classifications stored before source tagging")
+    parser.add_argument("--tenant", help="Only use events of this tenant")
+    parser.add_argument("--output", help="Model path (default LOCAL_CLASSIFIER_PATH)")
+    parser.add_argument("--usd-per-million-tokens", type=float, help="Price used to report cost saved")
+    asyncio.run(main(parser.parse_args()))
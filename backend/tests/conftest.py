@@ -0,0 +1,26 @@
+from contextlib import asynccontextmanager
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+import app.db.models  # noqa: F401  (registers the tables)
+from app.db.session import Base
+
+
+@asynccontextmanager
+async def _memory_db():
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    try:
+        yield async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    finally:
+        await engine.dispose()
+
+
+@pytest.fixture
+def memory_db():
+    """``async with memory_db() as session_factory``: a fresh in-memory
+    SQLite database with the schema, inside the test's event loop."""
+    return _memory_db
@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+
+from app.core.config import get_settings
+from app.services.ann import IVFPQIndex, exact_top_k
+from app.services.mmap_vector_store import MappedVectorStore
+from app.services.vector_store import LocalVectorStore
+
+
+def _clustered(n, dim=32, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((50, dim)).astype(np.float32)
+    x = centers[rng.integers(0, 50, n)] + 0.3 * rng.standard_normal((n, dim)).astype(np.float32)
+    return x / np.linalg.norm(x, axis=1, keepdims=True), rng
+
+
+def _meta():
+    return {"tenant_id": "t1", "company_id": "c1"}
+
+
+@pytest.fixture
+def ann_settings(monkeypatch):
+    settings = get_settings()
+    monkeypatch.setattr(settings, "VECTOR_ANN_MIN_ROWS", 1000)
+    monkeypatch.setattr(settings, "VECTOR_ANN_NLIST", 32)
+    monkeypatch.setattr(settings, "VECTOR_ANN_PQ_M", 8)
+    monkeypatch.setattr(settings, "VECTOR_ANN_NPROBE", 8)
+    return settings
+
+
+def test_index_recall_against_exact():
+    x, rng = _clustered(3000)
+    index = IVFPQIndex.build(x, nlist=32, m=8)
+    recall = 0
+    for q in x[rng.integers(0, len(x), 50)]:
+        expected, _ = exact_top_k(x, None, q, 10)
+        found, _ = exact_top_k(x, index.candidates(q, 100, nprobe=8), q, 10)
+        recall += len(set(expected) & set(found)) / 10
+    assert recall / 50 >= 0.9
+
+
+def test_index_follows_partition_updates_and_deletes(ann_settings):
+    x, rng = _clustered(1500)
+    store = LocalVectorStore(background_index=False)
+    for i, v in enumerate(x):
+        store.upsert(str(i), v, _meta())
+    partition = store._partitions[("t1", "c1")]
+    assert partition.ann is not None and store.stats()["indexed_partitions"] == 1
+
+    for i in range(0, 1500, 4):
+        store.delete(str(i))
+    for i in range(1, 200, 4):
+        store.upsert(str(i), -x[i], _meta())
+    index = partition.ann
+    assert index.size == len(partition)
+    assert sum(m.size for m in index.members) == len(partition)
+    for lst, members in enumerate(index.members):
+        rows = members.rows[:members.size]
+        assert (index.lists[rows] == lst).all()
+        assert (index.positions[rows] == np.arange(members.size)).all()
+
+    # Scores are exact and every result is a live document.
+    q = x[7]
+    results = store.query(q, "t1", "c1", top_k=5)
+    assert results[0]["id"] == "7" and results[0]["score"] == pytest.approx(1.0, abs=1e-5)
+    assert all(int(r["id"]) % 4 for r in results)
+
+
+def test_compaction_persists_index(tmp_path, ann_settings):
+    x, rng = _clustered(1200)
+    store = MappedVectorStore(str(tmp_path))
+    reference = LocalVectorStore(background_index=False)
+    for i, v in enumerate(x):
+        store.upsert(str(i), v, _meta(), f"doc {i}")
+        reference.upsert(str(i), v, _meta(), f"doc {i}")
+    assert store.compact()
+    assert store.stats()["indexed_partitions"] == 1
+    assert (tmp_path / "ann-1-0.npy").exists()
+
+    store.delete("3")
+    reference.delete("3")
+    reopened = MappedVectorStore(str(tmp_path))
+    recall = 0
+    for q in x[rng.integers(0, len(x), 30)]:
+        expected = {r["id"] for r in reference.query(q, "t1", "c1", 10)}
+        results = reopened.query(q, "t1", "c1", 10)
+        assert "3" not in {r["id"] for r in results}
+        assert results[0]["text"] == f"doc {results[0]['id']}"
+        recall += len(expected & {r["id"] for r in results}) / 10
+    assert recall / 30 >= 0.9
+
+    store.upsert("new", x[0], _meta())
+    assert store.compact()
+    assert not (tmp_path / "ann-1-0.npy").exists() and (tmp_path / "ann-2-0.npy").exists()
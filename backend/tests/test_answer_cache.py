@@ -0,0 +1,119 @@
+import asyncio
+
+import pytest
+
+from app.api.routers.chat import _caching
+from app.core.config import get_settings
+from app.services import answer_cache as answer_cache_module
+from app.services.answer_cache import AnswerCache
+
+ANSWER = {
+    "answer": "Emissions rose 4% [1].",
+    "citations": [{"idx": 1, "title": "Annual report", "url": "", "ts": ""}],
+    "used_company_id": "c1",
+}
+
+
+@pytest.fixture
+def cache():
+    return AnswerCache(max_entries=10, min_similarity=0.95)
+
+
+def test_similar_question_hits_with_citations(cache):
+    cache.put("t", "c1", "s1:d1", [1.0, 0.0, 0.1], ANSWER)
+    hit = cache.get("t", "c1", "s1:d1", [1.0, 0.02, 0.1])
+    assert hit == ANSWER
+    hit["citations"][0]["title"] = "changed"
+    assert cache.get("t", "c1", "s1:d1", [1.0, 0.0, 0.1])["citations"][0]["title"] == "Annual report"
+
+
+def test_dissimilar_question_and_other_company_miss(cache):
+    cache.put("t", "c1", "s1:d1", [1.0, 0.0, 0.0], ANSWER)
+    assert cache.get("t", "c1", "s1:d1", [0.0, 1.0, 0.0]) is None
+    assert cache.get("t", "c2", "s1:d1", [1.0, 0.0, 0.0]) is None
+    assert cache.stats()["hit_rate"] == 0.0
+
+
+def test_embeddings_of_other_dimensions_miss_and_replace(cache):
+    cache.put("t", "c1", "s1:d1", [1.0, 0.0, 0.0], ANSWER)
+    assert cache.get("t", "c1", "s1:d1", [1.0, 0.0]) is None
+    cache.put("t", "c1", "s1:d1", [1.0, 0.0], ANSWER)
+    assert cache.get("t", "c1", "s1:d1", [1.0, 0.0]) == ANSWER
+    assert cache.stats()["entries"] == 1
+
+
+def test_new_evidence_drops_entries(cache):
+    cache.put("t", "c1", "s1:d1", [1.0, 0.0], ANSWER)
+    assert cache.get("t", "c1", "s2:d1", [1.0, 0.0]) is None
+    assert cache.stats()["stale"] == 1 and cache.stats()["entries"] == 0
+
+    cache.put("t", "c1", "s2:d1", [1.0, 0.0], ANSWER)
+    cache.invalidate("t", "c1")
+    assert cache.get("t", "c1", "s2:d1", [1.0, 0.0]) is None
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_per_company_cap_ttl_and_lru(cache, monkeypatch):
+    settings = answer_cache_module.get_settings()
+    monkeypatch.setattr(settings, "ANSWER_CACHE_MAX_PER_COMPANY", 2)
+    for i in range(3):
+        cache.put("t", "c1", "f", [float(i == 0), float(i == 1), float(i == 2)], ANSWER)
+    assert cache.get("t", "c1", "f", [1.0, 0.0, 0.0]) is None  # oldest entry pushed out
+    assert cache.get("t", "c1", "f", [0.0, 0.0, 1.0]) is not None
+
+    for company in ("c2", "c3", "c4", "c5", "c6"):
+        cache.put("t", company, "f", [1.0, 0.0, 0.0], ANSWER)
+        cache.put("t", company, "f", [0.0, 1.0, 0.0], ANSWER)
+    assert cache.stats()["entries"] == 10 and cache.stats()["evictions"] == 2
+    assert cache.get("t", "c1", "f", [0.0, 0.0, 1.0]) is None  # least recently used company
+
+    monkeypatch.setattr(settings, "ANSWER_CACHE_TTL_S", -1)
+    assert cache.get("t", "c6", "f", [1.0, 0.0, 0.0]) is None
+    assert cache.stats()["companies"] == 4
+
+
+def test_completed_stream_is_cached(monkeypatch):
+    cache = AnswerCache(max_entries=10, min_similarity=0.95)
+    monkeypatch.setattr("app.api.routers.chat.answer_cache", cache)
+
+    async def events(finish):
+        yield "citations", {"citations": ANSWER["citations"], "used_company_id": "c1"}
+        yield "token", {"text": "Emissions rose "}
+        yield "token", {"text": "4% [1]."}
+        if finish:
+            yield "done", {"used_company_id": "c1"}
+
+    async def run(finish):
+        return [e async for e, _ in _caching(events(finish), "t", "c1", ("f", [1.0, 0.0], None))]
+
+    assert asyncio.run(run(False))[-1] == "token"
+    assert cache.stats()["entries"] == 0  # cut-off streams are not cached
+    assert asyncio.run(run(True))[-1] == "done"
+    assert cache.get("t", "c1", "f", [1.0, 0.0]) == ANSWER
+
+
+def test_mock_embeddings_only_match_the_same_question(monkeypatch):
+    import app.api.routers.chat as chat
+
+    cache = AnswerCache(max_entries=10, min_similarity=0.0)  # any vector would match by similarity
+    monkeypatch.setattr(chat, "answer_cache", cache)
+    monkeypatch.setattr(get_settings(), "AZURE_OPENAI_API_KEY", "")  # mock embeddings
+
+    async def evidence_fingerprint(db, tenant_id, company_id):
+        return "f"
+
+    monkeypatch.setattr(chat, "evidence_fingerprint", evidence_fingerprint)
+
+    async def ask(message):
+        return await chat._cached_answer(message, "t", "c1", db=None)
+
+    async def run():
+        cached, entry = await ask("What are Acme's emissions?")
+        assert cached is None and entry[2] is not None
+        chat._cache_answer("t", "c1", entry, ANSWER)
+        same, other = [(await ask(m))[0] for m in ("what are acme s  emissions", "Who sits on Acme's board?")]
+        by_similarity = cache.get("t", "c1", "f", entry[1])  # the same vector, as if it were a real one
+        return same, other, by_similarity
+
+    same, other, by_similarity = asyncio.run(run())
+    assert same == ANSWER and other is None and by_similarity is None
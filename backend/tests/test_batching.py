@@ -0,0 +1,120 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import classifier
+from app.services.batching import MicroBatcher
+from app.services.classification_cache import ClassificationCache
+
+
+def _batcher(handler, max_batch=4, max_wait_ms=20):
+    return MicroBatcher(handler, max_batch=lambda: max_batch, max_wait_ms=lambda: max_wait_ms)
+
+
+def test_concurrent_submits_share_one_batch():
+    calls = []
+
+    async def handler(items):
+        calls.append(list(items))
+        return [i * 10 for i in items]
+
+    async def run():
+        batcher = _batcher(handler, max_batch=8)
+        results = await asyncio.gather(*(batcher.submit(i) for i in range(5)))
+        return results, batcher.stats()
+
+    results, stats = asyncio.run(run())
+    assert results == [0, 10, 20, 30, 40]
+    assert calls == [[0, 1, 2, 3, 4]]
+    assert stats["batches"] == 1 and stats["avg_batch_size"] == 5
+
+
+def test_full_batch_flushes_without_waiting():
+    calls = []
+
+    async def handler(items):
+        calls.append(len(items))
+        return items
+
+    async def run():
+        batcher = _batcher(handler, max_batch=3, max_wait_ms=10_000)
+        return await asyncio.wait_for(asyncio.gather(*(batcher.submit(i) for i in range(6))), 1)
+
+    assert asyncio.run(run()) == list(range(6))
+    assert calls == [3, 3]
+
+
+def test_handler_failure_reaches_every_caller():
+    async def handler(items):
+        raise RuntimeError("boom")
+
+    async def run():
+        batcher = _batcher(handler)
+        return await asyncio.gather(*(batcher.submit(i) for i in range(3)), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+class _FakeClient:
+    def __init__(self, content):
+        self.prompts = []
+
+        async def create(**kwargs):
+            self.prompts.append(kwargs["messages"][-1]["content"])
+            body = content(self.prompts[-1]) if callable(content) else content
+            return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=body))])
+
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=create))
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    settings = classifier.get_settings()
+    monkeypatch.setattr(settings, "AZURE_OPENAI_API_KEY", "test")
+    monkeypatch.setattr(settings, "CLASSIFIER_BATCH_MAX", 16)
+    monkeypatch.setattr(settings, "LOCAL_CLASSIFIER_ENABLED", False)
+    monkeypatch.setattr(classifier, "classification_cache", ClassificationCache("test", max_entries=100))
+
+    def install(content):
+        client = _FakeClient(content)
+        monkeypatch.setattr(classifier.llm_clients, "client", lambda: client)
+        return client
+
+    return install
+
+
+def test_classify_events_maps_results_by_id(llm):
+    def answer(prompt):
+        events = json.loads(prompt.split("Events (JSON):", 1)[1].split("\n\n", 1)[0])
+        # Out of order, one malformed entry, one missing.
+        return json.dumps([
+            {"id": 2, "category": "social", "subcategory": "x", "severity": 40, "confidence": 0.9, "sentiment": "negative"},
+            {"id": 0, "category": "environmental", "subcategory": "y", "severity": 3, "confidence": 1.5, "sentiment": "neutral"},
+            {"id": 1, "category": "weather"},
+        ][:len(events)])
+
+    client = llm(answer)
+    items = [
+        ("Solar plant opened", "New renewable facility"),
+        ("Board independence concerns", "Audit issues flagged"),
+        ("Worker strike", "Labor dispute over wages"),
+        ("Bribery probe", "Corruption investigation opened"),
+    ]
+    results = asyncio.run(classifier.classify_events(items))
+
+    assert len(client.prompts) == 1
+    assert results[0]["category"] == "environmental" and results[0]["confidence"] == 1.0
+    assert results[2]["category"] == "social" and results[2]["severity"] == 10
+    # Malformed and missing items fall back to the rule-based classifier.
+    assert results[1] == classifier._rule_based_classify(*items[1])
+    assert results[3] == classifier._rule_based_classify(*items[3])
+
+
+def test_classify_events_falls_back_when_response_is_not_json(llm):
+    llm("Sorry, I cannot help with that.")
+    items = [("Worker strike", "Labor dispute"), ("Bribery probe", "Corruption")]
+    results = asyncio.run(classifier.classify_events(items))
+    assert results == [classifier._rule_based_classify(t, d) for t, d in items]
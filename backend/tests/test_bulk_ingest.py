@@ -0,0 +1,182 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from app.schemas.common import IngestEventRequest
+from app.services.bulk_ingest import BulkIngest, iter_json_array, iter_ndjson
+
+EVENTS = [
+    {"company_id": "c1", "title": "Oil spill near Mumbai — cleanup begins", "description": "Leak at refinery."},
+    {"company_id": "c1", "title": "Workers strike", "description": "Unpaid wages."},
+    {"company_id": "c2", "title": "Auditor resigns", "description": "Board ignored findings."},
+]
+
+
+def _chunks(data: bytes, size: int):
+    async def gen():
+        for i in range(0, len(data), size):
+            yield data[i:i + size]
+    return gen()
+
+
+def _collect(items):
+    async def run():
+        return [item async for item in items]
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("size", [1, 7, 4096])
+def test_json_array_split_anywhere(size):
+    body = json.dumps(EVENTS, ensure_ascii=False).encode()
+    items = _collect(iter_json_array(_chunks(body, size)))
+    assert [(i, e.title) for i, e in items] == [(i, e["title"]) for i, e in enumerate(EVENTS)]
+
+
+@pytest.mark.parametrize("size", [1, 5, 4096])
+def test_ndjson_bad_lines_fail_alone(size):
+    lines = [json.dumps(EVENTS[0], ensure_ascii=False), "{not json", "", json.dumps({"title": "no company"}),
+             json.dumps(EVENTS[2])]
+    items = _collect(iter_ndjson(_chunks("\n".join(lines).encode(), size)))
+    assert [i for i, _ in items] == [0, 1, 2, 3]
+    assert items[0][1].title == EVENTS[0]["title"] and items[3][1].title == EVENTS[2]["title"]
+    assert "json" in items[1][1].lower()
+    assert items[2][1].startswith("company_id: Field required")
+
+
+def test_json_array_errors():
+    assert _collect(iter_json_array(_chunks(b"[]", 1))) == []
+    assert _collect(iter_json_array(_chunks(b'{"title": "x"}', 4))) == [(-1, "body must be a JSON array")]
+    items = _collect(iter_json_array(_chunks(b'[%s, 5, {"title": ' % json.dumps(EVENTS[1]).encode(), 3)))
+    assert items[0][1].title == "Workers strike"
+    assert items[1] == (1, "item: must be an object")
+    assert items[2][0] == -1 and items[2][1].startswith("malformed JSON after item 1")
+
+
+class _FakeDB:
+    def __init__(self):
+        self.inserts = []
+        self.commits = 0
+
+    async def execute(self, stmt, rows=None):
+        if rows is None:  # the tenant's companies
+            return SimpleNamespace(scalars=lambda: SimpleNamespace(all=lambda: ["c1", "c2"]))
+        self.inserts.append(rows)
+
+    async def commit(self):
+        self.commits += 1
+
+
+class _FakePool:
+    def __init__(self, pending=0, capacity=10_000):
+        self.running = True
+        self.pending = pending
+        self.capacity = capacity
+        self.submitted = []
+
+    def accepts(self, company_ids):
+        return self.running and self.pending + len(list(company_ids)) <= self.capacity
+
+    def submit(self, event_id, company_id):
+        self.submitted.append(event_id)
+        self.pending += 1
+        return True
+
+
+def _items(events):
+    async def gen():
+        for i, event in enumerate(events):
+            yield i, event
+    return gen()
+
+
+def _bulk(db, pool, items, chunk_size=2):
+    parsed = [(e if isinstance(e, str) else IngestEventRequest.model_validate(e)) for e in items]
+    return asyncio.run(BulkIngest(db, "t1", pool, chunk_size=chunk_size).run(_items(parsed)))
+
+
+def test_bulk_inserts_in_chunks_and_reports_every_item():
+    db, pool = _FakeDB(), _FakePool()
+    events = EVENTS + ["title: Field required", {**EVENTS[0], "company_id": "other-tenant"}, EVENTS[1]]
+    response = _bulk(db, pool, events)
+    assert [len(rows) for rows in db.inserts] == [2, 2] and db.commits == 2
+    assert [r["status"] for r in response["results"]] == ["queued", "queued", "queued", "invalid", "invalid", "queued"]
+    assert response["results"][4]["error"] == "company_id: unknown company"
+    assert pool.submitted == [r["event_id"] for r in response["results"] if r["status"] == "queued"]
+    row = db.inserts[0][0]
+    assert row["tenant_id"] == "t1" and row["category"] == "governance" and row["raw_text"] == "Leak at refinery."
+    assert response["queued"] == 4 and response["invalid"] == 2 and response["error"] is None
+
+
+def test_bulk_rejects_chunks_the_queue_cannot_take():
+    db, pool = _FakeDB(), _FakePool(pending=1, capacity=2)
+    response = _bulk(db, pool, EVENTS, chunk_size=1)
+    assert [r["status"] for r in response["results"]] == ["queued", "rejected", "rejected"]
+    assert len(db.inserts) == 1 and response["rejected"] == 2
+
+
+def test_bulk_defers_events_a_concurrent_request_crowded_out(monkeypatch):
+    import app.workers.ingest_pool as ingest_pool_module
+    from app.workers.ingest_pool import IngestPool
+
+    class Session:
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc):
+            return False
+
+        async def get(self, model, event_id):
+            return None  # nothing to process
+
+    class SlowDB(_FakeDB):
+        def __init__(self, gate):
+            super().__init__()
+            self.gate = gate
+
+        async def commit(self):
+            await self.gate.wait()
+
+    async def run():
+        gate = asyncio.Event()
+        pool = IngestPool(workers=1, session_factory=Session, max_pending=2, backfill_interval_s=0)
+        pool.start()
+        events = [IngestEventRequest.model_validate(e) for e in EVENTS[:2]]
+        calls = [asyncio.create_task(BulkIngest(SlowDB(gate), "t1", pool, chunk_size=2).run(_items(events)))
+                 for _ in range(2)]
+        await asyncio.sleep(0.01)  # both chunks passed accepts() and wait in commit
+        gate.set()
+        responses = await asyncio.gather(*calls)
+        rejected = pool.rejected
+        await pool.stop()
+        return responses, rejected
+
+    responses, rejected = asyncio.run(run())
+    statuses = [r["status"] for response in responses for r in response["results"]]
+    assert statuses == ["queued", "queued", "deferred", "deferred"] and rejected == 2
+    assert all(r["event_id"] for response in responses for r in response["results"])
+    assert responses[1]["deferred"] == 2 and responses[1]["queued"] == 0
+
+
+def test_async_ingest_does_not_report_a_refused_event_as_queued(monkeypatch):
+    from fastapi import Response
+    import app.api.routers.ingest as ingest_router
+
+    pool = _FakePool()
+    pool.submit = lambda event_id, company_id: False  # the lane filled up during the commit
+    monkeypatch.setattr(ingest_router, "get_ingest_queue", lambda: pool)
+    db = _FakeDB()
+    added = []
+
+    async def flush():
+        added[0].id = "e1"
+
+    db.add, db.flush = added.append, flush
+    response = Response()
+    body = IngestEventRequest.model_validate(EVENTS[0])
+    result = asyncio.run(ingest_router.ingest_event(
+        body, response, mode="async", current_user=SimpleNamespace(tenant_id="t1"), db=db,
+    ))
+    assert response.status_code == 202 and db.commits == 1
+    assert result["status"] == "deferred" and result["event_id"] == "e1"
@@ -0,0 +1,48 @@
+import random
+from types import SimpleNamespace
+from datetime import datetime, timezone, timedelta
+import numpy as np
+from app.services.scoring import compute_category_impacts, build_score
+from app.services.bulk_scoring import compute_scores, CATEGORIES
+
+
+def test_vectorized_scores_match_per_company_scoring():
+    rng = random.Random(3)
+    now = datetime(2025, 6, 1, tzinfo=timezone.utc)
+    n_companies = 25
+    events = [
+        SimpleNamespace(
+            company=rng.randrange(n_companies),
+            category=rng.choice(CATEGORIES),
+            severity=rng.randint(1, 10),
+            confidence=round(rng.uniform(0.3, 1.0), 2),
+            event_date=now - timedelta(hours=rng.uniform(-48, 89 * 24)),
+        )
+        for _ in range(1500)
+    ]
+
+    scores = compute_scores(
+        np.array([e.company for e in events]),
+        np.array([CATEGORIES.index(e.category) for e in events]),
+        np.array([e.severity for e in events], dtype=float),
+        np.array([e.confidence for e in events]),
+        np.array([e.event_date.timestamp() for e in events]),
+        n_companies,
+        now.timestamp(),
+    )
+
+    for i in range(n_companies):
+        company_events = [e for e in events if e.company == i]
+        expected = build_score("t", str(i), compute_category_impacts(company_events, now), now)
+        assert abs(scores["overall"][i] - expected.overall) <= 0.011
+        assert abs(scores["environmental"][i] - expected.environmental) <= 0.011
+        assert scores["risk_level"][i] == expected.risk_level
+
+
+def test_company_without_events_gets_base_score():
+    scores = compute_scores(
+        np.array([], dtype=np.int64), np.array([], dtype=np.int64),
+        np.array([]), np.array([]), np.array([]), 2, 0.0,
+    )
+    assert list(scores["overall"]) == [75.0, 75.0]
+    assert list(scores["risk_level"]) == ["medium", "medium"]
@@ -0,0 +1,88 @@
+import asyncio
+import time
+
+import pytest
+
+from app.api.routers.chat import _sse
+from app.services import rag
+from app.services.llm_client import llm_clients
+from app.services.llm_scheduler import llm_scheduler
+from scripts.openai_stub import serve_in_background
+
+PORT = 8791
+WORDS = 40
+TOKEN_MS = 10
+
+CHAT = {
+    "citations": [{"idx": 1, "title": "Carbon targets missed", "url": "", "ts": ""}],
+    "score_context": "",
+    "messages": [{"role": "user", "content": "Question: how are emissions trending?"}],
+    "used_company_id": "c1",
+}
+
+
+@pytest.fixture(scope="module")
+def stub():
+    server = serve_in_background(PORT, latency_ms=0, concurrency=4, token_ms=TOKEN_MS, answer_words=WORDS)
+    yield server.app_state.stats
+    server.should_exit = True
+
+
+@pytest.fixture
+def llm(stub, monkeypatch):
+    settings = rag.get_settings()
+    monkeypatch.setattr(settings, "AZURE_OPENAI_API_KEY", "test")
+    monkeypatch.setattr(settings, "AZURE_OPENAI_ENDPOINT", f"http://127.0.0.1:{PORT}")
+    return stub
+
+
+def test_streams_citations_then_tokens(llm):
+    async def run():
+        started = time.perf_counter()
+        events = []
+        async for event, data in rag.stream_chat_answer(CHAT):
+            events.append((event, data, time.perf_counter() - started))
+        await llm_clients.close()
+        return events
+
+    events = asyncio.run(run())
+    assert events[0][0] == "citations" and events[0][1]["citations"] == CHAT["citations"]
+    assert events[-1][0] == "done"
+    tokens = [e for e in events if e[0] == "token"]
+    assert len("".join(d["text"] for _, d, _ in tokens).split()) == WORDS
+    # Words arrive as they are generated rather than all at once at the end
+    # (measured from the first token: the first call also pays for imports).
+    assert tokens[-1][2] - tokens[0][2] > 0.75 * (WORDS - 1) * TOKEN_MS / 1000
+    assert llm["streams_completed"] >= 1
+
+
+def test_closing_the_stream_stops_the_completion(llm):
+    async def run():
+        before = dict(llm)
+        events = rag.stream_chat_answer(CHAT)
+        assert (await events.__anext__())[0] == "citations"
+        assert (await events.__anext__())[0] == "token"
+        await events.aclose()
+        await asyncio.sleep(0.2)  # let the stub notice the disconnect
+        in_flight = llm_scheduler.stats()["lanes"]["interactive"]["in_flight"]
+        await llm_clients.close()
+        return before, in_flight
+
+    before, in_flight = asyncio.run(run())
+    assert llm["streams_cancelled"] == before["streams_cancelled"] + 1
+    assert llm["stream_tokens"] - before["stream_tokens"] < WORDS
+    assert in_flight == 0
+
+
+def test_sse_framing():
+    async def events():
+        yield "citations", {"citations": []}
+        yield "token", {"text": "Hello\n"}
+
+    async def run():
+        return [chunk async for chunk in _sse(events())]
+
+    assert asyncio.run(run()) == [
+        'event: citations\ndata: {"citations": []}\n\n',
+        'event: token\ndata: {"text": "Hello\\n"}\n\n',
+    ]
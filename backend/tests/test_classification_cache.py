@@ -0,0 +1,78 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+from app.services import classifier
+from app.services.classification_cache import ClassificationCache, prompt_version
+
+RESULT = {"category": "social", "subcategory": "labor_rights", "severity": 6, "confidence": 0.8, "sentiment": "negative"}
+
+
+def test_key_ignores_case_and_whitespace():
+    cache = ClassificationCache("v1", max_entries=10)
+    assert cache.key("Worker  Strike", "Labor dispute\n") == cache.key("worker strike", "  labor dispute")
+    assert cache.key("Worker strike", "a") != cache.key("Worker strike", "b")
+
+
+def test_prompt_change_changes_keys():
+    old = ClassificationCache(prompt_version("prompt A"), max_entries=10)
+    new = ClassificationCache(prompt_version("prompt B"), max_entries=10)
+    assert old.key("t", "d") != new.key("t", "d")
+
+
+def test_lru_eviction_and_counters():
+    async def run():
+        cache = ClassificationCache("v1", max_entries=2)
+        await cache.set("a", "", RESULT)
+        await cache.set("b", "", RESULT)
+        assert await cache.get("a", "") == RESULT  # a becomes most recent
+        await cache.set("c", "", RESULT)  # evicts b
+        assert await cache.get("b", "") is None
+        assert await cache.get("c", "") == RESULT
+        return cache.stats()
+
+    stats = asyncio.run(run())
+    assert stats["hits"] == 2 and stats["misses"] == 1 and stats["evictions"] == 1
+    assert stats["entries"] == 2
+
+
+def test_classify_event_reuses_llm_result(monkeypatch):
+    settings = classifier.get_settings()
+    monkeypatch.setattr(settings, "AZURE_OPENAI_API_KEY", "test")
+    monkeypatch.setattr(settings, "LOCAL_CLASSIFIER_ENABLED", False)
+    monkeypatch.setattr(settings, "CLASSIFIER_BATCH_WINDOW_MS", 0)
+    monkeypatch.setattr(classifier, "classification_cache", ClassificationCache("test", max_entries=10))
+    calls = []
+
+    async def create(**kwargs):
+        # Only answers the request; populating the cache is classify_event's job.
+        calls.append(kwargs["messages"][-1]["content"])
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=json.dumps(RESULT)))])
+
+    fake_client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    monkeypatch.setattr(classifier.llm_clients, "client", lambda: fake_client)
+
+    async def run():
+        first = await classifier.classify_event("Worker strike", "Labor dispute")
+        second = await classifier.classify_event("WORKER STRIKE ", "labor  dispute")
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first == second == {**RESULT, "source": "llm"}
+    assert len(calls) == 1 and "Worker strike" in calls[0]
+    stats = classifier.classification_cache.stats()
+    assert stats["entries"] == 1 and stats["hits"] == 1
+
+
+def test_fallback_results_are_not_cached(monkeypatch):
+    settings = classifier.get_settings()
+    monkeypatch.setattr(settings, "AZURE_OPENAI_API_KEY", "test")
+    monkeypatch.setattr(classifier, "classification_cache", ClassificationCache("test", max_entries=10))
+
+    def broken_client():
+        raise RuntimeError("unreachable")
+
+    monkeypatch.setattr(classifier.llm_clients, "client", broken_client)
+    result = asyncio.run(classifier._llm_classify("Worker strike", "Labor dispute"))
+    assert result == classifier._rule_based_classify("Worker strike", "Labor dispute")
+    assert classifier.classification_cache.stats()["entries"] == 0
@@ -0,0 +1,123 @@
+import asyncio
+from types import SimpleNamespace
+from sqlalchemy import text
+import app.workers.coalescer as coalescer_module
+from app.db.models import ESGScore
+from app.workers.coalescer import ScoreCoalescer
+
+
+def _event(i, company="c1"):
+    return SimpleNamespace(id=f"e{i}", tenant_id="t1", company_id=company)
+
+
+def _db():
+    return SimpleNamespace(info={})
+
+
+def _patch_recalculate(monkeypatch, delay=0.01):
+    calls = []
+
+    async def fake_recalculate(db, company_id, tenant_id):
+        calls.append(company_id)
+        await asyncio.sleep(delay)
+        return ESGScore(company_id=company_id, overall=float(len(calls)))
+
+    monkeypatch.setattr(coalescer_module, "recalculate_company_score", fake_recalculate)
+    return calls
+
+
+def test_burst_is_coalesced(monkeypatch):
+    calls = _patch_recalculate(monkeypatch)
+    coalescer = ScoreCoalescer(window_ms=100)
+
+    async def run():
+        first = await coalescer.recompute(_db(), _event(0))
+        burst = await asyncio.gather(*(coalescer.recompute(_db(), _event(i)) for i in range(1, 30)))
+        return first, burst
+
+    first, burst = asyncio.run(run())
+    assert first[1][0].id == "e0"
+    assert len(calls) == 2
+    leaders = [events for _, events in burst if events]
+    assert len(leaders) == 1 and len(leaders[0]) == 29
+    assert all(score.overall == 2 for score, _ in burst)
+
+
+def test_companies_are_independent(monkeypatch):
+    calls = _patch_recalculate(monkeypatch)
+    coalescer = ScoreCoalescer(window_ms=100)
+
+    async def run():
+        await asyncio.gather(*(coalescer.recompute(None, _event(i, f"c{i}")) for i in range(5)))
+
+    asyncio.run(run())
+    assert sorted(calls) == [f"c{i}" for i in range(5)]
+
+
+def test_followers_recompute_when_leader_fails(monkeypatch):
+    calls = []
+
+    async def flaky(db, company_id, tenant_id):
+        calls.append(company_id)
+        await asyncio.sleep(0.01)
+        if len(calls) == 2:
+            raise RuntimeError("db down")
+        return ESGScore(company_id=company_id)
+
+    monkeypatch.setattr(coalescer_module, "recalculate_company_score", flaky)
+    coalescer = ScoreCoalescer(window_ms=50)
+
+    async def run():
+        await coalescer.recompute(_db(), _event(0))
+        return await asyncio.gather(
+            *(coalescer.recompute(_db(), _event(i)) for i in range(1, 4)), return_exceptions=True
+        )
+
+    results = asyncio.run(run())
+    assert sum(isinstance(r, RuntimeError) for r in results) == 1
+    assert sum(not isinstance(r, Exception) for r in results) == 2
+
+
+def test_zero_window_disables_coalescing(monkeypatch):
+    calls = _patch_recalculate(monkeypatch, delay=0)
+    coalescer = ScoreCoalescer(window_ms=0)
+
+    async def run():
+        await asyncio.gather(*(coalescer.recompute(None, _event(i)) for i in range(5)))
+
+    asyncio.run(run())
+    assert len(calls) == 5
+
+
+def test_company_is_rescored_when_a_coalesced_session_rolls_back(memory_db, monkeypatch):
+    calls = []
+
+    async def fake_recalculate(db, company_id, tenant_id):
+        calls.append(db)
+        await asyncio.sleep(0.01)
+        return ESGScore(id=f"s{len(calls)}", company_id=company_id, overall=50.0)
+
+    monkeypatch.setattr(coalescer_module, "recalculate_company_score", fake_recalculate)
+
+    async def run():
+        async with memory_db() as sessions:
+            coalescer = ScoreCoalescer(window_ms=50, session_factory=sessions)
+            monkeypatch.setattr(coalescer_module, "score_coalescer", coalescer)
+            await coalescer.recompute(_db(), _event(0))  # starts the window
+            async with sessions() as leader_db, sessions() as follower_db:
+                for db in (leader_db, follower_db):
+                    await db.execute(text("select 1"))  # an open transaction, as after the event's flush
+                (leader, folded), (follower, _) = await asyncio.gather(
+                    coalescer.recompute(leader_db, _event(1)), coalescer.recompute(follower_db, _event(2)),
+                )
+                await leader_db.commit()
+                await coalescer.drain()
+                rescored_on_commit = coalescer.rescores
+            # follower_db closes without committing
+            await coalescer.drain()
+            return leader, follower, folded, rescored_on_commit, coalescer.rescores
+
+    leader, follower, folded, rescored_on_commit, rescores = asyncio.run(run())
+    assert [e.id for e in folded] == ["e1", "e2"]
+    assert follower is not leader and follower.id == leader.id == "s2"  # a copy, not the leader's object
+    assert rescored_on_commit == 0 and rescores == 1 and len(calls) == 3
@@ -0,0 +1,88 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from app.core.config import get_settings
+from app.services.dedup import NearDuplicateIndex, minhash, similarity
+from app.workers import pipeline
+
+NOW = datetime(2025, 6, 1, tzinfo=timezone.utc)
+TITLE = "Carbon emission targets missed by 23%"
+DESCRIPTION = (
+    "The company failed to meet its annual carbon reduction targets, exceeding planned emissions "
+    "by 23%. This raises concerns about the company's commitment to climate goals and may affect "
+    "ESG ratings."
+)
+
+
+def _index():
+    return NearDuplicateIndex(window_hours=72, min_similarity=0.7, max_per_company=100)
+
+
+def test_similarity_estimates_word_overlap():
+    a = minhash(f"{TITLE} {DESCRIPTION}")
+    assert similarity(a, minhash(f"{TITLE.upper()}  {DESCRIPTION}")) == 1.0
+    assert similarity(a, minhash("Worker strike at Pune plant over wages")) < 0.2
+
+
+def test_reworded_copy_links_to_canonical():
+    index = _index()
+    assert index.check("t", "c", "e1", TITLE, DESCRIPTION, NOW) is None
+    copy = index.check("t", "c", "e2", f"{TITLE} - Reuters", DESCRIPTION.replace("annual", "yearly"), NOW)
+    assert copy is not None and copy.event_id == "e1"
+    assert index.check("t", "c", "e3", "Worker strike at Pune plant", "Employees demand better wages.", NOW) is None
+    assert index.stats()["duplicates"] == 1 and index.stats()["indexed"] == 2
+
+
+def test_scope_is_per_company_and_window():
+    index = _index()
+    index.check("t", "c", "e1", TITLE, DESCRIPTION, NOW)
+    assert index.check("t", "other", "e2", TITLE, DESCRIPTION, NOW) is None
+    assert index.check("t2", "c", "e3", TITLE, DESCRIPTION, NOW) is None
+    assert index.check("t", "c", "e4", TITLE, DESCRIPTION, NOW + timedelta(hours=73)) is None
+    # e1 left the window when e4 arrived; e4 is the canonical event now.
+    assert index.check("t", "c", "e5", TITLE, DESCRIPTION, NOW + timedelta(hours=74)).event_id == "e4"
+
+
+def test_discarded_event_is_not_linked():
+    index = _index()
+    index.check("t", "c", "e1", TITLE, DESCRIPTION, NOW)
+    index.discard("e1")
+    assert index.check("t", "c", "e2", TITLE, DESCRIPTION, NOW) is None
+
+
+def test_duplicate_skips_classification_and_scoring(monkeypatch):
+    settings = get_settings()
+    monkeypatch.setattr(settings, "DEDUP_ENABLED", True)
+    index = _index()
+    monkeypatch.setattr(pipeline, "near_duplicates", index)
+    index.check("t", "c", "e1", TITLE, DESCRIPTION, NOW)
+    classification = {"category": "environmental", "severity": 7, "confidence": 0.9,
+                      "sentiment": "negative", "source": "llm"}
+    index.resolve("e1", classification)
+
+    async def fail(*args, **kwargs):
+        raise AssertionError("duplicate was processed")
+
+    monkeypatch.setattr(pipeline, "classify_event", fail)
+    monkeypatch.setattr(pipeline, "create_embedding", fail)
+    monkeypatch.setattr(pipeline.score_coalescer, "recompute", fail)
+    latest = SimpleNamespace(overall=61.0, risk_level="medium")
+
+    class FakeDB:
+        def add(self, obj):
+            raise AssertionError("duplicate got a RAG document")
+
+        async def flush(self):
+            pass
+
+        async def execute(self, stmt):
+            return SimpleNamespace(scalar_one_or_none=lambda: latest)
+
+    event = SimpleNamespace(
+        id="e2", tenant_id="t", company_id="c", title=f"{TITLE} (PTI)", description=DESCRIPTION,
+        event_date=NOW + timedelta(hours=1), category="governance", duplicate_of=None,
+    )
+    assert asyncio.run(pipeline.process_event(FakeDB(), event)) is latest
+    assert event.duplicate_of == "e1"
+    assert event.category == "environmental" and event.severity == 7 and event.is_processed
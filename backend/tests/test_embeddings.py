@@ -0,0 +1,96 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import rag
+from app.services.embedding_cache import EmbeddingCache
+from app.services.llm_scheduler import INTERACTIVE
+
+
+class _FakeEmbeddings:
+    def __init__(self):
+        self.requests = []
+
+        async def create(**kwargs):
+            self.requests.append(list(kwargs["input"]))
+            # Out of order on purpose: results must be matched by index.
+            data = [SimpleNamespace(index=i, embedding=[float(len(t)), float(i)]) for i, t in enumerate(kwargs["input"])]
+            return SimpleNamespace(data=data[::-1])
+
+        self.embeddings = SimpleNamespace(create=create)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    settings = rag.get_settings()
+    monkeypatch.setattr(settings, "AZURE_OPENAI_API_KEY", "test")
+    monkeypatch.setattr(settings, "EMBEDDING_BATCH_MAX", 3)
+    monkeypatch.setattr(settings, "EMBEDDING_BATCH_WINDOW_MS", 20)
+    monkeypatch.setattr(rag, "embedding_cache", EmbeddingCache(max_entries=100))
+    fake = _FakeEmbeddings()
+    monkeypatch.setattr(rag.llm_clients, "client", lambda: fake)
+    return fake
+
+
+def test_create_embeddings_chunks_and_dedupes(client):
+    texts = ["a", "bb", "a", "ccc", "dddd", "eeeee"]
+    results = asyncio.run(rag.create_embeddings(texts))
+    assert [r[0] for r in results] == [1, 2, 1, 3, 4, 5]
+    assert sorted(map(len, client.requests)) == [2, 3]  # "a" sent once, at most 3 inputs per request
+
+    again = asyncio.run(rag.create_embeddings(["bb", "eeeee"]))
+    assert [r[0] for r in again] == [2, 5] and len(client.requests) == 2
+    assert rag.embedding_cache.stats()["hits"] == 2
+
+
+def test_concurrent_background_embeddings_share_a_request(client):
+    async def run():
+        return await asyncio.gather(*(rag.create_embedding(t) for t in ("x", "yy", "x")))
+
+    assert [r[0] for r in asyncio.run(run())] == [1, 2, 1]
+    assert client.requests == [["x", "yy"]]
+
+
+def test_interactive_embeddings_skip_the_batch_window(client, monkeypatch):
+    monkeypatch.setattr(rag.get_settings(), "EMBEDDING_BATCH_WINDOW_MS", 10_000)
+    result = asyncio.run(asyncio.wait_for(rag.create_embedding("query", lane=INTERACTIVE), 1))
+    assert result[0] == 5 and client.requests == [["query"]]
+
+
+def test_failures_fall_back_to_mock_and_are_not_cached(client):
+    async def fail(**kwargs):
+        raise RuntimeError("down")
+
+    client.embeddings.create = fail
+    assert asyncio.run(rag.create_embeddings(["text"])) == [rag._mock_embedding("text")]
+    assert len(rag._mock_embedding("text")) == rag.get_settings().EMBEDDING_DIM
+    assert rag.embedding_cache.stats()["entries"] == 0
+
+
+def test_failed_embedding_never_fails_indexing_or_retrieval(client, monkeypatch):
+    from app.services.vector_store import LocalVectorStore
+
+    async def fail(**kwargs):
+        raise RuntimeError("down")
+
+    store = LocalVectorStore()
+    indexed = []
+    monkeypatch.setattr(rag, "get_vector_store", lambda: store)
+    monkeypatch.setattr(rag, "keyword_index", SimpleNamespace(add=lambda doc_id, *args: indexed.append(doc_id)))
+    meta = {"tenant_id": "t", "company_id": "c"}
+
+    async def run():
+        await rag.upsert_document("a", "aa", meta)  # 2 dimensions, from the fake API
+        client.embeddings.create = fail
+        monkeypatch.setattr(rag.get_settings(), "EMBEDDING_BATCH_WINDOW_MS", 0)
+        await rag.upsert_document("b", "bbb", meta)  # fallback of another dimension: skipped
+        skipped = await rag._vector_query("query", "t", "c", 5)
+        monkeypatch.setattr(rag.get_settings(), "EMBEDDING_DIM", 2)
+        await rag.upsert_document("c", "c", meta)  # fallback of the store's dimension
+        return skipped, await rag._vector_query("query", "t", "c", 5)
+
+    skipped, hits = asyncio.run(run())
+    assert len(rag._mock_embedding("text")) == 2
+    assert skipped == [] and sorted(h["id"] for h in hits) == ["a", "c"]
+    assert indexed == ["a", "b", "c"] and "b" not in store
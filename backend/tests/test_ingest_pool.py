@@ -0,0 +1,180 @@
+import asyncio
+from types import SimpleNamespace
+
+import app.workers.ingest_pool as ingest_pool_module
+from app.workers.ingest_pool import IngestPool
+
+
+class _FakeSession:
+    def __init__(self, db):
+        self.db = db
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def get(self, model, event_id):
+        return self.db.events.get(event_id)
+
+    async def execute(self, stmt):  # the recovery query
+        return [SimpleNamespace(id=e.id, company_id=e.company_id) for e in self.db.events.values()
+                if not e.is_processed and not e.processing_error]
+
+    async def commit(self):
+        self.db.commits += 1
+
+    async def rollback(self):
+        self.db.rollbacks += 1
+
+
+class _FakeDB:
+    def __init__(self, *event_ids, companies=1):
+        self.events = {
+            i: SimpleNamespace(id=i, company_id=f"c{n % companies}", is_processed=False, processing_error=None)
+            for n, i in enumerate(event_ids)
+        }
+        self.commits = 0
+        self.rollbacks = 0
+
+    def session(self):
+        return _FakeSession(self)
+
+
+def _patch_pipeline(monkeypatch, fail=(), delay=0.01):
+    active = {"now": 0, "max": 0, "companies": set(), "overlap": False, "order": []}
+
+    async def fake_process_event(db, event, coalesce=True):
+        active["overlap"] |= event.company_id in active["companies"]
+        active["companies"].add(event.company_id)
+        active["now"] += 1
+        active["max"] = max(active["max"], active["now"])
+        await asyncio.sleep(delay)
+        active["now"] -= 1
+        active["companies"].discard(event.company_id)
+        active["order"].append(event.id)
+        if event.id in fail:
+            raise RuntimeError("classifier exploded")
+        event.is_processed = True
+
+    monkeypatch.setattr(ingest_pool_module, "process_event", fake_process_event)
+    return active
+
+
+def test_companies_run_in_parallel_and_each_in_order(monkeypatch):
+    active = _patch_pipeline(monkeypatch)
+    db = _FakeDB(*(f"e{i}" for i in range(24)), companies=6)
+    pool = IngestPool(workers=3, session_factory=db.session)
+
+    async def run():
+        pool.start()
+        for event in db.events.values():
+            assert pool.submit(event.id, event.company_id)
+        assert pool.status("e23") == "queued"
+        await pool.drain()
+        await pool.stop()
+
+    asyncio.run(run())
+    assert all(e.is_processed for e in db.events.values()) and db.commits == 24
+    assert active["max"] == 3 and not active["overlap"]
+    for company in ("c0", "c3", "c5"):
+        order = [i for i in active["order"] if db.events[i].company_id == company]
+        assert order == sorted(order, key=lambda i: int(i[1:]))
+    stats = pool.stats()
+    assert stats["processed"] == 24 and pool.pending == 0
+    assert sum(lane["processed"] for lane in stats["lanes"]) == 24 and len(stats["lanes"]) == 3
+
+
+def test_full_lane_refuses_events(monkeypatch):
+    _patch_pipeline(monkeypatch)
+    db = _FakeDB("a", "b", "c", "d", companies=1)
+    pool = IngestPool(workers=2, session_factory=db.session, max_pending=4)  # 2 per lane
+
+    async def run():
+        pool.start()
+        accepted = [pool.submit(i, "c0") for i in ("a", "b", "c")]
+        room = (pool.accepts(["c0"]), pool.accepts(["other"] * 2))
+        await pool.drain()
+        accepted.append(pool.submit("d", "c0"))
+        await pool.drain()
+        await pool.stop()
+        return accepted, room
+
+    accepted, room = asyncio.run(run())
+    assert accepted == [True, True, False, True]
+    assert room == (False, pool._executor.lane_for("other") != pool._executor.lane_for("c0"))
+    assert pool.stats()["rejected"] == 1 and not db.events["c"].is_processed
+
+
+def test_failure_is_recorded_on_the_event(monkeypatch):
+    _patch_pipeline(monkeypatch, fail={"bad"})
+    db = _FakeDB("good", "bad")
+    pool = IngestPool(workers=2, session_factory=db.session)
+
+    async def run():
+        pool.start()
+        pool.submit("good", "c0")
+        pool.submit("bad", "c1")
+        await pool.drain()
+        await pool.stop()
+
+    asyncio.run(run())
+    assert db.events["good"].is_processed and db.events["good"].processing_error is None
+    assert db.events["bad"].processing_error == "RuntimeError: classifier exploded"
+    assert db.rollbacks == 1 and db.commits == 2 and pool.stats()["failed"] == 1
+
+
+def test_recovery_queues_unfinished_events(monkeypatch):
+    _patch_pipeline(monkeypatch)
+    db = _FakeDB("pending", "done", "failed")
+    db.events["done"].is_processed = True
+    db.events["failed"].processing_error = "TimeoutError: "
+    pool = IngestPool(workers=1, session_factory=db.session)
+
+    async def run():
+        pool.start()
+        recovered = await pool.recover()
+        await pool.drain()
+        await pool.stop()
+        return recovered
+
+    assert asyncio.run(run()) == 1
+    assert db.events["pending"].is_processed and db.commits == 1
+
+
+def test_backfill_queues_a_backlog_larger_than_the_lanes(monkeypatch):
+    _patch_pipeline(monkeypatch)
+    db = _FakeDB(*(f"e{i}" for i in range(7)))
+    pool = IngestPool(workers=1, session_factory=db.session, max_pending=2, backfill_interval_s=0.01)
+
+    async def run():
+        pool.start()
+        first = await pool.recover()
+        for _ in range(200):
+            if all(e.is_processed for e in db.events.values()):
+                break
+            await asyncio.sleep(0.01)
+        await pool.stop()
+        return first
+
+    assert asyncio.run(run()) == 2
+    assert all(e.is_processed for e in db.events.values()) and db.commits == 7
+    assert pool.stats()["recovered"] == 7 and pool.stats()["rejected"] > 0
+
+
+def test_stop_leaves_queued_events_for_recovery(monkeypatch):
+    _patch_pipeline(monkeypatch, delay=0.05)
+    db = _FakeDB("a", "b", "c")
+    pool = IngestPool(workers=1, session_factory=db.session)
+
+    async def run():
+        pool.start()
+        for event in db.events.values():
+            pool.submit(event.id, event.company_id)
+        await asyncio.sleep(0.01)  # "a" is in flight
+        await pool.stop()
+        return pool.submit("d", "c0")
+
+    assert asyncio.run(run()) is False
+    assert [e.id for e in db.events.values() if e.is_processed] == ["a"]
@@ -0,0 +1,56 @@
+import asyncio
+
+from app.workers.keyed_executor import KeyedExecutor
+
+
+def test_lanes_count_failures_and_stop_returns_unstarted_items():
+    handled = []
+
+    async def handle(item):
+        await asyncio.sleep(0.01)
+        handled.append(item)
+        if item == "boom":
+            raise RuntimeError("boom")
+        return item != "no"
+
+    executor = KeyedExecutor(handle, lanes=1, capacity=3)
+
+    async def run():
+        executor.start()
+        assert [executor.submit("k", i) for i in ("ok", "no", "boom", "late")] == [True, True, True, False]
+        await executor.drain()
+        for item in ("a", "b", "c"):
+            executor.submit("k", item)
+        await asyncio.sleep(0.005)  # "a" is in hand
+        dropped = await executor.stop()
+        return dropped, executor.submit("k", "d")
+
+    dropped, after_stop = asyncio.run(run())
+    assert handled == ["ok", "no", "boom", "a"] and dropped == ["b", "c"] and after_stop is False
+    lane = executor.stats()["lane_stats"][0]
+    assert lane["processed"] == 2 and lane["failed"] == 2 and lane["dropped"] == 1 and lane["max_depth"] == 3
+
+
+def test_restart_after_a_stop_that_timed_out():
+    handled = []
+
+    async def handle(item):
+        if item == "stuck":
+            await asyncio.sleep(10)
+        handled.append(item)
+
+    executor = KeyedExecutor(handle, lanes=2, capacity=2)
+
+    async def run():
+        executor.start()
+        executor.submit("k", "stuck")
+        await asyncio.sleep(0.005)
+        await executor.stop(timeout=0.01)  # cancels the stuck lane
+        executor.start()
+        # "k" and "a" share the stuck lane, "d" is on the other one.
+        assert all(executor.submit(key, i) for i, key in enumerate(("k", "a", "d", "e")))
+        await asyncio.wait_for(executor.drain(), 1)
+        await executor.stop()
+
+    asyncio.run(run())
+    assert sorted(handled) == [0, 1, 2, 3]
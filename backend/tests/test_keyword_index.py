@@ -0,0 +1,75 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from app.services.keyword_index import KeywordIndex, _Partition, reciprocal_rank_fusion, tokenize
+
+DOCS = {
+    "spill": "Oil spill contaminates river near refinery. Oil cleanup under way.",
+    "strike": "Workers strike over unpaid wages at the assembly plant.",
+    "audit": "Auditor resigns after board ignores accounting irregularities.",
+    "emissions": "Refinery emissions exceed permitted levels for the third year.",
+}
+
+
+def _partition():
+    partition = _Partition()
+    for doc_id, text in DOCS.items():
+        partition.add(doc_id, text)
+    return partition
+
+
+def test_tokenize_drops_case_punctuation_and_stopwords():
+    assert tokenize("What did the Refinery's OIL spill do?") == ["refinery", "s", "oil", "spill"]
+
+
+def test_bm25_ranks_matching_documents():
+    partition = _partition()
+    hits = partition.search(tokenize("oil spill at the refinery"), top_k=3)
+    assert [doc_id for doc_id, _ in hits] == ["spill", "emissions"]
+    assert hits[0][1] > hits[1][1] > 0
+    assert partition.search(tokenize("unrelated question"), top_k=3) == []
+
+
+def test_replace_and_remove_keep_postings_consistent():
+    partition = _partition()
+    partition.add("strike", "Refinery workers walk out.")
+    assert partition.remove("audit")
+    assert not partition.remove("audit")
+    assert [d for d, _ in partition.search(["wages"], 5)] == []
+    assert {d for d, _ in partition.search(["refinery"], 5)} == {"spill", "emissions", "strike"}
+    # Two dead rows out of six triggered a compaction.
+    assert len(partition.ids) == partition.alive == 3
+    assert all(max(rows) < 3 for rows, _ in partition.postings.values())
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["c", "a"]], k=60)
+    assert [doc_id for doc_id, _ in fused] == ["a", "c", "b"]
+    assert fused[0][1] == 1 / 61 + 1 / 62
+
+
+class _FakeDB:
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = 0
+
+    async def execute(self, stmt):
+        self.queries += 1
+        return list(self.rows)
+
+
+def test_partition_loads_from_db_and_syncs_new_rows(monkeypatch):
+    index = KeywordIndex()
+    now = datetime(2025, 6, 1, tzinfo=timezone.utc)
+    db = _FakeDB([SimpleNamespace(id=d, content=t, created_at=now) for d, t in DOCS.items()])
+    monkeypatch.setattr("app.services.keyword_index.get_settings",
+                        lambda: SimpleNamespace(KEYWORD_INDEX_SYNC_INTERVAL_S=0))
+
+    hits = asyncio.run(index.search(db, "auditor resigns", "t", "c", 2))
+    assert hits[0][0] == "audit"
+    index.add("fine", "t", "c", "Regulator fines company for accounting fraud.")
+    db.rows.append(SimpleNamespace(id="fine", content="ignored, already indexed", created_at=now + timedelta(seconds=1)))
+    hits = asyncio.run(index.search(db, "accounting fraud", "t", "c", 2))
+    assert [doc_id for doc_id, _ in hits] == ["fine", "audit"]
+    assert index.stats()["documents"] == 5 and db.queries == 2
@@ -0,0 +1,49 @@
+import json
+
+import pytest
+
+from app.services.classifier import RULE_LEXICON
+from app.services.keyword_matcher import KeywordMatcher, load_lexicon
+
+
+def _scan(lexicon, text):
+    return {k for words in lexicon.values() for k in words if k in text}
+
+
+def test_substring_mode_matches_plain_scan():
+    matcher = KeywordMatcher(RULE_LEXICON)
+    texts = [
+        "wastewater discharge raised emissions; board approves award",
+        "human rights groups flagged worker safety at the plant",
+        "humanrights and  human rights, deforestation!",
+        "no keywords here",
+    ]
+    for text in texts:
+        assert matcher.find(text) == _scan(RULE_LEXICON, text)
+
+
+def test_counts_distinct_keywords_per_group():
+    matcher = KeywordMatcher(RULE_LEXICON)
+    counts = matcher.count("positive progress on carbon emissions, carbon neutral by 2030")
+    assert counts["environmental"] == 2  # carbon counted once
+    assert counts["positive"] == 2
+    assert counts["low_severity"] == 2
+    assert counts["social"] == 0
+
+
+def test_word_boundary_mode():
+    matcher = KeywordMatcher({"env": ["emission", "water", "e-waste"], "soc": ["human rights"]}, word_boundary=True)
+    assert matcher.find("emissions in wastewater") == set()
+    assert matcher.find("emission of water, e-waste and human  rights") == {"emission", "water", "e-waste", "human rights"}
+
+
+def test_load_lexicon_overrides_groups(tmp_path):
+    path = tmp_path / "lexicon.json"
+    path.write_text(json.dumps({"governance": ["insider trading"]}))
+    lexicon = load_lexicon(str(path), RULE_LEXICON)
+    assert lexicon["governance"] == ["insider trading"]
+    assert lexicon["social"] == RULE_LEXICON["social"]
+
+    path.write_text(json.dumps({"weather": ["storm"]}))
+    with pytest.raises(ValueError):
+        load_lexicon(str(path), RULE_LEXICON)
@@ -0,0 +1,53 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import delete, select
+from app.db.models import ESGScore, LatestScore
+from app.services.latest_scores import refresh_latest_score, upsert_latest_scores
+
+NOW = datetime(2025, 6, 1, 12, tzinfo=timezone.utc)
+
+
+def _score(score_id, company_id, overall, minutes):
+    return {
+        "id": score_id, "tenant_id": "t", "company_id": company_id, "overall": overall,
+        "environmental": overall, "social": overall, "governance": overall,
+        "risk_level": "medium", "recorded_at": NOW + timedelta(minutes=minutes),
+    }
+
+
+def test_upsert_keeps_the_newest_score_per_company(memory_db):
+    async def run():
+        async with memory_db() as sessions:
+            for batch in (
+                [_score("a1", "a", 70.0, 10), _score("b1", "b", 60.0, 0)],
+                # A recompute that finished late: older for "a", newer for "b".
+                [_score("a0", "a", 50.0, 5), _score("b2", "b", 65.0, 20), _score("b0", "b", 40.0, 1)],
+            ):
+                async with sessions() as db:
+                    await upsert_latest_scores(db, batch, chunk_size=1)
+                    await db.commit()
+            async with sessions() as db:
+                rows = (await db.execute(select(LatestScore).order_by(LatestScore.company_id))).scalars().all()
+                return [(r.company_id, r.score_id, r.overall) for r in rows]
+
+    assert asyncio.run(run()) == [("a", "a1", 70.0), ("b", "b2", 65.0)]
+
+
+def test_refresh_falls_back_to_an_older_score_after_deletes(memory_db):
+    async def run():
+        async with memory_db() as sessions:
+            async with sessions() as db:
+                scores = [_score("s1", "c", 70.0, 0), _score("s2", "c", 60.0, 10)]
+                db.add_all(ESGScore(**s) for s in scores)
+                await upsert_latest_scores(db, scores)
+                await db.execute(delete(ESGScore).where(ESGScore.id == "s2"))
+                await refresh_latest_score(db, "t", "c")
+                await db.commit()
+                first = (await db.get(LatestScore, "c")).score_id
+                await db.execute(delete(ESGScore))
+                await refresh_latest_score(db, "t", "c")
+                await db.commit()
+                remaining = (await db.execute(select(LatestScore))).scalars().all()
+                return first, remaining
+
+    assert asyncio.run(run()) == ("s1", [])
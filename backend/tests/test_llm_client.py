@@ -0,0 +1,79 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.core.config import get_settings
+from app.services.llm_client import LLMClientManager
+
+
+@pytest.fixture
+def manager(monkeypatch):
+    settings = get_settings()
+    monkeypatch.setattr(settings, "AZURE_OPENAI_API_KEY", "test")
+    monkeypatch.setattr(settings, "AZURE_OPENAI_ENDPOINT", "http://127.0.0.1:9")
+    return LLMClientManager()
+
+
+def test_client_is_shared_within_a_loop(manager):
+    async def run():
+        first = manager.client()
+        second = manager.client()
+        await manager.close()
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first is second
+    assert manager.clients_built == 1
+
+
+def test_new_loop_gets_new_pool(manager):
+    async def get():
+        client = manager.client()
+        await asyncio.sleep(0)  # a request yields to the loop
+        return client
+
+    first = asyncio.run(get())
+    assert first.is_closed()  # closed as its loop shut down
+    second = asyncio.run(get())
+    assert first is not second
+    assert manager.clients_built == 2
+
+
+def test_replaced_pool_is_closed_on_its_own_loop(manager):
+    other = asyncio.new_event_loop()
+    thread = threading.Thread(target=other.run_forever)
+    thread.start()
+
+    async def build():
+        client = manager.client()
+        await asyncio.sleep(0)
+        return client
+
+    async def replace_and_close():
+        second = manager.client()
+        await manager.close()
+        return second
+
+    try:
+        first = asyncio.run_coroutine_threadsafe(build(), other).result()
+        second = asyncio.run(replace_and_close())
+        deadline = time.monotonic() + 2
+        while not first.is_closed() and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        other.call_soon_threadsafe(other.stop)
+        thread.join()
+        other.close()
+    assert first.is_closed() and second.is_closed()
+    assert manager.stats() == {"clients_built": 2, "active": False}
+
+
+def test_per_operation_timeouts(manager, monkeypatch):
+    monkeypatch.setattr(get_settings(), "LLM_EMBED_TIMEOUT_S", 7)
+    timeout = manager.timeout("embed")
+    assert timeout.read == 7
+    assert timeout.connect == get_settings().LLM_CONNECT_TIMEOUT_S
+    with pytest.raises(ValueError):
+        manager.timeout("summarize")
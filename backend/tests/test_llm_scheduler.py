@@ -0,0 +1,112 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+from openai import RateLimitError
+
+from app.services.llm_scheduler import BACKGROUND, INTERACTIVE, LLMScheduler, estimate_tokens
+
+
+def _rate_limit_error(retry_after_ms: int) -> RateLimitError:
+    response = httpx.Response(
+        429, headers={"retry-after-ms": str(retry_after_ms)},
+        request=httpx.Request("POST", "http://llm.test/chat/completions"),
+    )
+    return RateLimitError("Too Many Requests", response=response, body=None)
+
+
+def test_interactive_calls_jump_the_queue():
+    scheduler = LLMScheduler(max_concurrency=1, interactive_reserved=0)
+    order = []
+
+    async def run():
+        gate = asyncio.Event()
+
+        async def blocker():
+            await gate.wait()
+
+        async def call(name):
+            order.append(name)
+
+        first = asyncio.create_task(scheduler.run(BACKGROUND, 1, blocker))
+        await asyncio.sleep(0.01)
+        queued = [asyncio.create_task(scheduler.run(BACKGROUND, 1, lambda: call("bg1"))),
+                  asyncio.create_task(scheduler.run(BACKGROUND, 1, lambda: call("bg2")))]
+        await asyncio.sleep(0.01)
+        queued.append(asyncio.create_task(scheduler.run(INTERACTIVE, 1, lambda: call("chat"))))
+        await asyncio.sleep(0.01)
+        assert scheduler.stats()["lanes"][BACKGROUND]["queued"] == 2
+        gate.set()
+        await asyncio.gather(first, *queued)
+
+    asyncio.run(run())
+    assert order == ["chat", "bg1", "bg2"]
+
+
+def test_background_cannot_take_reserved_slots():
+    scheduler = LLMScheduler(max_concurrency=2, interactive_reserved=1)
+
+    async def run():
+        gate = asyncio.Event()
+        tasks = [asyncio.create_task(scheduler.run(BACKGROUND, 1, gate.wait)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        stats = scheduler.stats()["lanes"][BACKGROUND]
+        chat = await asyncio.wait_for(scheduler.run(INTERACTIVE, 1, lambda: asyncio.sleep(0, "ok")), 1)
+        gate.set()
+        await asyncio.gather(*tasks)
+        return stats, chat
+
+    stats, chat = asyncio.run(run())
+    assert stats["in_flight"] == 1 and stats["queued"] == 1
+    assert chat == "ok"
+
+
+def test_request_rate_is_limited():
+    # 600 rpm with a 0.1s bucket: one request immediately, then one per 0.1s.
+    scheduler = LLMScheduler(requests_per_minute=600, max_concurrency=10, bucket_window_s=0.1)
+
+    async def run():
+        started = time.monotonic()
+        await asyncio.gather(*(scheduler.run(BACKGROUND, 1, lambda: asyncio.sleep(0)) for _ in range(4)))
+        return time.monotonic() - started
+
+    assert asyncio.run(run()) >= 0.28
+
+
+def test_rate_limit_pauses_retries_and_slows_down():
+    scheduler = LLMScheduler(max_concurrency=8)
+    attempts = []
+
+    async def flaky():
+        attempts.append(time.monotonic())
+        if len(attempts) == 1:
+            raise _rate_limit_error(50)
+        return "done"
+
+    assert asyncio.run(scheduler.run(INTERACTIVE, 10, flaky)) == "done"
+    assert attempts[1] - attempts[0] >= 0.045
+    stats = scheduler.stats()
+    assert stats["throttled"] == 1 and stats["retries"] == 1
+    assert stats["rate_factor"] == 0.55  # halved, then one success step back
+    assert stats["max_concurrency"] == 4
+
+
+def test_other_errors_propagate_and_free_the_slot():
+    scheduler = LLMScheduler(max_concurrency=1)
+
+    async def broken():
+        raise ValueError("bad request")
+
+    async def run():
+        with pytest.raises(ValueError):
+            await scheduler.run(BACKGROUND, 1, broken)
+        return await asyncio.wait_for(scheduler.run(BACKGROUND, 1, lambda: asyncio.sleep(0, 1)), 1)
+
+    assert asyncio.run(run()) == 1
+    assert scheduler.stats()["lanes"][BACKGROUND]["failed"] == 1
+
+
+def test_estimate_tokens_counts_completion_budget():
+    messages = [{"role": "user", "content": "x" * 400}]
+    assert estimate_tokens(messages, 1000) == 1100
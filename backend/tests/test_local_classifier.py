@@ -0,0 +1,151 @@
+import asyncio
+import os
+import random
+
+import pytest
+
+from app.core.config import get_settings
+from app.services import classifier
+from app.services.classification_cache import ClassificationCache
+from app.services.local_classifier import LocalClassifier, LocalModel, severity_band, train
+from scripts.seed import EVENT_TEMPLATES, gen_event
+
+
+def _examples(n=300, seed=7):
+    random.seed(seed)
+    examples = []
+    for _ in range(n):
+        category = random.choice(list(EVENT_TEMPLATES))
+        title, description = gen_event(category, "Acme")
+        label = classifier._rule_based_classify(title, description)
+        label["category"] = category
+        examples.append((title, description, label))
+    return examples
+
+
+@pytest.fixture(scope="module")
+def model():
+    return train(_examples())
+
+
+def test_predicts_trained_categories(model):
+    held_out = _examples(100, seed=11)
+    correct = sum(model.predict(t, d)["category"] == label["category"] for t, d, label in held_out)
+    assert correct >= 95
+
+    result = model.predict(*held_out[0][:2])
+    assert result["source"] == "local"
+    assert set(result) == {"category", "subcategory", "severity", "confidence", "sentiment", "source"}
+    assert 0 < result["confidence"] <= 1
+
+
+def test_too_few_examples_is_an_error():
+    with pytest.raises(ValueError):
+        train(_examples(5))
+
+
+def test_save_load_round_trip(model, tmp_path):
+    path = str(tmp_path / "model.npz")
+    model.save(path)
+    loaded = LocalModel.load(path)
+    title, description, _ = _examples(1, seed=3)[0]
+    assert loaded.predict(title, description) == model.predict(title, description)
+    assert loaded.trained_on == model.trained_on
+
+
+def test_severity_bands():
+    assert [severity_band(s) for s in (1, 3, 4, 6, 7, 10)] == ["low", "low", "medium", "medium", "high", "high"]
+
+
+def test_threshold_gates_predictions(model, tmp_path, monkeypatch):
+    settings = get_settings()
+    path = str(tmp_path / "model.npz")
+    model.save(path)
+    monkeypatch.setattr(settings, "LOCAL_CLASSIFIER_PATH", path)
+    monkeypatch.setattr(settings, "LOCAL_CLASSIFIER_ENABLED", True)
+    local = LocalClassifier()
+
+    monkeypatch.setattr(settings, "LOCAL_CLASSIFIER_THRESHOLD", 0.0)
+    assert local.predict("Carbon emission targets missed", "Emissions exceeded plan") is not None
+    monkeypatch.setattr(settings, "LOCAL_CLASSIFIER_THRESHOLD", 1.01)
+    assert local.predict("Carbon emission targets missed", "Emissions exceeded plan") is None
+    assert local.stats() == {"loaded": True, "predictions": 2, "accepted": 1, "escalated": 1}
+
+    monkeypatch.setattr(settings, "LOCAL_CLASSIFIER_ENABLED", False)
+    assert local.predict("Carbon emission targets missed", "Emissions exceeded plan") is None
+
+
+def test_confident_prediction_skips_the_llm(model, tmp_path, monkeypatch):
+    settings = get_settings()
+    path = str(tmp_path / "model.npz")
+    model.save(path)
+    monkeypatch.setattr(settings, "AZURE_OPENAI_API_KEY", "test")
+    monkeypatch.setattr(settings, "CLASSIFIER_BATCH_WINDOW_MS", 0)
+    monkeypatch.setattr(settings, "LOCAL_CLASSIFIER_PATH", path)
+    monkeypatch.setattr(settings, "LOCAL_CLASSIFIER_ENABLED", True)
+    monkeypatch.setattr(classifier, "classification_cache", ClassificationCache("test", max_entries=10))
+    monkeypatch.setattr(classifier, "local_classifier", LocalClassifier())
+    calls = []
+
+    async def fake_llm(title, description):
+        calls.append(title)
+        return {"category": "social", "severity": 5, "confidence": 0.9, "sentiment": "neutral", "source": "llm"}
+
+    monkeypatch.setattr(classifier, "_llm_classify", fake_llm)
+    title, description, _ = _examples(1, seed=5)[0]
+
+    monkeypatch.setattr(settings, "LOCAL_CLASSIFIER_THRESHOLD", 0.0)
+    assert asyncio.run(classifier.classify_event(title, description))["source"] == "local"
+    assert calls == []
+
+    monkeypatch.setattr(settings, "LOCAL_CLASSIFIER_THRESHOLD", 1.01)
+    assert asyncio.run(classifier.classify_event(title, description))["source"] == "llm"
+    assert calls == [title]
+
+
+def test_model_file_is_checked_once_per_interval(model, tmp_path, monkeypatch):
+    import app.services.local_classifier as local_classifier_module
+
+    settings = get_settings()
+    path = str(tmp_path / "model.npz")
+    model.save(path)
+    monkeypatch.setattr(settings, "LOCAL_CLASSIFIER_PATH", path)
+    monkeypatch.setattr(settings, "LOCAL_CLASSIFIER_ENABLED", True)
+    monkeypatch.setattr(settings, "LOCAL_CLASSIFIER_RELOAD_INTERVAL_S", 3600)
+    stats = []
+    real_stat = os.stat
+    monkeypatch.setattr(local_classifier_module.os, "stat", lambda p, **kw: stats.append(p) or real_stat(p, **kw))
+    local = LocalClassifier()
+
+    for _ in range(50):
+        local.predict("Carbon emission targets missed", "Emissions exceeded plan")
+    stats = [p for p in stats if p == path]
+    assert stats == [path]
+
+    os.remove(path)  # e.g. replaced by a retrain in this process
+    local.reload()
+    assert local.model() is None
+
+
+def test_cache_hit_skips_the_local_model(model, tmp_path, monkeypatch):
+    settings = get_settings()
+    path = str(tmp_path / "model.npz")
+    model.save(path)
+    monkeypatch.setattr(settings, "AZURE_OPENAI_API_KEY", "test")
+    monkeypatch.setattr(settings, "LOCAL_CLASSIFIER_PATH", path)
+    monkeypatch.setattr(settings, "LOCAL_CLASSIFIER_ENABLED", True)
+    monkeypatch.setattr(settings, "LOCAL_CLASSIFIER_THRESHOLD", 0.0)
+    cache = ClassificationCache("test", max_entries=10)
+    local = LocalClassifier()
+    monkeypatch.setattr(classifier, "classification_cache", cache)
+    monkeypatch.setattr(classifier, "local_classifier", local)
+    cached = {"category": "social", "severity": 5, "confidence": 0.9, "sentiment": "neutral", "source": "llm"}
+
+    async def run():
+        await cache.set("Strike", "Plant closed", cached)
+        return await classifier.classify_event("Strike", "Plant closed"), await classifier.classify_events(
+            [("Strike", "Plant closed")]
+        )
+
+    single, batch = asyncio.run(run())
+    assert single == cached and batch == [cached] and local.predictions == 0
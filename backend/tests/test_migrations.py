@@ -0,0 +1,72 @@
+import importlib.util
+from pathlib import Path
+
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from sqlalchemy import create_engine, inspect, text
+
+import app.db.models  # noqa: F401  (registers the tables)
+from app.db.session import Base
+
+VERSIONS = Path(__file__).resolve().parents[1] / "migrations" / "versions"
+
+
+def _migration(name):
+    spec = importlib.util.spec_from_file_location(name, VERSIONS / f"{name}.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _run(engine, step):
+    with engine.begin() as conn:
+        with Operations.context(MigrationContext.configure(conn)):
+            step()
+
+
+def _old_schema(engine):
+    """The tables as a deployment created them before the new columns."""
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        for statement in (
+            "DROP INDEX ix_esg_events_duplicate_of",
+            "ALTER TABLE esg_events DROP COLUMN duplicate_of",
+            "ALTER TABLE esg_events DROP COLUMN processing_error",
+            "DROP INDEX ix_rag_docs_tenant_company_created",
+            "CREATE INDEX ix_rag_docs_tenant_company ON rag_documents (tenant_id, company_id)",
+            "DROP TABLE latest_scores",
+            "DROP TABLE esg_score_rollups",
+        ):
+            conn.execute(text(statement))
+
+
+def test_upgrade_brings_an_old_database_to_the_models_and_can_run_again(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    _old_schema(engine)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO tenants (id, name, slug) VALUES ('t', 'T', 't')"))
+    migration = _migration("3f2b9c1d7e40_upgrade_existing_tables")
+
+    _run(engine, migration.upgrade)
+    _run(engine, migration.upgrade)  # idempotent
+
+    inspector = inspect(engine)
+    assert {"processing_error", "duplicate_of"} <= {c["name"] for c in inspector.get_columns("esg_events")}
+    assert "ix_esg_events_duplicate_of" in {i["name"] for i in inspector.get_indexes("esg_events")}
+    assert {i["name"] for i in inspector.get_indexes("rag_documents")} == {"ix_rag_docs_tenant_company_created"}
+    assert inspector.has_table("latest_scores") and inspector.has_table("esg_score_rollups")
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT count(*) FROM tenants")).scalar() == 1
+
+    _run(engine, migration.downgrade)
+    assert "duplicate_of" not in {c["name"] for c in inspect(engine).get_columns("esg_events")}
+    engine.dispose()
+
+
+def test_upgrade_of_an_empty_database_leaves_it_to_create_all(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'new.db'}")
+    _run(engine, _migration("3f2b9c1d7e40_upgrade_existing_tables").upgrade)
+    assert inspect(engine).get_table_names() == []
+    Base.metadata.create_all(engine)
+    _run(engine, _migration("3f2b9c1d7e40_upgrade_existing_tables").upgrade)
+    engine.dispose()
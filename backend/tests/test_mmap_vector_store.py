@@ -0,0 +1,109 @@
+import base64
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from app.services.mmap_vector_store import MappedVectorStore
+from app.services.vector_store import LocalVectorStore
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _meta(company="c1"):
+    return {"tenant_id": "t1", "company_id": company}
+
+
+def _ids(results):
+    return [r["id"] for r in results]
+
+
+def test_survives_reopen_and_compaction(tmp_path):
+    rng = np.random.default_rng(1)
+    vectors = rng.standard_normal((60, 8))
+    store = MappedVectorStore(str(tmp_path))
+    reference = LocalVectorStore()
+    for i, v in enumerate(vectors):
+        company = f"c{i % 3}"
+        store.upsert(str(i), v, _meta(company), f"doc {i}")
+        reference.upsert(str(i), v, _meta(company), f"doc {i}")
+
+    q = rng.standard_normal(8)
+    assert _ids(store.query(q, "t1", "c1", 5)) == _ids(reference.query(q, "t1", "c1", 5))
+    assert store.compact()
+    assert store.stats()["log_records"] == 0 and store.stats()["base_rows"] == 60
+
+    # Updates and deletes after compaction shadow the mapped base rows.
+    for doc_id in ("1", "4", "7"):
+        store.delete(doc_id)
+        reference.delete(doc_id)
+    store.upsert("10", -q, _meta("c1"), "moved away")
+    reference.upsert("10", -q, _meta("c1"), "moved away")
+
+    reopened = MappedVectorStore(str(tmp_path))
+    for s in (store, reopened):
+        results = s.query(q, "t1", "c1", 5)
+        assert _ids(results) == _ids(reference.query(q, "t1", "c1", 5))
+        assert results[0]["text"] == f"doc {results[0]['id']}"
+        assert results[0]["score"] == pytest.approx(reference.query(q, "t1", "c1", 1)[0]["score"], abs=1e-6)
+
+    assert reopened.compact()
+    assert store.query(q, "t1", "c1", 20)[-1]["id"] == "10"
+    assert len(store.query(q, "t1", "c1", 100)) == 17
+
+
+def test_compaction_needs_enough_records(tmp_path):
+    store = MappedVectorStore(str(tmp_path))
+    store.upsert("a", [1, 0], _meta())
+    assert not store.compact(min_records=2)
+    store.upsert("b", [0, 1], _meta())
+    assert store.compact(min_records=2)
+    assert store.stats()["generation"] == 1
+    assert _ids(store.query([1, 0], "t1", "c1")) == ["a", "b"]
+    assert sorted(os.listdir(tmp_path)) == [
+        "COMPACT", "CURRENT", "LOCK", "manifest-1.json", "meta-1.jsonl", "vectors-1.f32", "wal-1.log",
+    ]
+
+
+def test_writes_during_compaction_move_to_the_new_log(tmp_path, monkeypatch):
+    store = MappedVectorStore(str(tmp_path))
+    other = MappedVectorStore(str(tmp_path))
+    store.upsert("a", [1, 0], _meta())
+    # Another worker is half-way through appending "b" when compaction starts.
+    line = (json.dumps({
+        "op": "put", "id": "b", "metadata": _meta(), "text": "",
+        "vector": base64.b64encode(np.array([0, 1], dtype=np.float32).tobytes()).decode(),
+    }) + "\n").encode()
+    wal = tmp_path / "wal-0.log"
+    with open(wal, "ab") as f:
+        f.write(line[:20])
+    write_generation = store._write_generation
+
+    def slow_write_generation(snapshot, generation):
+        write_generation(snapshot, generation)
+        with open(wal, "ab") as f:
+            f.write(line[20:])
+        other.upsert("c", [1, 1], _meta())
+
+    monkeypatch.setattr(store, "_write_generation", slow_write_generation)
+    assert store.compact()
+    for s in (store, other, MappedVectorStore(str(tmp_path))):
+        assert sorted(_ids(s.query([1, 0], "t1", "c1"))) == ["a", "b", "c"]
+    assert store.stats()["base_rows"] == 1 and store.stats()["log_records"] == 2
+
+
+def test_other_process_writes_are_visible(tmp_path):
+    store = MappedVectorStore(str(tmp_path))
+    store.upsert("mine", [1, 0, 0], _meta())
+    script = (
+        "from app.services.mmap_vector_store import MappedVectorStore\n"
+        f"s = MappedVectorStore({str(tmp_path)!r})\n"
+        "assert [r['id'] for r in s.query([1, 0, 0], 't1', 'c1')] == ['mine']\n"
+        "s.upsert('theirs', [0, 1, 0], {'tenant_id': 't1', 'company_id': 'c1'})\n"
+        "s.compact()\n"
+    )
+    subprocess.run([sys.executable, "-c", script], cwd=BACKEND, check=True)
+    assert _ids(store.query([0, 1, 0], "t1", "c1")) == ["theirs", "mine"]
@@ -0,0 +1,224 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import app.services.alerts as alerts
+import app.workers.pipeline as pipeline
+from app.services.alerts import PENDING_KEY, AlertDispatcher
+from app.services.rag import PENDING_INDEX_KEY
+from app.workers.pipeline import StageTimings, run_stages
+
+
+def test_independent_stages_overlap_and_dependents_wait(monkeypatch):
+    monkeypatch.setattr(pipeline, "stage_timings", StageTimings())
+    log = []
+
+    def step(name, delay, result=None):
+        async def run(results):
+            log.append(f"start {name}")
+            await asyncio.sleep(delay)
+            log.append(f"end {name}")
+            return result
+        return run
+
+    stages = {
+        "a": ((), step("a", 0.05, 1)),
+        "b": ((), step("b", 0.05, 2)),
+        "c": (("a", "b"), lambda r: step("c", 0, r["a"] + r["b"])(r)),
+    }
+    started = time.perf_counter()
+    results = asyncio.run(run_stages(stages, "graph"))
+    assert time.perf_counter() - started < 0.09
+    assert results == {"a": 1, "b": 2, "c": 3}
+    assert log[:2] == ["start a", "start b"] and log[-2:] == ["start c", "end c"]
+    assert set(pipeline.stage_timings.stats()) == {"a", "b", "c", "graph"}
+
+
+def test_failed_stage_cancels_the_rest(monkeypatch):
+    monkeypatch.setattr(pipeline, "stage_timings", StageTimings())
+    cancelled = []
+
+    async def slow(results):
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            cancelled.append("slow")
+            raise
+
+    async def boom(results):
+        raise ValueError("embedding service down")
+
+    with pytest.raises(ValueError):
+        asyncio.run(run_stages({"slow": ((), slow), "boom": ((), boom), "after": (("boom",), slow)}, "graph"))
+    assert cancelled == ["slow"] and "graph" not in pipeline.stage_timings.stats()
+
+
+def test_process_event_overlaps_classification_and_embedding(monkeypatch):
+    monkeypatch.setattr(pipeline, "stage_timings", StageTimings())
+    monkeypatch.setattr(pipeline.get_settings(), "DEDUP_ENABLED", False)
+    calls = []
+
+    async def classify_event(title, description):
+        await asyncio.sleep(0.05)
+        calls.append("classified")
+        return {"category": "environmental", "severity": 8}
+
+    async def create_embedding(text):
+        await asyncio.sleep(0.05)
+        calls.append("embedded")
+        return [1.0, 0.0]
+
+    async def recompute(db, event, coalesce):
+        assert event.category == "environmental"
+        return SimpleNamespace(company_id="c"), [event]
+
+    async def evaluate_alerts_for_event(db, event, score, tenant_id):
+        calls.append("alerts")
+
+    async def publish_live_update(update):
+        calls.append("published")
+
+    monkeypatch.setattr(pipeline, "classify_event", classify_event)
+    monkeypatch.setattr(pipeline, "create_embedding", create_embedding)
+    monkeypatch.setattr(pipeline.score_coalescer, "recompute", recompute)
+    monkeypatch.setattr(pipeline.score_engine, "add_event", lambda event, db=None: None)
+    monkeypatch.setattr(pipeline, "evaluate_alerts_for_event", evaluate_alerts_for_event)
+    monkeypatch.setattr(pipeline, "live_update", lambda score, events: {})
+    monkeypatch.setattr(pipeline, "publish_live_update", publish_live_update)
+    added = []
+    db = SimpleNamespace(add=added.append, info={})
+    event = SimpleNamespace(
+        id="e1", tenant_id="t", company_id="c", title="Oil spill", description="Leak.", source_url="",
+        event_date=None, category="governance",
+    )
+
+    started = time.perf_counter()
+    assert asyncio.run(pipeline.process_event(db, event)).company_id == "c"
+    assert time.perf_counter() - started < 0.09
+    assert sorted(calls[:2]) == ["classified", "embedded"] and sorted(calls[2:]) == ["alerts", "published"]
+    assert added[0].event_id == "e1" and event.is_processed
+    assert [doc[0] for doc in db.info[PENDING_INDEX_KEY]] == [added[0].id]  # indexed on commit
+    stats = pipeline.stage_timings.stats()
+    assert stats["event"]["avg_ms"] < stats["classify"]["avg_ms"] + stats["embed"]["avg_ms"]
+
+
+def test_documents_are_indexed_only_when_their_row_commits(memory_db, monkeypatch):
+    from sqlalchemy import select
+    import app.services.rag as rag
+    import app.services.score_state as score_state
+    from app.db.models import Company, ESGEvent, RAGDocument, Tenant
+    from app.services.score_state import IncrementalScoreEngine
+
+    engine = IncrementalScoreEngine()
+    monkeypatch.setattr(score_state, "score_engine", engine)
+    monkeypatch.setattr(pipeline, "score_engine", engine)
+    monkeypatch.setattr(pipeline.get_settings(), "DEDUP_ENABLED", False)
+    indexed = []
+
+    async def classify_event(title, description):
+        return {"category": "social", "severity": 6}
+
+    async def create_embedding(text):
+        if text.startswith("Embedding down"):
+            raise RuntimeError("embedding service down")
+        if text.startswith("Fallback"):
+            return rag.MockEmbedding([0.5, 0.5])  # what create_embedding returns when the API fails
+        return [1.0, 0.0]
+
+    async def evaluate_alerts_for_event(db, event, score, tenant_id):
+        if event.title == "Alerts down":
+            raise RuntimeError("alert rules unavailable")
+
+    monkeypatch.setattr(pipeline, "classify_event", classify_event)
+    monkeypatch.setattr(pipeline, "create_embedding", create_embedding)
+    monkeypatch.setattr(pipeline, "evaluate_alerts_for_event", evaluate_alerts_for_event)
+    monkeypatch.setattr(pipeline.get_settings(), "AZURE_OPENAI_API_KEY", "key")
+    monkeypatch.setattr(
+        rag, "index_document", lambda doc_id, text, metadata, embedding: indexed.append((text, embedding)),
+    )
+
+    async def ingest(sessions, company, title):
+        async with sessions() as db:
+            event = ESGEvent(tenant_id=company.tenant_id, company_id=company.id, title=title, category="governance")
+            db.add(event)
+            await db.flush()
+            await pipeline.process_event(db, event, coalesce=False)
+            before_commit = list(indexed)
+            await db.commit()
+            return before_commit
+
+    async def run():
+        async with memory_db() as sessions:
+            async with sessions() as db:
+                tenant = Tenant(name="T", slug="t")
+                db.add(tenant)
+                await db.flush()
+                company = Company(tenant_id=tenant.id, name="C")
+                db.add(company)
+                await db.commit()
+
+            before_commit = await ingest(sessions, company, "Strike")
+            await ingest(sessions, company, "Embedding down")
+            await ingest(sessions, company, "Fallback")
+            with pytest.raises(RuntimeError):
+                await ingest(sessions, company, "Alerts down")
+            async with sessions() as db:
+                stored = (await db.execute(
+                    select(RAGDocument.title, RAGDocument.embedding_id != "").order_by(RAGDocument.created_at)
+                )).all()
+            return before_commit, stored
+
+    before_commit, stored = asyncio.run(run())
+    # Keyword-indexed either way; only a real embedding goes into the vector store.
+    assert before_commit == []
+    assert indexed == [("Strike. ", [1.0, 0.0]), ("Embedding down. ", None), ("Fallback. ", None)]
+    # Rolled back: no row. Without a vector: kept, with no embedding_id, for re-embedding.
+    assert [tuple(row) for row in stored] == [("Strike", True), ("Embedding down", False), ("Fallback", False)]
+
+
+class _FakeSession:
+    def __init__(self, log):
+        self.log = log
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, stmt):
+        params = stmt.compile().params
+        ids = next(v for k, v in params.items() if k.startswith("id_"))  # the expanding IN list
+        self.log.append((params["status"], sorted(ids)))
+
+    async def commit(self):
+        pass
+
+
+def test_deliveries_are_sent_after_commit_only(monkeypatch):
+    log = []
+    dispatcher = AlertDispatcher(session_factory=lambda: _FakeSession(log))
+    monkeypatch.setattr(alerts, "alert_dispatcher", dispatcher)
+
+    async def send_slack(payload):
+        await asyncio.sleep(0.01)
+        return payload["message"] != "webhook down"
+
+    monkeypatch.setattr(alerts, "_send_slack", send_slack)
+    deliveries = [("d1", "slack", {"message": "ok"}), ("d2", "slack", {"message": "webhook down"}),
+                  ("d3", "email", {"message": "ok", "rule_name": "r"})]
+
+    async def run():
+        rolled_back = SimpleNamespace(info={PENDING_KEY: [("d0", "slack", {"message": "ok"})]})
+        alerts._drop_after_rollback(rolled_back)
+        alerts._send_after_commit(rolled_back)
+        committed = SimpleNamespace(info={PENDING_KEY: deliveries})
+        alerts._send_after_commit(committed)
+        assert committed.info == {} and dispatcher.stats()["in_flight"] == 1
+        await dispatcher.drain()
+
+    asyncio.run(run())
+    assert log == [("sent", ["d1", "d3"]), ("failed", ["d2"])]
+    assert dispatcher.stats()["sent"] == 2 and dispatcher.stats()["failed"] == 1
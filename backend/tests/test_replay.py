@@ -0,0 +1,160 @@
+import asyncio
+import random
+import pytest
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select
+import app.services.replay as replay
+from app.db.models import Company, ESGEvent, ESGScore, Tenant
+from app.services.replay import ReplayCheckpoint, parse_cadence, replay_company, replay_scores
+from app.services.scoring import LOOKBACK_DAYS, build_score, compute_category_impacts
+
+BASE = datetime(2025, 3, 1, tzinfo=timezone.utc)
+START = BASE + timedelta(days=2)
+END = BASE + timedelta(days=9)
+
+
+def test_parse_cadence_intervals():
+    assert parse_cadence("15m") == timedelta(minutes=15)
+    assert parse_cadence("1h") == timedelta(hours=1)
+    assert parse_cadence("7d") == timedelta(days=7)
+
+
+def test_parse_cadence_per_event():
+    assert parse_cadence("event") is None
+
+
+@pytest.mark.parametrize("cadence", ["", "h", "0h", "1w", "-1d", "abc"])
+def test_parse_cadence_rejects_invalid(cadence):
+    with pytest.raises(ValueError):
+        parse_cadence(cadence)
+
+
+def _aware(dt):
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+async def _seed(sessions, n=40):
+    rng = random.Random(5)
+    async with sessions() as db:
+        tenant = Tenant(name="T", slug="t")
+        db.add(tenant)
+        await db.flush()
+        company = Company(tenant_id=tenant.id, name="C")
+        db.add(company)
+        await db.flush()
+        events = [
+            ESGEvent(
+                tenant_id=tenant.id, company_id=company.id, title=f"Event {i}",
+                category=rng.choice(["environmental", "social", "governance"]),
+                severity=rng.randint(1, 10), confidence=round(rng.uniform(0.3, 1.0), 2),
+                event_date=BASE + timedelta(hours=rng.uniform(0, 10 * 24)), is_processed=True,
+            )
+            for i in range(n)
+        ]
+        # Not scored: unprocessed, and a near-duplicate.
+        events.append(ESGEvent(
+            tenant_id=tenant.id, company_id=company.id, title="Pending", category="social",
+            severity=10, event_date=BASE + timedelta(days=3),
+        ))
+        events.append(ESGEvent(
+            tenant_id=tenant.id, company_id=company.id, title="Copy", category="social", severity=10,
+            event_date=BASE + timedelta(days=3), is_processed=True, duplicate_of="x",
+        ))
+        db.add_all(events)
+        await db.commit()
+    return tenant.id, company.id, events[:n]
+
+
+async def _snapshots(sessions, company_id):
+    async with sessions() as db:
+        rows = (await db.execute(
+            select(ESGScore).where(ESGScore.company_id == company_id).order_by(ESGScore.recorded_at)
+        )).scalars().all()
+    return [(_aware(r.recorded_at), r.overall, r.environmental, r.social, r.governance, r.risk_level) for r in rows]
+
+
+async def _ids(sessions):
+    async with sessions() as db:
+        return set((await db.execute(select(ESGScore.id))).scalars())
+
+
+def _expected(events, at):
+    """What recalculate_company_score computes at ``at`` from the events known then."""
+    seen = [e for e in events if at - timedelta(days=LOOKBACK_DAYS) <= e.event_date <= at]
+    s = build_score("t", "c", compute_category_impacts(seen, at), at)
+    return (at, s.overall, s.environmental, s.social, s.governance, s.risk_level)
+
+
+def test_snapshots_match_scoring_at_each_cutoff(memory_db, monkeypatch):
+    async def run():
+        async with memory_db() as sessions:
+            monkeypatch.setattr(replay, "async_session", sessions)
+            tenant_id, company_id, events = await _seed(sessions)
+            written = await replay_company(tenant_id, company_id, START, END, "6h", batch_size=7)
+            return written, events, await _snapshots(sessions, company_id)
+
+    written, events, snapshots = asyncio.run(run())
+    ticks = [START + timedelta(hours=6 * i) for i in range(29)]
+    assert written == len(snapshots) == len(ticks)
+    for snapshot, at in zip(snapshots, ticks):
+        expected = _expected(events, at)
+        assert snapshot[0] == at and snapshot[5] == expected[5]
+        assert all(abs(a - b) <= 0.011 for a, b in zip(snapshot[1:5], expected[1:5]))
+
+
+def test_per_event_cadence_snapshots_after_each_event_in_range(memory_db, monkeypatch):
+    async def run():
+        async with memory_db() as sessions:
+            monkeypatch.setattr(replay, "async_session", sessions)
+            tenant_id, company_id, events = await _seed(sessions)
+            await replay_company(tenant_id, company_id, START, END, "event")
+            return events, await _snapshots(sessions, company_id)
+
+    events, snapshots = asyncio.run(run())
+    dates = sorted(e.event_date for e in events if START <= e.event_date <= END)
+    assert [s[0] for s in snapshots] == dates
+    for snapshot in snapshots:
+        assert abs(snapshot[1] - _expected(events, snapshot[0])[1]) <= 0.011
+
+
+def test_resume_from_checkpoint_replaces_only_rows_after_it(memory_db, monkeypatch):
+    async def run():
+        async with memory_db() as sessions:
+            monkeypatch.setattr(replay, "async_session", sessions)
+            tenant_id, company_id, _ = await _seed(sessions)
+            full = await replay_company(tenant_id, company_id, START, END, "1d")
+            first = await _snapshots(sessions, company_id)
+            first_ids = await _ids(sessions)
+
+            # A run interrupted after the snapshot of day 3 resumes from there.
+            checkpoint = ReplayCheckpoint(None, {})
+            await checkpoint.mark(company_id, (START + timedelta(days=3)).isoformat())
+            resumed = await replay_company(tenant_id, company_id, START, END, "1d", replace=True, checkpoint=checkpoint)
+            second = await _snapshots(sessions, company_id)
+            kept = len(first_ids & await _ids(sessions))
+
+            rerun = await replay_company(tenant_id, company_id, START, END, "1d", replace=True)
+            third = await _snapshots(sessions, company_id)
+            return full, first, resumed, kept, second, rerun, third, checkpoint.is_done(company_id)
+
+    full, first, resumed, kept, second, rerun, third, done = asyncio.run(run())
+    assert full == 8 and resumed == 4 and kept == 4 and rerun == 8 and done
+    assert second == first == third  # no duplicates, same values
+
+
+def test_replay_scores_skips_companies_done_in_checkpoint(memory_db, monkeypatch, tmp_path):
+    path = str(tmp_path / "replay.json")
+
+    async def run():
+        async with memory_db() as sessions:
+            monkeypatch.setattr(replay, "async_session", sessions)
+            await _seed(sessions)
+            first = await replay_scores(START, END, "1d", checkpoint_path=path)
+            second = await replay_scores(START, END, "1d", checkpoint_path=path)
+            with pytest.raises(ValueError):
+                await replay_scores(START, END, "1h", checkpoint_path=path)
+            return first, second
+
+    first, second = asyncio.run(run())
+    assert first == {"companies": 1, "skipped": 0, "rows": 8}
+    assert second == {"companies": 1, "skipped": 1, "rows": 0}
@@ -0,0 +1,87 @@
+from datetime import datetime, timezone, timedelta
+from app.services.rollups import bucket_floor, lttb_indices, _aggregate
+
+
+def test_bucket_floor():
+    ts = datetime(2025, 3, 4, 15, 42, 7, tzinfo=timezone.utc)
+    assert bucket_floor(ts, "1h") == datetime(2025, 3, 4, 15, tzinfo=timezone.utc)
+    assert bucket_floor(ts, "1d") == datetime(2025, 3, 4, tzinfo=timezone.utc)
+
+
+def test_aggregate_ohlc_and_averages():
+    start = datetime(2025, 3, 4, 10, tzinfo=timezone.utc)
+    values = [70.0, 65.0, 72.0, 60.0]
+    scores = [
+        {
+            "tenant_id": "t", "company_id": "c", "overall": v,
+            "environmental": v, "social": 50.0, "governance": 40.0,
+            "recorded_at": start + timedelta(minutes=10 * i),
+        }
+        # out of order on purpose: open/close follow recorded_at, not arrival
+        for i, v in reversed(list(enumerate(values)))
+    ]
+    buckets = _aggregate(scores)
+    hourly = buckets[("t", "c", "1h", start)]
+    assert (hourly.open, hourly.high, hourly.low, hourly.close) == (70.0, 72.0, 60.0, 60.0)
+    assert hourly.count == 4
+    assert hourly.e_sum / hourly.count == sum(values) / 4
+    assert ("t", "c", "1d", datetime(2025, 3, 4, tzinfo=timezone.utc)) in buckets
+
+
+def test_lttb_keeps_endpoints_and_budget():
+    xs = list(range(1000))
+    ys = [float((i * 37) % 101) for i in xs]
+    kept = lttb_indices(xs, ys, 50)
+    assert len(kept) == 50
+    assert kept[0] == 0 and kept[-1] == 999
+    assert kept == sorted(kept)
+
+
+def test_lttb_preserves_spike():
+    xs = list(range(500))
+    ys = [0.0] * 500
+    ys[250] = 100.0
+    assert 250 in lttb_indices(xs, ys, 20)
+
+
+def test_lttb_short_series_untouched():
+    assert lttb_indices([1, 2, 3], [1, 2, 3], 10) == [0, 1, 2]
+
+
+def test_apply_scores_merges_into_existing_buckets(memory_db):
+    import asyncio
+    from sqlalchemy import select
+    from app.db.models import ESGScoreRollup
+    from app.services.rollups import apply_scores_to_rollups
+
+    start = datetime(2025, 3, 4, 10, tzinfo=timezone.utc)
+    values = [70.0, 65.0, 72.0, 60.0, 68.0]
+    scores = [
+        {
+            "id": f"s{i}", "tenant_id": "t", "company_id": "c", "overall": v,
+            "environmental": v, "social": 50.0 + i, "governance": 40.0,
+            "recorded_at": start + timedelta(minutes=10 * i),
+        }
+        for i, v in enumerate(values)
+    ]
+
+    async def run():
+        async with memory_db() as sessions:
+            # Two writers folding into the same buckets, the later one
+            # carrying both an earlier and a later sample.
+            for batch in (scores[1:4], [scores[0], scores[4]]):
+                async with sessions() as db:
+                    await apply_scores_to_rollups(db, batch, chunk_size=1)
+                    await db.commit()
+            async with sessions() as db:
+                return {r.resolution: r for r in (await db.execute(select(ESGScoreRollup))).scalars()}
+
+    rows = asyncio.run(run())
+    expected = _aggregate(scores)[("t", "c", "1h", start)]
+    hourly = rows["1h"]
+    assert (hourly.open, hourly.high, hourly.low, hourly.close) == (70.0, 72.0, 60.0, 68.0)
+    assert hourly.sample_count == rows["1d"].sample_count == 5
+    assert abs(hourly.environmental_avg - expected.e_sum / 5) < 1e-9
+    assert abs(hourly.social_avg - expected.s_sum / 5) < 1e-9
+    assert hourly.first_at.replace(tzinfo=timezone.utc) == start
+    assert hourly.last_at.replace(tzinfo=timezone.utc) == start + timedelta(minutes=40)
@@ -0,0 +1,141 @@
+import asyncio
+import random
+from types import SimpleNamespace
+import pytest
+from datetime import datetime, timezone, timedelta
+from app.services.scoring import compute_category_impacts, build_score
+from app.services.score_state import CompanyScoreState
+
+
+def _make_events(n, start, span_days, seed=7):
+    rng = random.Random(seed)
+    events = []
+    for i in range(n):
+        events.append(SimpleNamespace(
+            id=f"evt-{i}",
+            category=rng.choice(["environmental", "social", "governance", "Social", None, "other"]),
+            severity=rng.randint(1, 10),
+            confidence=round(rng.uniform(0.3, 1.0), 2),
+            event_date=start + timedelta(hours=rng.uniform(0, span_days * 24)),
+        ))
+    return events
+
+
+def _reference(events, now):
+    lookback = now - timedelta(days=90)
+    return compute_category_impacts([e for e in events if e.event_date >= lookback], now)
+
+
+def _assert_same_score(state_impacts, ref_impacts, now):
+    a = build_score("t", "c", state_impacts, now)
+    b = build_score("t", "c", ref_impacts, now)
+    for field in ("overall", "environmental", "social", "governance", "risk_level"):
+        assert getattr(a, field) == getattr(b, field)
+    for cat in ref_impacts:
+        assert abs(state_impacts[cat] - ref_impacts[cat]) < 1e-6
+
+
+def test_incremental_matches_rescan_in_order():
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    events = sorted(_make_events(400, start, 200), key=lambda e: e.event_date)
+    state = CompanyScoreState(start)
+    seen = []
+    for e in events:
+        state.advance(e.event_date)
+        state.add(e.id, e.event_date, e.category, e.severity, e.confidence)
+        seen.append(e)
+        _assert_same_score(state.category_impacts(), _reference(seen, e.event_date), e.event_date)
+
+
+def test_incremental_handles_backfill_and_future_events():
+    now = datetime(2025, 6, 1, tzinfo=timezone.utc)
+    events = _make_events(300, now - timedelta(days=120), 150, seed=11)
+    state = CompanyScoreState(now)
+    for e in events:
+        state.add(e.id, e.event_date, e.category, e.severity, e.confidence)
+    _assert_same_score(state.category_impacts(), _reference(events, now), now)
+
+    for step in range(1, 40):
+        later = now + timedelta(days=step * 1.5)
+        state.advance(later)
+        _assert_same_score(state.category_impacts(), _reference(events, later), later)
+
+
+def test_duplicate_event_is_ignored():
+    now = datetime(2025, 6, 1, tzinfo=timezone.utc)
+    state = CompanyScoreState(now)
+    assert state.add("e1", now, "social", 8, 0.9)
+    assert not state.add("e1", now, "social", 8, 0.9)
+    assert state.counts["social"] == 1
+
+
+def test_naive_datetimes_are_treated_as_utc():
+    now = datetime(2025, 6, 1, tzinfo=timezone.utc)
+    state = CompanyScoreState(now)
+    state.add("e1", datetime(2025, 5, 18), "environmental", 10, 1.0)
+    assert abs(state.category_impacts()["environmental"] - 10 * 0.5) < 0.01
+
+
+def test_events_of_a_failed_pipeline_are_taken_out_again(memory_db, monkeypatch):
+    import app.services.score_state as score_state
+    import app.workers.pipeline as pipeline
+    from app.db.models import Company, ESGEvent, Tenant
+    from app.services.score_state import IncrementalScoreEngine
+
+    engine = IncrementalScoreEngine()
+    monkeypatch.setattr(score_state, "score_engine", engine)
+    monkeypatch.setattr(pipeline, "score_engine", engine)
+    monkeypatch.setattr(pipeline.get_settings(), "DEDUP_ENABLED", False)
+    alerts_down = True
+
+    async def classify_event(title, description):
+        return {"category": "social", "severity": 9, "confidence": 1.0}
+
+    async def create_embedding(text):
+        return [1.0, 0.0]
+
+    async def evaluate_alerts_for_event(db, event, score, tenant_id):
+        if alerts_down:
+            raise RuntimeError("alert rules unavailable")
+
+    monkeypatch.setattr(pipeline, "classify_event", classify_event)
+    monkeypatch.setattr(pipeline, "create_embedding", create_embedding)
+    monkeypatch.setattr(pipeline, "evaluate_alerts_for_event", evaluate_alerts_for_event)
+    now = datetime.now(timezone.utc) + timedelta(minutes=1)
+
+    async def ingest(sessions, tenant, company, title):
+        async with sessions() as db:
+            event = ESGEvent(tenant_id=tenant.id, company_id=company.id, title=title, category="governance")
+            db.add(event)
+            await db.flush()
+            await pipeline.process_event(db, event, coalesce=False)
+            await db.commit()
+            return event
+
+    async def run():
+        nonlocal alerts_down
+        async with memory_db() as sessions:
+            async with sessions() as db:
+                tenant = Tenant(name="T", slug="t")
+                db.add(tenant)
+                await db.flush()
+                company = Company(tenant_id=tenant.id, name="C")
+                db.add(company)
+                await db.commit()
+                before = await engine.category_impacts(db, tenant.id, company.id, now)
+
+            with pytest.raises(RuntimeError):
+                await ingest(sessions, tenant, company, "Strike at plant")
+            async with sessions() as db:
+                after_failure = await engine.category_impacts(db, tenant.id, company.id, now)
+
+            alerts_down = False
+            event = await ingest(sessions, tenant, company, "Strike at plant")
+            async with sessions() as db:
+                after_commit = await engine.category_impacts(db, tenant.id, company.id, now)
+            return before, after_failure, after_commit, event
+
+    before, after_failure, after_commit, event = asyncio.run(run())
+    assert after_failure == before
+    assert after_commit["social"] > before["social"] == 0.0
+    assert engine._states[(event.tenant_id, event.company_id)].ids == {event.id}
@@ -0,0 +1,222 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import app.workers.stages as stages
+from app.workers.broker import Broker, FileLogBroker, MemoryBroker, partition_for
+from app.workers.stages import StagedPipeline
+
+TOPICS = {"raw_events": {"partitions": 3}, "normalized": {"partitions": 3},
+          "classified": {"partitions": 3}, "scored_updates": {"partitions": 3}}
+
+
+def test_memory_broker_partitions_by_key_and_tracks_offsets():
+    broker = MemoryBroker(TOPICS)
+    records = [broker.produce("raw_events", f"c{i % 4}", {"n": i}) for i in range(12)]
+    assert all(r.partition == partition_for(r.key, 3) for r in records)
+    p = records[0].partition
+    ours = [r.value["n"] for r in records if r.partition == p]
+    assert [r.value["n"] for r in broker.read("raw_events", p, 0, 100)] == ours
+
+    broker.commit("g", "raw_events", p, 2)
+    assert broker.committed("g", "raw_events", p) == 2 and broker.committed("other", "raw_events", p) == 0
+
+    async def wait_for_produce():
+        positions = {q: broker.end_offset("normalized", q) for q in range(3)}
+        fetch = asyncio.ensure_future(broker.fetch("normalized", positions, 10, timeout_s=5))
+        await asyncio.sleep(0.01)
+        broker.produce("normalized", "c1", {"late": True})
+        return await fetch
+
+    assert [r.value for r in asyncio.run(wait_for_produce())] == [{"late": True}]
+
+
+def test_incomplete_brokers_and_stages_fail_when_created():
+    class NoCommit(Broker):
+        def read(self, topic, partition, offset, max_records):
+            return []
+
+        def end_offset(self, topic, partition):
+            return 0
+
+        def committed(self, group, topic, partition):
+            return 0
+
+        def _append(self, topic, partition, key, value):
+            return 0
+
+    class NoHandle(stages.StageConsumer):
+        name = source = "raw_events"
+
+    with pytest.raises(TypeError, match="commit"):
+        NoCommit(TOPICS)
+    with pytest.raises(TypeError, match="handle"):
+        NoHandle(SimpleNamespace(), 1)
+    stages.NormalizedConsumer(SimpleNamespace(), 1)  # handles batches, and single records through them
+
+
+def test_file_log_broker_resumes_after_reopen(tmp_path):
+    broker = FileLogBroker(str(tmp_path), TOPICS, fsync=False)
+    for i in range(5):
+        broker.produce("raw_events", "c1", {"n": i})
+    p = partition_for("c1", 3)
+    broker.commit("esg-normalize", "raw_events", p, 3)
+    broker.close()
+    with open(tmp_path / "raw_events" / f"{p:03d}.log", "ab") as f:
+        f.write(b'{"key":"c1","value":{"n":')  # crash in the middle of a write
+
+    reopened = FileLogBroker(str(tmp_path), TOPICS, fsync=False)
+    offset = reopened.committed("esg-normalize", "raw_events", p)
+    assert offset == 3 and reopened.end_offset("raw_events", p) == 5
+    assert [r.value["n"] for r in reopened.read("raw_events", p, offset, 10)] == [3, 4]
+    assert reopened.produce("raw_events", "c1", {"n": 5}).offset == 5
+    assert reopened.read("raw_events", p, 5, 1)[0].value == {"n": 5}
+    reopened.close()
+
+
+class _FakeSession:
+    def __init__(self, db):
+        self.db = db
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def get(self, model, event_id):
+        return self.db.events.get(event_id)
+
+    async def execute(self, stmt):  # the recovery query
+        return [SimpleNamespace(id=e.id, company_id=e.company_id) for e in self.db.events.values()
+                if not e.is_processed and not e.processing_error]
+
+    async def commit(self):
+        self.db.commits += 1
+
+
+class _FakeDB:
+    def __init__(self, n, companies=3):
+        self.events = {
+            f"e{i}": SimpleNamespace(
+                id=f"e{i}", tenant_id="t1", company_id=f"c{i % companies}", title=f" Event  {i} ",
+                description="text", event_date=None, is_processed=False, processing_error=None,
+            )
+            for i in range(n)
+        }
+        self.commits = 0
+
+    def session(self):
+        return _FakeSession(self)
+
+
+@pytest.fixture
+def fake_steps(monkeypatch):
+    calls = {"classify": [], "scored": [], "published": []}
+
+    async def classify_events(items):
+        calls["classify"].append(len(items))
+        await asyncio.sleep(0.01)
+        return [{"category": "environmental", "title": t} for t, _ in items]
+
+    async def score_classified(db, event, classification):
+        if event.title.endswith("poison "):
+            raise ValueError("bad event")
+        assert classification["title"] == " ".join(event.title.split())
+        event.is_processed = True
+        calls["scored"].append(event.id)
+        return SimpleNamespace(company_id=event.company_id), [event]
+
+    async def publish_live_update(update):
+        calls["published"].append(update)
+
+    monkeypatch.setattr(stages, "find_canonical", lambda event: None)
+    monkeypatch.setattr(stages, "classify_events", classify_events)
+    monkeypatch.setattr(stages, "score_classified", score_classified)
+    monkeypatch.setattr(stages, "live_update", lambda score, events: {"events": [e.id for e in events]})
+    monkeypatch.setattr(stages, "publish_live_update", publish_live_update)
+    settings = stages.get_settings()
+    monkeypatch.setattr(settings, "PIPELINE_CLASSIFY_CONSUMERS", 2)
+    monkeypatch.setattr(settings, "PIPELINE_CLASSIFY_BATCH", 8)
+    return calls
+
+
+def test_events_flow_through_every_stage(fake_steps):
+    db = _FakeDB(30)
+    db.events["e7"].title = "poison "
+    pipeline = StagedPipeline(MemoryBroker(TOPICS), session_factory=db.session)
+
+    async def run():
+        pipeline.start()
+        for event in db.events.values():
+            assert pipeline.submit(event.id, event.company_id)
+        await asyncio.wait_for(pipeline.drain(), 5)
+        await pipeline.stop()
+
+    asyncio.run(run())
+    assert sorted(fake_steps["scored"]) == sorted(e for e in db.events if e != "e7")
+    assert db.events["e7"].processing_error == "ValueError: bad event"
+    assert max(fake_steps["classify"]) > 1  # classified in batches
+    assert sum(len(u["events"]) for u in fake_steps["published"]) == 29
+    # A company's events keep their submission order through the stages.
+    for company in ("c0", "c1", "c2"):
+        ids = [e for e in fake_steps["scored"] if db.events[e].company_id == company]
+        assert ids == sorted(ids, key=lambda e: int(e[1:]))
+    stats = pipeline.stats()["stages"]
+    assert stats["score"]["failed"] == 1 and all(s["lag"] == 0 for s in stats.values())
+
+
+def test_restart_resumes_from_committed_offsets(fake_steps, monkeypatch, tmp_path):
+    db = _FakeDB(6)
+
+    async def stuck(db_, event, classification):
+        await asyncio.sleep(3600)
+
+    async def crash():
+        pipeline = StagedPipeline(FileLogBroker(str(tmp_path), TOPICS), session_factory=db.session)
+        pipeline.start()
+        for event in db.events.values():
+            pipeline.submit(event.id, event.company_id)
+        while pipeline.stages[1].lag() or len(fake_steps["classify"]) == 0:
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.05)
+        await pipeline.stop(timeout=0.1)  # the score stage is cancelled mid-batch
+        pipeline.broker.close()
+
+    real_score = stages.score_classified
+    monkeypatch.setattr(stages, "score_classified", stuck)
+    asyncio.run(crash())
+    assert not any(e.is_processed for e in db.events.values())
+    classified_before = sum(fake_steps["classify"])
+
+    monkeypatch.setattr(stages, "score_classified", real_score)
+
+    async def restart():
+        pipeline = StagedPipeline(FileLogBroker(str(tmp_path), TOPICS), session_factory=db.session)
+        pipeline.start()
+        recovered = await pipeline.recover()
+        await asyncio.wait_for(pipeline.drain(), 5)
+        await pipeline.stop()
+        pipeline.broker.close()
+        return recovered
+
+    assert asyncio.run(restart()) == 0  # everything was still in the logs
+    assert sorted(fake_steps["scored"]) == sorted(db.events)
+    assert sum(fake_steps["classify"]) == classified_before  # not classified again
+
+
+def test_recover_requeues_events_lost_with_a_memory_broker(fake_steps):
+    db = _FakeDB(4)
+    db.events["e0"].is_processed = True
+    pipeline = StagedPipeline(MemoryBroker(TOPICS), session_factory=db.session)
+
+    async def run():
+        pipeline.start()
+        recovered = await pipeline.recover()
+        await asyncio.wait_for(pipeline.drain(), 5)
+        await pipeline.stop()
+        return recovered
+
+    assert asyncio.run(run()) == 3
+    assert sorted(fake_steps["scored"]) == ["e1", "e2", "e3"]
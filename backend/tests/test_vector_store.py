@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from app.services.vector_store import LocalVectorStore
+
+
+def _meta(company="c1", tenant="t1"):
+    return {"tenant_id": tenant, "company_id": company}
+
+
+def test_query_ranks_by_cosine_within_partition():
+    store = LocalVectorStore()
+    store.upsert("a", [1, 0, 0], _meta(), "A")
+    store.upsert("b", [1, 1, 0], _meta(), "B")
+    store.upsert("c", [0, 0, 5], _meta())
+    store.upsert("other", [1, 0, 0], _meta(company="c2"))
+    store.upsert("other-tenant", [1, 0, 0], _meta(tenant="t2"))
+
+    results = store.query([2, 0, 0], "t1", "c1", top_k=2)
+    assert [r["id"] for r in results] == ["a", "b"]
+    assert results[0]["score"] == pytest.approx(1.0)
+    assert results[1]["score"] == pytest.approx(2 ** -0.5)
+    assert results[0]["text"] == "A" and results[0]["metadata"] == _meta()
+    assert store.query([1, 0, 0], "t1", "missing") == []
+
+
+def test_matches_brute_force_after_growth_and_deletes():
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((500, 8))
+    store = LocalVectorStore()
+    for i, v in enumerate(vectors):
+        store.upsert(str(i), v, _meta())
+    for i in range(0, 500, 3):
+        assert store.delete(str(i))
+    assert not store.delete("0")
+
+    kept = [i for i in range(500) if i % 3]
+    q = rng.standard_normal(8)
+    unit = vectors[kept] / np.linalg.norm(vectors[kept], axis=1, keepdims=True)
+    expected = [str(kept[i]) for i in np.argsort(unit @ q / np.linalg.norm(q))[::-1][:10]]
+    assert [r["id"] for r in store.query(q, "t1", "c1", top_k=10)] == expected
+    assert len(store) == len(kept)
+
+
+def test_upsert_replaces_and_moves_partitions():
+    store = LocalVectorStore()
+    store.upsert("a", [1, 0], _meta(), "old")
+    store.upsert("a", [0, 1], _meta(), "new")
+    assert len(store) == 1
+    assert store.query([0, 1], "t1", "c1")[0]["text"] == "new"
+
+    store.upsert("a", [0, 1], _meta(company="c2"))
+    assert store.query([0, 1], "t1", "c1") == []
+    assert [r["id"] for r in store.query([0, 1], "t1", "c2")] == ["a"]
+    assert store.stats()["partitions"] == 1
+
+
+def test_dimension_mismatch_is_rejected():
+    store = LocalVectorStore()
+    store.upsert("a", [1, 0, 0], _meta())
+    with pytest.raises(ValueError):
+        store.upsert("b", [1, 0], _meta())
@@ -12,13 +12,14 @@ import { useAuthStore } from "@/stores/auth";
 import { useDashboardStore } from "@/stores/dashboard";
 import { api } from "@/lib/api";
 import { wsClient } from "@/lib/websocket";
+import type { ESGScore } from "@/types/api";
 
 export default function DashboardClient() {
   const router = useRouter();
   const { hydrate } = useAuthStore();
   const {
     companies, setCompanies, selectedCompanyId, selectCompany,
-    latestScores, setLatestScore, scoreHistory, setScoreHistory,
+    latestScores, setLatestScore, setLatestScores, scoreHistory, setScoreHistory,
     events, setEvents, addLiveUpdate,
   } = useDashboardStore();
   const [loading, setLoading] = useState(true);
@@ -58,8 +59,13 @@ export default function DashboardClient() {
 
   const loadData = async () => {
     try {
-      const companiesData = await api.getCompanies();
+      const companiesData = await api.getCompaniesWithScores();
       setCompanies(companiesData);
+      const scores: Record<string, ESGScore> = {};
+      for (const company of companiesData) {
+        if (company.latest_score) scores[company.id] = company.latest_score;
+      }
+      setLatestScores(scores);
       if (companiesData.length > 0 && !selectedCompanyId) {
         selectCompany(companiesData[0].id);
       }
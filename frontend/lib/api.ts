@@ -44,6 +44,9 @@ export const api = {
   getCompanies: (query?: string) =>
     apiFetch<Company[]>(`/v1/companies${query ? `?query=${encodeURIComponent(query)}` : ""}`),
 
+  getCompaniesWithScores: () =>
+    apiFetch<Company[]>("/v1/companies?include=latest_score,delta_24h&limit=10000"),
+
   getCompany: (id: string) =>
     apiFetch<Company>(`/v1/companies/${id}`),
 
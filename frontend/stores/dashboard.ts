@@ -14,6 +14,7 @@ interface DashboardState {
   setCompanies: (companies: Company[]) => void;
   selectCompany: (id: string) => void;
   setLatestScore: (companyId: string, score: ESGScore) => void;
+  setLatestScores: (scores: Record<string, ESGScore>) => void;
   setScoreHistory: (companyId: string, scores: ESGScore[]) => void;
   setEvents: (companyId: string, events: ESGEvent[]) => void;
   addLiveUpdate: (update: LiveUpdate) => void;
@@ -40,6 +41,11 @@ export const useDashboardStore = create<DashboardState>((set) => ({
       latestScores: { ...state.latestScores, [companyId]: score },
     })),
 
+  setLatestScores: (scores) =>
+    set((state) => ({
+      latestScores: { ...state.latestScores, ...scores },
+    })),
+
   setScoreHistory: (companyId, scores) =>
     set((state) => ({
       scoreHistory: { ...state.scoreHistory, [companyId]: scores },
@@ -6,6 +6,8 @@ export interface Company {
   country: string | null;
   description: string;
   logo_url: string;
+  latest_score?: ESGScore | null;
+  delta_24h?: number | null;
 }
 
 export interface ESGScore {